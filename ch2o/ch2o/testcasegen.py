@@ -7,6 +7,7 @@ import glob
 import os
 import shutil
 import types
+import zlib
 
 import numpy as np
 import chainer
@@ -67,6 +68,34 @@ def validate_chainer_output(ys):
     return ys
 
 
+# Serialized tensors keyed by the ids of arrays and their names. Test
+# scripts often feed the same input arrays to multiple test cases, and
+# they are serialized only once. Arrays are kept in the cache so their
+# ids are not reused, and checksums detect arrays updated in place.
+_serialized_tensors = {}
+
+
+def _serialize_tensor(value, name):
+    value = chainer.cuda.to_cpu(value)
+    key = (id(value), name)
+    checksum = (value.dtype.str, value.shape,
+                zlib.crc32(np.ascontiguousarray(value)))
+    cached = _serialized_tensors.get(key)
+    if cached is not None and cached[1] == checksum:
+        return cached[2]
+    tensor = tensor_from_array(value, name)
+    serialized = (tensor.data_type, value.shape, tensor.SerializeToString())
+    _serialized_tensors[key] = (value, checksum, serialized)
+    return serialized
+
+
+def _write_tensor(filename, value, name):
+    data_type, dims, serialized = _serialize_tensor(value, name)
+    with open(filename, 'wb') as f:
+        f.write(serialized)
+    return data_type, dims
+
+
 def dump_test_inputs_outputs(inputs, outputs, test_data_dir):
     if not os.path.exists(test_data_dir):
         os.makedirs(test_data_dir)
@@ -81,14 +110,12 @@ def dump_test_inputs_outputs(inputs, outputs, test_data_dir):
                     filename = os.path.join(
                         test_data_dir,
                         '%s_%d_%s.pb' % (typ, i, str(j).zfill(digits)))
-                    tensor = tensor_from_array(v, name)
-                    with open(filename, 'wb') as f:
-                        f.write(tensor.SerializeToString())
+                    data_type, _ = _write_tensor(filename, v, name)
 
                 value_info.type.CopyFrom(onnx.TypeProto())
                 sequence_type = value_info.type.sequence_type
                 tensor_type = sequence_type.elem_type.tensor_type
-                tensor_type.elem_type = tensor.data_type
+                tensor_type.elem_type = data_type
             else:
                 filename = os.path.join(test_data_dir,
                                         '%s_%d.pb' % (typ, i))
@@ -96,12 +123,10 @@ def dump_test_inputs_outputs(inputs, outputs, test_data_dir):
                     if get_test_args().allow_unused_params:
                         continue
                     raise RuntimeError('Unused parameter: %s' % name)
-                tensor = tensor_from_array(value, name)
-                with open(filename, 'wb') as f:
-                    f.write(tensor.SerializeToString())
+                data_type, dims = _write_tensor(filename, value, name)
 
                 vi = onnx.helper.make_tensor_value_info(
-                    name, tensor.data_type, tensor.dims)
+                    name, data_type, dims)
                 value_info.CopyFrom(vi)
 
 
@@ -0,0 +1,93 @@
+#include "common/thread_pool.h"
+
+#include <algorithm>
+#include <atomic>
+#include <memory>
+
+#include <common/log.h>
+
+namespace chainer_compiler {
+
+ThreadPool::ThreadPool(int num_threads) {
+    CHECK_LE(0, num_threads);
+    for (int i = 0; i < num_threads; ++i) {
+        workers_.emplace_back([this]() { Loop(); });
+    }
+}
+
+ThreadPool::~ThreadPool() {
+    {
+        std::unique_lock<std::mutex> lock{mu_};
+        should_finish_ = true;
+        cond_.notify_all();
+    }
+    for (std::thread& worker : workers_) {
+        worker.join();
+    }
+}
+
+void ThreadPool::Schedule(std::function<void()> task) {
+    if (workers_.empty()) {
+        task();
+        return;
+    }
+    std::unique_lock<std::mutex> lock{mu_};
+    tasks_.push(std::move(task));
+    cond_.notify_one();
+}
+
+void ThreadPool::ParallelFor(int64_t n, const std::function<void(int64_t)>& fn) {
+    if (n <= 0) return;
+    if (workers_.empty() || n == 1) {
+        for (int64_t i = 0; i < n; ++i) fn(i);
+        return;
+    }
+
+    // The state is shared with tasks which may start after this
+    // function returns. Such late tasks find no remaining work.
+    struct State {
+        std::atomic<int64_t> next{0};
+        int64_t done = 0;
+        std::mutex mu;
+        std::condition_variable cond;
+    };
+    std::shared_ptr<State> state = std::make_shared<State>();
+    auto run = [state, n, &fn]() {
+        int64_t num_done = 0;
+        for (int64_t i; (i = state->next++) < n;) {
+            fn(i);
+            ++num_done;
+        }
+        if (num_done == 0) return;
+        std::unique_lock<std::mutex> lock{state->mu};
+        state->done += num_done;
+        if (state->done == n) state->cond.notify_all();
+    };
+
+    int64_t num_tasks = std::min<int64_t>(n - 1, workers_.size());
+    for (int64_t i = 0; i < num_tasks; ++i) {
+        // `fn` is only dereferenced while some indices remain, i.e.,
+        // before this function returns.
+        Schedule(run);
+    }
+    run();
+
+    std::unique_lock<std::mutex> lock{state->mu};
+    while (state->done != n) state->cond.wait(lock);
+}
+
+void ThreadPool::Loop() {
+    while (true) {
+        std::function<void()> task;
+        {
+            std::unique_lock<std::mutex> lock{mu_};
+            while (tasks_.empty() && !should_finish_) cond_.wait(lock);
+            if (tasks_.empty()) return;
+            task = std::move(tasks_.front());
+            tasks_.pop();
+        }
+        task();
+    }
+}
+
+}  // namespace chainer_compiler
@@ -0,0 +1,45 @@
+#pragma once
+
+#include <condition_variable>
+#include <cstdint>
+#include <functional>
+#include <mutex>
+#include <queue>
+#include <thread>
+#include <vector>
+
+namespace chainer_compiler {
+
+// A fixed-size pool of worker threads. A pool with zero threads runs
+// everything on the calling thread.
+class ThreadPool {
+public:
+    explicit ThreadPool(int num_threads);
+    ~ThreadPool();
+
+    ThreadPool(const ThreadPool&) = delete;
+    ThreadPool& operator=(const ThreadPool&) = delete;
+
+    // Enqueues `task` to be run by one of the workers.
+    void Schedule(std::function<void()> task);
+
+    // Runs `fn(i)` for each `i` in [0, n) and waits for all of them.
+    // The calling thread also takes part in the loop so this can be
+    // called from a task running on this pool.
+    void ParallelFor(int64_t n, const std::function<void(int64_t)>& fn);
+
+    int num_threads() const {
+        return static_cast<int>(workers_.size());
+    }
+
+private:
+    void Loop();
+
+    std::vector<std::thread> workers_;
+    std::mutex mu_;
+    std::condition_variable cond_;
+    std::queue<std::function<void()>> tasks_;
+    bool should_finish_ = false;
+};
+
+}  // namespace chainer_compiler
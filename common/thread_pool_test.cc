@@ -0,0 +1,42 @@
+#include <gtest/gtest.h>
+
+#include <atomic>
+#include <vector>
+
+#include <common/thread_pool.h>
+
+namespace chainer_compiler {
+namespace {
+
+TEST(ThreadPoolTest, ParallelFor) {
+    for (int num_threads : {0, 1, 4}) {
+        ThreadPool pool(num_threads);
+        EXPECT_EQ(num_threads, pool.num_threads());
+        std::vector<int> values(1000);
+        pool.ParallelFor(values.size(), [&values](int64_t i) { values[i] = i * 2; });
+        for (size_t i = 0; i < values.size(); ++i) {
+            EXPECT_EQ(i * 2, values[i]);
+        }
+    }
+}
+
+TEST(ThreadPoolTest, NestedParallelFor) {
+    ThreadPool pool(2);
+    std::atomic<int> sum{0};
+    pool.ParallelFor(8, [&pool, &sum](int64_t i) { pool.ParallelFor(10, [&sum](int64_t j) { sum += j; }); });
+    EXPECT_EQ(8 * 45, sum);
+}
+
+TEST(ThreadPoolTest, Schedule) {
+    std::atomic<int> count{0};
+    {
+        ThreadPool pool(3);
+        for (int i = 0; i < 100; ++i) {
+            pool.Schedule([&count]() { ++count; });
+        }
+    }
+    EXPECT_EQ(100, count);
+}
+
+}  // namespace
+}  // namespace chainer_compiler
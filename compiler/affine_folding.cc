@@ -0,0 +1,233 @@
+#include "compiler/affine_folding.h"
+
+#include <vector>
+
+#include <common/log.h>
+#include <compiler/constant_propagation.h>
+#include <compiler/graph.h>
+#include <compiler/graph_builder.h>
+#include <compiler/log.h>
+#include <compiler/node.h>
+#include <compiler/tensor.h>
+#include <compiler/type.h>
+#include <compiler/value.h>
+
+namespace chainer_compiler {
+
+namespace {
+
+bool IsConstant(const Value* value) {
+    return value->producer() && value->producer()->op_type() == Node::kConstant;
+}
+
+const Tensor& GetConstant(const Value* value) {
+    return *value->producer()->tensor_value();
+}
+
+// Returns the number of output channels of `node`, or -1 if `node`
+// cannot absorb per-channel affine transformations. The channel axis
+// of outputs is always 1.
+int64_t GetNumChannels(const Node& node) {
+    switch (node.op_type()) {
+        case Node::kConv: {
+            if (!IsConstant(node.input(1))) return -1;
+            if (node.inputs().size() >= 3 && !IsConstant(node.input(2))) return -1;
+            return GetConstant(node.input(1)).dims()[0];
+        }
+
+        case Node::kGemm: {
+            if (!IsConstant(node.input(1)) || !IsConstant(node.input(2))) return -1;
+            // TODO(hamaji): Support beta != 1.
+            if (node.beta() != 1.0) return -1;
+            return GetConstant(node.input(1)).dims()[node.trans_b() ? 0 : 1];
+        }
+
+        default:
+            return -1;
+    }
+}
+
+int GetOutputRank(const Node& node) {
+    if (node.op_type() == Node::kGemm) return 2;
+    return GetConstant(node.input(1)).dims().size();
+}
+
+// Checks if `value` is a constant which has the same value along all
+// axes but the channel axis when it is broadcasted to outputs of
+// `node`.
+bool IsPerChannelConstant(const Node& node, int64_t num_channels, const Value* value) {
+    if (!IsConstant(value)) return false;
+    const Tensor& tensor = GetConstant(value);
+    if (tensor.dtype() != GetConstant(node.input(1)).dtype()) return false;
+    const std::vector<int64_t> dims = tensor.dims();
+    const int rank = GetOutputRank(node);
+    if (dims.size() > rank) return false;
+    const int offset = rank - dims.size();
+    for (size_t i = 0; i < dims.size(); ++i) {
+        if (i + offset == 1) {
+            if (dims[i] != 1 && dims[i] != num_channels) return false;
+        } else if (dims[i] != 1) {
+            return false;
+        }
+    }
+    return true;
+}
+
+// Returns a 1D tensor of size 1 or `num_channels`.
+Value* FlattenPerChannelConstant(GraphBuilder* gb, Value* value) {
+    Value* shape = gb->Const(Type(Dtype::kInt64, {1}), {-1});
+    return gb->Op(Node::kReshape, {value, shape});
+}
+
+Value* GetBias(const Node& node) {
+    if (node.op_type() == Node::kGemm) return node.input(2);
+    if (node.inputs().size() >= 3) return node.input(2);
+    return nullptr;
+}
+
+// Returns weights of `node` multiplied by `factor` along the output
+// channel axis.
+Value* ScaleWeight(GraphBuilder* gb, const Node& node, Value* factor) {
+    Value* w = node.input(1);
+    Value* scaled;
+    if (node.op_type() == Node::kGemm && !node.trans_b()) {
+        // (K, N) * (N)
+        scaled = gb->Op(Node::kMul, {w, factor});
+    } else {
+        std::vector<int64_t> axes;
+        for (size_t i = 1; i < GetConstant(w).dims().size(); ++i) axes.push_back(i);
+        Value* f = gb->Op(Node::kUnsqueeze, {factor});
+        f->producer()->set_axes(axes);
+        scaled = gb->Op(Node::kMul, {w, f});
+    }
+    scaled->set_type(new Type(w->type()));
+    return scaled;
+}
+
+// Replaces weights and biases of `node` by `weight` and `bias`, and
+// lets `node` output the output of `affine` instead.
+void Rewire(Graph* graph, Node* node, Node* affine, Value* weight, Value* bias) {
+    Value* output = affine->output(0);
+    graph->DetachNode(affine);
+
+    auto replace_input = [node](Value* old_value, Value* new_value) {
+        old_value->DetachUser(node);
+        new_value->AddUser(node);
+        node->ReplaceInput(old_value, new_value);
+    };
+    if (weight) replace_input(node->input(1), weight);
+    if (bias) {
+        if (node->inputs().size() >= 3) {
+            replace_input(node->input(2), bias);
+        } else {
+            node->AddInput(bias);
+        }
+    }
+
+    Value* old_output = node->output(0);
+    node->ReplaceOutput(old_output, output);
+    old_output->SetProducer(nullptr);
+    output->SetProducer(node);
+}
+
+bool FoldBatchNormalization(Graph* graph, Node* node, int64_t num_channels, Node* bn) {
+    if (bn->outputs().size() != 1 || bn->chainer_in_recomputing()) return false;
+    if (bn->input(0) != node->output(0)) return false;
+    for (int i = 1; i < 5; ++i) {
+        Value* input = bn->input(i);
+        if (!IsConstant(input) || GetConstant(input).dims() != std::vector<int64_t>{num_channels}) return false;
+    }
+
+    GraphBuilder gb(graph, "FoldAffine", bn->output(0));
+    Value* scale = bn->input(1);
+    Value* beta = bn->input(2);
+    Value* mean = bn->input(3);
+    Value* var = bn->input(4);
+    Value* eps = gb.Const(Type(GetConstant(var).dtype(), {}), {bn->epsilon()});
+    // y = (x - mean) * factor + beta
+    Value* factor = gb.Op(Node::kDiv, {scale, gb.Op(Node::kSqrt, {gb.Op(Node::kAdd, {var, eps})})});
+    Value* weight = ScaleWeight(&gb, *node, factor);
+    Value* bias = GetBias(*node);
+    if (bias) {
+        bias = gb.Op(Node::kAdd, {gb.Op(Node::kMul, {gb.Op(Node::kSub, {bias, mean}), factor}), beta});
+    } else {
+        bias = gb.Op(Node::kSub, {beta, gb.Op(Node::kMul, {mean, factor})});
+        bias->set_type(new Type(beta->type()));
+    }
+    Rewire(graph, node, bn, weight, bias);
+    return true;
+}
+
+bool FoldMul(Graph* graph, Node* node, int64_t num_channels, Node* mul) {
+    Value* k = mul->input(mul->input(0) == node->output(0) ? 1 : 0);
+    if (!IsPerChannelConstant(*node, num_channels, k)) return false;
+
+    GraphBuilder gb(graph, "FoldAffine", mul->output(0));
+    Value* factor = FlattenPerChannelConstant(&gb, k);
+    Value* weight = ScaleWeight(&gb, *node, factor);
+    Value* bias = GetBias(*node);
+    if (bias) bias = gb.Op(Node::kMul, {bias, factor});
+    Rewire(graph, node, mul, weight, bias);
+    return true;
+}
+
+bool FoldAdd(Graph* graph, Node* node, int64_t num_channels, Node* add) {
+    Value* k = add->input(add->input(0) == node->output(0) ? 1 : 0);
+    if (!IsPerChannelConstant(*node, num_channels, k)) return false;
+
+    GraphBuilder gb(graph, "FoldAffine", add->output(0));
+    Value* shift = FlattenPerChannelConstant(&gb, k);
+    Value* bias = GetBias(*node);
+    if (bias) {
+        bias = gb.Op(Node::kAdd, {bias, shift});
+    } else {
+        bias = gb.Op(Node::kExpand, {shift, gb.Const(Type(Dtype::kInt64, {1}), {num_channels})});
+        bias->set_type(new Type(GetConstant(k).dtype(), {num_channels}));
+    }
+    Rewire(graph, node, add, nullptr, bias);
+    return true;
+}
+
+bool FoldAffineOpsOnce(Graph* graph) {
+    bool folded = false;
+    for (Node* node : graph->GetLiveNodes()) {
+        if (node->detached()) continue;
+        const int64_t num_channels = GetNumChannels(*node);
+        if (num_channels < 0) continue;
+        Value* output = node->output(0);
+        if (output->IsOutput() || output->users().size() != 1) continue;
+        Node* user = output->users()[0];
+
+        bool ok = false;
+        switch (user->op_type()) {
+            case Node::kBatchNormalization:
+                ok = FoldBatchNormalization(graph, node, num_channels, user);
+                break;
+            case Node::kMul:
+                ok = FoldMul(graph, node, num_channels, user);
+                break;
+            case Node::kAdd:
+                ok = FoldAdd(graph, node, num_channels, user);
+                break;
+            default:
+                break;
+        }
+        if (ok) {
+            CLOG() << "Folded " << user->op_type() << " into " << node->ToString() << std::endl;
+            folded = true;
+        }
+    }
+    return folded;
+}
+
+}  // namespace
+
+void FoldAffineOps(Graph* graph) {
+    // Weights and biases need to be evaluated before the next op is
+    // folded into them.
+    while (FoldAffineOpsOnce(graph)) {
+        PropagateConstants(graph);
+    }
+}
+
+}  // namespace chainer_compiler
@@ -0,0 +1,13 @@
+#pragma once
+
+namespace chainer_compiler {
+
+class Graph;
+
+// Folds BatchNormalization and multiplications/additions by
+// per-channel constants into weights and biases of preceding Conv and
+// Gemm. Weights and biases must be `Constant`, so this is only for
+// inference.
+void FoldAffineOps(Graph* graph);
+
+}  // namespace chainer_compiler
@@ -0,0 +1,86 @@
+#include <gtest/gtest.h>
+
+#include <chainerx/context.h>
+
+#include <common/log.h>
+#include <compiler/affine_folding.h>
+#include <compiler/graph.h>
+#include <compiler/graph_builder.h>
+#include <compiler/node.h>
+#include <compiler/tensor.h>
+#include <compiler/value.h>
+
+namespace chainer_compiler {
+namespace {
+
+TEST(AffineFoldingTest, ConvBatchNormMulAdd) {
+    chainerx::Context ctx;
+    chainerx::ContextScope ctx_scope(ctx);
+
+    Graph graph("test");
+    Value* x = graph.AddInputValue("x", Type(Dtype::kFloat32, {1, 1, 2, 2}));
+    Value* y = graph.AddOutputValue("y", Type(Dtype::kFloat32, {1, 2, 2, 2}));
+    GraphBuilder gb(&graph, "test", y);
+    Value* w = gb.Const(Type(Dtype::kFloat32, {2, 1, 1, 1}), {2.0, 3.0});
+    Value* conv = gb.Op(Node::kConv, {x, w});
+    Node* conv_node = conv->producer();
+
+    // factor = scale / sqrt(var + eps) = [0.5, 0.5]
+    Value* scale = gb.Const(Type(Dtype::kFloat32, {2}), {1.0, 2.0});
+    Value* beta = gb.Const(Type(Dtype::kFloat32, {2}), {0.5, 1.0});
+    Value* mean = gb.Const(Type(Dtype::kFloat32, {2}), {1.0, 1.0});
+    Value* var = gb.Const(Type(Dtype::kFloat32, {2}), {3.0, 15.0});
+    Value* bn = gb.Op(Node::kBatchNormalization, {conv, scale, beta, mean, var});
+    bn->producer()->set_epsilon(1.0);
+    // W = [1, 1.5], b = [0, 0.5]
+
+    Value* mul = gb.Op(Node::kMul, {gb.Const(Type(Dtype::kFloat32, {1, 2, 1, 1}), {2.0, 4.0}), bn});
+    // W = [2, 6], b = [0, 2]
+
+    gb.Op(Node::kAdd, {mul, gb.Const(Type(Dtype::kFloat32, {}), {1.0})}, y);
+    // W = [2, 6], b = [1, 3]
+
+    FoldAffineOps(&graph);
+
+    ASSERT_EQ(conv_node, y->producer());
+    ASSERT_EQ(3, conv_node->inputs().size());
+    EXPECT_EQ(x, conv_node->input(0));
+    Node* weight = conv_node->input(1)->producer();
+    Node* bias = conv_node->input(2)->producer();
+    ASSERT_EQ(Node::kConstant, weight->op_type());
+    ASSERT_EQ(Node::kConstant, bias->op_type());
+    EXPECT_EQ(std::vector<int64_t>({2, 1, 1, 1}), weight->tensor_value()->dims());
+    EXPECT_EQ(2.0, weight->tensor_value()->Get<float>(0));
+    EXPECT_EQ(6.0, weight->tensor_value()->Get<float>(1));
+    EXPECT_EQ(std::vector<int64_t>({2}), bias->tensor_value()->dims());
+    EXPECT_EQ(1.0, bias->tensor_value()->Get<float>(0));
+    EXPECT_EQ(3.0, bias->tensor_value()->Get<float>(1));
+
+    for (Node* node : graph.GetLiveNodes()) {
+        EXPECT_TRUE(node->op_type() == Node::kConstant || node == conv_node) << node->ToString();
+    }
+}
+
+TEST(AffineFoldingTest, NotPerChannel) {
+    chainerx::Context ctx;
+    chainerx::ContextScope ctx_scope(ctx);
+
+    Graph graph("test");
+    Value* x = graph.AddInputValue("x", Type(Dtype::kFloat32, {1, 1, 2, 2}));
+    Value* y = graph.AddOutputValue("y", Type(Dtype::kFloat32, {1, 2, 2, 2}));
+    GraphBuilder gb(&graph, "test", y);
+    Value* w = gb.Const(Type(Dtype::kFloat32, {2, 1, 1, 1}), {2.0, 3.0});
+    Value* conv = gb.Op(Node::kConv, {x, w});
+    // Different values along the spatial axis.
+    Value* k = gb.Const(Type(Dtype::kFloat32, {2}), {2.0, 4.0});
+    Node* mul = gb.Op(Node::kMul, {conv, k}, y)->producer();
+
+    FoldAffineOps(&graph);
+
+    EXPECT_FALSE(mul->detached());
+    EXPECT_EQ(mul, y->producer());
+    EXPECT_EQ(w, conv->producer()->input(1));
+}
+
+}  // namespace
+}  // namespace chainer_compiler
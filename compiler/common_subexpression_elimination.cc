@@ -0,0 +1,184 @@
+#include "compiler/common_subexpression_elimination.h"
+
+#include <cstring>
+#include <functional>
+#include <map>
+#include <queue>
+#include <sstream>
+#include <string>
+#include <unordered_map>
+#include <vector>
+
+#include <common/log.h>
+#include <common/strutil.h>
+#include <compiler/graph.h>
+#include <compiler/log.h>
+#include <compiler/node.h>
+#include <compiler/onnx.h>
+#include <compiler/tensor.h>
+#include <compiler/type.h>
+#include <compiler/value.h>
+
+namespace chainer_compiler {
+
+namespace {
+
+bool IsEliminable(const Node& node) {
+    // Sequences are mutable in XCVM, and their types may be unknown
+    // here.
+    const std::string op_type = Node::OpTypeToString(node.op_type());
+    if (HasPrefix(op_type, "ChainerSequence") || HasPrefix(op_type, "ChainerGeneric")) return false;
+
+    switch (node.op_type()) {
+        // These ops have side effects or are not deterministic.
+        case Node::kDropout:
+        case Node::kChainerPrint:
+        case Node::kChainerDoSomething:
+            return false;
+        default:
+            break;
+    }
+    if (node.outputs().empty() || !node.GetSubGraphs().empty()) return false;
+    for (const Value* value : node.inputs()) {
+        if (value->type().kind() != Type::Kind::kTensor) return false;
+    }
+    for (const Value* value : node.outputs()) {
+        if (value->type().kind() != Type::Kind::kTensor) return false;
+    }
+    return true;
+}
+
+uint64_t HashBytes(const void* data, size_t size) {
+    // FNV-1a.
+    const uint8_t* p = static_cast<const uint8_t*>(data);
+    uint64_t hash = 14695981039346656037ULL;
+    for (size_t i = 0; i < size; ++i) {
+        hash ^= p[i];
+        hash *= 1099511628211ULL;
+    }
+    return hash;
+}
+
+size_t GetNBytes(const Tensor& tensor) {
+    return tensor.ElementSize() * tensor.NumElements();
+}
+
+// Returns a string which is the same for nodes which compute the
+// same values, except for `Constant`, whose key has only the hash of
+// its contents.
+std::string GetKey(const Node& node) {
+    std::ostringstream oss;
+    oss << node.op_type() << '(';
+    for (const Value* value : node.inputs()) {
+        if (value->IsNull()) {
+            oss << "null,";
+        } else {
+            oss << static_cast<const void*>(value) << ',';
+        }
+    }
+    oss << ')' << node.outputs().size();
+
+    if (node.op_type() == Node::kConstant) {
+        const Tensor& tensor = *node.tensor_value();
+        oss << tensor.dtype() << '[' << JoinString(tensor.dims()) << ']' << node.chainer_host() << ':'
+            << HashBytes(tensor.GetRawData(), GetNBytes(tensor));
+    } else {
+        onnx::NodeProto xnode;
+        node.FillONNXAttributes(&xnode);
+        oss << node.domain() << ':' << xnode.SerializeAsString();
+    }
+    return oss.str();
+}
+
+bool HasSameContents(const Node& a, const Node& b) {
+    if (a.op_type() != Node::kConstant) return true;
+    const Tensor& ta = *a.tensor_value();
+    const Tensor& tb = *b.tensor_value();
+    CHECK_EQ(GetNBytes(ta), GetNBytes(tb));
+    return std::memcmp(ta.GetRawData(), tb.GetRawData(), GetNBytes(ta)) == 0;
+}
+
+void ReplaceNode(Graph* graph, Node* node, Node* replacement) {
+    CLOG() << "CSE: " << node->ToString() << " => " << replacement->ToString() << std::endl;
+    for (size_t i = 0; i < node->outputs().size(); ++i) {
+        Value* from = node->output(i);
+        Value* to = replacement->output(i);
+        for (Node* user : std::vector<Node*>(from->users())) {
+            from->DetachUser(user);
+            to->AddUser(user);
+            user->ReplaceInput(from, to);
+        }
+    }
+    graph->DetachNode(node);
+}
+
+// Returns nodes in a topological order. Unlike
+// `Graph::GetTopologicallySortedNodes`, ties are broken by the order
+// in the graph so the choice of remaining nodes is deterministic.
+std::vector<Node*> SortNodes(const Graph& graph) {
+    const std::vector<Node*> nodes = graph.GetLiveNodes();
+    std::map<const Node*, size_t> indices;
+    for (size_t i = 0; i < nodes.size(); ++i) indices.emplace(nodes[i], i);
+
+    std::vector<int> input_counts(nodes.size());
+    for (size_t i = 0; i < nodes.size(); ++i) {
+        for (const Value* value : nodes[i]->inputs()) {
+            if (indices.count(value->producer())) ++input_counts[i];
+        }
+    }
+
+    std::priority_queue<size_t, std::vector<size_t>, std::greater<size_t>> q;
+    for (size_t i = 0; i < nodes.size(); ++i) {
+        if (input_counts[i] == 0) q.push(i);
+    }
+    std::vector<Node*> sorted;
+    while (!q.empty()) {
+        Node* node = nodes[q.top()];
+        q.pop();
+        sorted.push_back(node);
+        for (const Value* value : node->outputs()) {
+            for (Node* user : value->users()) {
+                auto found = indices.find(user);
+                if (found == indices.end()) continue;
+                if (--input_counts[found->second] == 0) q.push(found->second);
+            }
+        }
+    }
+    return sorted;
+}
+
+}  // namespace
+
+void EliminateCommonSubexpressions(Graph* graph) {
+    // As nodes are visited in the topological order, inputs of a node
+    // are already replaced when the node is visited.
+    const std::vector<Node*> nodes = SortNodes(*graph);
+    std::unordered_map<std::string, std::vector<Node*>> seen;
+    int num_removed = 0;
+    for (Node* node : nodes) {
+        if (!IsEliminable(*node)) continue;
+        std::vector<Node*>& candidates = seen[GetKey(*node)];
+        Node* replacement = nullptr;
+        for (Node* candidate : candidates) {
+            if (HasSameContents(*node, *candidate)) {
+                replacement = candidate;
+                break;
+            }
+        }
+
+        bool is_output = false;
+        for (const Value* value : node->outputs()) is_output |= value->IsOutput();
+        if (replacement && !is_output) {
+            ReplaceNode(graph, node, replacement);
+            ++num_removed;
+        } else if (!replacement) {
+            candidates.push_back(node);
+        }
+    }
+
+    if (num_removed) {
+        CLOG() << "CSE: " << graph->name() << ": " << nodes.size() << " => " << nodes.size() - num_removed << " nodes" << std::endl;
+    }
+}
+
+}  // namespace chainer_compiler
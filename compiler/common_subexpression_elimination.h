@@ -0,0 +1,11 @@
+#pragma once
+
+namespace chainer_compiler {
+
+class Graph;
+
+// Merges nodes which have the same op type, attributes, and inputs.
+// `Constant` nodes with the same contents are merged, too.
+void EliminateCommonSubexpressions(Graph* graph);
+
+}  // namespace chainer_compiler
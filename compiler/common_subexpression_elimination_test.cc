@@ -0,0 +1,61 @@
+#include <gtest/gtest.h>
+
+#include <common/log.h>
+#include <compiler/common_subexpression_elimination.h>
+#include <compiler/graph.h>
+#include <compiler/graph_builder.h>
+#include <compiler/node.h>
+#include <compiler/value.h>
+
+namespace chainer_compiler {
+namespace {
+
+TEST(CommonSubexpressionEliminationTest, Basic) {
+    Graph graph("test");
+    Value* x = graph.AddInputValue("x", Type(Dtype::kFloat32, {2, 3}));
+    Value* y = graph.AddOutputValue("y", Type(Dtype::kInt64, {}));
+    Value* z = graph.AddOutputValue("z", Type(Dtype::kFloat32, {3, 2}));
+    GraphBuilder gb(&graph, "test", y);
+
+    // Gather(Shape(x), 0) appears twice with different constants of
+    // the same contents.
+    Value* s1 = gb.Op(Node::kShape, {x});
+    Value* g1 = gb.Op(Node::kGather, {s1, gb.Const(Type(Dtype::kInt64, {}), {0})});
+    Value* s2 = gb.Op(Node::kShape, {x});
+    Value* g2 = gb.Op(Node::kGather, {s2, gb.Const(Type(Dtype::kInt64, {}), {0})});
+    // A different constant.
+    Value* g3 = gb.Op(Node::kGather, {s2, gb.Const(Type(Dtype::kInt64, {}), {1})});
+    Node* add = gb.Op(Node::kAdd, {gb.Op(Node::kAdd, {g1, g2}), g3}, y)->producer();
+
+    // Transposes with different attributes are not merged.
+    Value* t1 = gb.Op(Node::kTranspose, {x});
+    t1->producer()->set_perm({1, 0});
+    Value* t2 = gb.Op(Node::kTranspose, {x});
+    t2->producer()->set_perm({0, 1});
+    Value* r = gb.Op(Node::kReshape, {t2, gb.Const(Type(Dtype::kInt64, {2}), {3, 2})});
+    gb.Op(Node::kAdd, {t1, r}, z);
+
+    EliminateCommonSubexpressions(&graph);
+
+    Node* sum = add->input(0)->producer();
+    EXPECT_EQ(sum->input(0), sum->input(1));
+    EXPECT_EQ(g1, sum->input(0));
+    EXPECT_NE(g1, add->input(1));
+    // Gather(Shape(x), 1) now uses the first Shape.
+    EXPECT_EQ(s1, add->input(1)->producer()->input(0));
+    EXPECT_TRUE(s2->producer()->detached());
+    EXPECT_TRUE(g2->producer()->detached());
+
+    EXPECT_FALSE(t1->producer()->detached());
+    EXPECT_FALSE(t2->producer()->detached());
+
+    int num_constants = 0;
+    for (Node* node : graph.GetLiveNodes()) {
+        if (node->op_type() == Node::kConstant) ++num_constants;
+    }
+    // 0, 1, and the shape for Reshape.
+    EXPECT_EQ(3, num_constants);
+}
+
+}  // namespace
+}  // namespace chainer_compiler
@@ -0,0 +1,233 @@
+#include "compiler/computation_order/policy_remat.h"
+
+#include <algorithm>
+#include <cmath>
+#include <map>
+#include <vector>
+
+#include <common/log.h>
+#include <common/strutil.h>
+#include <compiler/flags.h>
+#include <compiler/flops.h>
+#include <compiler/graph.h>
+#include <compiler/log.h>
+#include <compiler/node.h>
+#include <compiler/value.h>
+
+namespace chainer_compiler {
+
+namespace {
+
+// Splits topologically sorted nodes into segments. A value is
+// forgotten after the forward computation and recomputed before the
+// backward computation of its segment iff all its users are in the
+// same segment. Other values are remembered.
+//
+// The peak memory usage is estimated as the sum of remembered values
+// plus the largest sum of forgotten values in a segment, as forgotten
+// values of only one segment are alive at once.
+class RematPlanner {
+public:
+    explicit RematPlanner(const Graph& graph) : sorted_(graph.GetTopologicallySortedNodes()) {
+        std::map<Node*, size_t> node_indices;
+        for (size_t i = 0; i < sorted_.size(); ++i) {
+            node_indices.emplace(sorted_[i], i);
+        }
+
+        for (size_t i = 0; i < sorted_.size(); ++i) {
+            Node* node = sorted_[i];
+            flops_.push_back(std::max<int64_t>(0, CalculateFlops(*node)));
+            std::vector<size_t> outputs;
+            for (Value* value : node->outputs()) {
+                size_t last_use = i;
+                for (Node* user : value->users()) {
+                    auto found = node_indices.find(user);
+                    if (found != node_indices.end()) last_use = std::max(last_use, found->second);
+                }
+                if (value->IsOutput()) last_use = sorted_.size();
+                outputs.push_back(values_.size());
+                values_.push_back(ValueInfo{value, i, last_use, std::max<int64_t>(0, value->GetNBytes())});
+            }
+            outputs_.push_back(outputs);
+        }
+    }
+
+    std::vector<Order> Plan(int64_t budget) {
+        // Merging two segments trades remembered values for forgotten
+        // values, which may not reduce the estimated peak by itself.
+        // So segments are merged under a cap of forgotten bytes, and
+        // the cap which fits the budget with the least recompute
+        // FLOPs is chosen.
+        constexpr int kNumCaps = 8;
+        std::vector<Segment> best;
+        int64_t best_peak = 0, best_flops = 0;
+        for (int i = 1; i <= kNumCaps; ++i) {
+            std::vector<Segment> segments = PlanWithCap(budget, budget * i / kNumCaps);
+            int64_t peak, flops;
+            Estimate(segments, &peak, &flops);
+            const bool fits = peak <= budget;
+            const bool best_fits = !best.empty() && best_peak <= budget;
+            if (best.empty() || (fits && (!best_fits || flops < best_flops)) || (!fits && !best_fits && peak < best_peak)) {
+                best = segments;
+                best_peak = peak;
+                best_flops = flops;
+            }
+        }
+
+        if (best_peak > budget) {
+            WARN_ONCE(StrCat("Rematerialization cannot reduce memory usage to the budget (", budget / 1000000, "MB)"));
+        }
+        CLOG() << "Rematerialization: " << best.size() << " segments, estimated peak=" << best_peak / 1000000
+               << "MB recompute FLOPs=" << best_flops << std::endl;
+        return MakeOrders(best);
+    }
+
+    int64_t GetTotalBytes() const {
+        int64_t total = 0;
+        for (const ValueInfo& value : values_) total += value.bytes;
+        return total;
+    }
+
+    size_t num_nodes() const {
+        return sorted_.size();
+    }
+
+private:
+    struct ValueInfo {
+        Value* value;
+        size_t producer;
+        size_t last_use;
+        int64_t bytes;
+    };
+
+    struct Segment {
+        size_t begin;
+        size_t end;
+        int64_t remembered;
+        int64_t forgotten;
+        int64_t flops;
+    };
+
+    // Greedily merges adjacent segments which reduce remembered bytes
+    // the most per recompute FLOPs, keeping forgotten bytes of each
+    // segment under `cap`.
+    std::vector<Segment> PlanWithCap(int64_t budget, int64_t cap) const {
+        std::vector<Segment> segments;
+        for (size_t i = 0; i < sorted_.size(); ++i) {
+            segments.push_back(Evaluate(i, i + 1));
+        }
+        int64_t peak, flops;
+        Estimate(segments, &peak, &flops);
+        while (peak > budget) {
+            int best = -1;
+            double best_score = 0;
+            Segment best_merged{};
+            for (size_t i = 0; i + 1 < segments.size(); ++i) {
+                const Segment& lhs = segments[i];
+                const Segment& rhs = segments[i + 1];
+                const Segment merged = Evaluate(lhs.begin, rhs.end);
+                if (merged.forgotten > cap) continue;
+                const int64_t reduction = lhs.remembered + rhs.remembered - merged.remembered;
+                if (reduction <= 0) continue;
+                const int64_t cost = merged.flops - lhs.flops - rhs.flops;
+                const double score = static_cast<double>(reduction) / (cost + 1);
+                if (best < 0 || best_score < score) {
+                    best = i;
+                    best_score = score;
+                    best_merged = merged;
+                }
+            }
+            if (best < 0) break;
+
+            segments[best] = best_merged;
+            segments.erase(segments.begin() + best + 1);
+            Estimate(segments, &peak, &flops);
+        }
+        return segments;
+    }
+
+    static void Estimate(const std::vector<Segment>& segments, int64_t* peak, int64_t* flops) {
+        int64_t sum_remembered = 0, max_forgotten = 0;
+        *flops = 0;
+        for (const Segment& s : segments) {
+            sum_remembered += s.remembered;
+            max_forgotten = std::max(max_forgotten, s.forgotten);
+            *flops += s.flops;
+        }
+        *peak = sum_remembered + max_forgotten;
+    }
+
+    bool IsForgotten(const ValueInfo& value, size_t end) const {
+        // Values without users are never recomputed.
+        return value.producer < value.last_use && value.last_use < end;
+    }
+
+    Segment Evaluate(size_t begin, size_t end) const {
+        Segment segment{begin, end, 0, 0, 0};
+        for (size_t i = begin; i < end; ++i) {
+            bool recompute = false;
+            for (size_t v : outputs_[i]) {
+                const ValueInfo& value = values_[v];
+                if (IsForgotten(value, end)) {
+                    segment.forgotten += value.bytes;
+                    recompute = true;
+                } else if (value.producer < value.last_use) {
+                    segment.remembered += value.bytes;
+                }
+            }
+            if (recompute) segment.flops += flops_[i];
+        }
+        return segment;
+    }
+
+    // Emits orders in the same way as ChenPolicy.
+    std::vector<Order> MakeOrders(const std::vector<Segment>& segments) const {
+        std::vector<Order> orders;
+        for (Node* node : sorted_) {
+            orders.emplace_back(Order::kComputeForward, node, nullptr);
+        }
+
+        std::vector<bool> recompute(sorted_.size());
+        for (const Segment& segment : segments) {
+            for (size_t i = segment.begin; i < segment.end; ++i) {
+                for (size_t v : outputs_[i]) {
+                    const ValueInfo& value = values_[v];
+                    if (!IsForgotten(value, segment.end)) continue;
+                    orders.emplace_back(Order::kForgetForward, nullptr, value.value);
+                    recompute[i] = true;
+                }
+            }
+        }
+
+        for (auto segment = segments.rbegin(); segment != segments.rend(); ++segment) {
+            for (size_t i = segment->begin; i < segment->end; ++i) {
+                if (recompute[i]) orders.emplace_back(Order::kComputeForward, sorted_[i], nullptr);
+            }
+            for (size_t i = segment->end; i > segment->begin; --i) {
+                orders.emplace_back(Order::kComputeBackward, sorted_[i - 1], nullptr);
+            }
+        }
+        return orders;
+    }
+
+    const std::vector<Node*> sorted_;
+    std::vector<int64_t> flops_;
+    std::vector<ValueInfo> values_;
+    // Indices of `values_` produced by each node.
+    std::vector<std::vector<size_t>> outputs_;
+};
+
+}  // namespace
+
+std::vector<Order> RematPolicy(const Graph& graph) {
+    RematPlanner planner(graph);
+    int64_t budget = g_chen_budget * 1000000LL;
+    if (g_chen_budget == 0) {
+        // Segments of sqrt(n) nodes and their boundaries.
+        budget = 2 * planner.GetTotalBytes() / std::max<int64_t>(1, std::sqrt(planner.num_nodes()));
+        CLOG() << "Budget = " << budget / 1000000LL << " MB is used." << std::endl;
+    }
+    return planner.Plan(budget);
+}
+
+}  // namespace chainer_compiler
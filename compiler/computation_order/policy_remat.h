@@ -0,0 +1,15 @@
+#pragma once
+
+#include "compiler/computation_order/core.h"
+
+#include <vector>
+
+namespace chainer_compiler {
+
+// Splits the forward computation into segments like ChenPolicy, but
+// segments are chosen greedily to reduce the estimated peak memory
+// usage below the budget (`g_chen_budget`) with the least recompute
+// FLOPs. Segment boundaries do not have to be articulation points.
+std::vector<Order> RematPolicy(const Graph& graph);
+
+}  // namespace chainer_compiler
@@ -0,0 +1,81 @@
+#include <map>
+#include <vector>
+
+#include <gtest/gtest.h>
+
+#include <compiler/computation_order/policy_remat.h>
+#include <compiler/flags.h>
+#include <compiler/graph.h>
+#include <compiler/node.h>
+#include <compiler/type.h>
+#include <compiler/value.h>
+
+namespace chainer_compiler {
+namespace {
+
+// Makes a chain of 8 Relu ops whose outputs are 4MB each.
+void MakeChain(Graph* graph) {
+    const Type type(Dtype::kFloat32, {1000 * 1000});
+    Value* v = graph->AddInputValue("in", type);
+    for (int i = 0; i < 8; ++i) {
+        Value* next = i == 7 ? graph->AddOutputValue("out", type) : graph->AddValue("v", type);
+        graph->AddNode(Node::kRelu, {v}, {next});
+        v = next;
+    }
+}
+
+std::map<Order::Kind, int> CountOrders(const std::vector<Order>& orders) {
+    std::map<Order::Kind, int> counts;
+    for (const Order& order : orders) ++counts[order.kind];
+    return counts;
+}
+
+TEST(RematPolicyTest, LargeBudget) {
+    Graph graph("test");
+    MakeChain(&graph);
+    g_chen_budget = 1000;
+    std::map<Order::Kind, int> counts = CountOrders(RematPolicy(graph));
+    g_chen_budget = 0;
+    EXPECT_EQ(8, counts[Order::kComputeForward]);
+    EXPECT_EQ(8, counts[Order::kComputeBackward]);
+    EXPECT_EQ(0, counts[Order::kForgetForward]);
+}
+
+TEST(RematPolicyTest, SmallBudget) {
+    Graph graph("test");
+    MakeChain(&graph);
+    // Remembering all values needs 32MB. Three segments of 3, 3, and 2
+    // nodes need 12MB for remembered values and 8MB for recompute.
+    g_chen_budget = 20;
+    std::vector<Order> orders = RematPolicy(graph);
+    g_chen_budget = 0;
+    std::map<Order::Kind, int> counts = CountOrders(orders);
+    EXPECT_EQ(8, counts[Order::kComputeBackward]);
+    EXPECT_LT(0, counts[Order::kForgetForward]);
+    EXPECT_EQ(8 + counts[Order::kForgetForward], counts[Order::kComputeForward]);
+
+    // Forgotten values must be recomputed before the backward
+    // computation of their users.
+    std::map<Value*, bool> staged;
+    for (const Order& order : orders) {
+        switch (order.kind) {
+            case Order::kComputeForward:
+                for (Value* value : order.node->outputs()) staged[value] = true;
+                break;
+            case Order::kForgetForward:
+                staged[order.value] = false;
+                break;
+            case Order::kComputeBackward:
+                for (Value* value : order.node->inputs()) {
+                    if (value->IsInput()) continue;
+                    EXPECT_TRUE(staged[value]) << value->name();
+                }
+                break;
+            default:
+                break;
+        }
+    }
+}
+
+}  // namespace
+}  // namespace chainer_compiler
@@ -1,7 +1,9 @@
 #include "compiler/constant_propagation.h"
 
+#include <set>
 #include <vector>
 
+#include <common/log.h>
 #include <compiler/evaluator.h>
 #include <compiler/graph.h>
 #include <compiler/graph_builder.h>
@@ -26,46 +28,31 @@ bool HasConstantInputsOnly(const Node& node) {
     return true;
 }
 
-void DoConstantPropagation(Graph* graph, Node* node) {
-    CLOG() << "Propagate " << node->ToString() << std::endl;
-    std::vector<Node*> inputs;
-    for (Value* input : node->inputs()) inputs.push_back(input->producer());
-
-    std::vector<std::unique_ptr<EvaluatedValue>> next_values;
-    std::vector<Node*> nodes = inputs;
-    nodes.push_back(node);
-    Eval(nodes, node->outputs(), &next_values);
-
-    for (size_t i = 0; i < next_values.size(); ++i) {
-        auto& next_value = next_values[i];
-        GraphBuilder gb(graph, "Const", node->output(i));
-        if (next_value->is_tensor()) {
-            gb.Op(Node::kConstant, {}, node->output(i))->producer()->set_tensor_value(next_value->ReleaseTensor());
-        } else {
-            gb.Op(Node::kChainerSequenceConstants, {}, node->output(i))->producer()->set_tensor_values(next_value->ReleaseSequence());
-        }
-    }
-
-    graph->DetachNode(node);
-    for (Node* input : inputs) {
-        if (input->output(0)->users().empty()) {
-            graph->DetachNode(input);
-        }
-    }
-}
-
-bool MaybePropagateConstant(Graph* graph, Node* node) {
-    switch (node->op_type()) {
+bool IsFoldable(const Node& node) {
+    switch (node.op_type()) {
         // TODO(hamaji): Handle more ops.
         case Node::kIdentity:
         case Node::kAdd:
         case Node::kSub:
         case Node::kMul:
         case Node::kDiv:
+        case Node::kNeg:
+        case Node::kSqrt:
+        case Node::kEqual:
+        case Node::kGreater:
+        case Node::kNot:
+        case Node::kAnd:
+        case Node::kOr:
+        case Node::kXor:
         case Node::kChainerGenericIs:
         case Node::kChainerGenericLen:
         case Node::kShape:
+        case Node::kSize:
+        case Node::kReshape:
+        case Node::kSqueeze:
         case Node::kUnsqueeze:
+        case Node::kConcat:
+        case Node::kTranspose:
         case Node::kGather:
         case Node::kSlice:
         case Node::kExpand:
@@ -74,27 +61,84 @@ bool MaybePropagateConstant(Graph* graph, Node* node) {
         case Node::kChainerSequenceConcat:
         case Node::kChainerSequenceCreate:
         case Node::kChainerSequenceStack:
-        case Node::kChainerSequenceRange: {
-            DoConstantPropagation(graph, node);
+        case Node::kChainerSequenceRange:
             return true;
-        }
 
         default:
-            CLOG() << "Not propagate " << node->ToString() << std::endl;
+            return false;
     }
-    return false;
+}
+
+bool IsReady(const Node& node) {
+    return !node.detached() && IsFoldable(node) && HasConstantInputsOnly(node);
+}
+
+// Evaluates all nodes in `batch` by a single `Eval` and replaces
+// their outputs by constants. Nodes in `batch` must not depend on
+// each other. Returns the values which became constants.
+std::vector<Value*> DoConstantPropagation(Graph* graph, const std::vector<Node*>& batch) {
+    std::vector<Node*> inputs;
+    std::set<Node*> seen_inputs;
+    std::vector<Value*> fetches;
+    for (Node* node : batch) {
+        CLOG() << "Propagate " << node->ToString() << std::endl;
+        for (Value* input : node->inputs()) {
+            if (seen_inputs.insert(input->producer()).second) inputs.push_back(input->producer());
+        }
+        for (Value* output : node->outputs()) fetches.push_back(output);
+    }
+
+    std::vector<std::unique_ptr<EvaluatedValue>> next_values;
+    std::vector<Node*> nodes = inputs;
+    nodes.insert(nodes.end(), batch.begin(), batch.end());
+    Eval(nodes, fetches, &next_values);
+    CHECK_EQ(fetches.size(), next_values.size());
+
+    for (size_t i = 0; i < next_values.size(); ++i) {
+        auto& next_value = next_values[i];
+        GraphBuilder gb(graph, "Const", fetches[i]);
+        if (next_value->is_tensor()) {
+            gb.Op(Node::kConstant, {}, fetches[i])->producer()->set_tensor_value(next_value->ReleaseTensor());
+        } else {
+            gb.Op(Node::kChainerSequenceConstants, {}, fetches[i])->producer()->set_tensor_values(next_value->ReleaseSequence());
+        }
+    }
+
+    for (Node* node : batch) graph->DetachNode(node);
+    for (Node* input : inputs) {
+        if (input->output(0)->users().empty()) {
+            graph->DetachNode(input);
+        }
+    }
+    return fetches;
 }
 
 }  // namespace
 
 void PropagateConstants(Graph* graph) {
-    bool replaced = true;
-    while (replaced) {
-        replaced = false;
-        for (Node* node : graph->GetLiveNodes()) {
-            if (!HasConstantInputsOnly(*node)) continue;
-            if (MaybePropagateConstant(graph, node)) {
-                replaced = true;
+    // A worklist of nodes whose inputs are all constants. Only users
+    // of newly folded values are examined after the initial scan.
+    std::vector<Node*> ready;
+    std::set<Node*> queued;
+    for (Node* node : graph->GetLiveNodes()) {
+        if (IsReady(*node)) {
+            ready.push_back(node);
+            queued.insert(node);
+        } else if (HasConstantInputsOnly(*node)) {
+            CLOG() << "Not propagate " << node->ToString() << std::endl;
+        }
+    }
+
+    while (!ready.empty()) {
+        // Ready nodes only take constants so they can be evaluated
+        // together.
+        std::vector<Node*> batch;
+        batch.swap(ready);
+        for (Value* value : DoConstantPropagation(graph, batch)) {
+            for (Node* user : value->users()) {
+                if (queued.count(user) || !IsReady(*user)) continue;
+                ready.push_back(user);
+                queued.insert(user);
             }
         }
     }
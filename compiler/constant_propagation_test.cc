@@ -0,0 +1,84 @@
+#include <gtest/gtest.h>
+
+#include <chainerx/context.h>
+
+#include <common/log.h>
+#include <compiler/constant_propagation.h>
+#include <compiler/graph.h>
+#include <compiler/graph_builder.h>
+#include <compiler/node.h>
+#include <compiler/tensor.h>
+#include <compiler/value.h>
+
+namespace chainer_compiler {
+namespace {
+
+TEST(ConstantPropagationTest, Chain) {
+    chainerx::Context ctx;
+    chainerx::ContextScope ctx_scope(ctx);
+
+    Graph graph("test");
+    Value* x = graph.AddInputValue("x", Type(Dtype::kInt32, {2}));
+    Value* y = graph.AddOutputValue("y", Type(Dtype::kInt32, {2}));
+    GraphBuilder gb(&graph, "test", y);
+    Value* a = gb.Const(Type(Dtype::kInt32, {2}), {2, 3});
+    Value* b = gb.Const(Type(Dtype::kInt32, {2}), {4, 5});
+    Value* s = gb.Op(Node::kAdd, {a, b});
+    Value* r = gb.Op(Node::kMul, {s, b});
+    Node* add = s->producer();
+    Node* mul = r->producer();
+    gb.Op(Node::kAdd, {x, r}, y);
+
+    PropagateConstants(&graph);
+
+    EXPECT_TRUE(add->detached());
+    EXPECT_TRUE(mul->detached());
+    EXPECT_TRUE(a->producer()->detached());
+    Node* folded = y->producer()->input(1)->producer();
+    ASSERT_EQ(Node::kConstant, folded->op_type());
+    const Tensor& t = *folded->tensor_value();
+    ASSERT_EQ(1, t.dims().size());
+    EXPECT_EQ(2, t.dims()[0]);
+    EXPECT_EQ(24, t.Get<int>(0));
+    EXPECT_EQ(40, t.Get<int>(1));
+}
+
+TEST(ConstantPropagationTest, ShapeOps) {
+    chainerx::Context ctx;
+    chainerx::ContextScope ctx_scope(ctx);
+
+    Graph graph("test");
+    Value* x = graph.AddInputValue("x", Type(Dtype::kBool, {6}));
+    Value* y = graph.AddOutputValue("y", Type(Dtype::kBool, {6}));
+    GraphBuilder gb(&graph, "test", y);
+    Value* a = gb.Const(Type(Dtype::kInt32, {2, 3}), {1, 2, 3, 4, 5, 6});
+    Value* b = gb.Const(Type(Dtype::kInt32, {1, 3}), {3, 3, 3});
+    Value* shape = gb.Const(Type(Dtype::kInt64, {1}), {6});
+    // [1, 4, 2, 5, 3, 6]
+    Value* flat = gb.Op(Node::kReshape, {gb.Op(Node::kTranspose, {a}), shape});
+    // [3, 3, 3, 3, 3, 3]
+    Value* sb = gb.Op(Node::kSqueeze, {b});
+    Value* threes = gb.Op(Node::kConcat, {sb, sb});
+    threes->producer()->set_axis(0);
+    Value* gt = gb.Op(Node::kGreater, {flat, threes});
+    gb.Op(Node::kAnd, {x, gt}, y);
+
+    PropagateConstants(&graph);
+
+    Node* folded = y->producer()->input(1)->producer();
+    ASSERT_EQ(Node::kConstant, folded->op_type());
+    const Tensor& t = *folded->tensor_value();
+    EXPECT_EQ(Dtype::kBool, t.dtype());
+    ASSERT_EQ(1, t.dims().size());
+    ASSERT_EQ(6, t.dims()[0]);
+    const std::vector<bool> expected = {false, true, false, true, false, true};
+    for (int i = 0; i < 6; ++i) {
+        EXPECT_EQ(expected[i], t.Get<bool>(i)) << i;
+    }
+    for (Node* node : graph.GetLiveNodes()) {
+        EXPECT_TRUE(node->op_type() == Node::kConstant || node == y->producer()) << node->ToString();
+    }
+}
+
+}  // namespace
+}  // namespace chainer_compiler
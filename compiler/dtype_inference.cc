@@ -249,6 +249,32 @@ void InferDtype(Node* node) {
             break;
         }
 
+        case Node::kChainerQuantizeLinear:
+        case Node::kChainerRequantize: {
+            set(0, Dtype::kInt8);
+            break;
+        }
+
+        case Node::kChainerDequantizeLinear: {
+            set(0, default_float);
+            break;
+        }
+
+        case Node::kChainerConvInteger:
+        case Node::kChainerMatMulInteger: {
+            set(0, Dtype::kInt32);
+            break;
+        }
+
+        case Node::kChainerSGDUpdate:
+        case Node::kChainerMomentumSGDUpdate:
+        case Node::kChainerAdamUpdate: {
+            // Outputs alias the parameter and optimizer states.
+            set(0, in0);
+            for (size_t i = 1; i < node->outputs().size(); ++i) set(i, node->input(i + 1)->type().dtype());
+            break;
+        }
+
         case Node::kBatchNormalization: {
             Dtype dtype = coerce();
             set(0, dtype);
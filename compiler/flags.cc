@@ -16,8 +16,22 @@ bool g_use_cuda;
 
 bool g_fuse_operations;
 
+bool g_fold_affine_ops;
+
+bool g_mixed_precision;
+
+std::string g_optimizer;
+
+float g_learning_rate = 0.01;
+
+int g_num_micro_batches = 1;
+
+std::string g_quantization_ranges;
+
 bool g_use_nvrtc;
 
+bool g_use_cpu_codegen;
+
 bool g_use_tvm;
 
 bool g_reuse_tvm_code;
@@ -30,6 +44,8 @@ bool g_use_ngraph;
 
 std::string g_backend_name;
 
+int g_compiler_threads = 1;
+
 bool g_dump_after_inference;
 bool g_dump_after_simplification;
 bool g_dump_after_gradient;
@@ -37,6 +53,8 @@ bool g_dump_after_fusion;
 bool g_dump_after_scheduling;
 bool g_dump_subgraphs;
 
+std::string g_scheduler;
+int g_scheduler_beam_width = 1;
 std::string g_computation_order;
 int g_chen_budget;
 
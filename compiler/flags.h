@@ -29,9 +29,42 @@ extern bool g_use_cuda;
 // Fuse consecutive element-wise operations.
 extern bool g_fuse_operations;
 
+// Fold BatchNormalization and affine ops into Conv/Gemm. This is
+// effective only for inference.
+extern bool g_fold_affine_ops;
+
+// Run Conv, Gemm, and MatMul in float16 and scale gradients by the
+// `loss_scale` input. Parameters and other ops stay in float32.
+extern bool g_mixed_precision;
+
+// Append fused parameter updates of this optimizer ("sgd",
+// "momentum_sgd", or "adam") to the training graph, so a single run
+// performs a whole training step. Optimizer states are kept in
+// inputs with initializers and updated in place.
+extern std::string g_optimizer;
+
+// The initial value of the `learning_rate` input of the training
+// graph, which is used by `g_optimizer`.
+extern float g_learning_rate;
+
+// Split a training batch into this number of micro-batches. Forward
+// and backward computation runs in a loop over micro-batches and
+// gradients are averaged, so the loss must be a mean over examples.
+// Inputs without initializers must have the batch size in their
+// first dimension.
+extern int g_num_micro_batches;
+
+// A file of value ranges made by python/quantization.py. If set,
+// Conv, Gemm, and MatMul run in int8. This is only for inference.
+extern std::string g_quantization_ranges;
+
 // Use NVRTC to execute fused operations.
 extern bool g_use_nvrtc;
 
+// Use C++ code compiled for the host CPU to execute fused
+// element-wise operations. Ignored if `g_use_nvrtc` is set.
+extern bool g_use_cpu_codegen;
+
 // Use TVM to execute fused operations.
 extern bool g_use_tvm;
 
@@ -50,6 +83,10 @@ extern bool g_use_ngraph;
 // The name of backend.
 extern std::string g_backend_name;
 
+// The number of threads to run passes over sibling subgraphs and to
+// build fused kernels. The output does not depend on this.
+extern int g_compiler_threads;
+
 // Dumps the ONNX graph at a specific timing.
 extern bool g_dump_after_inference;
 extern bool g_dump_after_simplification;
@@ -58,8 +95,14 @@ extern bool g_dump_after_fusion;
 extern bool g_dump_after_scheduling;
 extern bool g_dump_subgraphs;
 
+// The scheduler of nodes ("greedy", "naive", or "memory").
+extern std::string g_scheduler;
+// The beam width of the "memory" scheduler.
+extern int g_scheduler_beam_width;
+
 // The policy of computation order.
 extern std::string g_computation_order;
+// The memory budget (in MB) of "chen" and "remat" policies.
 extern int g_chen_budget;
 
 }  // namespace chainer_compiler
@@ -9,6 +9,10 @@ class Node;
 
 int64_t CalculateFlops(const Node& node, int* num_unknown_ops = nullptr);
 
+// Returns the sum of FLOPs of nodes in the computation sequence of
+// `graph`, i.e., `graph` must be scheduled.
+int64_t CalculateTotalFlops(const Graph& graph, int* num_unknown_ops = nullptr);
+
 void ShowFlops(const Graph& graph);
 
 }  // namespace chainer_compiler
@@ -10,6 +10,8 @@
 #include <vector>
 
 #include <common/strutil.h>
+#include <common/thread_pool.h>
+#include <compiler/flags.h>
 #include <compiler/graph.h>
 #include <compiler/graph_builder.h>
 #include <compiler/node.h>
@@ -336,15 +338,18 @@ void FuseElementwiseOperations(Graph* graph) {
     FuseAllConnectedNodes("nvrtc", graph, 2, is_fusable);
 }
 
-}  // namespace
-
-void FuseOperations(Graph* graph, bool use_tvm, bool use_ngraph) {
-    // Fuse ops in subgraphs first to avoid infinite loop.
+void FuseOperationsImpl(ThreadPool* pool, Graph* graph, bool use_tvm, bool use_ngraph) {
+    // Fuse ops in subgraphs first to avoid infinite loop. Subgraphs
+    // are independent so they are processed in parallel.
+    std::vector<Graph*> subgraphs;
     for (const Node* node : graph->nodes()) {
         for (Graph* subgraph : node->GetSubGraphs()) {
-            FuseOperations(subgraph, use_tvm);
+            subgraphs.push_back(subgraph);
         }
     }
+    pool->ParallelFor(subgraphs.size(), [pool, &subgraphs, use_tvm](int64_t i) {
+        FuseOperationsImpl(pool, subgraphs[i], use_tvm, false /* use_ngraph */);
+    });
 
     if (use_ngraph) {
         FuseNGraphOperations(graph);
@@ -355,4 +360,11 @@ void FuseOperations(Graph* graph, bool use_tvm, bool use_ngraph) {
     FuseElementwiseOperations(graph);
 }
 
+}  // namespace
+
+void FuseOperations(Graph* graph, bool use_tvm, bool use_ngraph) {
+    ThreadPool pool(std::max(0, g_compiler_threads - 1));
+    FuseOperationsImpl(&pool, graph, use_tvm, use_ngraph);
+}
+
 }  // namespace chainer_compiler
@@ -246,6 +246,30 @@ NodeDef('ChainerGatherGrad', 3, 1, axis=0)
 NodeDef('ChainerDynamicSliceGrad', (4, 5, 6), 1)
 NodeDef('ChainerFusionGroup', None, None, subgraph=Graph, fusion_type=str)
 
+# Symmetric per-tensor int8 quantization with no zero points.
+#
+# Quantizes a float tensor: (F) -> (int8)
+NodeDef('ChainerQuantizeLinear', 1, 1, scale=Required(float))
+# Dequantizes an int8 or int32 tensor: (I) -> (float)
+NodeDef('ChainerDequantizeLinear', 1, 1, scale=Required(float))
+# Converts int32 accumulators to int8 for the next quantized op:
+# (int32) -> (int8)
+NodeDef('ChainerRequantize', 1, 1, scale=Required(float), relu=False)
+# Conv/MatMul with int32 accumulators: (int8, int8, int32?) -> (int32)
+NodeDef('ChainerConvInteger', (2, 3), 1, **conv_attrs)
+NodeDef('ChainerMatMulInteger', (2, 3), 1)
+
+# Fused parameter updates of optimizers. The parameter and optimizer
+# states are updated in place and outputs alias them. `lr` is a float
+# scalar and `t` is an int64 scalar of the number of updates.
+#
+# (param, grad, lr) -> (param)
+NodeDef('ChainerSGDUpdate', 3, 1)
+# (param, grad, v, lr) -> (param, v)
+NodeDef('ChainerMomentumSGDUpdate', 4, 2, momentum=0.9)
+# (param, grad, m, v, t, lr) -> (param, m, v, t)
+NodeDef('ChainerAdamUpdate', 6, 4, beta1=0.9, beta2=0.999, epsilon=1e-8)
+
 # Numpy's advanced indexing.
 #
 # The first input is the tensor to be sliced.
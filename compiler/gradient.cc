@@ -9,9 +9,11 @@
 #include <compiler/onnx.h>
 
 #include <common/log.h>
+#include <compiler/flags.h>
 #include <compiler/gradient_ops.h>
 #include <compiler/graph.h>
 #include <compiler/graph_builder.h>
+#include <compiler/micro_batch.h>
 #include <compiler/node.h>
 #include <compiler/tensor.h>
 #include <compiler/type.h>
@@ -21,6 +23,22 @@ namespace chainer_compiler {
 
 namespace {
 
+// Multiplies the gradients of outputs by the scale of loss, so small
+// gradients do not underflow in float16.
+void ScaleGradients(Graph* graph, Graph* dest_graph, Value* loss_scale) {
+    for (Value* value : graph->output_values()) {
+        Value* grad = value->grad();
+        CHECK(grad);
+        GraphBuilder gb(dest_graph, "LossScale", value);
+        Value* scale = loss_scale;
+        if (value->type().dtype() != Dtype::kFloat32) {
+            scale = gb.Op(Node::kCast, {loss_scale});
+            scale->producer()->set_to(value->type().dtype());
+        }
+        value->set_grad(gb.Op(Node::kMul, {grad, scale}));
+    }
+}
+
 void SetInitialGradients(Graph* graph) {
     CHECK_EQ(1UL, graph->output_values().size());
     for (Value* value : graph->output_values()) {
@@ -33,9 +51,55 @@ void SetInitialGradients(Graph* graph) {
     }
 }
 
-void ExposeParamGradsAsOutputs(Graph* graph, Graph* dest_graph, const std::set<Value*>& xs) {
+// Adds a zero-initialized input for a state of the optimizer, which
+// is kept across training steps as a parameter.
+Value* AddOptimizerState(Graph* graph, Value* param, const std::string& key, const Type& type) {
+    const std::string name = "optimizer_state@" + param->name() + "@" + key;
+    Value* state = graph->AddInputValue(name, type);
+    std::unique_ptr<Tensor> tensor;
+    if (type.dtype() == Dtype::kInt64) {
+        tensor.reset(new Tensor(name, type.dtype(), type.dims(), std::vector<int64_t>(type.NumElements())));
+    } else {
+        tensor.reset(new Tensor(name, type.dtype(), type.dims(), std::vector<float>(type.NumElements())));
+    }
+    state->ResetInitializer(std::move(tensor));
+    return state;
+}
+
+// Adds a node which updates `param` by `grad` in place. Updated
+// values are exposed as outputs so the node will be scheduled.
+void AddOptimizerUpdate(Graph* graph, Value* param, Value* grad, Value* learning_rate) {
+    GraphBuilder gb(graph, "Optimizer", param);
+    std::vector<Value*> inputs = {param, grad};
+    std::vector<Value*> outputs = {graph->AddOutputValue("param_out@" + param->name(), param->type())};
+    auto add_state = [&](const std::string& key, const Type& type) {
+        inputs.push_back(AddOptimizerState(graph, param, key, type));
+        outputs.push_back(graph->AddOutputValue("optimizer_state_out@" + param->name() + "@" + key, type));
+    };
+
+    Node::OpType op_type;
+    if (g_optimizer == "sgd") {
+        op_type = Node::kChainerSGDUpdate;
+    } else if (g_optimizer == "momentum_sgd") {
+        op_type = Node::kChainerMomentumSGDUpdate;
+        add_state("v", param->type());
+    } else if (g_optimizer == "adam") {
+        op_type = Node::kChainerAdamUpdate;
+        add_state("m", param->type());
+        add_state("v", param->type());
+        add_state("t", Type(Dtype::kInt64, {}));
+    } else {
+        CHECK(false) << "Unknown optimizer: " << g_optimizer;
+    }
+    inputs.push_back(learning_rate);
+    gb.MOp(op_type, inputs, outputs);
+}
+
+void ExposeParamGradsAsOutputs(Graph* graph, Graph* dest_graph, const std::set<Value*>& xs, Value* loss_scale, Value* learning_rate) {
     bool ok = true;
-    for (Value* input : graph->input_values()) {
+    // Copied as optimizer states are added to inputs.
+    const std::vector<Value*> inputs = graph->input_values();
+    for (Value* input : inputs) {
         if (!xs.count(input)) continue;
         if (!input->type().dtype().IsFloat()) continue;
         if (!input->grad()) {
@@ -44,8 +108,22 @@ void ExposeParamGradsAsOutputs(Graph* graph, Graph* dest_graph, const std::set<V
             ok = false;
             continue;
         }
-        Value* out_grad = dest_graph->AddOutputValue("grad_out@" + input->name(), input->type());
-        dest_graph->AddNode(Node::kIdentity, {input->grad()}, {out_grad});
+        Value* out_grad = learning_rate ? dest_graph->AddValue("grad@" + input->name(), input->type())
+                                        : dest_graph->AddOutputValue("grad_out@" + input->name(), input->type());
+        if (loss_scale) {
+            GraphBuilder gb(dest_graph, "LossScale", out_grad);
+            Value* scale = loss_scale;
+            if (input->type().dtype() != Dtype::kFloat32) {
+                scale = gb.Op(Node::kCast, {loss_scale});
+                scale->producer()->set_to(input->type().dtype());
+            }
+            gb.Op(Node::kDiv, {input->grad(), scale}, out_grad);
+        } else {
+            dest_graph->AddNode(Node::kIdentity, {input->grad()}, {out_grad});
+        }
+        if (learning_rate) {
+            AddOptimizerUpdate(dest_graph, input, out_grad, learning_rate);
+        }
     }
     if (!ok) {
         graph->DumpONNXOnFailure();
@@ -99,6 +177,13 @@ void GenerateGradientNodesImpl(Graph* graph, Graph* dest_graph, const std::set<V
         value->set_grad(grad);
     }
 
+    // The scale is the last input of `dest_graph`.
+    Value* loss_scale = nullptr;
+    if (g_mixed_precision) {
+        loss_scale = dest_graph->AddValue("loss_scale_tmp", Type(Dtype::kFloat32, {}));
+        ScaleGradients(graph, dest_graph, loss_scale);
+    }
+
     std::map<Value*, Value*> retained;
     GenerateGradientNodes(graph, dest_graph, std::vector<Value*>(xs.begin(), xs.end()), graph->output_values(), &retained);
 
@@ -112,18 +197,59 @@ void GenerateGradientNodesImpl(Graph* graph, Graph* dest_graph, const std::set<V
         gbd.Op(Node::kIdentity, {i}, p.second);
     }
 
-    ExposeParamGradsAsOutputs(graph, dest_graph, xs);
+    if (loss_scale) {
+        Value* i = dest_graph->AddInputValue("loss_scale", loss_scale->type());
+        dest_graph->AddNode(Node::kIdentity, {i}, {loss_scale});
+    }
+
+    ExposeParamGradsAsOutputs(graph, dest_graph, xs, loss_scale, nullptr);
 }
 
 }  // namespace
 
 void AddGradientNodesForTraining(Graph* graph) {
-    SetInitialGradients(graph);
+    // Micro-batches set initial gradients of losses in the loop body.
+    if (g_num_micro_batches <= 1) {
+        SetInitialGradients(graph);
+    }
 
     std::set<Value*> xs = GetParamValues(graph);
+
+    // An input with an initializer, so it can be overridden by
+    // training loops. Note this is not a parameter as it is not
+    // necessary for outputs.
+    Value* loss_scale = nullptr;
+    if (g_mixed_precision) {
+        loss_scale = graph->AddInputValue("loss_scale", Type(Dtype::kFloat32, {}));
+        loss_scale->ResetInitializer(
+                std::make_unique<Tensor>("loss_scale", Dtype::kFloat32, std::vector<int64_t>{}, std::vector<float>{kInitialLossScale}));
+        ScaleGradients(graph, graph, loss_scale);
+    }
+
+    // Like `loss_scale`, the learning rate is an input which can be
+    // overridden by training loops.
+    Value* learning_rate = nullptr;
+    if (!g_optimizer.empty()) {
+        CHECK(!g_mixed_precision) << "Optimizers in graphs cannot skip steps with overflowed gradients";
+        learning_rate = graph->AddInputValue("learning_rate", Type(Dtype::kFloat32, {}));
+        learning_rate->ResetInitializer(std::make_unique<Tensor>(
+                "learning_rate", Dtype::kFloat32, std::vector<int64_t>{}, std::vector<float>{g_learning_rate}));
+    }
+
+    if (g_num_micro_batches > 1) {
+        CHECK(!g_mixed_precision) << "Micro-batches with mixed precision are not supported yet";
+        GenerateGradientNodesOverMicroBatches(graph, std::vector<Value*>(xs.begin(), xs.end()));
+        std::set<Value*> xs_with_grads;
+        for (Value* x : xs) {
+            if (x->grad()) xs_with_grads.insert(x);
+        }
+        ExposeParamGradsAsOutputs(graph, graph, xs_with_grads, nullptr, learning_rate);
+        return;
+    }
+
     GenerateGradientNodes(graph, graph, std::vector<Value*>(xs.begin(), xs.end()), graph->output_values(), nullptr);
 
-    ExposeParamGradsAsOutputs(graph, graph, xs);
+    ExposeParamGradsAsOutputs(graph, graph, xs, loss_scale, learning_rate);
 }
 
 void GenerateGradientNodes(Graph* graph, Graph* dest_graph) {
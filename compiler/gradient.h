@@ -9,6 +9,12 @@ namespace chainer_compiler {
 class Graph;
 class Value;
 
+// The initial scale of loss for mixed precision training, which is the
+// value of the `loss_scale` input of training graphs and the initial
+// scale of `DynamicLossScaler` in Python. The scale is cast to float16
+// in the graph, so it must be smaller than the max of float16 (65504).
+constexpr float kInitialLossScale = 1024.0;
+
 void AddGradientNodesForTraining(Graph* graph);
 
 void GenerateGradientNodes(Graph* graph, Graph* dest_graph);
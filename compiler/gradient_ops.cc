@@ -257,6 +257,11 @@ void IdentityGradFn(GradientOpContext* gc) {
     gc->GradOp(Node::kIdentity, 0, {gc->gy(0)});
 }
 
+void CastGradFn(GradientOpContext* gc) {
+    Value* gx = gc->GradOp(Node::kCast, 0, {gc->gy(0)});
+    gx->producer()->set_to(gc->NoRetainX(0)->type().dtype());
+}
+
 void ReshapeGradFn(GradientOpContext* gc) {
     GraphBuilder gb{gc->builder(0)};
     Value* t0 = gb.Op(Node::kShape, {gc->x(0)});
@@ -971,6 +976,7 @@ bool AddGradientForNode(Graph* graph, Graph* dest_graph, Node* node, std::map<Va
         register_grad_fn(Node::kTanh, &TanhGradFn);
 
         register_grad_fn(Node::kIdentity, &IdentityGradFn);
+        register_grad_fn(Node::kCast, &CastGradFn);
         register_grad_fn(Node::kReshape, &ReshapeGradFn);
         register_grad_fn(Node::kSqueeze, &ReshapeGradFn);
         register_grad_fn(Node::kUnsqueeze, &ReshapeGradFn);
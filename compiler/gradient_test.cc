@@ -1,8 +1,14 @@
+#include <map>
+#include <set>
+#include <string>
+#include <vector>
+
 #include <gtest/gtest.h>
 
 #include <compiler/onnx.h>
 
 #include <common/log.h>
+#include <compiler/flags.h>
 #include <compiler/gradient.h>
 #include <compiler/graph.h>
 #include <compiler/node.h>
@@ -44,5 +50,101 @@ TEST(GradientTest, Basic) {
     EXPECT_EQ(1, output_names.count("grad_out@in2"));
 }
 
+TEST(GradientTest, Optimizer) {
+    onnx::TensorProto dummy_input;
+    dummy_input.set_data_type(onnx::TensorProto::FLOAT);
+    dummy_input.add_float_data(1.0);
+
+    Graph graph("test");
+    Value* out = graph.AddOutputValue("out", Type(Dtype::kFloat32, {1}));
+    Value* in0 = graph.AddInputValue("in0", Type(Dtype::kFloat32, {1}));
+    in0->ResetInitializer(std::make_unique<Tensor>(dummy_input));
+    Value* in1 = graph.AddInputValue("in1", Type(Dtype::kFloat32, {1}));
+    in1->ResetInitializer(std::make_unique<Tensor>(dummy_input));
+
+    // out = in0 * in1
+    graph.AddNode(Node::kMul, {in0, in1}, {out});
+
+    g_optimizer = "adam";
+    AddGradientNodesForTraining(&graph);
+    g_optimizer = "";
+
+    // Parameters and states are updated instead of exposing gradients.
+    std::set<std::string> output_names;
+    for (Value* output : graph.output_values()) {
+        ASSERT_TRUE(output_names.emplace(output->name()).second);
+        EXPECT_NE("grad_out@", output->name().substr(0, 9));
+    }
+    for (const char* name : {"in0", "in1"}) {
+        EXPECT_EQ(1, output_names.count(std::string("param_out@") + name));
+        for (const char* key : {"m", "v", "t"}) {
+            EXPECT_EQ(1, output_names.count(std::string("optimizer_state_out@") + name + "@" + key));
+        }
+    }
+
+    std::map<std::string, Value*> inputs;
+    for (Value* input : graph.input_values()) {
+        ASSERT_TRUE(inputs.emplace(input->name(), input).second);
+        EXPECT_TRUE(input->initializer()) << input->name();
+    }
+    ASSERT_EQ(1, inputs.count("learning_rate"));
+    ASSERT_EQ(1, inputs.count("optimizer_state@in0@t"));
+    EXPECT_EQ(Dtype::kInt64, inputs["optimizer_state@in0@t"]->type().dtype());
+
+    int num_updates = 0;
+    for (Node* node : in0->users()) {
+        if (node->op_type() != Node::kChainerAdamUpdate) continue;
+        ++num_updates;
+        EXPECT_EQ(in0, node->input(0));
+        EXPECT_EQ(inputs["learning_rate"], node->inputs().back());
+    }
+    EXPECT_EQ(1, num_updates);
+}
+
+TEST(GradientTest, MicroBatches) {
+    onnx::TensorProto dummy_input;
+    dummy_input.set_data_type(onnx::TensorProto::FLOAT);
+    dummy_input.add_float_data(1.0);
+
+    Graph graph("test");
+    Value* out = graph.AddOutputValue("out", Type(Dtype::kFloat32, {2, 1}));
+    Value* in0 = graph.AddInputValue("in0", Type(Dtype::kFloat32, {1}));
+    in0->ResetInitializer(std::make_unique<Tensor>(dummy_input));
+    Value* x = graph.AddInputValue("x", Type(Dtype::kFloat32, {2, 1}));
+
+    // out = in0 * x
+    graph.AddNode(Node::kMul, {in0, x}, {out});
+
+    g_num_micro_batches = 3;
+    AddGradientNodesForTraining(&graph);
+    g_num_micro_batches = 1;
+
+    // The input is fed as a full batch.
+    EXPECT_EQ(std::vector<int64_t>({6, 1}), x->type().dims());
+
+    std::set<std::string> output_names;
+    for (Value* output : graph.output_values()) {
+        ASSERT_TRUE(output_names.emplace(output->name()).second);
+    }
+    EXPECT_EQ(1, output_names.count("out"));
+    EXPECT_EQ(1, output_names.count("grad_out@in0"));
+    EXPECT_EQ(0, output_names.count("grad_out@x"));
+
+    std::vector<Node*> loops;
+    for (Node* node : graph.GetLiveNodes()) {
+        if (node->op_type() == Node::kLoop) loops.push_back(node);
+    }
+    ASSERT_EQ(1UL, loops.size());
+    Graph* body = loops[0]->body().get();
+    std::set<std::string> body_output_names;
+    for (Value* output : body->output_values()) {
+        body_output_names.insert(output->name());
+    }
+    EXPECT_EQ(1, body_output_names.count("MicroBatch@grad_out@in0"));
+    EXPECT_EQ(1, body_output_names.count("MicroBatch@loss_out"));
+    // Loop outputs: states for `in0`, `x`, and the gradient, and the scan output of losses.
+    EXPECT_EQ(4UL, loops[0]->outputs().size());
+}
+
 }  // namespace
 }  // namespace chainer_compiler
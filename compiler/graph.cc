@@ -3,6 +3,7 @@
 #include <algorithm>
 #include <fstream>
 #include <map>
+#include <memory>
 #include <queue>
 #include <set>
 
@@ -305,6 +306,17 @@ void Graph::MigrateNodes(const std::vector<Node*>& nodes, const std::vector<Valu
 }
 
 void Graph::InferShapes() {
+    // Large initializers are kept out of the round trip through ONNX
+    // so they are neither copied nor re-allocated. Small ones may be
+    // read by shape inference as constants (e.g., shapes of Reshape).
+    const int64_t kMaxInferredInitializerElements = 64;
+    std::map<std::string, std::unique_ptr<Tensor>> initializers;
+    for (Value* value : input_values_) {
+        const Tensor* initializer = value->initializer();
+        if (!initializer || initializer->NumElements() <= kMaxInferredInitializerElements) continue;
+        CHECK(initializers.emplace(value->name(), std::unique_ptr<Tensor>(value->ReleaseInitializer())).second);
+    }
+
     onnx::GraphProto xgraph;
     ToONNX(&xgraph);
     output_values_.clear();
@@ -317,6 +329,11 @@ void Graph::InferShapes() {
     opset_imports[""] = 9;
     onnx::shape_inference::InferShapes(&xgraph, opset_imports);
     Construct(xgraph);
+
+    for (Value* value : input_values_) {
+        auto found = initializers.find(value->name());
+        if (found != initializers.end()) value->ResetInitializer(std::move(found->second));
+    }
 }
 
 void Graph::ResetGradients() {
@@ -0,0 +1,201 @@
+#include "compiler/micro_batch.h"
+
+#include <iostream>
+#include <map>
+#include <set>
+#include <vector>
+
+#include <common/log.h>
+#include <compiler/flags.h>
+#include <compiler/gradient.h>
+#include <compiler/graph.h>
+#include <compiler/graph_builder.h>
+#include <compiler/node.h>
+#include <compiler/topology.h>
+#include <compiler/type.h>
+#include <compiler/value.h>
+
+namespace chainer_compiler {
+
+namespace {
+
+bool IsBatchInput(const Value* value) {
+    const Type& type = value->type();
+    return value->IsInput() && !value->initializer() && type.kind() == Type::Kind::kTensor && type.HasKnownShape() && type.ndim() >= 1;
+}
+
+void ResetShapes(Graph* graph) {
+    for (const auto& value : graph->all_values()) {
+        if (value->IsInput() || value->type().kind() != Type::Kind::kTensor) continue;
+        value->set_type(new Type(value->type().dtype()));
+    }
+    for (const Node* node : graph->nodes()) {
+        for (Graph* subgraph : node->GetSubGraphs()) {
+            ResetShapes(subgraph);
+        }
+    }
+}
+
+}  // namespace
+
+void SplitInputsIntoMicroBatches(Graph* graph) {
+    const int64_t num_micro_batches = g_num_micro_batches;
+    for (Value* value : graph->input_values()) {
+        if (!IsBatchInput(value)) continue;
+        std::vector<int64_t> dims = value->type().dims();
+        CHECK_EQ(0, dims[0] % num_micro_batches) << "The batch size of " << value->name() << " (" << dims[0]
+                                                 << ") is not divisible by the number of micro-batches (" << num_micro_batches << ")";
+        dims[0] /= num_micro_batches;
+        value->set_type(new Type(value->type().dtype(), dims));
+    }
+    // Shapes of other values must be inferred again.
+    ResetShapes(graph);
+}
+
+void GenerateGradientNodesOverMicroBatches(Graph* graph, const std::vector<Value*>& xs) {
+    const int64_t num_micro_batches = g_num_micro_batches;
+    CHECK_EQ(1UL, graph->output_values().size());
+    Value* loss = graph->output_values()[0];
+
+    const std::vector<Node*> nodes = graph->GetLiveNodes();
+    const std::set<Node*> node_set(nodes.begin(), nodes.end());
+    std::vector<Value*> inputs;
+    std::vector<Value*> outputs;
+    std::vector<Value*> temps;
+    ClassifyValues(nodes, &inputs, &outputs, &temps);
+    CHECK_EQ(1UL, outputs.size());
+    CHECK_EQ(loss, outputs[0]);
+
+    // Same as the one in fusion.cc.
+    auto replace_value = [&node_set](Value* value, Value* new_value) {
+        if (Node* node = value->producer()) {
+            if (node_set.count(node)) {
+                node->ReplaceOutput(value, new_value);
+                value->SetProducer(nullptr);
+                new_value->SetProducer(node);
+            }
+        }
+
+        const std::vector<Node*> users(value->users());  // Take a copy.
+        for (Node* node : users) {
+            if (node_set.count(node)) {
+                node->ReplaceInput(value, new_value);
+                value->DetachUser(node);
+                new_value->AddUser(node);
+            }
+        }
+    };
+
+    Graph* body = new Graph(graph->name() + "_MicroBatch");
+    GraphBuilder gb(graph, "MicroBatch", loss);
+    GraphBuilder bgb(body, "MicroBatch", loss);
+
+    Value* iter = body->AddInputValue("MicroBatch@iter", Type(Dtype::kInt64, {}));
+    Value* cond = body->AddInputValue("MicroBatch@cond", Type(Dtype::kBool, {}));
+    bgb.Op(Node::kIdentity, {cond}, body->AddOutputValue("MicroBatch@cond_out", Type(Dtype::kBool, {})));
+
+    std::vector<Value*> loop_inputs = {gb.Const(Type(Dtype::kInt64, {}), {num_micro_batches}), graph->AddNullValue()};
+    std::vector<Value*> loop_outputs;
+
+    // Values of the outer graph are passed as loop states. Batch
+    // inputs are fed as full batches and sliced in the body.
+    std::map<Value*, Value*> body_inputs;
+    for (Value* value : inputs) {
+        if (value->IsNull()) {
+            replace_value(value, body->AddNullValue());
+            continue;
+        }
+
+        const bool is_batch = IsBatchInput(value);
+        const Type micro_type(value->type());
+        if (is_batch) {
+            std::vector<int64_t> dims = micro_type.dims();
+            dims[0] *= num_micro_batches;
+            value->set_type(new Type(micro_type.dtype(), dims));
+        }
+
+        Value* in = body->AddInputValue("MicroBatch@in@" + value->name(), value->type());
+        bgb.Op(Node::kIdentity, {in}, body->AddOutputValue("MicroBatch@out@" + value->name(), value->type()));
+        Value* micro = in;
+        if (is_batch) {
+            // [N * B, ...] => [N, B, ...] => [B, ...]
+            std::vector<int64_t> shape = micro_type.dims();
+            shape.insert(shape.begin(), num_micro_batches);
+            Value* reshaped = bgb.Op(Node::kReshape, {in, bgb.Const(Type(Dtype::kInt64, {static_cast<int64_t>(shape.size())}), shape)});
+            micro = bgb.Op(Node::kGather, {reshaped, iter});
+            micro->set_type(new Type(micro_type));
+        }
+        replace_value(value, micro);
+        body_inputs.emplace(value, in);
+
+        loop_inputs.push_back(value);
+        loop_outputs.push_back(gb.Temp(value->type()));
+    }
+
+    Value* micro_loss = body->AddValue("MicroBatch@loss", loss->type());
+    replace_value(loss, micro_loss);
+    graph->MigrateNodes(nodes, temps, body);
+
+    {
+        GraphBuilder gb(body, "GradIn", micro_loss);
+        Value* one = gb.Const(Type(micro_loss->type().dtype(), {}), {1.0});
+        Value* shape = gb.Op(Node::kShape, {micro_loss});
+        micro_loss->set_grad(gb.Op(Node::kExpand, {one, shape}));
+    }
+
+    std::vector<Value*> body_xs;
+    for (Value* x : xs) {
+        auto found = body_inputs.find(x);
+        if (found != body_inputs.end()) body_xs.push_back(found->second);
+    }
+    GenerateGradientNodes(body, body, body_xs, {micro_loss}, nullptr);
+
+    // Gradients are accumulated in loop states, which start with null.
+    std::vector<std::pair<Value*, Value*>> accumulated;
+    bool ok = true;
+    for (Value* x : xs) {
+        auto found = body_inputs.find(x);
+        if (found == body_inputs.end() || !x->type().dtype().IsFloat()) continue;
+        Value* in = found->second;
+        if (!in->grad()) {
+            // The same check as ExposeParamGradsAsOutputs in gradient.cc.
+            if (in->users().size() == 2 && in->users()[1]->op_type() == Node::kBatchNormalization) continue;
+            std::cerr << "No gradient for parameter: " << x->name() << std::endl;
+            ok = false;
+            continue;
+        }
+        Value* acc_in = body->AddInputValue("MicroBatch@grad_in@" + x->name(), x->type());
+        Value* acc_out = body->AddOutputValue("MicroBatch@grad_out@" + x->name(), x->type());
+        bgb.Op(Node::kChainerGenericAccumulateGrad, {acc_in, in->grad()}, acc_out);
+
+        loop_inputs.push_back(gb.Op(Node::kChainerNullConstant, {}));
+        Value* sum = gb.Temp(x->type());
+        loop_outputs.push_back(sum);
+        accumulated.emplace_back(x, sum);
+    }
+    if (!ok) {
+        body->DumpONNXOnFailure();
+        CHECK(false);
+    }
+    body->ResetGradients();
+
+    // Losses of micro-batches are stacked as a scan output.
+    bgb.Op(Node::kIdentity, {micro_loss}, body->AddOutputValue("MicroBatch@loss_out", micro_loss->type()));
+    Value* losses = gb.Temp(Type(micro_loss->type().dtype()));
+    loop_outputs.push_back(losses);
+
+    Node* loop = gb.MOp(Node::kLoop, loop_inputs, loop_outputs);
+    loop->set_body(body);
+
+    Node* mean = gb.Op(Node::kReduceMean, {losses}, loss)->producer();
+    mean->set_axes({0});
+    mean->set_keepdims(false);
+
+    for (const auto& p : accumulated) {
+        Value* x = p.first;
+        Value* n = gb.Const(Type(x->type().dtype(), {}), {static_cast<double>(num_micro_batches)});
+        x->set_grad(gb.Op(Node::kDiv, {p.second, n}));
+    }
+}
+
+}  // namespace chainer_compiler
@@ -0,0 +1,22 @@
+#pragma once
+
+#include <vector>
+
+namespace chainer_compiler {
+
+class Graph;
+class Value;
+
+// Divides the batch size of inputs without initializers by
+// `g_num_micro_batches`, so shapes of the forward computation are
+// inferred for a micro-batch.
+void SplitInputsIntoMicroBatches(Graph* graph);
+
+// Moves the forward computation of `graph` into a Loop over
+// micro-batches, which slices full-batch inputs, and adds nodes for
+// gradients of `xs` in the loop body. Gradients are accumulated over
+// micro-batches and their means are set as `grad()` of `xs`. The
+// output of `graph` becomes the mean of losses of micro-batches.
+void GenerateGradientNodesOverMicroBatches(Graph* graph, const std::vector<Value*>& xs);
+
+}  // namespace chainer_compiler
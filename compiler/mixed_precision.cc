@@ -0,0 +1,114 @@
+#include "compiler/mixed_precision.h"
+
+#include <map>
+#include <vector>
+
+#include <common/log.h>
+#include <compiler/graph.h>
+#include <compiler/graph_builder.h>
+#include <compiler/log.h>
+#include <compiler/node.h>
+#include <compiler/type.h>
+#include <compiler/value.h>
+
+namespace chainer_compiler {
+
+namespace {
+
+bool RunsInHalf(const Node& node) {
+    switch (node.op_type()) {
+        case Node::kConv:
+        case Node::kGemm:
+        case Node::kMatMul:
+            break;
+        default:
+            return false;
+    }
+    for (const Value* value : node.inputs()) {
+        if (value->IsNull()) continue;
+        if (value->type().kind() != Type::Kind::kTensor || value->type().dtype() != Dtype::kFloat32) return false;
+    }
+    for (const Value* value : node.outputs()) {
+        if (value->type().kind() != Type::Kind::kTensor || value->type().dtype() != Dtype::kFloat32) return false;
+    }
+    return true;
+}
+
+Type* HalfType(const Type& type) {
+    Type* half = new Type(type);
+    half->set_dtype(Dtype::kFloat16);
+    return half;
+}
+
+class MixedPrecisionConverter {
+public:
+    explicit MixedPrecisionConverter(Graph* graph) : graph_(graph) {
+    }
+
+    void Run() {
+        int num_converted = 0;
+        for (Node* node : graph_->GetTopologicallySortedNodes()) {
+            if (node->detached() || !RunsInHalf(*node)) continue;
+            Convert(node);
+            ++num_converted;
+        }
+        CLOG() << "Mixed precision: " << num_converted << " ops run in float16" << std::endl;
+    }
+
+private:
+    // Returns a float16 version of `value`. Casts are shared among
+    // users and a float32 value which was cast from float16 is not
+    // cast again.
+    Value* GetHalf(Value* value) {
+        auto found = halves_.find(value);
+        if (found != halves_.end()) return found->second;
+
+        Value* half;
+        Node* producer = value->producer();
+        if (producer && producer->op_type() == Node::kCast && producer->input(0)->type().dtype() == Dtype::kFloat16) {
+            half = producer->input(0);
+        } else {
+            GraphBuilder gb(graph_, "MixedPrecision", value);
+            half = gb.Op(Node::kCast, {value});
+            half->producer()->set_to(Dtype::kFloat16);
+            half->set_type(HalfType(value->type()));
+        }
+        CHECK(halves_.emplace(value, half).second);
+        return half;
+    }
+
+    void Convert(Node* node) {
+        const std::vector<Value*> inputs = node->inputs();
+        for (Value* input : inputs) {
+            if (input->IsNull()) continue;
+            Value* half = GetHalf(input);
+            input->DetachUser(node);
+            half->AddUser(node);
+            node->ReplaceInput(input, half);
+        }
+
+        Value* output = node->output(0);
+        Value* half = graph_->AddValue(output->name() + "_fp16");
+        half->set_type(HalfType(output->type()));
+        node->ReplaceOutput(output, half);
+        output->SetProducer(nullptr);
+        half->SetProducer(node);
+
+        GraphBuilder gb(graph_, "MixedPrecision", output);
+        gb.Op(Node::kCast, {half}, output);
+        output->producer()->set_to(Dtype::kFloat32);
+        halves_.emplace(output, half);
+    }
+
+    Graph* graph_;
+    std::map<Value*, Value*> halves_;
+};
+
+}  // namespace
+
+void ConvertToMixedPrecision(Graph* graph) {
+    MixedPrecisionConverter converter(graph);
+    converter.Run();
+}
+
+}  // namespace chainer_compiler
@@ -0,0 +1,13 @@
+#pragma once
+
+namespace chainer_compiler {
+
+class Graph;
+
+// Lets Conv, Gemm, and MatMul run in float16 by casting their float32
+// inputs to float16 and their outputs back to float32. Other ops,
+// such as BatchNormalization and softmax cross entropy, and
+// parameters stay in float32.
+void ConvertToMixedPrecision(Graph* graph);
+
+}  // namespace chainer_compiler
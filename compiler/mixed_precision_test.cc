@@ -0,0 +1,58 @@
+#include <gtest/gtest.h>
+
+#include <common/log.h>
+#include <compiler/graph.h>
+#include <compiler/graph_builder.h>
+#include <compiler/mixed_precision.h>
+#include <compiler/node.h>
+#include <compiler/type.h>
+#include <compiler/value.h>
+
+namespace chainer_compiler {
+namespace {
+
+TEST(MixedPrecisionTest, MatMulRelu) {
+    Graph graph("test");
+    Value* x = graph.AddInputValue("x", Type(Dtype::kFloat32, {2, 3}));
+    Value* w0 = graph.AddInputValue("w0", Type(Dtype::kFloat32, {3, 3}));
+    Value* w1 = graph.AddInputValue("w1", Type(Dtype::kFloat32, {3, 3}));
+    Value* y = graph.AddOutputValue("y", Type(Dtype::kFloat32, {2, 3}));
+    Value* z = graph.AddOutputValue("z", Type(Dtype::kFloat32, {2, 3}));
+    GraphBuilder gb(&graph, "test", y);
+    Node* matmul0 = gb.Op(Node::kMatMul, {x, w0}, y)->producer();
+    // `y` is used by both Relu and the second MatMul.
+    Value* r = gb.Op(Node::kRelu, {y});
+    r->set_type(new Type(Dtype::kFloat32, {2, 3}));
+    Node* matmul1 = gb.Op(Node::kMatMul, {y, w1}, z)->producer();
+
+    ConvertToMixedPrecision(&graph);
+
+    for (Node* node : {matmul0, matmul1}) {
+        for (Value* value : node->inputs()) {
+            EXPECT_EQ(Dtype::kFloat16, value->type().dtype()) << value->name();
+        }
+        ASSERT_EQ(1, node->outputs().size());
+        EXPECT_EQ(Dtype::kFloat16, node->output(0)->type().dtype());
+    }
+
+    // Outputs are cast back to float32.
+    ASSERT_EQ(Node::kCast, y->producer()->op_type());
+    EXPECT_EQ(Dtype::kFloat32, y->producer()->to());
+    EXPECT_EQ(matmul0->output(0), y->producer()->input(0));
+    ASSERT_EQ(Node::kCast, z->producer()->op_type());
+    EXPECT_EQ(matmul1->output(0), z->producer()->input(0));
+
+    // The float16 output of the first MatMul is reused without casts.
+    EXPECT_EQ(matmul0->output(0), matmul1->input(0));
+    // Relu stays in float32.
+    EXPECT_EQ(y, r->producer()->input(0));
+
+    // Parameters are float32 and cast only once.
+    EXPECT_EQ(Dtype::kFloat32, w0->type().dtype());
+    ASSERT_EQ(1, w0->users().size());
+    EXPECT_EQ(Node::kCast, w0->users()[0]->op_type());
+    EXPECT_EQ(Dtype::kFloat16, w0->users()[0]->to());
+}
+
+}  // namespace
+}  // namespace chainer_compiler
@@ -37,7 +37,7 @@ Model::Model(const Model& model, const std::string& graph_name)
 Model::~Model() {
 }
 
-void Model::ToONNX(onnx::ModelProto* xmodel) const {
+void Model::ToONNX(onnx::ModelProto* xmodel, bool serialize_initializers) const {
     DUMP_PRIM(xmodel, ir_version);
     for (const onnx::OperatorSetIdProto& opset : opset_import_) {
         *xmodel->add_opset_import() = opset;
@@ -47,7 +47,7 @@ void Model::ToONNX(onnx::ModelProto* xmodel) const {
     DUMP_STRING(xmodel, domain);
     DUMP_PRIM(xmodel, model_version);
     DUMP_STRING(xmodel, doc_string);
-    graph_->ToONNX(xmodel->mutable_graph());
+    graph_->ToONNX(xmodel->mutable_graph(), serialize_initializers);
     for (const auto& p : metadata_props_) {
         onnx::StringStringEntryProto* metadata = xmodel->add_metadata_props();
         metadata->set_key(p.first);
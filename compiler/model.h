@@ -21,7 +21,7 @@ public:
 
     Model& operator=(const Model&) = delete;
 
-    void ToONNX(onnx::ModelProto* xmodel) const;
+    void ToONNX(onnx::ModelProto* xmodel, bool serialize_initializers = true) const;
 
     const Graph& graph() const {
         return *graph_;
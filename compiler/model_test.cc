@@ -18,6 +18,7 @@
 #include <compiler/memory_simulator.h>
 #include <compiler/model.h>
 #include <compiler/passes.h>
+#include <compiler/util.h>
 
 namespace chainer_compiler {
 namespace {
@@ -44,6 +45,14 @@ void ReorderInitializers(onnx::GraphProto* xgraph) {
     }
 }
 
+// Stores initializers in typed fields instead of `raw_data` for
+// normalization.
+void NormalizeInitializers(onnx::GraphProto* xgraph) {
+    for (onnx::TensorProto& tensor : *xgraph->mutable_initializer()) {
+        MakeHumanReadableValue(&tensor);
+    }
+}
+
 // Sorts attributes alphabetically for normalization.
 void SortAttributes(onnx::GraphProto* xgraph) {
     for (onnx::NodeProto& xnode : *xgraph->mutable_node()) {
@@ -95,6 +104,8 @@ TEST(ModelTest, DumpMNIST) {
     SortAttributes(xmodel.mutable_graph());
     SortAttributes(xmodel2.mutable_graph());
     ReorderInitializers(xmodel.mutable_graph());
+    NormalizeInitializers(xmodel.mutable_graph());
+    NormalizeInitializers(xmodel2.mutable_graph());
 
     EXPECT_EQ(xmodel.DebugString(), xmodel2.DebugString());
 }
@@ -9,6 +9,7 @@
 #include <compiler/graph.h>
 #include <compiler/serializer_util.h>
 #include <compiler/tensor.h>
+#include <compiler/util.h>
 #include <compiler/value.h>
 
 namespace chainer_compiler {
@@ -51,6 +52,9 @@ void Node::ToONNX(onnx::NodeProto* xnode) const {
 std::string Node::DebugString() const {
     onnx::NodeProto xnode;
     ToONNX(&xnode);
+    for (onnx::AttributeProto& xattr : *xnode.mutable_attribute()) {
+        if (xattr.has_t()) MakeHumanReadableValue(xattr.mutable_t());
+    }
     return xnode.DebugString();
 }
 
@@ -3,6 +3,7 @@
 #include <ctype.h>
 
 #include <algorithm>
+#include <iomanip>
 #include <iterator>
 #include <map>
 #include <queue>
@@ -85,6 +86,54 @@ void EmitNode(const Node* node, CodeEmitter* ce) {
     }
 }
 
+// Emits code which computes outputs from inputs named by
+// `CleanseIdent`.
+void EmitNodes(const std::vector<Node*>& nodes, const std::vector<Value*>& inputs, CodeEmitter* ce) {
+    std::map<Node*, int> input_counts;
+    for (Node* node : nodes) {
+        CHECK(input_counts.emplace(node, node->GetNumActualInputs()).second);
+    }
+
+    std::queue<Value*> q;
+    for (Value* value : inputs) {
+        q.push(value);
+    }
+
+    for (Node* node : nodes) {
+        if (node->op_type() != Node::kConstant) continue;
+        q.push(node->output(0));
+        Tensor* t = node->tensor_value().get();
+        CHECK_EQ(1, t->NumElements()) << t->dtype();
+        double value;
+        switch (t->dtype()) {
+            case Dtype::kFloat32:
+                value = t->Get<float>(0);
+                break;
+            case Dtype::kFloat64:
+                value = t->Get<double>(0);
+                break;
+            default:
+                CHECK(false) << t->dtype();
+        }
+        std::ostringstream value_str;
+        value_str << std::setprecision(17) << value;
+        *ce << "const T " << CleanseIdent(node->output(0)->name()) << " = " << value_str.str() << ";  // Constant\n";
+    }
+
+    while (!q.empty()) {
+        Value* value = q.front();
+        q.pop();
+
+        for (Node* node : value->users()) {
+            auto found = input_counts.find(node);
+            if (found == input_counts.end()) continue;
+            if (--found->second != 0) continue;
+            EmitNode(node, ce);
+            for (Value* value : node->outputs()) q.push(value);
+        }
+    }
+}
+
 }  // namespace
 
 void BuildNvrtcProgram(
@@ -119,52 +168,62 @@ void BuildNvrtcProgram(
         ce << "const T " << CleanseIdent(value->name()) << " = " << CleanseIdent(value->name(), "i_") << "[tid];  // input\n";
     }
 
-    std::map<Node*, int> input_counts;
-    for (Node* node : nodes) {
-        CHECK(input_counts.emplace(node, node->GetNumActualInputs()).second);
-    }
+    EmitNodes(nodes, inputs, &ce);
 
-    std::queue<Value*> q;
-    for (Value* value : inputs) {
-        q.push(value);
+    for (Value* value : outputs) {
+        ce << CleanseIdent(value->name(), "o_") << "[tid] = " << CleanseIdent(value->name()) << ";  // output\n";
     }
 
+    ce << "}\n";
+
+    *prog = oss.str();
+}
+
+void BuildCpuElementwiseProgram(
+        const std::vector<Node*>& nodes, int id, const std::vector<Value*>& inputs, const std::vector<Value*>& outputs, std::string* prog) {
+    std::set<Node::OpType> seen_ops;
     for (Node* node : nodes) {
-        if (node->op_type() != Node::kConstant) continue;
-        q.push(node->output(0));
-        Tensor* t = node->tensor_value().get();
-        CHECK_EQ(1, t->NumElements()) << t->dtype();
-        double value;
-        switch (t->dtype()) {
-            case Dtype::kFloat32:
-                value = t->Get<float>(0);
-                break;
-            case Dtype::kFloat64:
-                value = t->Get<double>(0);
-                break;
-            default:
-                CHECK(false) << t->dtype();
-        }
-        ce << "const T " << CleanseIdent(node->output(0)->name()) << " = " << value << ";  // Constant\n";
+        seen_ops.insert(node->op_type());
     }
 
-    while (!q.empty()) {
-        Value* value = q.front();
-        q.pop();
+    std::ostringstream oss;
+    CodeEmitter ce(oss);
+    ce << "#include <cmath>\n";
+    ce << "#include <cstdint>\n";
+    ce << "using std::exp;\n";
+    ce << "using std::tanh;\n";
+    ce << "typedef float T;\n";
+    if (seen_ops.count(Node::kSigmoid)) {
+        ce << "static inline T sigmoid(T x) {\n";
+        ce << "const T half = 0.5;\n";
+        ce << "return tanh(x * half) * half + half;\n";
+        ce << "}\n";
+    }
 
-        for (Node* node : value->users()) {
-            auto found = input_counts.find(node);
-            if (found == input_counts.end()) continue;
-            if (--found->second != 0) continue;
-            EmitNode(node, &ce);
-            for (Value* value : node->outputs()) q.push(value);
-        }
+    // Pointers to inputs and outputs are passed by `args` in this
+    // order.
+    ce << "extern \"C\"\n";
+    ce << "void fusion" << id << "(int64_t n, void** args) {\n";
+    int index = 0;
+    for (Value* value : inputs) {
+        ce << "const T* " << CleanseIdent(value->name(), "i_") << " = static_cast<const T*>(args[" << index++ << "]);\n";
+    }
+    for (Value* value : outputs) {
+        ce << "T* " << CleanseIdent(value->name(), "o_") << " = static_cast<T*>(args[" << index++ << "]);\n";
+    }
+    ce << "#pragma omp parallel for if (n >= 32768)\n";
+    ce << "for (int64_t tid = 0; tid < n; ++tid) {\n";
+    for (Value* value : inputs) {
+        ce << "const T " << CleanseIdent(value->name()) << " = " << CleanseIdent(value->name(), "i_") << "[tid];  // input\n";
     }
 
+    EmitNodes(nodes, inputs, &ce);
+
     for (Value* value : outputs) {
         ce << CleanseIdent(value->name(), "o_") << "[tid] = " << CleanseIdent(value->name()) << ";  // output\n";
     }
 
+    ce << "}\n";
     ce << "}\n";
 
     *prog = oss.str();
@@ -11,4 +11,10 @@ class Value;
 void BuildNvrtcProgram(
         const std::vector<Node*>& nodes, int id, const std::vector<Value*>& inputs, const std::vector<Value*>& outputs, std::string* prog);
 
+// Builds C++ code for CPU which has the same semantics as the NVRTC
+// program. The kernel function takes the number of elements and an
+// array of pointers to inputs and outputs.
+void BuildCpuElementwiseProgram(
+        const std::vector<Node*>& nodes, int id, const std::vector<Value*>& inputs, const std::vector<Value*>& outputs, std::string* prog);
+
 }  // namespace chainer_compiler
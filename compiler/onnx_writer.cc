@@ -0,0 +1,151 @@
+#include "compiler/onnx_writer.h"
+
+#include <algorithm>
+#include <fstream>
+#include <vector>
+
+#include <google/protobuf/io/coded_stream.h>
+#include <google/protobuf/io/zero_copy_stream_impl.h>
+#include <google/protobuf/wire_format_lite.h>
+
+#include <compiler/onnx.h>
+
+#include <common/log.h>
+#include <common/strutil.h>
+#include <compiler/graph.h>
+#include <compiler/model.h>
+#include <compiler/tensor.h>
+#include <compiler/value.h>
+
+namespace chainer_compiler {
+
+namespace {
+
+using google::protobuf::internal::WireFormatLite;
+using google::protobuf::io::CodedOutputStream;
+
+// Alignment of tensors in external data files.
+constexpr int64_t kExternalDataAlignment = 64;
+// Smaller tensors are kept in the model file.
+constexpr int64_t kExternalDataThreshold = 1024;
+
+uint32_t LengthDelimitedTag(int field_number) {
+    return WireFormatLite::MakeTag(field_number, WireFormatLite::WIRETYPE_LENGTH_DELIMITED);
+}
+
+// The size of a length-delimited field including its tag and length.
+int64_t LengthDelimitedSize(int field_number, int64_t size) {
+    return CodedOutputStream::VarintSize32(LengthDelimitedTag(field_number)) + CodedOutputStream::VarintSize64(size) + size;
+}
+
+// An initializer whose `raw_data` is written from the tensor without
+// being copied into a TensorProto.
+struct InitializerWriter {
+    onnx::TensorProto header;
+    // Null if the data is stored externally.
+    const void* data;
+    int64_t nbytes;
+
+    int64_t ByteSize() const {
+        int64_t size = header.ByteSizeLong();
+        if (data) size += LengthDelimitedSize(onnx::TensorProto::kRawDataFieldNumber, nbytes);
+        return size;
+    }
+
+    void Write(CodedOutputStream* out) const {
+        CHECK(header.SerializeToCodedStream(out));
+        if (!data) return;
+        out->WriteTag(LengthDelimitedTag(onnx::TensorProto::kRawDataFieldNumber));
+        out->WriteVarint64(nbytes);
+        // `WriteRaw` takes the size as int.
+        constexpr int64_t kChunkSize = 1 << 30;
+        for (int64_t offset = 0; offset < nbytes; offset += kChunkSize) {
+            out->WriteRaw(static_cast<const char*>(data) + offset, std::min(kChunkSize, nbytes - offset));
+        }
+    }
+};
+
+void AddExternalData(const std::string& key, const std::string& value, onnx::TensorProto* xtensor) {
+    onnx::StringStringEntryProto* entry = xtensor->add_external_data();
+    entry->set_key(key);
+    entry->set_value(value);
+}
+
+}  // namespace
+
+void WriteModel(const Model& model, const std::string& filename, bool external_data) {
+    onnx::ModelProto xmodel;
+    model.ToONNX(&xmodel, false /* serialize_initializers */);
+    onnx::GraphProto xgraph;
+    xgraph.Swap(xmodel.mutable_graph());
+    xmodel.clear_graph();
+
+    const std::string data_filename = filename + ".data";
+    const size_t slash = data_filename.rfind('/');
+    const std::string data_location = slash == std::string::npos ? data_filename : data_filename.substr(slash + 1);
+    std::ofstream data_ofs;
+    int64_t data_offset = 0;
+    if (external_data) {
+        data_ofs.open(data_filename, std::ios::binary);
+        CHECK(data_ofs) << "Failed to open " << data_filename;
+    }
+
+    std::vector<InitializerWriter> initializers;
+    for (const Value* value : model.graph().input_values()) {
+        const Tensor* tensor = value->initializer();
+        if (!tensor) continue;
+        InitializerWriter w;
+        for (int64_t d : tensor->dims()) w.header.add_dims(d);
+        w.header.set_data_type(tensor->dtype().ToONNX());
+        w.header.set_name(tensor->name());
+        if (!tensor->doc_string().empty()) w.header.set_doc_string(tensor->doc_string());
+        w.data = tensor->GetRawData();
+        w.nbytes = tensor->ElementSize() * tensor->NumElements();
+
+        if (external_data && w.nbytes >= kExternalDataThreshold) {
+            const int64_t padding = (kExternalDataAlignment - data_offset % kExternalDataAlignment) % kExternalDataAlignment;
+            data_ofs.write(std::string(padding, '\0').data(), padding);
+            data_offset += padding;
+            data_ofs.write(static_cast<const char*>(w.data), w.nbytes);
+            w.header.set_data_location(onnx::TensorProto::EXTERNAL);
+            AddExternalData("location", data_location, &w.header);
+            AddExternalData("offset", StrCat(data_offset), &w.header);
+            AddExternalData("length", StrCat(w.nbytes), &w.header);
+            data_offset += w.nbytes;
+            w.data = nullptr;
+        }
+        initializers.push_back(std::move(w));
+    }
+    if (external_data) {
+        data_ofs.close();
+        CHECK(data_ofs) << "Failed to write " << data_filename;
+    }
+
+    int64_t graph_size = xgraph.ByteSizeLong();
+    for (const InitializerWriter& w : initializers) {
+        graph_size += LengthDelimitedSize(onnx::GraphProto::kInitializerFieldNumber, w.ByteSize());
+    }
+
+    std::ofstream ofs(filename, std::ios::binary);
+    CHECK(ofs) << "Failed to open output ONNX: " << filename;
+    {
+        google::protobuf::io::OstreamOutputStream oos(&ofs);
+        CodedOutputStream out(&oos);
+        // Fields of a message can be in any order, so the graph with
+        // its initializers is written after the other fields.
+        CHECK(xmodel.SerializeToCodedStream(&out));
+        out.WriteTag(LengthDelimitedTag(onnx::ModelProto::kGraphFieldNumber));
+        out.WriteVarint64(graph_size);
+        CHECK(xgraph.SerializeToCodedStream(&out));
+        for (const InitializerWriter& w : initializers) {
+            out.WriteTag(LengthDelimitedTag(onnx::GraphProto::kInitializerFieldNumber));
+            out.WriteVarint64(w.ByteSize());
+            w.Write(&out);
+        }
+        CHECK(!out.HadError()) << "Failed to write " << filename;
+    }
+    ofs.close();
+    CHECK(ofs) << "Failed to write " << filename;
+}
+
+}  // namespace chainer_compiler
@@ -0,0 +1,17 @@
+#pragma once
+
+#include <string>
+
+namespace chainer_compiler {
+
+class Model;
+
+// Writes `model` to `filename` as an ONNX model. Unlike serializing
+// the result of `Model::ToONNX`, initializers are written directly
+// from their tensors, so the whole ModelProto is never in memory.
+//
+// If `external_data` is true, initializers of 1KB or larger are stored
+// in `filename` + ".data" as ONNX external data.
+void WriteModel(const Model& model, const std::string& filename, bool external_data = false);
+
+}  // namespace chainer_compiler
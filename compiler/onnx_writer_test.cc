@@ -0,0 +1,67 @@
+#include <cstdio>
+#include <string>
+
+#include <gtest/gtest.h>
+
+#include <compiler/onnx.h>
+
+#include <common/log.h>
+#include <common/protoutil.h>
+#include <compiler/graph.h>
+#include <compiler/model.h>
+#include <compiler/onnx_writer.h>
+#include <compiler/tensor.h>
+#include <compiler/util.h>
+#include <compiler/value.h>
+
+namespace chainer_compiler {
+namespace {
+
+TEST(ONNXWriterTest, WriteMNIST) {
+    onnx::ModelProto xmodel(LoadLargeProto<onnx::ModelProto>("data/mnist/model.onnx"));
+    Model model(xmodel);
+    onnx::ModelProto expected;
+    model.ToONNX(&expected);
+
+    const std::string filename = "/tmp/onnx_writer_test_mnist.onnx";
+    WriteModel(model, filename);
+    onnx::ModelProto actual(LoadLargeProto<onnx::ModelProto>(filename));
+    EXPECT_EQ(expected.DebugString(), actual.DebugString());
+    std::remove(filename.c_str());
+}
+
+TEST(ONNXWriterTest, WriteMNISTWithExternalData) {
+    onnx::ModelProto xmodel(LoadLargeProto<onnx::ModelProto>("data/mnist/model.onnx"));
+    Model model(xmodel);
+
+    const std::string filename = "/tmp/onnx_writer_test_mnist_external.onnx";
+    WriteModel(model, filename, true /* external_data */);
+    onnx::ModelProto xmodel2(LoadLargeProto<onnx::ModelProto>(filename));
+    int num_external = 0;
+    for (const onnx::TensorProto& xtensor : xmodel2.graph().initializer()) {
+        if (xtensor.data_location() == onnx::TensorProto::EXTERNAL) {
+            EXPECT_FALSE(xtensor.has_raw_data());
+            ++num_external;
+        }
+    }
+    EXPECT_LT(0, num_external);
+
+    ResolveExternalDataLocations(filename, &xmodel2);
+    Model model2(xmodel2);
+    ASSERT_EQ(model.graph().input_values().size(), model2.graph().input_values().size());
+    for (size_t i = 0; i < model.graph().input_values().size(); ++i) {
+        const Tensor* expected = model.graph().input_values()[i]->initializer();
+        const Tensor* actual = model2.graph().input_values()[i]->initializer();
+        if (!expected) {
+            EXPECT_EQ(nullptr, actual);
+            continue;
+        }
+        ASSERT_NE(nullptr, actual);
+        EXPECT_EQ(expected->DebugString(), actual->DebugString());
+    }
+    std::remove(filename.c_str());
+    std::remove((filename + ".data").c_str());
+}
+
+}  // namespace
+}  // namespace chainer_compiler
@@ -1,9 +1,15 @@
 #include "compiler/passes.h"
 
+#include <algorithm>
 #include <iostream>
 #include <map>
 #include <memory>
+#include <vector>
 
+#include <common/thread_pool.h>
+
+#include <compiler/affine_folding.h>
+#include <compiler/common_subexpression_elimination.h>
 #include <compiler/config.h>
 #include <compiler/constant_propagation.h>
 #include <compiler/flags.h>
@@ -12,7 +18,10 @@
 #include <compiler/gradient.h>
 #include <compiler/graph.h>
 #include <compiler/memory_simulator.h>
+#include <compiler/micro_batch.h>
+#include <compiler/mixed_precision.h>
 #include <compiler/model.h>
+#include <compiler/quantization.h>
 #include <compiler/scheduler.h>
 #include <compiler/shape_evaluator.h>
 #include <compiler/simplifier.h>
@@ -49,6 +58,22 @@ void Recursively(Fn fn, Graph* graph) {
     }
 }
 
+// Same as `Recursively`, but sibling subgraphs are processed in
+// parallel. `fn` must only touch the graph it is given. As names are
+// generated per graph, the result does not depend on the number of
+// threads.
+template <class Fn>
+void RecursivelyInParallel(ThreadPool* pool, Fn fn, Graph* graph) {
+    fn(graph);
+    std::vector<Graph*> subgraphs;
+    for (const Node* node : graph->nodes()) {
+        for (Graph* subgraph : node->GetSubGraphs()) {
+            subgraphs.push_back(subgraph);
+        }
+    }
+    pool->ParallelFor(subgraphs.size(), [pool, &fn, &subgraphs](int64_t i) { RecursivelyInParallel(pool, fn, subgraphs[i]); });
+}
+
 }  //  namespace
 
 void RunDefaultPasses(Model* model, bool gen_backprop) {
@@ -61,6 +86,14 @@ void RunDefaultPasses(Graph* graph, bool gen_backprop) {
 
     std::unique_ptr<CompilerConfig> ccfg{GetCompilerConfig(g_backend_name)};
 
+    ThreadPool pool(std::max(0, g_compiler_threads - 1));
+
+    if (gen_backprop && g_num_micro_batches > 1) {
+        CHECK(g_computation_order.empty()) << "Micro-batches are not supported with computation orders";
+        SplitInputsIntoMicroBatches(graph);
+        if (!g_skip_inference) graph->InferShapes();
+    }
+
     InferAllDtypeAndShape(graph);
 
     auto dump_onnx = [&graph](bool cond, const char* msg) {
@@ -76,13 +109,28 @@ void RunDefaultPasses(Graph* graph, bool gen_backprop) {
 
     CanonicalizeSubGraphs(graph);
 
-    Recursively([&ccfg, gen_backprop](Graph* g) { Simplify(*ccfg, g, gen_backprop); }, graph);
+    RecursivelyInParallel(&pool, [&ccfg, gen_backprop](Graph* g) { Simplify(*ccfg, g, gen_backprop); }, graph);
 
-    Recursively(PropagateConstants, graph);
+    RecursivelyInParallel(&pool, PropagateConstants, graph);
 
-    Recursively(EvaluateShapes, graph);
+    RecursivelyInParallel(&pool, EliminateCommonSubexpressions, graph);
 
-    Recursively([](Graph* g) { g->DeleteDetached(); }, graph);
+    if (!gen_backprop && g_fold_affine_ops) {
+        RecursivelyInParallel(&pool, FoldAffineOps, graph);
+    }
+
+    if (!gen_backprop && !g_quantization_ranges.empty()) {
+        const QuantizationRanges ranges = ReadQuantizationRanges(g_quantization_ranges);
+        RecursivelyInParallel(&pool, [&ranges](Graph* g) { QuantizeOps(ranges, g); }, graph);
+    }
+
+    if (g_mixed_precision) {
+        RecursivelyInParallel(&pool, ConvertToMixedPrecision, graph);
+    }
+
+    RecursivelyInParallel(&pool, EvaluateShapes, graph);
+
+    RecursivelyInParallel(&pool, [](Graph* g) { g->DeleteDetached(); }, graph);
 
     dump_onnx(g_dump_after_simplification, "after simplification");
 
@@ -93,6 +141,7 @@ void RunDefaultPasses(Graph* graph, bool gen_backprop) {
             AddGradientNodesForTraining(graph);
         } else {
             // specified computation order
+            CHECK(g_optimizer.empty()) << "Optimizers are not supported with computation orders";
             skip_scheduling = true;
             auto orders = GetComputationOrder(*graph, g_computation_order);
             AddGradientNodesForTrainingWithOrders(graph, orders);
@@ -104,11 +153,13 @@ void RunDefaultPasses(Graph* graph, bool gen_backprop) {
     // if (!g_skip_inference) graph->InferShapes();
 
     if (!skip_scheduling) {
-        Recursively([&ccfg, gen_backprop](Graph* g) { Simplify(*ccfg, g, gen_backprop); }, graph);
+        RecursivelyInParallel(&pool, [&ccfg, gen_backprop](Graph* g) { Simplify(*ccfg, g, gen_backprop); }, graph);
 
-        Recursively(PropagateConstants, graph);
+        RecursivelyInParallel(&pool, PropagateConstants, graph);
 
-        Recursively([](Graph* g) { g->DeleteDetached(); }, graph);
+        RecursivelyInParallel(&pool, EliminateCommonSubexpressions, graph);
+
+        RecursivelyInParallel(&pool, [](Graph* g) { g->DeleteDetached(); }, graph);
     }
 
     dump_onnx(g_dump_after_gradient, "after gradient generation");
@@ -125,7 +176,8 @@ void RunDefaultPasses(Graph* graph, bool gen_backprop) {
     }
 
     int64_t order = 0;
-    Recursively([&order](Graph* g) { order = ScheduleComputation(*g, order); }, graph);
+    const SchedulerType scheduler_type = GetSchedulerType(g_scheduler);
+    Recursively([&order, scheduler_type](Graph* g) { order = ScheduleComputation(*g, order, scheduler_type); }, graph);
 
     if (g_compiler_log) {
         ShowSimulatedMemoryUsage(*graph);
@@ -145,6 +197,9 @@ void RunDefaultPassesBeforeGradient(Graph* graph) {
     CanonicalizeSubGraphs(graph);
     Recursively([&ccfg](Graph* g) { Simplify(*ccfg, g, true); }, graph);
     Recursively(PropagateConstants, graph);
+    if (g_mixed_precision) {
+        Recursively(ConvertToMixedPrecision, graph);
+    }
     Recursively([](Graph* g) { g->DeleteDetached(); }, graph);
     Recursively([&ccfg](Graph* g) { CheckAllOpsSupported(*ccfg, g); }, graph);
 }
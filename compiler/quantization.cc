@@ -0,0 +1,256 @@
+#include "compiler/quantization.h"
+
+#include <algorithm>
+#include <cmath>
+#include <fstream>
+#include <map>
+#include <vector>
+
+#include <common/log.h>
+#include <compiler/graph.h>
+#include <compiler/graph_builder.h>
+#include <compiler/log.h>
+#include <compiler/node.h>
+#include <compiler/tensor.h>
+#include <compiler/type.h>
+#include <compiler/value.h>
+
+namespace chainer_compiler {
+
+namespace {
+
+constexpr float kInt8Max = 127.0;
+
+const Tensor* GetConstantTensor(const Value* value) {
+    if (value->producer() && value->producer()->op_type() == Node::kConstant) {
+        return value->producer()->tensor_value().get();
+    }
+    if (value->IsInput() && value->initializer()) return value->initializer();
+    return nullptr;
+}
+
+bool IsFloat32(const Value* value) {
+    return value->type().kind() == Type::Kind::kTensor && value->type().dtype() == Dtype::kFloat32;
+}
+
+float GetScale(const std::vector<float>& data) {
+    float max_abs = 0;
+    for (float v : data) max_abs = std::max(max_abs, std::abs(v));
+    return max_abs / kInt8Max;
+}
+
+std::vector<float> GetFloats(const Tensor& tensor) {
+    std::vector<float> data;
+    for (int64_t i = 0; i < tensor.NumElements(); ++i) data.push_back(tensor.Get<float>(i));
+    return data;
+}
+
+std::vector<int> QuantizeData(const std::vector<float>& data, float scale, float max) {
+    std::vector<int> quantized;
+    for (float v : data) {
+        const float q = std::round(v / scale);
+        quantized.push_back(static_cast<int>(std::min(max, std::max(-max, q))));
+    }
+    return quantized;
+}
+
+class Quantizer {
+public:
+    Quantizer(const QuantizationRanges& ranges, Graph* graph) : ranges_(ranges), graph_(graph) {
+    }
+
+    void Run() {
+        int num_quantized = 0;
+        for (Node* node : graph_->GetTopologicallySortedNodes()) {
+            if (node->detached()) continue;
+            bool quantized = false;
+            switch (node->op_type()) {
+                case Node::kConv:
+                    quantized = QuantizeConv(node);
+                    break;
+                case Node::kGemm:
+                case Node::kMatMul:
+                case Node::kChainerLinear:
+                    quantized = QuantizeMatMul(node);
+                    break;
+                default:
+                    break;
+            }
+            if (quantized) ++num_quantized;
+        }
+        CLOG() << "Quantization: " << num_quantized << " ops run in int8" << std::endl;
+    }
+
+private:
+    // Returns the scale of `value` or 0 if it was not calibrated.
+    float GetInputScale(const Value* value) const {
+        if (!IsFloat32(value)) return 0;
+        auto found = ranges_.find(value->name());
+        if (found == ranges_.end()) return 0;
+        const QuantizationRange& range = found->second;
+        return std::max(std::abs(range.min), std::abs(range.max)) / kInt8Max;
+    }
+
+    // Returns an int8 version of `value`. Outputs of other quantized
+    // ops are requantized from their int32 accumulators, optionally
+    // through Relu.
+    Value* GetQuantized(Value* value, float scale) {
+        auto found = quantized_.find(value);
+        if (found != quantized_.end()) return found->second;
+
+        GraphBuilder gb(graph_, "Quantize", value);
+        Value* acc = nullptr;
+        float acc_scale = 0;
+        bool relu = false;
+        Value* v = value;
+        if (v->producer() && v->producer()->op_type() == Node::kRelu) {
+            v = v->producer()->input(0);
+            relu = true;
+        }
+        Node* producer = v->producer();
+        if (producer && producer->op_type() == Node::kChainerDequantizeLinear && producer->input(0)->type().dtype() == Dtype::kInt32) {
+            acc = producer->input(0);
+            acc_scale = producer->scale();
+        }
+
+        Value* quantized;
+        if (acc) {
+            quantized = gb.Op(Node::kChainerRequantize, {acc});
+            quantized->producer()->set_scale(acc_scale / scale)->set_relu(relu);
+        } else {
+            quantized = gb.Op(Node::kChainerQuantizeLinear, {value});
+            quantized->producer()->set_scale(scale);
+        }
+        quantized->set_type(new Type(Dtype::kInt8, value->type().dims()));
+        CHECK(quantized_.emplace(value, quantized).second);
+        return quantized;
+    }
+
+    // Replaces `node` by an integer op and dequantization of its
+    // int32 output.
+    void Replace(Node* node, Node::OpType op_type, const std::vector<Value*>& inputs, float scale, GraphBuilder* gb) {
+        Value* output = node->output(0);
+        Value* acc = gb->Op(op_type, inputs);
+        acc->set_type(new Type(Dtype::kInt32, output->type().dims()));
+        if (op_type == Node::kChainerConvInteger) {
+            acc->producer()
+                    ->set_strides(node->strides())
+                    ->set_pads(node->pads())
+                    ->set_kernel_shape(node->kernel_shape())
+                    ->set_auto_pad(node->auto_pad());
+        }
+        graph_->DetachNode(node);
+        gb->Op(Node::kChainerDequantizeLinear, {acc}, output);
+        output->producer()->set_scale(scale);
+    }
+
+    Value* QuantizeBias(const Tensor* bias, float scale, GraphBuilder* gb) {
+        const std::vector<int64_t> dims = {bias->NumElements()};
+        const float max = static_cast<float>(1 << 30);
+        return gb->Const(Type(Dtype::kInt32, dims), QuantizeData(GetFloats(*bias), scale, max));
+    }
+
+    bool QuantizeConv(Node* node) {
+        Value* x = node->input(0);
+        const Tensor* w = GetConstantTensor(node->input(1));
+        if (!w || w->dtype() != Dtype::kFloat32 || w->dims().size() != 4) return false;
+        if (node->group() != 1 || node->auto_pad() != "NOTSET") return false;
+        for (int d : node->dilations()) {
+            if (d != 1) return false;
+        }
+        const Tensor* b = nullptr;
+        if (node->inputs().size() >= 3 && !node->input(2)->IsNull()) {
+            b = GetConstantTensor(node->input(2));
+            if (!b || b->dtype() != Dtype::kFloat32) return false;
+        }
+        const float x_scale = GetInputScale(x);
+        const std::vector<float> w_data = GetFloats(*w);
+        const float w_scale = GetScale(w_data);
+        if (x_scale == 0 || w_scale == 0) return false;
+
+        GraphBuilder gb(graph_, "Quantize", node->output(0));
+        std::vector<Value*> inputs = {GetQuantized(x, x_scale)};
+        inputs.push_back(gb.Const(Type(Dtype::kInt8, w->dims()), QuantizeData(w_data, w_scale, kInt8Max)));
+        if (b) inputs.push_back(QuantizeBias(b, x_scale * w_scale, &gb));
+        Replace(node, Node::kChainerConvInteger, inputs, x_scale * w_scale, &gb);
+        return true;
+    }
+
+    bool QuantizeMatMul(Node* node) {
+        Value* x = node->input(0);
+        if (x->type().ndim() != 2) return false;
+        const Tensor* w = GetConstantTensor(node->input(1));
+        if (!w || w->dtype() != Dtype::kFloat32 || w->dims().size() != 2) return false;
+        bool trans_b = false;
+        const Tensor* b = nullptr;
+        Value* bias = nullptr;
+        if (node->op_type() == Node::kGemm) {
+            if (node->alpha() != 1.0 || node->trans_a()) return false;
+            trans_b = node->trans_b();
+            if (node->beta() != 0.0) {
+                if (node->beta() != 1.0) return false;
+                bias = node->input(2);
+            }
+        } else if (node->op_type() == Node::kChainerLinear) {
+            if (node->n_batch_axes() != 1) return false;
+            trans_b = true;
+            if (node->inputs().size() >= 3 && !node->input(2)->IsNull()) bias = node->input(2);
+        }
+        if (bias) {
+            b = GetConstantTensor(bias);
+            if (!b || b->dtype() != Dtype::kFloat32) return false;
+            // Only per-output-channel biases.
+            const int64_t n = w->dims()[trans_b ? 0 : 1];
+            if (b->NumElements() != n || b->dims().empty() || b->dims().back() != n) return false;
+        }
+        const float x_scale = GetInputScale(x);
+        std::vector<float> w_data = GetFloats(*w);
+        const float w_scale = GetScale(w_data);
+        if (x_scale == 0 || w_scale == 0) return false;
+
+        // The integer kernel takes weights in (K, N).
+        std::vector<int64_t> w_dims = w->dims();
+        if (trans_b) {
+            const int64_t n = w_dims[0], k = w_dims[1];
+            std::vector<float> transposed(w_data.size());
+            for (int64_t i = 0; i < n; ++i) {
+                for (int64_t j = 0; j < k; ++j) transposed[j * n + i] = w_data[i * k + j];
+            }
+            w_data.swap(transposed);
+            w_dims = {k, n};
+        }
+
+        GraphBuilder gb(graph_, "Quantize", node->output(0));
+        std::vector<Value*> inputs = {GetQuantized(x, x_scale)};
+        inputs.push_back(gb.Const(Type(Dtype::kInt8, w_dims), QuantizeData(w_data, w_scale, kInt8Max)));
+        if (b) inputs.push_back(QuantizeBias(b, x_scale * w_scale, &gb));
+        Replace(node, Node::kChainerMatMulInteger, inputs, x_scale * w_scale, &gb);
+        return true;
+    }
+
+    const QuantizationRanges& ranges_;
+    Graph* graph_;
+    std::map<Value*, Value*> quantized_;
+};
+
+}  // namespace
+
+QuantizationRanges ReadQuantizationRanges(const std::string& filename) {
+    std::ifstream ifs(filename);
+    CHECK(ifs) << "Failed to open: " << filename;
+    QuantizationRanges ranges;
+    std::string name;
+    QuantizationRange range;
+    while (ifs >> name >> range.min >> range.max) {
+        ranges[name] = range;
+    }
+    CHECK(ifs.eof()) << "Broken quantization ranges: " << filename;
+    return ranges;
+}
+
+void QuantizeOps(const QuantizationRanges& ranges, Graph* graph) {
+    Quantizer quantizer(ranges, graph);
+    quantizer.Run();
+}
+
+}  // namespace chainer_compiler
@@ -0,0 +1,29 @@
+#pragma once
+
+#include <map>
+#include <string>
+
+namespace chainer_compiler {
+
+class Graph;
+
+// The range of a float tensor observed in calibration.
+struct QuantizationRange {
+    float min;
+    float max;
+};
+
+typedef std::map<std::string, QuantizationRange> QuantizationRanges;
+
+// Reads ranges written by python/quantization.py. Each line of the
+// file is "<value name> <min> <max>".
+QuantizationRanges ReadQuantizationRanges(const std::string& filename);
+
+// Rewrites Conv, Gemm, MatMul, and ChainerLinear with constant weights
+// and calibrated inputs to int8 ops with int32 accumulators.
+// Quantization is symmetric and per-tensor. Consecutive quantized ops
+// exchange int8 tensors by `ChainerRequantize`. This is only for
+// inference.
+void QuantizeOps(const QuantizationRanges& ranges, Graph* graph);
+
+}  // namespace chainer_compiler
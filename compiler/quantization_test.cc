@@ -0,0 +1,72 @@
+#include <gtest/gtest.h>
+
+#include <common/log.h>
+#include <compiler/graph.h>
+#include <compiler/graph_builder.h>
+#include <compiler/node.h>
+#include <compiler/quantization.h>
+#include <compiler/tensor.h>
+#include <compiler/type.h>
+#include <compiler/value.h>
+
+namespace chainer_compiler {
+namespace {
+
+TEST(QuantizationTest, ConvReluConv) {
+    Graph graph("test");
+    Value* x = graph.AddInputValue("x", Type(Dtype::kFloat32, {1, 1, 2, 2}));
+    Value* y = graph.AddOutputValue("y", Type(Dtype::kFloat32, {1, 2, 2, 2}));
+    Value* r;
+    {
+        GraphBuilder gb(&graph, "test", y);
+        Value* w0 = gb.Const(Type(Dtype::kFloat32, {2, 1, 1, 1}), {0.25, -1.0});
+        Value* b0 = gb.Const(Type(Dtype::kFloat32, {2}), {0.3, 0.0});
+        Value* h = gb.Op(Node::kConv, {x, w0, b0});
+        h->set_type(new Type(Dtype::kFloat32, {1, 2, 2, 2}));
+        r = gb.Op(Node::kRelu, {h});
+        r->set_type(new Type(Dtype::kFloat32, {1, 2, 2, 2}));
+        Value* w1 = gb.Const(Type(Dtype::kFloat32, {2, 2, 1, 1}), {1.0, 2.0, 3.0, 4.0});
+        gb.Op(Node::kConv, {r, w1}, y);
+    }
+
+    QuantizationRanges ranges;
+    ranges[x->name()] = QuantizationRange{-2.54, 1.0};
+    ranges[r->name()] = QuantizationRange{0.0, 12.7};
+    QuantizeOps(ranges, &graph);
+
+    // y = Dequantize(ConvInteger(Requantize(ConvInteger(Quantize(x)))))
+    Node* dequantize = y->producer();
+    ASSERT_EQ(Node::kChainerDequantizeLinear, dequantize->op_type());
+    Node* conv1 = dequantize->input(0)->producer();
+    ASSERT_EQ(Node::kChainerConvInteger, conv1->op_type());
+    ASSERT_EQ(2, conv1->inputs().size());
+    EXPECT_FLOAT_EQ(0.1 * 4.0 / 127, dequantize->scale());
+
+    Node* requantize = conv1->input(0)->producer();
+    ASSERT_EQ(Node::kChainerRequantize, requantize->op_type());
+    EXPECT_TRUE(requantize->relu());
+    Node* conv0 = requantize->input(0)->producer();
+    ASSERT_EQ(Node::kChainerConvInteger, conv0->op_type());
+    // (x_scale * w_scale) / r_scale
+    EXPECT_FLOAT_EQ(0.02 * (1.0 / 127) / 0.1, requantize->scale());
+
+    Node* quantize = conv0->input(0)->producer();
+    ASSERT_EQ(Node::kChainerQuantizeLinear, quantize->op_type());
+    EXPECT_EQ(x, quantize->input(0));
+    EXPECT_FLOAT_EQ(0.02, quantize->scale());
+
+    // Weights and biases are quantized at compile time.
+    ASSERT_EQ(3, conv0->inputs().size());
+    const Tensor& qw0 = *conv0->input(1)->producer()->tensor_value();
+    EXPECT_EQ(Dtype::kInt8, qw0.dtype());
+    EXPECT_EQ(32, qw0.Get<int8_t>(0));
+    EXPECT_EQ(-127, qw0.Get<int8_t>(1));
+    const Tensor& qb0 = *conv0->input(2)->producer()->tensor_value();
+    EXPECT_EQ(Dtype::kInt32, qb0.dtype());
+    // round(0.3 / (0.02 / 127))
+    EXPECT_EQ(1905, qb0.Get<int32_t>(0));
+    EXPECT_EQ(0, qb0.Get<int32_t>(1));
+}
+
+}  // namespace
+}  // namespace chainer_compiler
@@ -5,8 +5,12 @@
 #include <iterator>
 #include <map>
 #include <queue>
+#include <set>
+#include <tuple>
+#include <unordered_map>
 #include <vector>
 
+#include <compiler/flags.h>
 #include <compiler/graph.h>
 #include <compiler/log.h>
 #include <compiler/node.h>
@@ -102,6 +106,54 @@ std::vector<Node*> DelaySimpleNodes(const std::vector<Node*>& nodes_in) {
     return reordered;
 }
 
+bool IsOptimizerUpdate(const Node* node) {
+    switch (node->op_type()) {
+        case Node::kChainerSGDUpdate:
+        case Node::kChainerMomentumSGDUpdate:
+        case Node::kChainerAdamUpdate:
+            return true;
+        default:
+            return false;
+    }
+}
+
+// Optimizer updates overwrite parameters and optimizer states in
+// place, so they are delayed until all other users of them run. The
+// gradient (the second input) and the learning rate (the last input)
+// are not overwritten.
+std::vector<Node*> DelayOptimizerUpdates(const std::vector<Node*>& nodes_in) {
+    std::vector<std::vector<Node*>> nodes;
+    std::map<Node*, size_t> node_to_index;
+    for (size_t i = 0; i < nodes_in.size(); ++i) {
+        nodes.push_back({nodes_in[i]});
+        CHECK(node_to_index.emplace(nodes_in[i], i).second);
+    }
+
+    for (size_t i = 0; i < nodes_in.size(); ++i) {
+        Node* node = nodes_in[i];
+        if (!IsOptimizerUpdate(node)) continue;
+        size_t to = i;
+        for (size_t j = 0; j < node->inputs().size() - 1; ++j) {
+            if (j == 1) continue;
+            for (Node* user : node->input(j)->users()) {
+                auto found = node_to_index.find(user);
+                if (found == node_to_index.end()) continue;
+                to = std::max(to, found->second);
+            }
+        }
+        if (to == i) continue;
+        CLOG() << "Delayed: from " << i << " to " << to << " " << node->ToString() << std::endl;
+        nodes[i].clear();
+        nodes[to].push_back(node);
+    }
+
+    std::vector<Node*> reordered;
+    for (const std::vector<Node*>& ns : nodes) {
+        std::copy(ns.begin(), ns.end(), std::back_inserter(reordered));
+    }
+    return reordered;
+}
+
 // A simple topological sort.
 std::vector<Node*> ScheduleNaively(const Graph& graph, const std::vector<Value*>& input_values, const std::vector<Value*>& output_values) {
     std::map<Node*, int> input_counts = graph.GetNecessaryNodesAndInputCounts(output_values);
@@ -199,6 +251,258 @@ std::vector<Node*> ScheduleGreedy(const Graph& graph, const std::vector<Value*>&
     return nodes;
 }
 
+// A list scheduler which uses the simulated memory usage as its
+// objective. Each step schedules a ready node which keeps the peak
+// lowest, preferring nodes which free more memory. With a beam width
+// larger than one, the best `beam_width` partial schedules are kept.
+//
+// SimulateMemoryUsage works only for a complete schedule stored in a
+// graph, so partial schedules are scored by an incremental model of
+// the same rules: outputs are allocated before inputs are freed,
+// parameters are never freed, and values of unknown sizes are
+// ignored. Unlike SimulateMemoryUsage, outputs without users are
+// freed right after their producers run.
+class MemoryAwareScheduler {
+public:
+    MemoryAwareScheduler(const Graph& graph, const std::vector<Value*>& input_values, const std::vector<Value*>& output_values)
+        : input_values_(input_values) {
+        std::map<Node*, int> input_counts = graph.GetNecessaryNodesAndInputCounts(output_values);
+        // Use the order in the graph for determinism.
+        for (Node* node : graph.nodes()) {
+            auto found = input_counts.find(node);
+            if (found == input_counts.end()) continue;
+            node_ids_.emplace(node, nodes_.size());
+            nodes_.push_back(node);
+            initial_input_counts_.push_back(found->second);
+        }
+
+        std::set<const Value*> persistent(output_values.begin(), output_values.end());
+        for (Node* node : nodes_) {
+            std::vector<std::pair<int, int>> inputs;
+            for (Value* value : node->inputs()) {
+                if (value->IsNull()) continue;
+                int id = GetValueId(value);
+                ++initial_num_uses_[id];
+                auto found = std::find_if(inputs.begin(), inputs.end(), [id](const std::pair<int, int>& p) { return p.first == id; });
+                if (found == inputs.end()) {
+                    inputs.emplace_back(id, 1);
+                } else {
+                    ++found->second;
+                }
+            }
+            node_inputs_.push_back(inputs);
+
+            std::vector<int> outputs;
+            int64_t output_bytes = 0;
+            for (Value* value : node->outputs()) {
+                if (value->IsNull()) continue;
+                int id = GetValueId(value);
+                outputs.push_back(id);
+                output_bytes += bytes_[id];
+            }
+            node_outputs_.push_back(outputs);
+            node_output_bytes_.push_back(output_bytes);
+        }
+
+        for (size_t i = 0; i < values_.size(); ++i) {
+            const Value* value = values_[i];
+            if (persistent.count(value) || value->IsOutput() || value->initializer()) {
+                // Never freed.
+                ++initial_num_uses_[i];
+            }
+        }
+    }
+
+    std::vector<Node*> Schedule(int beam_width) {
+        std::vector<State> states(1, InitialState());
+        // Schedule nodes which are already schedulable (e.g., Constant).
+        for (size_t n = 0; n < nodes_.size(); ++n) {
+            if (initial_input_counts_[n] == 0) states[0].ready.push_back(n);
+        }
+        for (const Value* value : input_values_) {
+            MakeValueReady(&states[0], value);
+        }
+        ScheduleAlreadyScheduledNodes(&states[0]);
+
+        while (true) {
+            // (peak, memory usage, state index, node index). A
+            // negative node index means the state is complete.
+            std::vector<std::tuple<int64_t, int64_t, int, int>> candidates;
+            bool has_incomplete = false;
+            for (size_t i = 0; i < states.size(); ++i) {
+                const State& state = states[i];
+                if (state.ready.empty()) {
+                    candidates.emplace_back(state.peak, state.mem, i, -1);
+                    continue;
+                }
+                has_incomplete = true;
+                for (int n : state.ready) {
+                    int64_t mem_after;
+                    int64_t peak = std::max(state.peak, Estimate(state, n, &mem_after));
+                    candidates.emplace_back(peak, mem_after, i, n);
+                }
+            }
+            if (!has_incomplete) break;
+
+            const size_t num_survivors = std::min<size_t>(std::max(beam_width, 1), candidates.size());
+            std::partial_sort(candidates.begin(), candidates.begin() + num_survivors, candidates.end());
+            std::vector<State> next_states;
+            for (size_t i = 0; i < num_survivors; ++i) {
+                int state_index = std::get<2>(candidates[i]);
+                int n = std::get<3>(candidates[i]);
+                next_states.push_back(states[state_index]);
+                if (n >= 0) {
+                    State* state = &next_states.back();
+                    ScheduleNode(state, n);
+                    ScheduleAlreadyScheduledNodes(state);
+                }
+            }
+            states.swap(next_states);
+        }
+
+        const State& best = *std::min_element(states.begin(), states.end(), [](const State& a, const State& b) {
+            return std::make_tuple(a.peak, a.mem) < std::make_tuple(b.peak, b.mem);
+        });
+        std::vector<Node*> nodes;
+        for (int n : best.scheduled) {
+            if (nodes_[n]->chainer_order() < 0) nodes.push_back(nodes_[n]);
+        }
+        return nodes;
+    }
+
+    // Returns the simulated peak memory usage when `nodes` are run in
+    // this order.
+    int64_t SimulatePeak(const std::vector<Node*>& nodes) {
+        State state = InitialState();
+        for (Node* node : nodes) {
+            auto found = node_ids_.find(node);
+            CHECK(found != node_ids_.end());
+            int64_t mem_after;
+            state.peak = std::max(state.peak, Estimate(state, found->second, &mem_after));
+            Consume(&state, found->second);
+            state.mem = mem_after;
+        }
+        return state.peak;
+    }
+
+private:
+    struct State {
+        std::vector<int> input_counts;
+        std::vector<int> num_uses;
+        std::vector<int> ready;
+        std::vector<int> scheduled;
+        int64_t mem;
+        int64_t peak;
+    };
+
+    int GetValueId(Value* value) {
+        auto p = value_ids_.emplace(value, values_.size());
+        if (p.second) {
+            values_.push_back(value);
+            bytes_.push_back(std::max<int64_t>(0, value->GetNBytes()));
+            initial_num_uses_.push_back(0);
+        }
+        return p.first->second;
+    }
+
+    State InitialState() const {
+        State state;
+        state.input_counts = initial_input_counts_;
+        state.num_uses = initial_num_uses_;
+        state.mem = 0;
+        for (const Value* value : input_values_) {
+            auto found = value_ids_.find(value);
+            if (found != value_ids_.end()) state.mem += bytes_[found->second];
+        }
+        state.peak = state.mem;
+        return state;
+    }
+
+    // Returns the memory usage while `n` runs and sets the one after
+    // `n` runs to `mem_after`.
+    int64_t Estimate(const State& state, int n, int64_t* mem_after) const {
+        const int64_t mem = state.mem + node_output_bytes_[n];
+        *mem_after = mem;
+        for (const std::pair<int, int>& p : node_inputs_[n]) {
+            if (state.num_uses[p.first] == p.second) *mem_after -= bytes_[p.first];
+        }
+        for (int id : node_outputs_[n]) {
+            if (state.num_uses[id] == 0) *mem_after -= bytes_[id];
+        }
+        return mem;
+    }
+
+    void Consume(State* state, int n) const {
+        for (const std::pair<int, int>& p : node_inputs_[n]) {
+            state->num_uses[p.first] -= p.second;
+            CHECK_LE(0, state->num_uses[p.first]) << nodes_[n]->ToString();
+        }
+    }
+
+    void ScheduleNode(State* state, int n) {
+        int64_t mem_after;
+        state->peak = std::max(state->peak, Estimate(*state, n, &mem_after));
+        state->mem = mem_after;
+        Consume(state, n);
+        state->ready.erase(std::find(state->ready.begin(), state->ready.end(), n));
+        state->scheduled.push_back(n);
+        for (Value* value : nodes_[n]->outputs()) {
+            MakeValueReady(state, value);
+        }
+    }
+
+    // Nodes which were scheduled by a previous call of
+    // ScheduleComputation are run as soon as they become ready.
+    void ScheduleAlreadyScheduledNodes(State* state) {
+        while (true) {
+            auto found = std::find_if(state->ready.begin(), state->ready.end(), [this](int n) { return nodes_[n]->chainer_order() >= 0; });
+            if (found == state->ready.end()) break;
+            ScheduleNode(state, *found);
+        }
+    }
+
+    void MakeValueReady(State* state, const Value* value) const {
+        if (value->IsNull()) return;
+        for (Node* node : value->users()) {
+            auto found = node_ids_.find(node);
+            if (found == node_ids_.end()) continue;
+            int cnt = --state->input_counts[found->second];
+            CHECK_LE(0, cnt) << node->ToString();
+            if (cnt != 0) continue;
+            state->ready.push_back(found->second);
+        }
+    }
+
+    const std::vector<Value*> input_values_;
+
+    std::vector<Node*> nodes_;
+    std::unordered_map<const Node*, int> node_ids_;
+    std::vector<int> initial_input_counts_;
+    std::vector<std::vector<std::pair<int, int>>> node_inputs_;
+    std::vector<std::vector<int>> node_outputs_;
+    std::vector<int64_t> node_output_bytes_;
+
+    std::vector<const Value*> values_;
+    std::unordered_map<const Value*, int> value_ids_;
+    std::vector<int64_t> bytes_;
+    std::vector<int> initial_num_uses_;
+};
+
+std::vector<Node*> ScheduleMemoryAware(
+        const Graph& graph, const std::vector<Value*>& input_values, const std::vector<Value*>& output_values) {
+    MemoryAwareScheduler scheduler(graph, input_values, output_values);
+    std::vector<Node*> nodes = scheduler.Schedule(g_scheduler_beam_width);
+
+    // Fall back to the greedy scheduler if it happens to be better.
+    std::vector<Node*> greedy_nodes = ScheduleGreedy(graph, input_values, output_values);
+    const int64_t greedy_peak = scheduler.SimulatePeak(greedy_nodes);
+    const int64_t peak = scheduler.SimulatePeak(nodes);
+    CLOG() << "Memory-aware scheduling (" << graph.name() << "): estimated peak " << greedy_peak / 1000 / 1000 << "MB => "
+           << peak / 1000 / 1000 << "MB" << std::endl;
+    if (greedy_peak < peak) return greedy_nodes;
+    return nodes;
+}
+
 void CheckSanity(
         const Graph& graph,
         const std::vector<Value*>& input_values,
@@ -236,6 +540,14 @@ void CheckSanity(
 
 }  // namespace
 
+SchedulerType GetSchedulerType(const std::string& name) {
+    if (name.empty() || name == "greedy") return SchedulerType::kGreedy;
+    if (name == "naive") return SchedulerType::kNaive;
+    if (name == "memory") return SchedulerType::kMemory;
+    CHECK(false) << "Unknown scheduler: " << name;
+    return SchedulerType::kGreedy;
+}
+
 int64_t ScheduleComputation(
         const Graph& graph,
         const std::vector<Value*>& input_values,
@@ -250,8 +562,13 @@ int64_t ScheduleComputation(
         case SchedulerType::kGreedy:
             nodes = ScheduleGreedy(graph, input_values, output_values);
             break;
+        case SchedulerType::kMemory:
+            nodes = ScheduleMemoryAware(graph, input_values, output_values);
+            break;
     }
 
+    nodes = DelayOptimizerUpdates(nodes);
+
     CheckSanity(graph, input_values, output_values, nodes);
 
     for (Node* node : nodes) {
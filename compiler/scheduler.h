@@ -1,4 +1,5 @@
 #include <stdint.h>
+#include <string>
 #include <vector>
 
 namespace chainer_compiler {
@@ -9,8 +10,15 @@ class Value;
 enum class SchedulerType {
     kNaive,
     kGreedy,
+    // A list scheduler which minimizes the simulated peak memory
+    // usage. Beam search is used when `g_scheduler_beam_width` > 1.
+    kMemory,
 };
 
+// Returns the scheduler for `--scheduler`. The empty string means
+// the default scheduler.
+SchedulerType GetSchedulerType(const std::string& name);
+
 int64_t ScheduleComputation(
         const Graph& graph,
         const std::vector<Value*>& input_values,
@@ -4,8 +4,11 @@
 
 #include <common/log.h>
 #include <compiler/graph.h>
+#include <compiler/memory_simulator.h>
 #include <compiler/node.h>
 #include <compiler/scheduler.h>
+#include <compiler/type.h>
+#include <compiler/value.h>
 
 namespace chainer_compiler {
 namespace {
@@ -94,7 +97,60 @@ TEST_P(SchedulerTest, MultipleTimes) {
     EXPECT_EQ(2, n3->chainer_order());
 }
 
-INSTANTIATE_TEST_CASE_P(ForEachScheduler, SchedulerTest, ::testing::Values(SchedulerType::kNaive, SchedulerType::kGreedy));
+TEST_P(SchedulerTest, Constant) {
+    Graph graph("test");
+    Value* in = graph.AddInputValue("in", Type(Dtype::kFloat32, {2}));
+    Value* out = graph.AddOutputValue("out", Type(Dtype::kFloat32, {2}));
+    Value* shape = graph.AddValue("shape", Type(Dtype::kInt64, {1}));
+    Value* tmp = graph.AddValue("tmp", Type(Dtype::kFloat32, {2}));
+
+    // A node without inputs and its users must be scheduled.
+    Node* n1 = graph.AddNode(Node::kConstant, {}, {shape});
+    Node* n2 = graph.AddNode(Node::kReshape, {in, shape}, {tmp});
+    Node* n3 = graph.AddNode(Node::kIdentity, {tmp}, {out});
+
+    ScheduleComputation(graph, 0, GetParam());
+
+    const std::vector<const Node*> nodes(graph.GetComputationSequence());
+    ASSERT_EQ(3UL, nodes.size());
+    EXPECT_EQ(n1, nodes[0]);
+    EXPECT_EQ(n2, nodes[1]);
+    EXPECT_EQ(n3, nodes[2]);
+}
+
+INSTANTIATE_TEST_CASE_P(
+        ForEachScheduler, SchedulerTest, ::testing::Values(SchedulerType::kNaive, SchedulerType::kGreedy, SchedulerType::kMemory));
+
+TEST(MemorySchedulerTest, FinishBranchFirst) {
+    Graph graph("test");
+    Value* in = graph.AddInputValue("in", Type(Dtype::kFloat32, {1}));
+    Value* out = graph.AddOutputValue("out", Type(Dtype::kFloat32, {1}));
+    Value* big1 = graph.AddValue("big1", Type(Dtype::kFloat32, {1000}));
+    Value* big2 = graph.AddValue("big2", Type(Dtype::kFloat32, {1000}));
+    Value* small1 = graph.AddValue("small1", Type(Dtype::kFloat32, {1}));
+    Value* small2 = graph.AddValue("small2", Type(Dtype::kFloat32, {1}));
+
+    // Both big values are alive at the same time unless a branch is
+    // finished before the other starts.
+    Node* n1 = graph.AddNode(Node::kExpand, {in}, {big1});
+    Node* n2 = graph.AddNode(Node::kExpand, {in}, {big2});
+    Node* n3 = graph.AddNode(Node::kReduceSum, {big1}, {small1});
+    Node* n4 = graph.AddNode(Node::kReduceSum, {big2}, {small2});
+    Node* n5 = graph.AddNode(Node::kAdd, {small1, small2}, {out});
+
+    ScheduleComputation(graph, 0, SchedulerType::kMemory);
+
+    const std::vector<const Node*> nodes(graph.GetComputationSequence());
+    ASSERT_EQ(5UL, nodes.size());
+    EXPECT_EQ(n1, nodes[0]);
+    EXPECT_EQ(n3, nodes[1]);
+    EXPECT_EQ(n2, nodes[2]);
+    EXPECT_EQ(n4, nodes[3]);
+    EXPECT_EQ(n5, nodes[4]);
+
+    // Only one of the big values is alive at a time.
+    EXPECT_EQ(4 + 4000 + 4, SimulateMemoryUsage(graph).peak);
+}
 
 }  // namespace
 }  // namespace chainer_compiler
@@ -730,7 +730,7 @@ void Simplify(const CompilerConfig& ccfg, Graph* graph, bool gen_backprop) {
 
     // Replace initializers by `Constant` for better optimization
     // (e.g., Conv+BN fusion).
-    if (!gen_backprop && g_use_ngraph) {
+    if (!gen_backprop && (g_use_ngraph || g_fold_affine_ops)) {
         ReplaceInitializers(graph);
     }
 }
@@ -1,9 +1,16 @@
 #include "compiler/tensor.h"
 
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+#include <cerrno>
 #include <cstdint>
 #include <cstdlib>
 #include <cstring>
 #include <sstream>
+#include <string>
 
 #include <common/log.h>
 #include <compiler/serializer_util.h>
@@ -25,9 +32,7 @@ Tensor::UniqueData LoadDataFromRepeated(const ::google::protobuf::RepeatedField<
 template <typename To>
 Tensor::UniqueData LoadDataFromRawData(const void* data, int64_t num_elements) {
     Tensor::UniqueData p(std::malloc(num_elements * sizeof(To)), &std::free);
-    for (int i = 0; i < num_elements; ++i) {
-        static_cast<To*>(p.get())[i] = reinterpret_cast<const To*>(data)[i];
-    }
+    std::memcpy(p.get(), data, num_elements * sizeof(To));
     return p;
 }
 
@@ -83,6 +88,45 @@ void DumpDataToRepeated(const Tensor& t, ::google::protobuf::RepeatedField<To>*
     DumpDataToRepeated<To, To>(t, a);
 }
 
+// Maps the external data of `xtensor` into memory. Pages are copied
+// only when they are written, so the file is never modified.
+std::shared_ptr<void> MapExternalData(const onnx::TensorProto& xtensor, int64_t nbytes) {
+    std::string location;
+    int64_t offset = 0;
+    int64_t length = -1;
+    for (const onnx::StringStringEntryProto& entry : xtensor.external_data()) {
+        if (entry.key() == "location") {
+            location = entry.value();
+        } else if (entry.key() == "offset") {
+            offset = std::stoll(entry.value());
+        } else if (entry.key() == "length") {
+            length = std::stoll(entry.value());
+        }
+    }
+    CHECK(!location.empty()) << "No location for external data of " << xtensor.name();
+    if (length >= 0) {
+        CHECK_EQ(nbytes, length) << "Invalid length of external data of " << xtensor.name();
+    }
+    if (nbytes == 0) {
+        return std::shared_ptr<void>(std::malloc(1), &std::free);
+    }
+
+    int fd = open(location.c_str(), O_RDONLY);
+    CHECK_LE(0, fd) << "Failed to open " << location << ": " << strerror(errno);
+    struct stat st;
+    CHECK_EQ(0, fstat(fd, &st)) << "Failed to stat " << location << ": " << strerror(errno);
+    CHECK_LE(offset + nbytes, st.st_size) << "External data of " << xtensor.name() << " exceeds " << location;
+
+    // The offset of mmap must be a multiple of the page size.
+    const int64_t page_size = sysconf(_SC_PAGESIZE);
+    const int64_t map_offset = offset / page_size * page_size;
+    const size_t map_size = nbytes + offset - map_offset;
+    void* addr = mmap(nullptr, map_size, PROT_READ | PROT_WRITE, MAP_PRIVATE, fd, map_offset);
+    CHECK(addr != MAP_FAILED) << "Failed to mmap " << location << ": " << strerror(errno);
+    close(fd);
+    return std::shared_ptr<void>(static_cast<char*>(addr) + offset - map_offset, [addr, map_size](void*) { munmap(addr, map_size); });
+}
+
 }  // namespace
 
 Tensor::Tensor(const onnx::TensorProto& xtensor)
@@ -93,7 +137,10 @@ Tensor::Tensor(const onnx::TensorProto& xtensor)
       doc_string_(xtensor.doc_string()) {
     CHECK(!xtensor.has_segment()) << "Segmented TensorProto not supported";
 
-    if (xtensor.has_raw_data()) {
+    if (xtensor.data_location() == onnx::TensorProto::EXTERNAL) {
+        CHECK_LE(0, NumElements()) << "Unknown shape of external data: " << name_;
+        data_ = MapExternalData(xtensor, NumElements() * ElementSize());
+    } else if (xtensor.has_raw_data()) {
         CHECK_EQ(0, xtensor.float_data_size());
         CHECK_EQ(0, xtensor.int32_data_size());
         CHECK_EQ(0, xtensor.string_data_size());
@@ -103,31 +150,31 @@ Tensor::Tensor(const onnx::TensorProto& xtensor)
 
         switch (dtype_) {
             case Dtype::kBool:
-                data_.reset(LoadDataFromRawData<bool>(xtensor.raw_data(), NumElements()).release());
+                data_ = LoadDataFromRawData<bool>(xtensor.raw_data(), NumElements());
                 break;
             case Dtype::kInt8:
-                data_.reset(LoadDataFromRawData<int8_t>(xtensor.raw_data(), NumElements()).release());
+                data_ = LoadDataFromRawData<int8_t>(xtensor.raw_data(), NumElements());
                 break;
             case Dtype::kInt16:
-                data_.reset(LoadDataFromRawData<int16_t>(xtensor.raw_data(), NumElements()).release());
+                data_ = LoadDataFromRawData<int16_t>(xtensor.raw_data(), NumElements());
                 break;
             case Dtype::kInt32:
-                data_.reset(LoadDataFromRawData<int32_t>(xtensor.raw_data(), NumElements()).release());
+                data_ = LoadDataFromRawData<int32_t>(xtensor.raw_data(), NumElements());
                 break;
             case Dtype::kInt64:
-                data_.reset(LoadDataFromRawData<int64_t>(xtensor.raw_data(), NumElements()).release());
+                data_ = LoadDataFromRawData<int64_t>(xtensor.raw_data(), NumElements());
                 break;
             case Dtype::kUInt8:
-                data_.reset(LoadDataFromRawData<uint8_t>(xtensor.raw_data(), NumElements()).release());
+                data_ = LoadDataFromRawData<uint8_t>(xtensor.raw_data(), NumElements());
                 break;
             case Dtype::kFloat16:
-                data_.reset(LoadDataFromRawData<int16_t>(xtensor.raw_data(), NumElements()).release());
+                data_ = LoadDataFromRawData<int16_t>(xtensor.raw_data(), NumElements());
                 break;
             case Dtype::kFloat32:
-                data_.reset(LoadDataFromRawData<float>(xtensor.raw_data(), NumElements()).release());
+                data_ = LoadDataFromRawData<float>(xtensor.raw_data(), NumElements());
                 break;
             case Dtype::kFloat64:
-                data_.reset(LoadDataFromRawData<double>(xtensor.raw_data(), NumElements()).release());
+                data_ = LoadDataFromRawData<double>(xtensor.raw_data(), NumElements());
                 break;
             default:
                 CHECK(false) << "Unknown data type: " << dtype_.ToString();
@@ -135,28 +182,31 @@ Tensor::Tensor(const onnx::TensorProto& xtensor)
     } else {
         switch (dtype_) {
             case Dtype::kBool:
-                data_.reset(LoadDataFromRepeated<int32_t, bool>(xtensor.int32_data()).release());
+                data_ = LoadDataFromRepeated<int32_t, bool>(xtensor.int32_data());
                 break;
             case Dtype::kInt8:
-                data_.reset(LoadDataFromRepeated<int32_t, int8_t>(xtensor.int32_data()).release());
+                data_ = LoadDataFromRepeated<int32_t, int8_t>(xtensor.int32_data());
                 break;
             case Dtype::kInt16:
-                data_.reset(LoadDataFromRepeated<int32_t, int16_t>(xtensor.int32_data()).release());
+                data_ = LoadDataFromRepeated<int32_t, int16_t>(xtensor.int32_data());
                 break;
             case Dtype::kInt32:
-                data_.reset(LoadDataFromRepeated<int32_t, int32_t>(xtensor.int32_data()).release());
+                data_ = LoadDataFromRepeated<int32_t, int32_t>(xtensor.int32_data());
                 break;
             case Dtype::kInt64:
-                data_.reset(LoadDataFromRepeated<int64_t, int64_t>(xtensor.int64_data()).release());
+                data_ = LoadDataFromRepeated<int64_t, int64_t>(xtensor.int64_data());
                 break;
             case Dtype::kUInt8:
-                data_.reset(LoadDataFromRepeated<int32_t, uint8_t>(xtensor.int32_data()).release());
+                data_ = LoadDataFromRepeated<int32_t, uint8_t>(xtensor.int32_data());
+                break;
+            case Dtype::kFloat16:
+                data_ = LoadDataFromRepeated<int32_t, uint16_t>(xtensor.int32_data());
                 break;
             case Dtype::kFloat32:
-                data_.reset(LoadDataFromRepeated<float, float>(xtensor.float_data()).release());
+                data_ = LoadDataFromRepeated<float, float>(xtensor.float_data());
                 break;
             case Dtype::kFloat64:
-                data_.reset(LoadDataFromRepeated<double, double>(xtensor.double_data()).release());
+                data_ = LoadDataFromRepeated<double, double>(xtensor.double_data());
                 break;
             default:
                 CHECK(false) << "Unknown data type: " << dtype_.ToString();
@@ -168,15 +218,24 @@ Tensor::Tensor(const std::string& name, Dtype dtype, const std::vector<int64_t>&
     : dims_(dims), dtype_(dtype), data_(data, &std::free), name_(name), doc_string_() {
 }
 
+Tensor::Tensor(const std::string& name, Dtype dtype, const std::vector<int64_t>& dims, std::shared_ptr<void> data)
+    : dims_(dims), dtype_(dtype), data_(data), name_(name), doc_string_() {
+}
+
 Tensor::~Tensor() {
 }
 
-void Tensor::ToONNX(onnx::TensorProto* xtensor) const {
+void Tensor::ToONNX(onnx::TensorProto* xtensor, bool use_raw_data) const {
     for (int64_t d : dims_) xtensor->add_dims(d);
     xtensor->set_data_type(dtype_.ToONNX());
     DUMP_STRING(xtensor, name);
     DUMP_STRING(xtensor, doc_string);
 
+    if (use_raw_data) {
+        xtensor->set_raw_data(data_.get(), ElementSize() * NumElements());
+        return;
+    }
+
     switch (dtype_) {
         case Dtype::kBool:
             DumpDataToRepeated<bool, int>(*this, xtensor->mutable_int32_data());
@@ -196,6 +255,9 @@ void Tensor::ToONNX(onnx::TensorProto* xtensor) const {
         case Dtype::kUInt8:
             DumpDataToRepeated<uint8_t, int>(*this, xtensor->mutable_int32_data());
             break;
+        case Dtype::kFloat16:
+            DumpDataToRepeated<uint16_t, int>(*this, xtensor->mutable_int32_data());
+            break;
         case Dtype::kFloat32:
             DumpDataToRepeated(*this, xtensor->mutable_float_data());
             break;
@@ -209,7 +271,7 @@ void Tensor::ToONNX(onnx::TensorProto* xtensor) const {
 
 std::string Tensor::DebugString() const {
     onnx::TensorProto xtensor;
-    ToONNX(&xtensor);
+    ToONNX(&xtensor, false /* use_raw_data */);
     return xtensor.DebugString();
 }
 
@@ -30,13 +30,17 @@ public:
     }
     // Takes the ownership of `data`.
     Tensor(const std::string& name, Dtype dtype, const std::vector<int64_t>& dims, void* data);
+    // Shares the ownership of `data`.
+    Tensor(const std::string& name, Dtype dtype, const std::vector<int64_t>& dims, std::shared_ptr<void> data);
 
     Tensor(const Tensor&) = delete;
     Tensor& operator=(const Tensor&) = delete;
 
     Tensor(const std::string& name, const Tensor& t);
 
-    void ToONNX(onnx::TensorProto* xtensor) const;
+    // Elements are stored in `raw_data` unless `use_raw_data` is
+    // false, which is slower but human readable.
+    void ToONNX(onnx::TensorProto* xtensor, bool use_raw_data = true) const;
     std::string DebugString() const;
 
     const std::vector<int64_t> dims() const {
@@ -65,10 +69,17 @@ public:
         return data_.get();
     }
 
+    // Returns the data which may outlive this tensor. Tensors loaded
+    // from ONNX external data are backed by copy-on-write mappings of
+    // the files, so sharing them does not copy the data.
+    std::shared_ptr<void> GetSharedData() const {
+        return data_;
+    }
+
 private:
     std::vector<int64_t> dims_;
     Dtype dtype_;
-    UniqueData data_;
+    std::shared_ptr<void> data_;
     std::string name_;
     std::string doc_string_;
 };
@@ -1,11 +1,18 @@
+#include <cstdio>
+#include <fstream>
 #include <string>
+#include <vector>
 
 #include <gtest/gtest.h>
 
 #include <common/log.h>
 #include <common/protoutil.h>
 #include <compiler/dtype.h>
+#include <compiler/graph.h>
+#include <compiler/node.h>
 #include <compiler/tensor.h>
+#include <compiler/type.h>
+#include <compiler/value.h>
 
 namespace chainer_compiler {
 namespace {
@@ -43,5 +50,88 @@ TEST(TensorTest, Constructor) {
     }
 }
 
+TEST(TensorTest, ExternalData) {
+    const std::string filename = "/tmp/tensor_test_external_data.bin";
+    const float values[] = {2.0f, 3.0f, 5.0f};
+    {
+        std::ofstream ofs(filename, std::ios::binary);
+        ofs.write("abc", 3);
+        ofs.write(reinterpret_cast<const char*>(values), sizeof(values));
+    }
+
+    onnx::TensorProto xtensor;
+    xtensor.set_name("foo");
+    xtensor.set_data_type(onnx::TensorProto::FLOAT);
+    xtensor.add_dims(3);
+    xtensor.set_data_location(onnx::TensorProto::EXTERNAL);
+    auto add_entry = [&xtensor](const std::string& key, const std::string& value) {
+        onnx::StringStringEntryProto* entry = xtensor.add_external_data();
+        entry->set_key(key);
+        entry->set_value(value);
+    };
+    add_entry("location", filename);
+    add_entry("offset", "3");
+    add_entry("length", std::to_string(sizeof(values)));
+
+    std::shared_ptr<void> data;
+    {
+        Tensor tensor(xtensor);
+        EXPECT_EQ(Dtype::kFloat32, tensor.dtype());
+        EXPECT_EQ(2.0, tensor.Get<float>(0));
+        EXPECT_EQ(3.0, tensor.Get<float>(1));
+        EXPECT_EQ(5.0, tensor.Get<float>(2));
+        data = tensor.GetSharedData();
+        EXPECT_EQ(tensor.GetRawData(), data.get());
+    }
+    // The data outlives the tensor and writes do not reach the file.
+    static_cast<float*>(data.get())[0] = 7.0f;
+    EXPECT_EQ(7.0f, static_cast<float*>(data.get())[0]);
+    EXPECT_EQ(2.0, Tensor(xtensor).Get<float>(0));
+    std::remove(filename.c_str());
+}
+
+TEST(TensorTest, ExternalDataAfterInferShapes) {
+    const std::string filename = "/tmp/tensor_test_external_data_infer.bin";
+    const std::vector<float> values(100, 3.0f);
+    {
+        std::ofstream ofs(filename, std::ios::binary);
+        ofs.write(reinterpret_cast<const char*>(values.data()), values.size() * sizeof(float));
+    }
+
+    onnx::TensorProto xtensor;
+    xtensor.set_name("w");
+    xtensor.set_data_type(onnx::TensorProto::FLOAT);
+    xtensor.add_dims(values.size());
+    xtensor.set_data_location(onnx::TensorProto::EXTERNAL);
+    onnx::StringStringEntryProto* entry = xtensor.add_external_data();
+    entry->set_key("location");
+    entry->set_value(filename);
+
+    Graph graph("graph");
+    Value* w = graph.AddInputValue("w", Type(Dtype::kFloat32, {static_cast<int64_t>(values.size())}));
+    w->ResetInitializer(std::unique_ptr<Tensor>(new Tensor(xtensor)));
+    const void* mapped = w->initializer()->GetRawData();
+    Value* t = graph.AddValue("t");
+    graph.AddNode(Node::kIdentity, {w}, {t});
+    graph.AddNode(Node::kIdentity, {t}, {graph.AddOutputValue("y", Type(Dtype::kFloat32))});
+
+    graph.InferShapes();
+
+    // LoadParams shares the memory of the initializer, which must be
+    // still the mapped one.
+    ASSERT_EQ(1, graph.input_values().size());
+    const Tensor* initializer = graph.input_values()[0]->initializer();
+    ASSERT_TRUE(initializer);
+    EXPECT_EQ(mapped, initializer->GetSharedData().get());
+    bool found = false;
+    for (const Value* value : graph.temp_values()) {
+        if (value->name() != "t") continue;
+        found = true;
+        EXPECT_EQ(std::vector<int64_t>({100}), value->type().dims());
+    }
+    EXPECT_TRUE(found);
+    std::remove(filename.c_str());
+}
+
 }  // namespace
 }  // namespace chainer_compiler
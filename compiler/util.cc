@@ -10,7 +10,7 @@ void MakeHumanReadableValue(onnx::TensorProto* tensor) {
     if (tensor->raw_data().empty()) return;
     Tensor t(*tensor);
     tensor->Clear();
-    t.ToONNX(tensor);
+    t.ToONNX(tensor, false /* use_raw_data */);
 }
 
 void StripLargeValue(onnx::TensorProto* tensor, int num_elements) {
@@ -42,6 +42,7 @@ void StripONNXGraph(onnx::GraphProto* graph) {
             onnx::AttributeProto* attr = node->mutable_attribute(j);
             if (attr->type() == onnx::AttributeProto::TENSOR) {
                 StripLargeValue(attr->mutable_t(), 20);
+                MakeHumanReadableValue(attr->mutable_t());
             } else if (attr->type() == onnx::AttributeProto::GRAPH) {
                 StripONNXGraph(attr->mutable_g());
             }
@@ -53,6 +54,40 @@ void StripONNXModel(onnx::ModelProto* model) {
     StripONNXGraph(model->mutable_graph());
 }
 
+namespace {
+
+void ResolveExternalDataLocation(const std::string& base_dir, onnx::TensorProto* tensor) {
+    if (tensor->data_location() != onnx::TensorProto::EXTERNAL) return;
+    for (onnx::StringStringEntryProto& entry : *tensor->mutable_external_data()) {
+        if (entry.key() == "location" && !entry.value().empty() && entry.value()[0] != '/') {
+            entry.set_value(StrCat(base_dir, '/', entry.value()));
+        }
+    }
+}
+
+void ResolveExternalDataLocationsInGraph(const std::string& base_dir, onnx::GraphProto* graph) {
+    for (onnx::TensorProto& tensor : *graph->mutable_initializer()) {
+        ResolveExternalDataLocation(base_dir, &tensor);
+    }
+    for (onnx::NodeProto& node : *graph->mutable_node()) {
+        for (onnx::AttributeProto& attr : *node.mutable_attribute()) {
+            if (attr.has_t()) ResolveExternalDataLocation(base_dir, attr.mutable_t());
+            if (attr.has_g()) ResolveExternalDataLocationsInGraph(base_dir, attr.mutable_g());
+            for (onnx::GraphProto& subgraph : *attr.mutable_graphs()) {
+                ResolveExternalDataLocationsInGraph(base_dir, &subgraph);
+            }
+        }
+    }
+}
+
+}  // namespace
+
+void ResolveExternalDataLocations(const std::string& model_path, onnx::ModelProto* model) {
+    const size_t slash = model_path.rfind('/');
+    const std::string base_dir = slash == std::string::npos ? "." : model_path.substr(0, slash);
+    ResolveExternalDataLocationsInGraph(base_dir, model->mutable_graph());
+}
+
 std::string CleanseIdent(const std::string& s) {
     std::string o;
     for (char c : s) {
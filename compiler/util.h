@@ -12,6 +12,10 @@ void StripONNXGraph(onnx::GraphProto* graph);
 
 void StripONNXModel(onnx::ModelProto* model);
 
+// Makes locations of external data relative to the directory of
+// `model_path` so tensors can be loaded from any working directory.
+void ResolveExternalDataLocations(const std::string& model_path, onnx::ModelProto* model);
+
 std::string CleanseIdent(const std::string& s);
 
 }  // namespace chainer_compiler
@@ -28,11 +28,14 @@ public:
         CHECK(op_set_.emplace(Node::kBatchNormalization).second);
         CHECK(op_set_.emplace(Node::kCast).second);
         CHECK(op_set_.emplace(Node::kCeil).second);
+        CHECK(op_set_.emplace(Node::kChainerAdamUpdate).second);
         CHECK(op_set_.emplace(Node::kChainerAveragePoolGrad).second);
         CHECK(op_set_.emplace(Node::kChainerAveragePoolGradNoCtx).second);
         CHECK(op_set_.emplace(Node::kChainerBatchNormalizationGrad).second);
         CHECK(op_set_.emplace(Node::kChainerConvGradWeight).second);
+        CHECK(op_set_.emplace(Node::kChainerConvInteger).second);
         CHECK(op_set_.emplace(Node::kChainerConvTransposeWithDynamicOutputShape).second);
+        CHECK(op_set_.emplace(Node::kChainerDequantizeLinear).second);
         CHECK(op_set_.emplace(Node::kChainerDoSomething).second);
         CHECK(op_set_.emplace(Node::kChainerDynamicSliceGrad).second);
         CHECK(op_set_.emplace(Node::kChainerFusionGroup).second);
@@ -48,16 +51,21 @@ public:
         CHECK(op_set_.emplace(Node::kChainerLRNGrad).second);
         CHECK(op_set_.emplace(Node::kChainerLSTMGrad).second);
         CHECK(op_set_.emplace(Node::kChainerMaxPoolGrad).second);
+        CHECK(op_set_.emplace(Node::kChainerMatMulInteger).second);
         CHECK(op_set_.emplace(Node::kChainerMaxPoolGradNoCtx).second);
+        CHECK(op_set_.emplace(Node::kChainerMomentumSGDUpdate).second);
         CHECK(op_set_.emplace(Node::kChainerNullConstant).second);
         CHECK(op_set_.emplace(Node::kChainerPrint).second);
+        CHECK(op_set_.emplace(Node::kChainerQuantizeLinear).second);
         CHECK(op_set_.emplace(Node::kChainerROIAverageAlign2D).second);
         CHECK(op_set_.emplace(Node::kChainerROIAveragePool2D).second);
         CHECK(op_set_.emplace(Node::kChainerROIMaxAlign2D).second);
         CHECK(op_set_.emplace(Node::kChainerROIMaxPool2D).second);
         CHECK(op_set_.emplace(Node::kChainerReduceSumTo).second);
         CHECK(op_set_.emplace(Node::kChainerReluGrad).second);
+        CHECK(op_set_.emplace(Node::kChainerRequantize).second);
         CHECK(op_set_.emplace(Node::kChainerResizeImages).second);
+        CHECK(op_set_.emplace(Node::kChainerSGDUpdate).second);
         CHECK(op_set_.emplace(Node::kChainerSequenceAppend).second);
         CHECK(op_set_.emplace(Node::kChainerSequenceConcat).second);
         CHECK(op_set_.emplace(Node::kChainerSequenceConstants).second);
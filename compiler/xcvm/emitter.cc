@@ -1,9 +1,11 @@
 #include "compiler/xcvm/emitter.h"
 
+#include <algorithm>
 #include <map>
 
 #include <common/log.h>
 #include <common/strutil.h>
+#include <common/thread_pool.h>
 #include <compiler/flags.h>
 #include <compiler/gen_xcvm_codegen.h>
 #include <compiler/graph.h>
@@ -56,12 +58,75 @@ void FillOpInfo(const Node& node, const std::string& debug_info, XCProgramProto*
     inst->set_id(node.chainer_order());
 }
 
+// Code of a fusion group built by TVM, NVRTC, or the CPU code
+// generator. For TVM, `code` is the filename of the shared object.
+struct FusionGroupProgram {
+    std::string code;
+    std::string func_name;
+};
+
+// The CPU code generator supports only float32. Other groups (e.g.,
+// float16 ones by mixed precision) run their subgraphs.
+bool IsFloat32FusionGroup(const Node& node) {
+    for (const std::vector<Value*>* values : {&node.inputs(), &node.outputs()}) {
+        for (const Value* value : *values) {
+            if (value->type().dtype() != Dtype::kFloat32) return false;
+        }
+    }
+    return true;
+}
+
+// Returns the backend which builds code for `node`, or an empty string
+// if the fusion group is emitted in another way.
+std::string GetFusionGroupBuilder(const Node& node) {
+    if (g_use_ngraph && node.fusion_type() == "ngraph") return "";
+    if (g_use_tvm && node.fusion_type() == "tvm") return "tvm";
+    if (g_use_nvrtc && node.fusion_type() == "nvrtc") return "nvrtc";
+    if (g_use_cpu_codegen && node.fusion_type() == "nvrtc" && IsFloat32FusionGroup(node)) return "cpu";
+    return "";
+}
+
+void BuildFusionGroupProgram(const Node& node, FusionGroupProgram* program) {
+    const Graph& body = *node.subgraph();
+    const std::string& builder = GetFusionGroupBuilder(node);
+    if (builder == "tvm") {
+        BuildTVMProgram(
+                body.nodes(),
+                node.chainer_fusion_group(),
+                body.input_values(),
+                body.output_values(),
+                &program->code,
+                &program->func_name);
+    } else if (builder == "nvrtc") {
+        BuildNvrtcProgram(body.nodes(), node.chainer_fusion_group(), body.input_values(), body.output_values(), &program->code);
+    } else if (builder == "cpu") {
+        BuildCpuElementwiseProgram(body.nodes(), node.chainer_fusion_group(), body.input_values(), body.output_values(), &program->code);
+    } else {
+        CHECK(false) << "No code is built for " << node.ToString();
+    }
+}
+
+void CollectFusionGroupsToBuild(const Graph& graph, std::vector<const Node*>* nodes) {
+    for (const Node* node : graph.nodes()) {
+        if (node->op_type() == Node::kChainerFusionGroup && !GetFusionGroupBuilder(*node).empty()) {
+            nodes->push_back(node);
+            continue;
+        }
+        for (Graph* subgraph : node->GetSubGraphs()) {
+            CollectFusionGroupsToBuild(*subgraph, nodes);
+        }
+    }
+}
+
 class XCVMEmitter {
 public:
     XCVMEmitter() {
     }
 
     void EmitModel(const Graph& graph, XCProgramProto* program, bool dump_value_names) {
+        if (g_compiler_threads > 1) {
+            BuildFusionGroups(graph);
+        }
         EmitInputTypes(graph, program);
         AssignValueIds(graph);
         EmitGraph(graph, program, false /* in_loop */, graph.output_values());
@@ -112,6 +177,46 @@ public:
     }
 
 private:
+    // Builds code of all fusion groups in parallel. Instructions are
+    // still emitted sequentially, so the emitted program does not
+    // depend on the number of threads.
+    void BuildFusionGroups(const Graph& graph) {
+        std::vector<const Node*> nodes;
+        CollectFusionGroupsToBuild(graph, &nodes);
+
+        // TVM names its output file by the fusion group ID, which is
+        // only unique in a graph. Fusion groups which share a file
+        // are built sequentially in the original order.
+        std::vector<std::vector<const Node*>> tasks;
+        std::map<int, size_t> tvm_tasks;
+        for (const Node* node : nodes) {
+            fusion_programs_.emplace(node, FusionGroupProgram());
+            if (GetFusionGroupBuilder(*node) == "tvm") {
+                auto p = tvm_tasks.emplace(node->chainer_fusion_group(), tasks.size());
+                if (!p.second) {
+                    tasks[p.first->second].push_back(node);
+                    continue;
+                }
+            }
+            tasks.push_back({node});
+        }
+
+        ThreadPool pool(std::max(0, g_compiler_threads - 1));
+        pool.ParallelFor(tasks.size(), [this, &tasks](int64_t i) {
+            for (const Node* node : tasks[i]) {
+                BuildFusionGroupProgram(*node, &fusion_programs_.find(node)->second);
+            }
+        });
+    }
+
+    const FusionGroupProgram& GetFusionGroupProgram(const Node& node) {
+        auto p = fusion_programs_.emplace(&node, FusionGroupProgram());
+        if (p.second) {
+            BuildFusionGroupProgram(node, &p.first->second);
+        }
+        return p.first->second;
+    }
+
     void AssignValueIds(const Graph& graph) {
         for (const Value* v : graph.input_values()) {
             CHECK(value_ids_.emplace(v, next_value_id_++).second) << v->DebugString();
@@ -385,6 +490,39 @@ private:
             CHECK_EQ(3UL, node.inputs().size());
             CHECK_EQ(1UL, node.outputs().size());
             EMIT(Gemm, out(0), in(0), in(1), in(2), node.alpha(), node.beta(), node.trans_a(), node.trans_b());
+        } else if (node.op_type() == Node::kChainerQuantizeLinear) {
+            EMIT(QuantizeLinear, out(0), in(0), node.scale());
+        } else if (node.op_type() == Node::kChainerDequantizeLinear) {
+            EMIT(DequantizeLinear, out(0), in(0), node.scale());
+        } else if (node.op_type() == Node::kChainerRequantize) {
+            EMIT(Requantize, out(0), in(0), node.scale(), node.relu());
+        } else if (node.op_type() == Node::kChainerConvInteger) {
+            CHECK_EQ(1UL, node.outputs().size());
+            CHECK_EQ(1, node.group()) << "Group is not supported for ConvInteger";
+            for (int d : node.dilations()) CHECK_EQ(d, 1) << "Dilation is not supported yet";
+            EMIT(ConvInteger, out(0), in(0), in(1), oin(2), strides(), pads());
+        } else if (node.op_type() == Node::kChainerMatMulInteger) {
+            CHECK_EQ(1UL, node.outputs().size());
+            EMIT(MatMulInteger, out(0), in(0), in(1), oin(2));
+        } else if (node.op_type() == Node::kChainerSGDUpdate) {
+            EMIT(SGDUpdate, out(0), in(0), in(1), in(2));
+        } else if (node.op_type() == Node::kChainerMomentumSGDUpdate) {
+            EMIT(MomentumSGDUpdate, out(0), out(1), in(0), in(1), in(2), in(3), node.momentum());
+        } else if (node.op_type() == Node::kChainerAdamUpdate) {
+            EMIT(AdamUpdate,
+                 out(0),
+                 out(1),
+                 out(2),
+                 out(3),
+                 in(0),
+                 in(1),
+                 in(2),
+                 in(3),
+                 in(4),
+                 in(5),
+                 node.beta1(),
+                 node.beta2(),
+                 node.epsilon());
         } else if (node.op_type() == Node::kBatchNormalization) {
             EmitBatchNormalization(node, prog);
         } else if (node.op_type() == Node::kLRN) {
@@ -858,10 +996,9 @@ private:
         }
 
         if (g_use_tvm && node.fusion_type() == "tvm") {
-            std::string dso_filename;
-            std::string func_name;
-            BuildTVMProgram(
-                    body.nodes(), node.chainer_fusion_group(), body.input_values(), body.output_values(), &dso_filename, &func_name);
+            const FusionGroupProgram& program = GetFusionGroupProgram(node);
+            const std::string& dso_filename = program.code;
+            const std::string& func_name = program.func_name;
             if (g_compiler_log) {
                 // TODO(hamaji): Show more code.
                 CLOG() << "Fusion group (TVM) " << GetFusionGroupSummary(node) << " => " << dso_filename << std::endl;
@@ -886,8 +1023,7 @@ private:
         }
 
         if (g_use_nvrtc && node.fusion_type() == "nvrtc") {
-            std::string nvrtc;
-            BuildNvrtcProgram(body.nodes(), node.chainer_fusion_group(), body.input_values(), body.output_values(), &nvrtc);
+            const std::string& nvrtc = GetFusionGroupProgram(node).code;
             if (g_compiler_log) {
                 CLOG() << "Fusion group (NVRTC) " << GetFusionGroupSummary(node) << std::endl;
                 CLOG() << nvrtc;
@@ -905,6 +1041,25 @@ private:
             return;
         }
 
+        if (GetFusionGroupBuilder(node) == "cpu") {
+            const std::string& code = GetFusionGroupProgram(node).code;
+            if (g_compiler_log) {
+                CLOG() << "Fusion group (CPU) " << GetFusionGroupSummary(node) << std::endl;
+                CLOG() << code;
+            }
+
+            std::vector<int> inputs;
+            std::vector<XCVMValue> outputs;
+            for (Value* value : node.inputs()) {
+                inputs.push_back(GetValueId(value));
+            }
+            for (Value* value : node.outputs()) {
+                outputs.emplace_back(GetValueId(value), value);
+            }
+            EMIT(ElementWiseCpu, outputs, inputs, outputs.size(), code, node.chainer_fusion_group());
+            return;
+        }
+
         AssignValueIds(body);
 
         for (size_t i = 0; i < node.inputs().size(); ++i) {
@@ -1202,6 +1357,7 @@ private:
     std::map<const Value*, int> value_ids_;
     std::map<int, int> stack_ids_;
     std::set<const Node*> emitted_;
+    std::map<const Node*, FusionGroupProgram> fusion_programs_;
 };
 
 }  // namespace
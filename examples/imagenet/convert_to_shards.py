@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""Converts a labeled image list into pre-decoded shards.
+
+The shards can be read by `MmapIterator` in feeder/mmap_iterator.h
+(`--shards` of train_imagenet.py). All images must have the same size.
+"""
+import argparse
+import struct
+import sys
+
+import numpy as np
+
+import chainer
+
+
+MAGIC = b'CCSHARD\0'
+VERSION = 1
+# magic, version, height, width, channels, num_records, labels_offset,
+# images_offset. See MmapShardHeader.
+HEADER_FORMAT = '<8s4i3q'
+ALIGNMENT = 64
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_shard(filename, dataset, indices):
+    image, _ = dataset[indices[0]]
+    channels, height, width = image.shape
+    num_records = len(indices)
+    labels_offset = _align(struct.calcsize(HEADER_FORMAT))
+    images_offset = _align(labels_offset + 4 * num_records)
+    image_bytes = height * width * channels
+
+    with open(filename, 'wb') as f:
+        f.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, height, width,
+                            channels, num_records, labels_offset,
+                            images_offset))
+        labels = np.empty(num_records, dtype=np.int32)
+        f.seek(images_offset)
+        for j, i in enumerate(indices):
+            image, label = dataset[i]
+            if image.shape != (channels, height, width):
+                raise RuntimeError('Image size mismatch at {}: {} vs {}'.format(
+                    i, image.shape, (channels, height, width)))
+            labels[j] = label
+            hwc = np.ascontiguousarray(image.transpose(1, 2, 0))
+            assert hwc.nbytes == image_bytes
+            f.write(hwc.tobytes())
+            sys.stderr.write('{} / {}\r'.format(i, len(dataset)))
+            sys.stderr.flush()
+        f.seek(labels_offset)
+        f.write(labels.tobytes())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Convert images into pre-decoded shards')
+    parser.add_argument('dataset',
+                        help='Path to training image-label list file')
+    parser.add_argument('output',
+                        help='Output prefix. Shards are named '
+                        '<output>-00000-of-00010.shard and so on')
+    parser.add_argument('--root', '-R', default='.',
+                        help='Root directory path of image files')
+    parser.add_argument('--records_per_shard', type=int, default=10000,
+                        help='Number of images in a shard')
+    args = parser.parse_args()
+
+    dataset = chainer.datasets.LabeledImageDataset(
+        args.dataset, args.root, dtype=np.uint8)
+    n = len(dataset)
+    num_shards = (n + args.records_per_shard - 1) // args.records_per_shard
+    filenames = []
+    for s in range(num_shards):
+        filename = '{}-{:05d}-of-{:05d}.shard'.format(
+            args.output, s, num_shards)
+        begin = s * args.records_per_shard
+        end = min(n, begin + args.records_per_shard)
+        write_shard(filename, dataset, list(range(begin, end)))
+        filenames.append(filename)
+    sys.stderr.write('\n')
+    print(','.join(filenames))
+
+
+if __name__ == '__main__':
+    main()
@@ -10,8 +10,10 @@ ImageDataLayer).
 """
 import argparse
 import json
+import os
 import random
 import re
+import sys
 
 import numpy as np
 
@@ -31,6 +33,12 @@ import nin
 import resnet50
 import resnext50
 
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+sys.path.append(os.path.join(project_root, 'ch2o'))
+sys.path.append(os.path.join(project_root, 'python'))
+sys.path.append(os.path.join(project_root, 'build/python'))
+
 
 class PreprocessedDataset(chainer.dataset.DatasetMixin):
 
@@ -137,6 +145,13 @@ def main():
     parser.set_defaults(test=False)
     parser.add_argument('--dali', action='store_true')
     parser.set_defaults(dali=False)
+    parser.add_argument('--native_iterator', action='store_true',
+                        help='Load the training images by the native '
+                        'iterator of chainer_compiler')
+    parser.add_argument('--shards', action='store_true',
+                        help='TRAIN is a comma separated list of shards '
+                        'made by convert_to_shards.py. Implies '
+                        '--native_iterator')
     group = parser.add_argument_group('deprecated arguments')
     group.add_argument('--gpu', '-g', type=int, nargs='?', const=0,
                        help='GPU ID (negative value indicates CPU)')
@@ -184,6 +199,28 @@ def main():
         val_iter = chainer.iterators.DaliIterator(val_pipe, repeat=False)
         # converter = dali_converter
         converter = dali_util.DaliConverter(mean=mean, crop_size=model.insize)
+    elif args.native_iterator or args.shards:
+        import chainer_compiler
+        num_threads = args.loaderjob
+        if num_threads is None or num_threads <= 0:
+            num_threads = 1
+        if args.shards:
+            train_iter = chainer_compiler.mmap_iterator(
+                args.train.split(','), args.batchsize, mean, model.insize,
+                num_threads=num_threads)
+        else:
+            if args.root != '.':
+                raise RuntimeError(
+                    '--root is not supported by --native_iterator')
+            train_iter = chainer_compiler.imagenet_iterator(
+                args.train, args.batchsize, mean, model.insize,
+                num_decode_threads=num_threads)
+        val = PreprocessedDataset(args.val, args.root, mean, model.insize,
+                                  False)
+        val_iter = chainer.iterators.MultiprocessIterator(
+            val, args.val_batchsize, repeat=False, n_processes=args.loaderjob)
+        converter = chainer_compiler.native_converter
+        val_converter = dataset.concat_examples
     else:
         # Load the dataset files
         train = PreprocessedDataset(args.train, args.root, mean, model.insize)
@@ -196,6 +233,8 @@ def main():
         val_iter = chainer.iterators.MultiprocessIterator(
             val, args.val_batchsize, repeat=False, n_processes=args.loaderjob)
         converter = dataset.concat_examples
+    if not (args.native_iterator or args.shards):
+        val_converter = converter
 
     # Set up an optimizer
     optimizer = chainer.optimizers.MomentumSGD(lr=0.01, momentum=0.9)
@@ -214,7 +253,8 @@ def main():
     log_interval = ((1 if args.test else 10 if args.iterations else 1000),
                     'iteration')
 
-    trainer.extend(extensions.Evaluator(val_iter, model, converter=converter,
+    trainer.extend(extensions.Evaluator(val_iter, model,
+                                        converter=val_converter,
                                         device=device), trigger=val_interval)
     # TODO(sonots): Temporarily disabled for chainerx. Fix it.
     if not (chainerx.is_available() and isinstance(device, chainerx.Device)):
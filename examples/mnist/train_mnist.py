@@ -83,6 +83,8 @@ def main():
                         help='Compile the model')
     parser.add_argument('--dump_onnx', action='store_true',
                         help='Dump ONNX model after optimization')
+    parser.add_argument('--native_iterator', action='store_true',
+                        help='Load the training data by the native iterator')
     args = parser.parse_args()
 
     device = parse_device(args)
@@ -110,13 +112,19 @@ def main():
     # Load the MNIST dataset
     train, test = chainer.datasets.get_mnist()
 
-    train_iter = chainer.iterators.SerialIterator(train, args.batchsize)
+    converter = chainer.dataset.concat_examples
+    if args.native_iterator:
+        train_iter = chainer_compiler.array_iterator(
+            chainer.dataset.concat_examples(train), args.batchsize)
+        converter = chainer_compiler.native_converter
+    else:
+        train_iter = chainer.iterators.SerialIterator(train, args.batchsize)
     test_iter = chainer.iterators.SerialIterator(test, args.batchsize,
                                                  repeat=False, shuffle=False)
 
     # Set up a trainer
     updater = training.updaters.StandardUpdater(
-        train_iter, optimizer, device=device)
+        train_iter, optimizer, converter=converter, device=device)
     trainer = training.Trainer(updater, (args.epoch, 'epoch'), out=args.out)
 
     # Evaluate the model with the test dataset for each epoch
@@ -0,0 +1,55 @@
+#include "array_iterator.h"
+
+#include <algorithm>
+#include <cstring>
+#include <numeric>
+
+#include <chainerx/routines/creation.h>
+
+#include <common/log.h>
+
+ArrayIterator::ArrayIterator(const std::vector<chainerx::Array>& arrays, int buf_size, int batch_size, bool shuffle, int num_epochs)
+    : DataIterator(buf_size), batch_size_(batch_size), shuffle_(shuffle), num_epochs_(num_epochs) {
+    CHECK(!arrays.empty());
+    CHECK_LT(0, batch_size_);
+    CHECK_LT(0, num_epochs_);
+    const int64_t num_examples = arrays[0].shape()[0];
+    for (const chainerx::Array& a : arrays) {
+        CHECK_LE(1, a.ndim());
+        CHECK_EQ(num_examples, a.shape()[0]) << "The number of examples mismatch";
+        // This is no-op when `a` is a contiguous array on host.
+        arrays_.push_back(chainerx::AsContiguous(a.ToNative()));
+    }
+    order_.resize(num_examples);
+    std::iota(order_.begin(), order_.end(), 0);
+    if (shuffle_) std::shuffle(order_.begin(), order_.end(), mt_);
+}
+
+std::vector<chainerx::Array> ArrayIterator::GetNextImpl() {
+    std::vector<int64_t> indices;
+    while (batch_size_ > indices.size()) {
+        if (iter_ == order_.size()) {
+            if (epoch_ + 1 == num_epochs_ || order_.empty()) break;
+            ++epoch_;
+            iter_ = 0;
+            if (shuffle_) std::shuffle(order_.begin(), order_.end(), mt_);
+        }
+        indices.push_back(order_[iter_++]);
+    }
+    if (indices.empty()) return {};
+
+    std::vector<chainerx::Array> batch;
+    for (const chainerx::Array& a : arrays_) {
+        chainerx::Shape shape = a.shape();
+        shape[0] = indices.size();
+        const int64_t row_bytes = a.GetNBytes() / a.shape()[0];
+        std::shared_ptr<void> data(new char[row_bytes * indices.size()], std::default_delete<char[]>());
+        const char* src = static_cast<const char*>(a.raw_data()) + a.offset();
+        char* dst = static_cast<char*>(data.get());
+        for (size_t i = 0; i < indices.size(); ++i) {
+            std::memcpy(dst + i * row_bytes, src + indices[i] * row_bytes, row_bytes);
+        }
+        batch.push_back(chainerx::FromContiguousHostData(shape, a.dtype(), data));
+    }
+    return batch;
+}
@@ -0,0 +1,37 @@
+#pragma once
+
+#include <random>
+#include <vector>
+
+#include <chainerx/array.h>
+
+#include <feeder/data_iterator.h>
+
+// Iterates over mini-batches of in-memory arrays. The first dimension
+// of each array is the index of examples. Each batch is gathered into
+// newly allocated host arrays.
+class ArrayIterator : public DataIterator {
+public:
+    explicit ArrayIterator(
+            const std::vector<chainerx::Array>& arrays, int buf_size, int batch_size, bool shuffle = true, int num_epochs = 1);
+    // The loader thread must stop before members are destroyed.
+    ~ArrayIterator() override {
+        Terminate();
+    }
+
+    std::vector<chainerx::Array> GetNextImpl() override;
+
+    int64_t num_examples() const {
+        return order_.size();
+    }
+
+private:
+    std::vector<chainerx::Array> arrays_;
+    std::vector<int64_t> order_;
+    size_t iter_ = 0;
+    int epoch_ = 0;
+    int batch_size_;
+    bool shuffle_;
+    int num_epochs_;
+    std::mt19937 mt_;
+};
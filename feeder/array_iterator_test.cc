@@ -0,0 +1,64 @@
+#include <set>
+
+#include <gtest/gtest.h>
+
+#include <chainerx/array.h>
+#include <chainerx/context.h>
+#include <chainerx/routines/creation.h>
+#include <chainerx/routines/manipulation.h>
+
+#include <feeder/array_iterator.h>
+
+namespace {
+
+TEST(TestArrayIterator, Basic) {
+    chainerx::Context ctx;
+    chainerx::SetGlobalDefaultContext(&ctx);
+
+    chainerx::Array x = chainerx::Arange(10 * 3, chainerx::Dtype::kFloat32).Reshape({10, 3});
+    chainerx::Array t = chainerx::Arange(10, chainerx::Dtype::kInt32);
+    ArrayIterator iter({x, t}, 2, 4, true /* shuffle */, 2 /* num_epochs */);
+    iter.Start();
+
+    std::multiset<int> labels;
+    std::vector<int64_t> batch_sizes;
+    while (true) {
+        std::vector<chainerx::Array> batch = iter.GetNext();
+        if (batch.empty()) break;
+        ASSERT_EQ(2, batch.size());
+        int64_t bs = batch[0].shape()[0];
+        batch_sizes.push_back(bs);
+        EXPECT_EQ(chainerx::Shape({bs, 3}), batch[0].shape());
+        EXPECT_EQ(chainerx::Shape({bs}), batch[1].shape());
+        for (int64_t i = 0; i < bs; ++i) {
+            int label = static_cast<int>(chainerx::AsScalar(batch[1].At({i})));
+            labels.insert(label);
+            EXPECT_EQ(label * 3 + 2, static_cast<int>(chainerx::AsScalar(batch[0].At({i, 2}))));
+        }
+    }
+    iter.Terminate();
+
+    // Batches may straddle epochs.
+    EXPECT_EQ(std::vector<int64_t>({4, 4, 4, 4, 4}), batch_sizes);
+    for (int i = 0; i < 10; ++i) {
+        EXPECT_EQ(2, labels.count(i)) << i;
+    }
+}
+
+TEST(TestArrayIterator, DestroyInEpoch) {
+    chainerx::Context ctx;
+    chainerx::SetGlobalDefaultContext(&ctx);
+
+    chainerx::Array x = chainerx::Arange(100 * 3, chainerx::Dtype::kFloat32).Reshape({100, 3});
+    for (int i = 0; i < 10; ++i) {
+        // The iterator is destroyed while the next batches are being
+        // prepared.
+        ArrayIterator iter({x}, 2, 4, true /* shuffle */, 10 /* num_epochs */);
+        iter.Start();
+        std::vector<chainerx::Array> batch = iter.GetNext();
+        ASSERT_EQ(1, batch.size());
+        EXPECT_EQ(chainerx::Shape({4, 3}), batch[0].shape());
+    }
+}
+
+}  // namespace
@@ -0,0 +1,24 @@
+#include "augmentation.h"
+
+#include <algorithm>
+#include <random>
+
+#include <common/log.h>
+
+CropParams ChooseCrop(int rows, int cols, int height, int width, bool random, uint32_t seed) {
+    CHECK_GE(rows, height);
+    CHECK_GE(cols, width);
+    CropParams crop;
+    if (random) {
+        // Same as `random.randint(0, h - crop_size - 1)` in Python.
+        std::mt19937 mt(seed);
+        crop.top = std::uniform_int_distribution<int>(0, std::max(0, rows - height - 1))(mt);
+        crop.left = std::uniform_int_distribution<int>(0, std::max(0, cols - width - 1))(mt);
+        crop.flip = std::uniform_int_distribution<int>(0, 1)(mt);
+    } else {
+        crop.top = (rows - height) / 2;
+        crop.left = (cols - width) / 2;
+        crop.flip = false;
+    }
+    return crop;
+}
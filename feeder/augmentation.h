@@ -0,0 +1,15 @@
+#pragma once
+
+#include <cstdint>
+
+struct CropParams {
+    int top;
+    int left;
+    bool flip;
+};
+
+// Chooses the region of a `rows`x`cols` image to be cropped to
+// `height`x`width`. This follows `PreprocessedDataset` in
+// examples/imagenet/train_imagenet.py: a random position and a random
+// horizontal flip if `random` is true, or the center otherwise.
+CropParams ChooseCrop(int rows, int cols, int height, int width, bool random, uint32_t seed);
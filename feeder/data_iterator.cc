@@ -29,8 +29,8 @@ void DataIterator::Start() {
 
 void DataIterator::Terminate() {
     std::unique_lock<std::mutex> lock{mu_};
-    CHECK(thread_.get());
-    if (should_finish_) return;
+    // Not started or already terminated.
+    if (!thread_.get() || should_finish_) return;
     should_finish_ = true;
     cond_.notify_all();
     cond_.wait(lock);
@@ -3,6 +3,7 @@
 #include <condition_variable>
 #include <mutex>
 #include <queue>
+#include <string>
 #include <thread>
 #include <vector>
 
@@ -16,7 +17,14 @@ public:
 
     virtual std::vector<chainerx::Array> GetNextImpl() = 0;
 
+    // Returns a human readable progress of the iteration.
+    virtual std::string GetStatus() const {
+        return "";
+    }
+
     void Start();
+    // Stops the background thread. Subclasses which own resources
+    // used by `GetNextImpl` must call this in their destructors.
     void Terminate();
 
 protected:
@@ -0,0 +1,73 @@
+// Measures the throughput of ImageNetIterator for different numbers
+// of decode threads.
+//
+// Usage: imagenet_benchmark <train.txt> <mean.bin>
+
+#include <chrono>
+#include <iostream>
+
+#include <chainerx/context.h>
+
+#include <common/log.h>
+#include <feeder/imagenet_iterator.h>
+#include <tools/cmdline.h>
+
+namespace {
+
+double MeasureImagesPerSecond(
+        const std::string& dataset,
+        const std::vector<float>& mean,
+        int batch_size,
+        int num_batches,
+        int num_threads,
+        bool random,
+        int size) {
+    ImageNetIterator iter(dataset, 3, batch_size, mean, size, size, num_threads, random, 1 << 20);
+    iter.Start();
+    // Warm up.
+    CHECK(!iter.GetNext().empty());
+
+    std::chrono::system_clock::time_point start = std::chrono::system_clock::now();
+    int64_t num_images = 0;
+    for (int i = 0; i < num_batches; ++i) {
+        std::vector<chainerx::Array> data = iter.GetNext();
+        CHECK(!data.empty());
+        num_images += data[0].shape()[0];
+    }
+    std::chrono::system_clock::time_point end = std::chrono::system_clock::now();
+    iter.Terminate();
+    double elapsed = std::chrono::duration_cast<std::chrono::microseconds>(end - start).count() * 1e-6;
+    return num_images / elapsed;
+}
+
+}  // namespace
+
+int main(int argc, char** argv) {
+    cmdline::parser args;
+    args.add<int>("batchsize", 'B', "Batch size", false, 32);
+    args.add<int>("batches", 'n', "Number of batches to be measured", false, 20);
+    args.add<int>("max_threads", '\0', "Maximum number of decode threads", false, 8);
+    args.add<int>("size", '\0', "Height and width of cropped images", false, 224);
+    args.add("no_random_crop", '\0', "Crop the center of images without flipping");
+    args.parse_check(argc, argv);
+    if (args.rest().size() != 2) {
+        std::cerr << args.usage() << std::endl;
+        QFAIL() << "Usage: " << argv[0] << " <train.txt> <mean.bin>";
+    }
+
+    chainerx::Context ctx;
+    chainerx::SetGlobalDefaultContext(&ctx);
+
+    const std::vector<float>& mean = LoadMean(args.rest()[1]);
+    for (int num_threads = 1; num_threads <= args.get<int>("max_threads"); num_threads *= 2) {
+        double images_per_sec = MeasureImagesPerSecond(
+                args.rest()[0],
+                mean,
+                args.get<int>("batchsize"),
+                args.get<int>("batches"),
+                num_threads,
+                !args.exist("no_random_crop"),
+                args.get<int>("size"));
+        std::cout << "threads=" << num_threads << " images/sec=" << images_per_sec << std::endl;
+    }
+}
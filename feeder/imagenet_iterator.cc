@@ -5,15 +5,20 @@
 #include <fstream>
 #include <random>
 
+#include <opencv2/core/core.hpp>
 #include <opencv2/highgui/highgui.hpp>
 
 #include <chainerx/routines/creation.h>
 
 #include <common/log.h>
 #include <common/strutil.h>
+#include <feeder/augmentation.h>
 
 namespace {
 
+const int kMeanHeight = 256;
+const int kMeanWidth = 256;
+
 chainerx::Array MakeArray(chainerx::Dtype dtype, chainerx::Shape shape, const void* src) {
     int64_t size = chainerx::GetItemSize(dtype) * shape.GetTotalSize();
     std::shared_ptr<void> data(new char[size], std::default_delete<char[]>());
@@ -25,9 +30,33 @@ chainerx::Array MakeArray(chainerx::Dtype dtype, chainerx::Shape shape, const vo
 }  // namespace
 
 ImageNetIterator::ImageNetIterator(
-        const std::string& labeled_image_dataset, int buf_size, int batch_size, const std::vector<float>& mean, int height, int width)
-    : DataIterator(buf_size), batch_size_(batch_size), mean_(mean), height_(height), width_(width) {
-    CHECK_EQ(3 * height * width, mean_.size());
+        const std::string& labeled_image_dataset,
+        int buf_size,
+        int batch_size,
+        const std::vector<float>& mean,
+        int height,
+        int width,
+        int num_decode_threads,
+        bool random,
+        int num_epochs)
+    : DataIterator(buf_size),
+      batch_size_(batch_size),
+      mean_(mean),
+      height_(height),
+      width_(width),
+      random_(random),
+      num_epochs_(num_epochs),
+      decode_pool_(new chainer_compiler::ThreadPool(std::max(0, num_decode_threads - 1))) {
+    if (mean_.size() == 3 * height * width) {
+        mean_height_ = height;
+        mean_width_ = width;
+    } else {
+        CHECK_EQ(3 * kMeanHeight * kMeanWidth, mean_.size());
+        mean_height_ = kMeanHeight;
+        mean_width_ = kMeanWidth;
+    }
+    CHECK_LT(0, num_epochs_);
+
     std::ifstream ifs(labeled_image_dataset);
     while (ifs) {
         std::string filename;
@@ -35,8 +64,11 @@ ImageNetIterator::ImageNetIterator(
         ifs >> filename >> label;
         dataset_.emplace_back(filename, label);
     }
-    std::mt19937 mt;
-    std::shuffle(dataset_.begin(), dataset_.end(), mt);
+    std::shuffle(dataset_.begin(), dataset_.end(), mt_);
+    // The last read above fails at EOF.
+    dataset_.erase(
+            std::remove_if(dataset_.begin(), dataset_.end(), [](const std::pair<std::string, int>& p) { return p.first.empty(); }),
+            dataset_.end());
     // std::cerr << dataset_.size() << " examples" << std::endl;
 }
 
@@ -44,34 +76,27 @@ std::vector<chainerx::Array> ImageNetIterator::GetNextImpl() {
     std::vector<std::pair<std::string, int>> batch;
     while (batch_size_ > batch.size()) {
         if (iter_ == dataset_.size()) {
-            std::cerr << batch.size() << std::endl;
-            break;
+            if (epoch_ + 1 == num_epochs_ || dataset_.empty()) break;
+            ++epoch_;
+            iter_ = 0;
+            std::shuffle(dataset_.begin(), dataset_.end(), mt_);
         }
         batch.push_back(dataset_[iter_++]);
     }
     if (batch.empty()) return {};
 
-    std::vector<float> image_data(batch.size() * 3 * height_ * width_);
+    // Seeds are drawn here so the augmentation does not depend on
+    // the number of decode threads.
+    std::vector<uint32_t> seeds(batch.size());
+    for (uint32_t& seed : seeds) seed = mt_();
+
+    const int image_size = 3 * height_ * width_;
+    std::vector<float> image_data(batch.size() * image_size);
     std::vector<int> label_data(batch.size());
-    for (size_t i = 0; i < batch.size(); ++i) {
+    decode_pool_->ParallelFor(batch.size(), [this, &batch, &seeds, &image_data, &label_data, image_size](int64_t i) {
         label_data[i] = batch[i].second;
-        cv::Mat image = cv::imread(batch[i].first);
-        int bi = i * 3 * height_ * width_;
-        CHECK_GE(image.rows, height_);
-        CHECK_GE(image.cols, width_);
-        int by = (image.rows - height_) / 2;
-        int bx = (image.cols - width_) / 2;
-        for (int y = 0; y < height_; ++y) {
-            for (int x = 0; x < width_; ++x) {
-                int ii = (y * width_ + x) * 3;
-                for (int k = 0; k < 3; ++k) {
-                    image_data[bi + ii + k] = image.at<cv::Vec3b>(by + y, bx + x)(2 - k);
-                    image_data[bi + ii + k] -= mean_[ii + k];
-                    image_data[bi + ii + k] *= 1.0 / 255.0;
-                }
-            }
-        }
-    }
+        DecodeImage(batch[i].first, seeds[i], &image_data[i * image_size]);
+    });
 
     std::vector<chainerx::Array> arrays;
     int bs = static_cast<int>(batch.size());
@@ -80,30 +105,68 @@ std::vector<chainerx::Array> ImageNetIterator::GetNextImpl() {
     return arrays;
 }
 
+void ImageNetIterator::DecodeImage(const std::string& filename, uint32_t seed, float* out) const {
+    cv::Mat image = cv::imread(filename);
+    CHECK(image.data) << "Failed to read: " << filename;
+    const CropParams crop = ChooseCrop(image.rows, image.cols, height_, width_, random_, seed);
+
+    // The mean is cropped at the same position as the image, but it
+    // is not flipped.
+    int mean_top = 0, mean_left = 0;
+    if (mean_height_ != height_ || mean_width_ != width_) {
+        CHECK_EQ(mean_height_, image.rows) << filename;
+        CHECK_EQ(mean_width_, image.cols) << filename;
+        mean_top = crop.top;
+        mean_left = crop.left;
+    }
+
+    // Flipping an image and then cropping [left, left+width) is the
+    // same as cropping the mirrored region and then flipping it.
+    int src_left = crop.flip ? image.cols - crop.left - width_ : crop.left;
+    cv::Mat cropped = image(cv::Rect(src_left, crop.top, width_, height_));
+    if (crop.flip) {
+        cv::Mat flipped;
+        cv::flip(cropped, flipped, 1 /* horizontal */);
+        cropped = flipped;
+    }
+
+    std::vector<cv::Mat> bgr;
+    cv::split(cropped, bgr);
+    const float scale = 1.0 / 255.0;
+    for (int k = 0; k < 3; ++k) {
+        // OpenCV decodes images in BGR while Chainer models take RGB.
+        cv::Mat dst(height_, width_, CV_32F, out + k * height_ * width_);
+        bgr[2 - k].convertTo(dst, CV_32F);
+        const float* mean_plane = &mean_[k * mean_height_ * mean_width_];
+        cv::Mat mean(mean_height_, mean_width_, CV_32F, const_cast<float*>(mean_plane));
+        cv::subtract(dst, mean(cv::Rect(mean_left, mean_top, width_, height_)), dst);
+        dst *= scale;
+    }
+}
+
 std::string ImageNetIterator::GetStatus() const {
-    return chainer_compiler::StrCat(iter_, "/", dataset_.size());
+    if (num_epochs_ == 1) return chainer_compiler::StrCat(iter_, "/", dataset_.size());
+    return chainer_compiler::StrCat(iter_, "/", dataset_.size(), " epoch=", epoch_);
 }
 
 std::vector<float> LoadMean(const std::string& filename, int height, int width) {
-    const int ORIG_HEIGHT = 256;
-    const int ORIG_WIDTH = 256;
-    CHECK_GE(ORIG_HEIGHT, height);
-    CHECK_GE(ORIG_WIDTH, width);
     std::ifstream ifs(filename);
     CHECK(ifs) << "Failed to open: " << filename;
-    int num_elements = 3 * ORIG_HEIGHT * ORIG_WIDTH;
+    int num_elements = 3 * kMeanHeight * kMeanWidth;
     std::vector<float> mean(num_elements);
     ifs.read(reinterpret_cast<char*>(&mean[0]), sizeof(float) * num_elements);
     CHECK_EQ(sizeof(float) * num_elements, ifs.gcount()) << "Invalid mean file: " << filename;
+    if (height == 0 && width == 0) return mean;
 
+    CHECK_GE(kMeanHeight, height);
+    CHECK_GE(kMeanWidth, width);
     std::vector<float> cropped(3 * height * width);
-    int by = (ORIG_HEIGHT - height) / 2;
-    int bx = (ORIG_WIDTH - width) / 2;
-    for (int y = 0; y < height; ++y) {
-        for (int x = 0; x < width; ++x) {
-            for (int k = 0; k < 3; ++k) {
-                cropped[(y * width + x) * 3 + k] = mean[((by + y) * width + (bx + x)) * 3 + k];
-            }
+    int by = (kMeanHeight - height) / 2;
+    int bx = (kMeanWidth - width) / 2;
+    for (int k = 0; k < 3; ++k) {
+        for (int y = 0; y < height; ++y) {
+            const float* src = &mean[(k * kMeanHeight + by + y) * kMeanWidth + bx];
+            std::copy(src, src + width, &cropped[(k * height + y) * width]);
         }
     }
     return cropped;
@@ -1,29 +1,67 @@
 #pragma once
 
+#include <cstdint>
+#include <memory>
+#include <random>
 #include <string>
 #include <utility>
 #include <vector>
 
 #include <chainerx/array.h>
 
+#include <common/thread_pool.h>
 #include <feeder/data_iterator.h>
 
+// Iterates over a labeled image list (the format of Caffe's
+// ImageDataLayer). Images are decoded and preprocessed in the same
+// way as `PreprocessedDataset` in examples/imagenet/train_imagenet.py.
+//
+// `mean` is in CHW order and its size must be either the size of
+// the cropped image or 3x256x256. In the latter case, the mean is
+// cropped at the same position as each image.
 class ImageNetIterator : public DataIterator {
 public:
     explicit ImageNetIterator(
-            const std::string& labeled_image_dataset, int buf_size, int batch_size, const std::vector<float>& mean, int height, int width);
+            const std::string& labeled_image_dataset,
+            int buf_size,
+            int batch_size,
+            const std::vector<float>& mean,
+            int height,
+            int width,
+            int num_decode_threads = 1,
+            bool random = false,
+            int num_epochs = 1);
+    // The loader thread must stop before members are destroyed.
+    ~ImageNetIterator() override {
+        Terminate();
+    }
 
     std::vector<chainerx::Array> GetNextImpl() override;
 
-    std::string GetStatus() const;
+    std::string GetStatus() const override;
+
+    int64_t num_examples() const {
+        return dataset_.size();
+    }
 
 private:
+    void DecodeImage(const std::string& filename, uint32_t seed, float* out) const;
+
     std::vector<std::pair<std::string, int>> dataset_;
     size_t iter_ = 0;
+    int epoch_ = 0;
     int batch_size_;
     std::vector<float> mean_;
+    int mean_height_;
+    int mean_width_;
     int height_;
     int width_;
+    bool random_;
+    int num_epochs_;
+    std::mt19937 mt_;
+    std::unique_ptr<chainer_compiler::ThreadPool> decode_pool_;
 };
 
-std::vector<float> LoadMean(const std::string& filename, int height, int width);
+// Loads a mean image of 3x256x256 float values in CHW order and crops
+// its center. Returns the whole image if `height` and `width` are 0.
+std::vector<float> LoadMean(const std::string& filename, int height = 0, int width = 0);
@@ -3,6 +3,7 @@
 #include <gtest/gtest.h>
 
 #include <chainerx/context.h>
+#include <chainerx/numeric.h>
 #include <chainerx/routines/manipulation.h>
 
 #include <common/log.h>
@@ -46,4 +47,32 @@ TEST(TestImageNetIterator, Basic) {
     iter.Terminate();
 }
 
+TEST(TestImageNetIterator, MultiThreadedRandomCrop) {
+    if (!file_exists("data/imagenet/test.txt") || !file_exists("data/imagenet/mean.bin")) {
+        WARN_ONCE("Test skipped");
+        return;
+    }
+
+    chainerx::Context ctx;
+    chainerx::SetGlobalDefaultContext(&ctx);
+
+    std::vector<float> mean(LoadMean("data/imagenet/mean.bin"));
+    ASSERT_EQ(256 * 256 * 3, mean.size());
+
+    // The results must not depend on the number of decode threads.
+    ImageNetIterator iter1("data/imagenet/test.txt", 3, 5, mean, 192, 192, 1, true);
+    ImageNetIterator iter4("data/imagenet/test.txt", 3, 5, mean, 192, 192, 4, true);
+    iter1.Start();
+    iter4.Start();
+    std::vector<chainerx::Array> a(iter1.GetNext());
+    std::vector<chainerx::Array> b(iter4.GetNext());
+    ASSERT_EQ(2, a.size());
+    ASSERT_EQ(2, b.size());
+    EXPECT_EQ(chainerx::Shape({5, 3, 192, 192}), b[0].shape());
+    EXPECT_TRUE(chainerx::AllClose(a[0], b[0]));
+    EXPECT_TRUE(chainerx::AllClose(a[1], b[1]));
+    iter1.Terminate();
+    iter4.Terminate();
+}
+
 }  // namespace
@@ -0,0 +1,154 @@
+#include "mmap_iterator.h"
+
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+#include <algorithm>
+#include <cstring>
+
+#include <chainerx/routines/creation.h>
+
+#include <common/log.h>
+#include <common/strutil.h>
+#include <feeder/augmentation.h>
+
+MmapIterator::MmapIterator(
+        const std::vector<std::string>& shards,
+        int buf_size,
+        int batch_size,
+        const std::vector<float>& mean,
+        int height,
+        int width,
+        int num_threads,
+        bool random,
+        int num_epochs)
+    : DataIterator(buf_size),
+      batch_size_(batch_size),
+      mean_(mean),
+      height_(height),
+      width_(width),
+      random_(random),
+      num_epochs_(num_epochs),
+      pool_(new chainer_compiler::ThreadPool(std::max(0, num_threads - 1))) {
+    CHECK(!shards.empty());
+    CHECK_LT(0, num_epochs_);
+    for (const std::string& filename : shards) {
+        int fd = open(filename.c_str(), O_RDONLY);
+        CHECK_LE(0, fd) << "Failed to open: " << filename;
+        struct stat st;
+        CHECK_EQ(0, fstat(fd, &st)) << filename;
+        CHECK_LE(sizeof(MmapShardHeader), st.st_size) << "Too small shard: " << filename;
+        void* data = mmap(nullptr, st.st_size, PROT_READ, MAP_SHARED, fd, 0);
+        CHECK(data != MAP_FAILED) << "Failed to mmap: " << filename;
+        close(fd);
+
+        Shard shard{static_cast<const uint8_t*>(data), static_cast<size_t>(st.st_size), static_cast<const MmapShardHeader*>(data)};
+        const MmapShardHeader& header = *shard.header;
+        CHECK_EQ(0, std::memcmp(header.magic, kMmapShardMagic, sizeof(kMmapShardMagic))) << "Not a shard: " << filename;
+        CHECK_EQ(kMmapShardVersion, header.version) << filename;
+        CHECK_EQ(3, header.channels) << filename;
+        const int64_t image_bytes = header.height * header.width * header.channels;
+        CHECK_LE(header.labels_offset + header.num_records * sizeof(int32_t), shard.size) << "Truncated shard: " << filename;
+        CHECK_LE(header.images_offset + header.num_records * image_bytes, shard.size) << "Truncated shard: " << filename;
+        if (shards_.empty()) {
+            image_height_ = header.height;
+            image_width_ = header.width;
+        } else {
+            CHECK_EQ(image_height_, header.height) << "Image sizes of shards mismatch: " << filename;
+            CHECK_EQ(image_width_, header.width) << "Image sizes of shards mismatch: " << filename;
+        }
+        for (int64_t i = 0; i < header.num_records; ++i) {
+            order_.emplace_back(shards_.size(), i);
+        }
+        shards_.push_back(shard);
+    }
+
+    if (mean_.size() == 3 * height * width) {
+        mean_height_ = height;
+        mean_width_ = width;
+    } else {
+        CHECK_EQ(3 * image_height_ * image_width_, mean_.size());
+        mean_height_ = image_height_;
+        mean_width_ = image_width_;
+    }
+    std::shuffle(order_.begin(), order_.end(), mt_);
+}
+
+MmapIterator::~MmapIterator() {
+    Terminate();
+    for (const Shard& shard : shards_) {
+        munmap(const_cast<uint8_t*>(shard.data), shard.size);
+    }
+}
+
+std::vector<chainerx::Array> MmapIterator::GetNextImpl() {
+    std::vector<std::pair<int, int64_t>> batch;
+    while (batch_size_ > batch.size()) {
+        if (iter_ == order_.size()) {
+            if (epoch_ + 1 == num_epochs_ || order_.empty()) break;
+            ++epoch_;
+            iter_ = 0;
+            std::shuffle(order_.begin(), order_.end(), mt_);
+        }
+        batch.push_back(order_[iter_++]);
+    }
+    if (batch.empty()) return {};
+
+    std::vector<uint32_t> seeds(batch.size());
+    for (uint32_t& seed : seeds) seed = mt_();
+
+    const int64_t bs = batch.size();
+    const int64_t image_size = 3 * height_ * width_;
+    std::shared_ptr<void> image_data(new float[bs * image_size], std::default_delete<float[]>());
+    std::shared_ptr<void> label_data(new int32_t[bs], std::default_delete<int32_t[]>());
+    float* images = static_cast<float*>(image_data.get());
+    int32_t* labels = static_cast<int32_t*>(label_data.get());
+    pool_->ParallelFor(bs, [this, &batch, &seeds, images, labels, image_size](int64_t i) {
+        const Shard& shard = shards_[batch[i].first];
+        const MmapShardHeader& header = *shard.header;
+        const int64_t index = batch[i].second;
+        std::memcpy(&labels[i], shard.data + header.labels_offset + index * sizeof(int32_t), sizeof(int32_t));
+        const int64_t image_bytes = header.height * header.width * header.channels;
+        CropImage(shard.data + header.images_offset + index * image_bytes, seeds[i], &images[i * image_size]);
+    });
+
+    std::vector<chainerx::Array> arrays;
+    arrays.push_back(chainerx::FromContiguousHostData({bs, 3, height_, width_}, chainerx::Dtype::kFloat32, image_data));
+    arrays.push_back(chainerx::FromContiguousHostData({bs}, chainerx::Dtype::kInt32, label_data));
+    return arrays;
+}
+
+void MmapIterator::CropImage(const uint8_t* image, uint32_t seed, float* out) const {
+    const CropParams crop = ChooseCrop(image_height_, image_width_, height_, width_, random_, seed);
+    int mean_top = 0, mean_left = 0;
+    if (mean_height_ != height_ || mean_width_ != width_) {
+        mean_top = crop.top;
+        mean_left = crop.left;
+    }
+    // See ImageNetIterator for the way to flip images.
+    const int src_left = crop.flip ? image_width_ - crop.left - width_ : crop.left;
+    const float scale = 1.0 / 255.0;
+    for (int k = 0; k < 3; ++k) {
+        for (int y = 0; y < height_; ++y) {
+            const uint8_t* src = image + ((crop.top + y) * image_width_ + src_left) * 3 + k;
+            const float* mean = &mean_[(k * mean_height_ + mean_top + y) * mean_width_ + mean_left];
+            float* dst = out + (k * height_ + y) * width_;
+            if (crop.flip) {
+                for (int x = 0; x < width_; ++x) {
+                    dst[x] = (src[(width_ - 1 - x) * 3] - mean[x]) * scale;
+                }
+            } else {
+                for (int x = 0; x < width_; ++x) {
+                    dst[x] = (src[x * 3] - mean[x]) * scale;
+                }
+            }
+        }
+    }
+}
+
+std::string MmapIterator::GetStatus() const {
+    if (num_epochs_ == 1) return chainer_compiler::StrCat(iter_, "/", order_.size());
+    return chainer_compiler::StrCat(iter_, "/", order_.size(), " epoch=", epoch_);
+}
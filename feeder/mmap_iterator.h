@@ -0,0 +1,85 @@
+#pragma once
+
+#include <cstdint>
+#include <memory>
+#include <random>
+#include <string>
+#include <utility>
+#include <vector>
+
+#include <chainerx/array.h>
+
+#include <common/thread_pool.h>
+#include <feeder/data_iterator.h>
+
+// The header of a shard of pre-decoded images. A shard consists of
+// this header, `num_records` int32 labels at `labels_offset`, and
+// `num_records` uint8 images in HWC order at `images_offset`. Every
+// image has the same size. All values are little endian.
+// examples/imagenet/convert_to_shards.py creates shards.
+struct MmapShardHeader {
+    char magic[8];
+    int32_t version;
+    int32_t height;
+    int32_t width;
+    int32_t channels;
+    int64_t num_records;
+    int64_t labels_offset;
+    int64_t images_offset;
+};
+
+constexpr char kMmapShardMagic[8] = {'C', 'C', 'S', 'H', 'A', 'R', 'D', '\0'};
+constexpr int32_t kMmapShardVersion = 1;
+
+// Iterates over images in memory-mapped shards. Each batch is
+// preprocessed in the same way as ImageNetIterator, but no file is
+// read or decoded while iterating.
+class MmapIterator : public DataIterator {
+public:
+    explicit MmapIterator(
+            const std::vector<std::string>& shards,
+            int buf_size,
+            int batch_size,
+            const std::vector<float>& mean,
+            int height,
+            int width,
+            int num_threads = 1,
+            bool random = false,
+            int num_epochs = 1);
+    ~MmapIterator() override;
+
+    std::vector<chainerx::Array> GetNextImpl() override;
+
+    std::string GetStatus() const override;
+
+    int64_t num_examples() const {
+        return order_.size();
+    }
+
+private:
+    struct Shard {
+        const uint8_t* data;
+        size_t size;
+        const MmapShardHeader* header;
+    };
+
+    void CropImage(const uint8_t* image, uint32_t seed, float* out) const;
+
+    std::vector<Shard> shards_;
+    // Pairs of a shard index and a record index.
+    std::vector<std::pair<int, int64_t>> order_;
+    size_t iter_ = 0;
+    int epoch_ = 0;
+    int batch_size_;
+    std::vector<float> mean_;
+    int mean_height_;
+    int mean_width_;
+    int image_height_;
+    int image_width_;
+    int height_;
+    int width_;
+    bool random_;
+    int num_epochs_;
+    std::mt19937 mt_;
+    std::unique_ptr<chainer_compiler::ThreadPool> pool_;
+};
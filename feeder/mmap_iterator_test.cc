@@ -0,0 +1,108 @@
+#include <cstdio>
+#include <cstring>
+#include <fstream>
+#include <set>
+
+#include <gtest/gtest.h>
+
+#include <chainerx/context.h>
+#include <chainerx/routines/manipulation.h>
+
+#include <feeder/mmap_iterator.h>
+
+namespace {
+
+// Writes a shard with `num_records` 4x4 images. The pixel values of
+// the i-th image are (i, x, y) and its label is i.
+void WriteShard(const std::string& filename, int num_records) {
+    const int kSize = 4;
+    MmapShardHeader header;
+    std::memcpy(header.magic, kMmapShardMagic, sizeof(kMmapShardMagic));
+    header.version = kMmapShardVersion;
+    header.height = kSize;
+    header.width = kSize;
+    header.channels = 3;
+    header.num_records = num_records;
+    header.labels_offset = sizeof(header);
+    header.images_offset = header.labels_offset + num_records * sizeof(int32_t);
+
+    std::ofstream ofs(filename, std::ios::binary);
+    ofs.write(reinterpret_cast<const char*>(&header), sizeof(header));
+    for (int32_t i = 0; i < num_records; ++i) {
+        ofs.write(reinterpret_cast<const char*>(&i), sizeof(i));
+    }
+    for (int i = 0; i < num_records; ++i) {
+        for (int y = 0; y < kSize; ++y) {
+            for (int x = 0; x < kSize; ++x) {
+                uint8_t pixel[3] = {static_cast<uint8_t>(i), static_cast<uint8_t>(x), static_cast<uint8_t>(y)};
+                ofs.write(reinterpret_cast<const char*>(pixel), sizeof(pixel));
+            }
+        }
+    }
+}
+
+TEST(TestMmapIterator, Basic) {
+    chainerx::Context ctx;
+    chainerx::SetGlobalDefaultContext(&ctx);
+
+    const std::string shard0 = "/tmp/mmap_iterator_test_0.shard";
+    const std::string shard1 = "/tmp/mmap_iterator_test_1.shard";
+    WriteShard(shard0, 3);
+    WriteShard(shard1, 4);
+
+    // Center crop 2x2 from 4x4 with a zero mean.
+    std::vector<float> mean(3 * 2 * 2);
+    {
+        MmapIterator iter({shard0, shard1}, 2, 5, mean, 2, 2);
+        EXPECT_EQ(7, iter.num_examples());
+        iter.Start();
+        std::vector<int64_t> batch_sizes;
+        while (true) {
+            std::vector<chainerx::Array> a = iter.GetNext();
+            if (a.empty()) break;
+            ASSERT_EQ(2, a.size());
+            int64_t bs = a[0].shape()[0];
+            batch_sizes.push_back(bs);
+            EXPECT_EQ(chainerx::Shape({bs, 3, 2, 2}), a[0].shape());
+            for (int64_t i = 0; i < bs; ++i) {
+                int label = static_cast<int>(chainerx::AsScalar(a[1].At({i})));
+                // Channel 0 is the label.
+                EXPECT_FLOAT_EQ(label / 255.0, static_cast<float>(chainerx::AsScalar(a[0].At({i, 0, 0, 0}))));
+                // Channel 1 is x and channel 2 is y, offset by 1.
+                EXPECT_FLOAT_EQ(2 / 255.0, static_cast<float>(chainerx::AsScalar(a[0].At({i, 1, 0, 1}))));
+                EXPECT_FLOAT_EQ(2 / 255.0, static_cast<float>(chainerx::AsScalar(a[0].At({i, 2, 1, 0}))));
+            }
+        }
+        EXPECT_EQ(std::vector<int64_t>({5, 2}), batch_sizes);
+    }
+
+    std::remove(shard0.c_str());
+    std::remove(shard1.c_str());
+}
+
+TEST(TestMmapIterator, RandomFlip) {
+    chainerx::Context ctx;
+    chainerx::SetGlobalDefaultContext(&ctx);
+
+    const std::string shard = "/tmp/mmap_iterator_test_flip.shard";
+    WriteShard(shard, 50);
+
+    // Crop the whole image so only flipping is random.
+    std::vector<float> mean(3 * 4 * 4);
+    {
+        MmapIterator iter({shard}, 2, 50, mean, 4, 4, 4 /* num_threads */, true /* random */);
+        iter.Start();
+        std::vector<chainerx::Array> a = iter.GetNext();
+        ASSERT_EQ(2, a.size());
+        std::set<int> first_xs;
+        for (int64_t i = 0; i < 50; ++i) {
+            float x = static_cast<float>(chainerx::AsScalar(a[0].At({i, 1, 0, 0}))) * 255;
+            first_xs.insert(static_cast<int>(x + 0.5));
+        }
+        EXPECT_EQ(std::set<int>({0, 3}), first_xs);
+    }
+
+    std::remove(shard.c_str());
+}
+
+}  // namespace
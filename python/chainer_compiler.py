@@ -1,4 +1,5 @@
 import chainer
+import math
 import os
 import sys
 import tempfile
@@ -56,6 +57,38 @@ def _from_var(v, device):
     return [_from_var(x, device) for x in v.sequence()]
 
 
+class DynamicLossScaler(object):
+    """Adjusts the scale of loss for mixed precision training.
+
+    The scale is halved when gradients overflow, and doubled after
+    `interval` steps without overflow. By default, the scale starts
+    with the initial value of the `loss_scale` input of training graphs.
+    """
+
+    def __init__(self, initial_scale=None, interval=1000, factor=2.0):
+        if initial_scale is None:
+            initial_scale = chainer_compiler_core.initial_loss_scale
+        self.scale = float(initial_scale)
+        self.interval = interval
+        self.factor = factor
+        self._num_good_steps = 0
+
+    def update(self, gxs):
+        """Updates the scale and returns False if `gxs` overflowed."""
+        for gx in gxs:
+            if gx is None:
+                continue
+            if not math.isfinite(float(gx.sum())):
+                self.scale = max(1.0, self.scale / self.factor)
+                self._num_good_steps = 0
+                return False
+        self._num_good_steps += 1
+        if self._num_good_steps >= self.interval:
+            self.scale *= self.factor
+            self._num_good_steps = 0
+        return True
+
+
 class RunCompiledModel(chainer.function_node.FunctionNode):
 
     def __init__(self, compiled_model, input_tmpl):
@@ -65,6 +98,7 @@ class RunCompiledModel(chainer.function_node.FunctionNode):
         self.bwd_output_names = compiled_model.bwd_output_names
         self.fwd = compiled_model.fwd
         self.bwd = compiled_model.bwd
+        self.loss_scaler = compiled_model.loss_scaler
         self.num_outputs = len(compiled_model.orig_output_names)
         self.input_tmpl = input_tmpl
         self.chainerx_device_name = None
@@ -115,6 +149,12 @@ class RunCompiledModel(chainer.function_node.FunctionNode):
         retained = self.retained
         gys = [self._to_var(gy) for gy in gys]
         values = gys + retained
+        if self.loss_scaler is not None:
+            import chainerx
+            scale = chainerx.full((), self.loss_scaler.scale,
+                                  dtype=chainerx.float32,
+                                  device=self.chainerx_device_name)
+            values.append(chainer_compiler_core.value(scale))
 
         del self.retained
         del self.nested_outputs
@@ -140,17 +180,27 @@ class RunCompiledModel(chainer.function_node.FunctionNode):
             else:
                 gxs.extend([None] * len(_flatten(tmpl)))
 
+        # Skip the update of parameters if gradients overflowed.
+        if (self.loss_scaler is not None and
+                not self.loss_scaler.update(gxs)):
+            gxs = [None] * len(gxs)
+
         gxs = tuple(None if gx is None else chainer.Variable(gx) for gx in gxs)
         return gxs
 
 
 class CompiledModel(chainer.Chain):
 
-    def __init__(self, model, inputs, dump_onnx=False):
+    def __init__(self, model, inputs, dump_onnx=False,
+                 mixed_precision=False, loss_scaler=None):
         super(CompiledModel, self).__init__()
         with self.init_scope():
             self.mc = model
         self.dump_onnx = dump_onnx
+        self.mixed_precision = mixed_precision
+        if mixed_precision and loss_scaler is None:
+            loss_scaler = DynamicLossScaler()
+        self.loss_scaler = loss_scaler
 
         self.compiled = False
         self.param_names = None
@@ -170,7 +220,8 @@ class CompiledModel(chainer.Chain):
 
         self.orig_output_names = graph.output_names()
 
-        fwd_graph, bwd_graph = graph.backward_to(graph.input_names())
+        fwd_graph, bwd_graph = graph.backward_to(
+            graph.input_names(), mixed_precision=self.mixed_precision)
         if self.dump_onnx:
             sys.stderr.write('=== vvv forward vvv ===\n' +
                              fwd_graph.dump() +
@@ -218,3 +269,254 @@ class CompiledModel(chainer.Chain):
 
 def compile(model, inputs=None, **kwargs):
     return CompiledModel(model, inputs, **kwargs)
+
+
+# Hyperparameters which are fixed in optimizer update ops of XCVM.
+_FIXED_HYPERPARAMS = {
+    'sgd': {},
+    'momentum_sgd': {'momentum': 0.9},
+    'adam': {'beta1': 0.9, 'beta2': 0.999, 'eps': 1e-8,
+             'weight_decay_rate': 0, 'amsgrad': False, 'adabound': False},
+}
+
+
+def _get_optimizer_name(optimizer):
+    if isinstance(optimizer, chainer.optimizers.MomentumSGD):
+        name = 'momentum_sgd'
+    elif isinstance(optimizer, chainer.optimizers.SGD):
+        name = 'sgd'
+    elif isinstance(optimizer, chainer.optimizers.Adam):
+        name = 'adam'
+    else:
+        raise ValueError('Unsupported optimizer: %s' % type(optimizer))
+    for key, value in _FIXED_HYPERPARAMS[name].items():
+        actual = getattr(optimizer, key, value)
+        if actual != value:
+            raise ValueError('Unsupported %s of %s: %s (must be %s)' %
+                             (key, type(optimizer).__name__, actual, value))
+    if getattr(optimizer, '_hooks', None):
+        raise ValueError('Optimizer hooks are not supported')
+    return name
+
+
+def _to_var(v):
+    if _is_array(v):
+        if isinstance(v, chainer.Variable):
+            v = v.array
+        return chainer_compiler_core.value(chainer.backend.to_chx(v))
+    return chainer_compiler_core.value([_to_var(a) for a in v])
+
+
+def _load_loss_graph(model, example_inputs):
+    """Converts `model` which returns a loss to a graph.
+
+    Parameters of `model` are stored as initializers of the graph.
+    Returns the graph and a dict from names of initializers to
+    parameters of `model`.
+    """
+    from ch2o.initializer import edit_onnx_protobuf
+
+    # Initialize parameters of links with lazy initialization.
+    if any(p.array is None for p in model.params()):
+        with chainer.no_backprop_mode():
+            model(*example_inputs)
+
+    xmodel = ch2o.compile_model(model, example_inputs)
+    model_params = dict(edit_onnx_protobuf(xmodel, model))
+    f = tempfile.NamedTemporaryFile(delete=False)
+    f.write(xmodel.SerializeToString())
+    f.close()
+    del xmodel
+
+    graph = chainer_compiler_core.load(f.name)
+    os.unlink(f.name)
+
+    if len(graph.output_names()) != 1:
+        raise ValueError('The model must return a single loss value')
+    return graph, model_params
+
+
+class TrainStep(object):
+    """A training step of a model compiled into a single XCVM program.
+
+    Forward, backward, and the update of parameters by `optimizer` run
+    in one XCVM run. Parameters and optimizer states stay in XCVM vars
+    between steps. Call `update_model` to copy them back to `model`.
+    """
+
+    def __init__(self, model, optimizer, example_inputs, dump_onnx=False,
+                 **kwargs):
+        self.model = model
+        self.optimizer = optimizer
+        self.optimizer_name = _get_optimizer_name(optimizer)
+
+        graph, self.model_params = _load_loss_graph(model, example_inputs)
+        self.input_names = graph.input_names()
+        self.loss_name = graph.output_names()[0]
+
+        self.xcvm = graph.compile(backprop=True,
+                                  optimizer=self.optimizer_name,
+                                  learning_rate=self._learning_rate(),
+                                  **kwargs)
+        if dump_onnx:
+            sys.stderr.write('=== vvv train step vvv ===\n' +
+                             graph.dump() +
+                             '\n=== ^^^ train step ^^^ ===\n')
+
+        self.chainerx_device_name = chainer.backend.to_chx(
+            _flatten(example_inputs)[0]).device
+        with chainer.using_device(self.chainerx_device_name):
+            self.params = graph.params()
+        self._learning_rate_cache = None
+
+    def _learning_rate(self):
+        if self.optimizer_name == 'adam':
+            return self.optimizer.alpha * self.optimizer.eta
+        return self.optimizer.lr
+
+    def _learning_rate_var(self):
+        lr = self._learning_rate()
+        if (self._learning_rate_cache is None or
+                self._learning_rate_cache[0] != lr):
+            import chainerx
+            array = chainerx.full((), lr, dtype=chainerx.float32,
+                                  device=self.chainerx_device_name)
+            var = chainer_compiler_core.value(array)
+            self._learning_rate_cache = (lr, var)
+        return self._learning_rate_cache[1]
+
+    def __call__(self, *args):
+        """Runs a training step and returns the loss."""
+        assert len(self.input_names) == len(args)
+        inputs = dict(self.params)
+        for name, value in zip(self.input_names, args):
+            inputs[name] = _to_var(value)
+        # The learning rate may be changed by extensions of trainers.
+        inputs['learning_rate'] = self._learning_rate_var()
+
+        with chainer.using_device(self.chainerx_device_name):
+            outputs = self.xcvm.run(inputs)
+        self.optimizer.t += 1
+        return outputs[self.loss_name].array()
+
+    def update_model(self):
+        """Copies parameters in XCVM back to the model."""
+        for name, param in self.model_params.items():
+            dst = param.array if isinstance(param, chainer.Variable) else param
+            device = chainer.backend.get_device_from_array(dst)
+            src = device.send(self.params[name].array())
+            dst[...] = src.reshape(dst.shape)
+
+
+def compile_train_step(model, optimizer, example_inputs, **kwargs):
+    """Compiles forward, backward, and update of `model` into a callable.
+
+    `model` must return a scalar loss and `optimizer` is one of SGD,
+    MomentumSGD, and Adam of Chainer. Keyword arguments are passed to
+    `Graph.compile`.
+    """
+    return TrainStep(model, optimizer, example_inputs, **kwargs)
+
+
+class NativeIterator(chainer.dataset.Iterator):
+    """Adapts a native `chainer_compiler_core.DataIterator` to Chainer.
+
+    Each batch is a tuple of ChainerX arrays on the native device,
+    which are created by the background thread of the native iterator
+    without being copied. Use `native_converter` as the converter of
+    `StandardUpdater`.
+    """
+
+    def __init__(self, native_iter, batch_size, num_examples):
+        self._iter = native_iter
+        self.batch_size = batch_size
+        self._num_examples = num_examples
+        self.current_position = 0
+        self.epoch = 0
+        self.is_new_epoch = False
+        self._previous_epoch_detail = -1.
+
+    def __next__(self):
+        batch = tuple(next(self._iter))
+        self._previous_epoch_detail = self.epoch_detail
+        self.current_position += len(batch[0])
+        self.is_new_epoch = self.current_position >= self._num_examples
+        if self.is_new_epoch:
+            self.current_position -= self._num_examples
+            self.epoch += 1
+        return batch
+
+    next = __next__
+
+    @property
+    def epoch_detail(self):
+        return self.epoch + self.current_position / self._num_examples
+
+    @property
+    def previous_epoch_detail(self):
+        # The same as SerialIterator's.
+        if self._previous_epoch_detail < 0:
+            return None
+        return self._previous_epoch_detail
+
+    def finalize(self):
+        self._iter.terminate()
+
+
+def native_converter(batch, device=None):
+    if device is None:
+        return batch
+    return tuple(chainer.dataset.to_device(device, a) for a in batch)
+
+
+def array_iterator(arrays, batch_size, shuffle=True, repeat=True,
+                   num_epochs=None):
+    """Creates a `NativeIterator` over NumPy or ChainerX arrays.
+
+    The first dimension of each array is the index of examples. Host
+    arrays are shared with the native iterator, not copied.
+    """
+    import chainerx
+    arrays = [chainerx.asarray(a) for a in arrays]
+    if num_epochs is None:
+        num_epochs = 1 << 30 if repeat else 1
+    native_iter = chainer_compiler_core.ArrayIterator(
+        arrays, batch_size, shuffle=shuffle, num_epochs=num_epochs)
+    return NativeIterator(native_iter, batch_size, native_iter.num_examples)
+
+
+def imagenet_iterator(labeled_image_dataset, batch_size, mean, crop_size,
+                      random=True, repeat=True, num_epochs=None,
+                      num_decode_threads=1):
+    """Creates a `NativeIterator` which works like `PreprocessedDataset`.
+
+    `mean` is a float array of shape (3, 256, 256) as made by
+    examples/imagenet/compute_mean.py.
+    """
+    if num_epochs is None:
+        num_epochs = 1 << 30 if repeat else 1
+    native_iter = chainer_compiler_core.ImageNetIterator(
+        labeled_image_dataset, batch_size,
+        mean.astype('float32').ravel().tolist(),
+        crop_size, crop_size,
+        num_decode_threads=num_decode_threads, random=random,
+        num_epochs=num_epochs)
+    return NativeIterator(native_iter, batch_size, native_iter.num_examples)
+
+
+def mmap_iterator(shards, batch_size, mean, crop_size, random=True,
+                  repeat=True, num_epochs=None, num_threads=1):
+    """Creates a `NativeIterator` over pre-decoded shards.
+
+    Shards are made by examples/imagenet/convert_to_shards.py. `mean`
+    is a float array of shape (3, H, W) where H and W are the size of
+    images in the shards.
+    """
+    if num_epochs is None:
+        num_epochs = 1 << 30 if repeat else 1
+    native_iter = chainer_compiler_core.MmapIterator(
+        list(shards), batch_size,
+        mean.astype('float32').ravel().tolist(),
+        crop_size, crop_size,
+        num_threads=num_threads, random=random, num_epochs=num_epochs)
+    return NativeIterator(native_iter, batch_size, native_iter.num_examples)
@@ -10,14 +10,24 @@
 
 #include <common/log.h>
 #include <common/protoutil.h>
+#include <common/strutil.h>
 #include <compiler/custom_onnx_ops.h>
 #include <compiler/flags.h>
+#include <compiler/flops.h>
 #include <compiler/gradient.h>
 #include <compiler/graph.h>
+#include <compiler/memory_simulator.h>
 #include <compiler/model.h>
 #include <compiler/passes.h>
 #include <compiler/subgraph_canonicalizer.h>
+#include <compiler/util.h>
 #include <compiler/xcvm/emitter.h>
+#include <feeder/array_iterator.h>
+#include <feeder/data_iterator.h>
+#include <feeder/mmap_iterator.h>
+#if CHAINER_COMPILER_ENABLE_OPENCV
+#include <feeder/imagenet_iterator.h>
+#endif
 #include <runtime/chrome_tracing.h>
 #include <runtime/xcvm.h>
 #include <runtime/xcvm.pb.h>
@@ -34,6 +44,7 @@ typedef std::shared_ptr<runtime::XCVMVar> VarPtr;
 
 std::shared_ptr<Graph> LoadGraph(const std::string& onnx_path) {
     onnx::ModelProto xmodel(LoadLargeProto<onnx::ModelProto>(onnx_path));
+    ResolveExternalDataLocations(onnx_path, &xmodel);
     return std::make_shared<Graph>(xmodel.graph());
 }
 
@@ -53,42 +64,66 @@ std::shared_ptr<runtime::XCVM> Compile(
         bool skip_inference,
         bool use_cuda,
         bool fuse_operations,
+        bool fold_affine_ops,
+        bool mixed_precision,
+        const std::string& optimizer,
+        float learning_rate,
+        int num_micro_batches,
+        const std::string& quantization_ranges,
         bool use_nvrtc,
+        bool use_cpu_codegen,
         bool use_tvm,
         bool reuse_tvm_code,
         const std::string& dump_autotvm_task_dir,
         const std::string& autotvm_log,
         bool use_ngraph,
         const std::string& backend_name,
+        int compiler_threads,
         bool dump_after_inference,
         bool dump_after_simplification,
         bool dump_after_gradient,
         bool dump_after_fusion,
         bool dump_after_scheduling,
-        bool dump_subgraphs) {
+        bool dump_subgraphs,
+        const std::string& scheduler,
+        int scheduler_beam_width,
+        const std::string& computation_order,
+        int chen_budget,
+        bool backprop) {
     g_compiler_log = compiler_log;
     g_permissive = permissive;
     g_skip_inference = skip_inference;
     g_use_cuda = use_cuda;
     g_fuse_operations = fuse_operations;
+    g_fold_affine_ops = fold_affine_ops;
+    g_mixed_precision = mixed_precision;
+    g_optimizer = optimizer;
+    g_learning_rate = learning_rate;
+    g_num_micro_batches = num_micro_batches;
+    g_quantization_ranges = quantization_ranges;
     g_use_nvrtc = use_nvrtc;
+    g_use_cpu_codegen = use_cpu_codegen;
     g_use_tvm = use_tvm;
     g_reuse_tvm_code = reuse_tvm_code;
     g_dump_autotvm_task_dir = dump_autotvm_task_dir;
     g_autotvm_log = autotvm_log;
     g_use_ngraph = use_ngraph;
     g_backend_name = backend_name;
+    g_compiler_threads = compiler_threads;
     g_dump_after_inference = dump_after_inference;
     g_dump_after_simplification = dump_after_simplification;
     g_dump_after_gradient = dump_after_gradient;
     g_dump_after_fusion = dump_after_fusion;
     g_dump_after_scheduling = dump_after_scheduling;
     g_dump_subgraphs = dump_subgraphs;
+    g_scheduler = scheduler;
+    g_scheduler_beam_width = scheduler_beam_width;
+    g_computation_order = computation_order;
+    g_chen_budget = chen_budget;
 
     if (!g_skip_inference) graph->InferShapes();
 
-    constexpr bool kBackprop = false;
-    RunDefaultPasses(graph.get(), kBackprop);
+    RunDefaultPasses(graph.get(), backprop);
     runtime::XCProgramProto xcvm_prog;
     constexpr bool kDumpValueNames = false;
     xcvm::Emit(*graph, &xcvm_prog, kDumpValueNames);
@@ -111,16 +146,18 @@ std::vector<std::string> GetOutputNames(const std::shared_ptr<Graph>& graph) {
     return names;
 }
 
-std::pair<std::shared_ptr<Graph>, std::shared_ptr<Graph>> GenerateBackward(const std::shared_ptr<Graph>& graph) {
+std::pair<std::shared_ptr<Graph>, std::shared_ptr<Graph>> GenerateBackward(const std::shared_ptr<Graph>& graph, bool mixed_precision) {
     auto backprop = std::make_shared<Graph>(graph->name() + "_backprop");
+    g_mixed_precision = mixed_precision;
     RunDefaultPassesBeforeGradient(graph.get());
     GenerateGradientNodes(graph.get(), backprop.get());
     return std::make_pair(graph, backprop);
 }
 
 std::pair<std::shared_ptr<Graph>, std::shared_ptr<Graph>> GenerateBackwardTo(
-        const std::shared_ptr<Graph>& graph, const std::vector<std::string>& param_names) {
+        const std::shared_ptr<Graph>& graph, const std::vector<std::string>& param_names, bool mixed_precision) {
     auto backprop = std::make_shared<Graph>(graph->name() + "_backprop");
+    g_mixed_precision = mixed_precision;
     RunDefaultPassesBeforeGradient(graph.get());
     GenerateGradientNodesTo(graph.get(), backprop.get(), param_names);
     return std::make_pair(graph, backprop);
@@ -130,6 +167,41 @@ std::string Dump(const std::shared_ptr<Graph>& graph) {
     return graph->DebugString();
 }
 
+void CheckScheduled(const Graph& graph) {
+    if (graph.GetComputationSequence().empty()) {
+        throw std::runtime_error("The graph is not scheduled yet. Call `compile` first");
+    }
+}
+
+py::dict GetFlops(const std::shared_ptr<Graph>& graph) {
+    CheckScheduled(*graph);
+    py::list nodes;
+    int num_unknown_ops = 0;
+    int64_t total = 0;
+    for (const Node* node : graph->GetComputationSequence()) {
+        int64_t flops = CalculateFlops(*node, &num_unknown_ops);
+        if (flops >= 0) total += flops;
+        py::dict n;
+        n["name"] = node->name();
+        n["op_type"] = Node::OpTypeToString(node->op_type());
+        // None for unknown FLOPs.
+        py::object f = py::none();
+        if (flops >= 0) f = py::cast(flops);
+        n["flops"] = f;
+        nodes.append(n);
+    }
+    py::dict flops;
+    flops["total"] = total;
+    flops["num_unknown_ops"] = num_unknown_ops;
+    flops["nodes"] = nodes;
+    return flops;
+}
+
+SimulatedMemoryUsage SimulateMemory(const std::shared_ptr<Graph>& graph) {
+    CheckScheduled(*graph);
+    return SimulateMemoryUsage(*graph);
+}
+
 void InitGraph(py::module& m) {
     py::class_<Graph, std::shared_ptr<Graph>> c{m, "Graph"};
     c.def("params", &LoadParams, "Load parameters of a model");
@@ -141,24 +213,67 @@ void InitGraph(py::module& m) {
           py::arg("skip_inference") = false,
           py::arg("use_cuda") = false,
           py::arg("fuse_operations") = false,
+          py::arg("fold_affine_ops") = false,
+          py::arg("mixed_precision") = false,
+          py::arg("optimizer") = "",
+          py::arg("learning_rate") = 0.01,
+          py::arg("num_micro_batches") = 1,
+          py::arg("quantization_ranges") = "",
           py::arg("use_nvrtc") = false,
+          py::arg("use_cpu_codegen") = false,
           py::arg("use_tvm") = false,
           py::arg("reuse_tvm_code") = false,
           py::arg("dump_autotvm_task_dir") = "",
           py::arg("autotvm_log") = "",
           py::arg("use_ngraph") = false,
           py::arg("backend_name") = "",
+          py::arg("compiler_threads") = 1,
           py::arg("dump_after_inference") = false,
           py::arg("dump_after_simplification") = false,
           py::arg("dump_after_gradient") = false,
           py::arg("dump_after_fusion") = false,
           py::arg("dump_after_scheduling") = false,
-          py::arg("dump_subgraphs") = false);
+          py::arg("dump_subgraphs") = false,
+          py::arg("scheduler") = "",
+          py::arg("scheduler_beam_width") = 1,
+          py::arg("computation_order") = "",
+          py::arg("chen_budget") = 0,
+          py::arg("backprop") = false);
     c.def("input_names", &GetInputNames, "Names of inputs");
     c.def("output_names", &GetOutputNames, "Names of outputs");
-    c.def("backward", &GenerateBackward, "Generate a pair of graphs for forward and back propagation");
-    c.def("backward_to", &GenerateBackwardTo, "Generate a pair of graphs for forward and back propagation");
+    c.def("backward",
+          &GenerateBackward,
+          "Generate a pair of graphs for forward and back propagation",
+          py::arg("mixed_precision") = false);
+    c.def("backward_to",
+          &GenerateBackwardTo,
+          "Generate a pair of graphs for forward and back propagation",
+          py::arg("param_names"),
+          py::arg("mixed_precision") = false);
     c.def("dump", &Dump, "Dump a model to a string");
+    c.def("flops", &GetFlops, "Estimate FLOPs of each node and the total FLOPs of a compiled model");
+    c.def("simulate_memory", &SimulateMemory, "Simulate memory usage of a compiled model");
+
+    py::class_<SimulatedMemoryUsage> mc{m, "SimulatedMemoryUsage"};
+    mc.def_readonly("param", &SimulatedMemoryUsage::param, "Bytes of parameters");
+    mc.def_readonly("peak", &SimulatedMemoryUsage::peak, "Peak bytes of live values");
+    mc.def_readonly("all", &SimulatedMemoryUsage::all, "Bytes of all values");
+    mc.def_readonly("num_values", &SimulatedMemoryUsage::num_values, "Number of values");
+    mc.def_readonly("num_unknowns", &SimulatedMemoryUsage::num_unknowns, "Number of values with unknown shapes");
+    mc.def("__repr__", [](const SimulatedMemoryUsage& u) {
+        return StrCat(
+                "SimulatedMemoryUsage(param=",
+                u.param,
+                ", peak=",
+                u.peak,
+                ", all=",
+                u.all,
+                ", num_values=",
+                u.num_values,
+                ", num_unknowns=",
+                u.num_unknowns,
+                ")");
+    });
 }
 
 std::map<std::string, VarPtr> Run(
@@ -170,7 +285,8 @@ std::map<std::string, VarPtr> Run(
         bool check_nans,
         bool check_infs,
         bool dump_memory_usage,
-        const std::string& chrome_tracing) {
+        const std::string& chrome_tracing,
+        int num_threads) {
     runtime::XCVMOptions xcvm_opts;
     if (trace) xcvm_opts.trace_level = 1;
     if (verbose) xcvm_opts.trace_level = 2;
@@ -178,6 +294,7 @@ std::map<std::string, VarPtr> Run(
     xcvm_opts.check_nans = check_nans;
     xcvm_opts.check_infs = check_infs;
     xcvm_opts.dump_memory_usage = dump_memory_usage;
+    xcvm_opts.num_threads = num_threads;
     if (!chrome_tracing.empty()) {
         xcvm_opts.chrome_tracing = new runtime::ChromeTracingEmitter();
     }
@@ -200,7 +317,8 @@ void InitXCVM(py::module& m) {
           py::arg("check_nans") = false,
           py::arg("check_infs") = false,
           py::arg("dump_memory_usage") = false,
-          py::arg("chrome_tracing") = "");
+          py::arg("chrome_tracing") = "",
+          py::arg("num_threads") = 1);
 }
 
 bool IsArray(const VarPtr& v) {
@@ -243,6 +361,110 @@ VarPtr CreateValueFromSequence(const std::vector<VarPtr>& seq) {
     return var;
 }
 
+std::vector<ArrayBodyPtr> GetNextBatch(const std::shared_ptr<DataIterator>& iter) {
+    std::vector<chainerx::Array> batch;
+    {
+        py::gil_scoped_release gsr;
+        batch = iter->GetNext();
+    }
+    if (batch.empty()) throw py::stop_iteration();
+    std::vector<ArrayBodyPtr> out;
+    for (const chainerx::Array& a : batch) {
+        out.push_back(chainerx::internal::GetArrayBody(a));
+    }
+    return out;
+}
+
+std::shared_ptr<ArrayIterator> CreateArrayIterator(
+        const std::vector<ArrayBodyPtr>& arrays, int batch_size, bool shuffle, int num_epochs, int buf_size) {
+    std::vector<chainerx::Array> a;
+    for (const ArrayBodyPtr& body : arrays) a.emplace_back(body);
+    auto iter = std::make_shared<ArrayIterator>(a, buf_size, batch_size, shuffle, num_epochs);
+    iter->Start();
+    return iter;
+}
+
+std::shared_ptr<MmapIterator> CreateMmapIterator(
+        const std::vector<std::string>& shards,
+        int batch_size,
+        const std::vector<float>& mean,
+        int height,
+        int width,
+        int num_threads,
+        bool random,
+        int num_epochs,
+        int buf_size) {
+    auto iter = std::make_shared<MmapIterator>(shards, buf_size, batch_size, mean, height, width, num_threads, random, num_epochs);
+    iter->Start();
+    return iter;
+}
+
+#if CHAINER_COMPILER_ENABLE_OPENCV
+std::shared_ptr<ImageNetIterator> CreateImageNetIterator(
+        const std::string& labeled_image_dataset,
+        int batch_size,
+        const std::vector<float>& mean,
+        int height,
+        int width,
+        int num_decode_threads,
+        bool random,
+        int num_epochs,
+        int buf_size) {
+    auto iter = std::make_shared<ImageNetIterator>(
+            labeled_image_dataset, buf_size, batch_size, mean, height, width, num_decode_threads, random, num_epochs);
+    iter->Start();
+    return iter;
+}
+#endif
+
+void InitDataIterator(py::module& m) {
+    py::class_<DataIterator, std::shared_ptr<DataIterator>> c{m, "DataIterator"};
+    c.def("__iter__", [](const std::shared_ptr<DataIterator>& iter) { return iter; });
+    c.def("__next__", &GetNextBatch, "Get the next batch as a list of ChainerX arrays");
+    c.def("terminate", &DataIterator::Terminate, "Stop the background thread");
+    c.def("status", &DataIterator::GetStatus, "Progress of the iteration");
+
+    py::class_<ArrayIterator, DataIterator, std::shared_ptr<ArrayIterator>> ac{m, "ArrayIterator"};
+    ac.def(py::init(&CreateArrayIterator),
+           "Iterate over mini-batches of arrays whose first dimensions are examples",
+           py::arg("arrays"),
+           py::arg("batch_size"),
+           py::arg("shuffle") = true,
+           py::arg("num_epochs") = 1,
+           py::arg("buf_size") = 3);
+    ac.def_property_readonly("num_examples", &ArrayIterator::num_examples);
+
+    py::class_<MmapIterator, DataIterator, std::shared_ptr<MmapIterator>> mc{m, "MmapIterator"};
+    mc.def(py::init(&CreateMmapIterator),
+           "Iterate over mini-batches of pre-decoded shards",
+           py::arg("shards"),
+           py::arg("batch_size"),
+           py::arg("mean"),
+           py::arg("height"),
+           py::arg("width"),
+           py::arg("num_threads") = 1,
+           py::arg("random") = false,
+           py::arg("num_epochs") = 1,
+           py::arg("buf_size") = 3);
+    mc.def_property_readonly("num_examples", &MmapIterator::num_examples);
+
+#if CHAINER_COMPILER_ENABLE_OPENCV
+    py::class_<ImageNetIterator, DataIterator, std::shared_ptr<ImageNetIterator>> ic{m, "ImageNetIterator"};
+    ic.def(py::init(&CreateImageNetIterator),
+           "Iterate over mini-batches of a labeled image list",
+           py::arg("labeled_image_dataset"),
+           py::arg("batch_size"),
+           py::arg("mean"),
+           py::arg("height"),
+           py::arg("width"),
+           py::arg("num_decode_threads") = 1,
+           py::arg("random") = false,
+           py::arg("num_epochs") = 1,
+           py::arg("buf_size") = 3);
+    ic.def_property_readonly("num_examples", &ImageNetIterator::num_examples);
+#endif
+}
+
 }  // namespace
 
 PYBIND11_MODULE(chainer_compiler_core, m) {  // NOLINT
@@ -256,6 +478,10 @@ PYBIND11_MODULE(chainer_compiler_core, m) {  // NOLINT
 
     InitXCVM(m);
 
+    InitDataIterator(m);
+
+    m.attr("initial_loss_scale") = kInitialLossScale;
+
     m.def("load", &LoadGraph, "Load an ONNX model");
     m.def("value", &CreateValueFromArray, "Create an XCVMVar from a ChainerX Array");
     m.def("value", &CreateValueFromSequence, "Create an XCVMVar from a sequence of XCVMVars");
@@ -92,3 +92,47 @@ def test_backprop():
     grad_b = chainerx.sum(grad_loss, axis=0)
     chainerx.testing.assert_allclose(
         grad_b, bwd_outputs['grad_out@/l1/b'].array())
+
+
+def test_array_iterator():
+    x = np.arange(10 * 3).reshape((10, 3)).astype(np.float32)
+    t = np.arange(10).astype(np.int32)
+    it = chainer_compiler_core.ArrayIterator(
+        [chainerx.asarray(x), chainerx.asarray(t)], 4, shuffle=False)
+    assert it.num_examples == 10
+
+    batches = list(it)
+    assert [len(b[1]) for b in batches] == [4, 4, 2]
+    for i, (bx, bt) in enumerate(batches):
+        assert isinstance(bx, chainerx.ndarray)
+        chainerx.testing.assert_array_equal(bx, x[i * 4:i * 4 + 4])
+        chainerx.testing.assert_array_equal(bt, t[i * 4:i * 4 + 4])
+    it.terminate()
+
+
+def test_cost_model():
+    graph = chainer_compiler_core.load('out/ch2o_node_Linear/model.onnx')
+    graph.compile()
+
+    flops = graph.flops()
+    assert flops['num_unknown_ops'] == 0
+    assert flops['total'] > 0
+    assert flops['total'] == sum(n['flops'] for n in flops['nodes'])
+    assert 'ChainerLinear' in [n['op_type'] for n in flops['nodes']]
+
+    usage = graph.simulate_memory()
+    assert usage.num_unknowns == 0
+    assert usage.param > 0
+    assert usage.peak >= usage.param
+    assert usage.all >= usage.peak
+
+
+def test_compiler_threads():
+    dumps = []
+    for compiler_threads in [1, 4]:
+        graph = chainer_compiler_core.load(
+            'out/ch2o_syntax_ForAndIf/model.onnx')
+        graph.compile(fuse_operations=True,
+                      compiler_threads=compiler_threads)
+        dumps.append(graph.dump())
+    assert dumps[0] == dumps[1]
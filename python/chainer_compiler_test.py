@@ -151,6 +151,63 @@ def test_mnist(device_name):
         chainerx.testing.assert_allclose(e_grad, a_grad, rtol=1e-4)
 
 
+def test_mnist_mixed_precision():
+    np.random.seed(40)
+
+    batch_size = 3
+    in_size = 5
+    n_units = 4
+    n_out = 10
+
+    device = chainer.get_device('native:0')
+    device.use()
+
+    mlp = MLP(n_units, n_out)
+    model = L.Classifier(mlp)
+    model.to_device(device)
+
+    input = np.random.rand(batch_size, in_size).astype(np.float32)
+    input = device.xp.array(input)
+    target = device.xp.array(np.random.randint(n_out, size=batch_size))
+
+    expected_loss, expected_grads = _run_fwd_bwd(model, [input, target])
+
+    mlp_compiled = chainer_compiler.compile(mlp, [input],
+                                            mixed_precision=True)
+    model = L.Classifier(mlp_compiled)
+    model.to_device(device)
+
+    actual_loss, actual_grads = _run_fwd_bwd(model, [input, target])
+
+    _assert_allclose(expected_loss, actual_loss, rtol=1e-2, atol=1e-2)
+
+    assert len(expected_grads) == len(actual_grads)
+    for (e_name, e_grad), (a_name, a_grad) in zip(
+            expected_grads, actual_grads):
+        assert e_name == a_name
+        assert a_grad is not None, a_name
+        # Master copies of parameters and their gradients are float32.
+        assert a_grad.dtype == np.float32
+        chainerx.testing.assert_allclose(e_grad, a_grad,
+                                         rtol=1e-2, atol=1e-2)
+
+
+def test_dynamic_loss_scaler():
+    # The same as the initial value of `loss_scale` in C++.
+    assert chainer_compiler.DynamicLossScaler().scale == 1024
+
+    scaler = chainer_compiler.DynamicLossScaler(initial_scale=8, interval=2)
+    ok = np.ones(3, dtype=np.float32)
+    assert scaler.update([ok, None])
+    assert scaler.scale == 8
+    assert scaler.update([ok])
+    assert scaler.scale == 16
+    assert not scaler.update([ok, np.array([np.inf], dtype=np.float32)])
+    assert scaler.scale == 8
+    assert not scaler.update([np.array([np.nan], dtype=np.float32)])
+    assert scaler.scale == 4
+
+
 class MultiInOuts(chainer.Chain):
 
     def forward(self, x, y):
@@ -359,3 +416,90 @@ def test_partially_differentiable(device_name):
     #     assert e is not None
     #     assert a is not None
     #     _assert_allclose(e, a)
+
+
+class MLPWithLoss(chainer.Chain):
+
+    def __init__(self, n_units, n_out):
+        super(MLPWithLoss, self).__init__()
+        with self.init_scope():
+            self.mlp = MLP(n_units, n_out)
+
+    def forward(self, x, t):
+        return F.softmax_cross_entropy(self.mlp(x), t)
+
+
+@pytest.mark.parametrize('optimizer_class', [
+    chainer.optimizers.SGD,
+    chainer.optimizers.MomentumSGD,
+    chainer.optimizers.Adam,
+])
+def test_compile_train_step(optimizer_class):
+    np.random.seed(40)
+
+    batch_size = 3
+    in_size = 5
+    n_units = 4
+    n_out = 10
+    num_steps = 3
+
+    device = chainer.get_device('native:0')
+    device.use()
+
+    model = MLPWithLoss(n_units, n_out)
+    model.to_device(device)
+    inputs = []
+    for _ in range(num_steps):
+        x = np.random.rand(batch_size, in_size).astype(np.float32)
+        t = np.random.randint(n_out, size=batch_size)
+        inputs.append((device.xp.array(x), device.xp.array(t)))
+    # Initialize parameters before copying the model.
+    model(*inputs[0])
+    compiled_model = model.copy(mode='copy')
+
+    optimizer = optimizer_class()
+    optimizer.setup(model)
+    expected_losses = []
+    for x, t in inputs:
+        loss = model(x, t)
+        model.cleargrads()
+        loss.backward()
+        optimizer.update()
+        expected_losses.append(chainer.backend.to_chx(loss.array))
+
+    optimizer = optimizer_class()
+    optimizer.setup(compiled_model)
+    train_step = chainer_compiler.compile_train_step(
+        compiled_model, optimizer, list(inputs[0]))
+    actual_losses = [train_step(x, t) for x, t in inputs]
+    train_step.update_model()
+    assert optimizer.t == num_steps
+
+    for e, a in zip(expected_losses, actual_losses):
+        _assert_allclose(e, a, rtol=1e-4)
+
+    expected_params = dict(model.namedparams())
+    actual_params = dict(compiled_model.namedparams())
+    assert expected_params.keys() == actual_params.keys()
+    for name, e in expected_params.items():
+        a = actual_params[name]
+        chainerx.testing.assert_allclose(
+            chainer.backend.to_chx(e.array),
+            chainer.backend.to_chx(a.array), rtol=1e-4, atol=1e-6)
+
+
+def test_native_iterator_epoch_detail():
+    x = np.arange(10 * 3).reshape((10, 3)).astype(np.float32)
+    it = chainer_compiler.array_iterator([x], 4, shuffle=False)
+    assert it.previous_epoch_detail is None
+    assert it.epoch_detail == 0
+
+    expected = [(0.4, 0.0, False), (0.8, 0.4, False), (1.2, 0.8, True),
+                (1.6, 1.2, False)]
+    for epoch_detail, previous_epoch_detail, is_new_epoch in expected:
+        next(it)
+        assert it.epoch_detail == pytest.approx(epoch_detail)
+        assert it.previous_epoch_detail == pytest.approx(
+            previous_epoch_detail)
+        assert it.is_new_epoch == is_new_epoch
+    it.finalize()
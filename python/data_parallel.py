@@ -0,0 +1,324 @@
+"""Data-parallel training of compiled models by CPU worker processes.
+
+Each worker process runs the compiled forward and backward of a model
+on its shard of a batch. Gradients are averaged by an allreduce over
+shared memory, so neither MPI nor network is needed. Then every
+worker applies the same update by its Chainer optimizer, so copies of
+parameters in workers stay the same.
+
+Workers are forked from the calling process, so they start from the
+same parameters without broadcasting them.
+"""
+
+import collections
+import ctypes
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+import traceback
+
+import chainer
+import numpy as np
+
+import chainer_compiler
+
+
+Result = collections.namedtuple(
+    'Result', ['num_workers', 'batch_size', 'num_steps', 'elapsed',
+               'throughput', 'compute', 'allreduce', 'update', 'losses'])
+
+
+class SharedMemoryAllreduce(object):
+    """Averages float32 arrays of worker processes in shared memory.
+
+    Arrays are concatenated and split into buckets of `bucket_size`
+    elements. Each worker copies a bucket into its own row of a shared
+    buffer, and then sums its 1/N slice of the bucket over all rows
+    (i.e., reduce-scatter), so the reduction is spread over workers
+    like a ring allreduce. Buckets are reduced by a background thread
+    while the next buckets are being copied.
+
+    This must be created before worker processes are forked, and
+    each worker must call `attach` with its rank.
+    """
+
+    def __init__(self, num_workers, size, bucket_size=1 << 20,
+                 context=multiprocessing):
+        self.num_workers = num_workers
+        self.size = size
+        self.buckets = [(b, min(b + bucket_size, size))
+                        for b in range(0, size, bucket_size)]
+        self.rank = None
+        self._rows = context.RawArray(ctypes.c_float, num_workers * size)
+        self._result = context.RawArray(ctypes.c_float, size)
+        self._barrier = context.Barrier(num_workers)
+
+    def attach(self, rank):
+        assert 0 <= rank < self.num_workers
+        self.rank = rank
+        self._rows_np = np.frombuffer(self._rows, dtype=np.float32).reshape(
+            self.num_workers, self.size)
+        self._result_np = np.frombuffer(self._result, dtype=np.float32)
+
+    def wait(self):
+        """Waits for all workers."""
+        self._barrier.wait()
+
+    def abort(self):
+        """Wakes up other workers waiting for this worker."""
+        self._barrier.abort()
+
+    def _reduce_buckets(self, ready, errors):
+        try:
+            scale = 1.0 / self.num_workers
+            for _ in self.buckets:
+                begin, end = self.buckets[ready.get()]
+                # Wait for all workers to fill the bucket.
+                self._barrier.wait()
+                chunk = -(-(end - begin) // self.num_workers)
+                lo = min(end, begin + chunk * self.rank)
+                hi = min(end, lo + chunk)
+                result = self._result_np[lo:hi]
+                np.sum(self._rows_np[:, lo:hi], axis=0, out=result)
+                result *= scale
+            # Wait for all workers to finish their slices.
+            self._barrier.wait()
+        except Exception as e:
+            errors.append(e)
+            self.abort()
+
+    def allreduce(self, arrays):
+        """Replaces float32 `arrays` by their means over workers."""
+        assert self.rank is not None, 'attach must be called first'
+        ready = queue.Queue()
+        errors = []
+        thread = threading.Thread(target=self._reduce_buckets,
+                                  args=(ready, errors))
+        thread.start()
+
+        row = self._rows_np[self.rank]
+        offset = 0
+        num_ready = 0
+        for a in arrays:
+            row[offset:offset + a.size] = a.ravel()
+            offset += a.size
+            while (num_ready < len(self.buckets) and
+                   self.buckets[num_ready][1] <= offset):
+                ready.put(num_ready)
+                num_ready += 1
+        assert offset == self.size, (offset, self.size)
+        thread.join()
+        if errors:
+            raise errors[0]
+
+        offset = 0
+        for a in arrays:
+            a[...] = self._result_np[offset:offset + a.size].reshape(a.shape)
+            offset += a.size
+
+
+class _GradientStep(object):
+    """Runs forward and backward of a model by XCVM."""
+
+    def __init__(self, model, example_inputs, **kwargs):
+        graph, self.model_params = chainer_compiler._load_loss_graph(
+            model, example_inputs)
+        self.input_names = graph.input_names()
+        self.loss_name = graph.output_names()[0]
+        self.xcvm = graph.compile(backprop=True, **kwargs)
+
+    def __call__(self, *args):
+        """Returns the loss and a dict from parameters to gradients."""
+        assert len(self.input_names) == len(args)
+        inputs = {}
+        for name, param in self.model_params.items():
+            inputs[name] = chainer_compiler._to_var(param)
+        for name, value in zip(self.input_names, args):
+            inputs[name] = chainer_compiler._to_var(value)
+        outputs = self.xcvm.run(inputs)
+
+        device = chainer.backend.CpuDevice()
+        grads = {}
+        for name, param in self.model_params.items():
+            grad = outputs.get('grad_out@' + name)
+            if grad is not None:
+                grads[id(param)] = device.send(grad.array())
+        loss = float(outputs[self.loss_name].array())
+        return loss, grads
+
+
+def _get_batch(dataset, converter, begin, batch_size):
+    examples = [dataset[(begin + i) % len(dataset)]
+                for i in range(batch_size)]
+    batch = converter(examples)
+    if not isinstance(batch, (list, tuple)):
+        batch = [batch]
+    return batch
+
+
+def _run_worker(rank, allreduce, results, optimizer, dataset, batch_size,
+                num_steps, converter, compile_kwargs):
+    allreduce.attach(rank)
+    model = optimizer.target
+    num_workers = allreduce.num_workers
+    params = list(model.params())
+    # Gradients of parameters which do not affect the loss.
+    zeros = [np.zeros(p.shape, dtype=np.float32) for p in params]
+
+    step = _GradientStep(model, _get_batch(dataset, converter, 0, batch_size),
+                         **compile_kwargs)
+
+    # Compilation time is not measured.
+    allreduce.wait()
+    start = time.time()
+    compute = 0.0
+    allreduce_time = 0.0
+    update = 0.0
+    losses = []
+    for i in range(num_steps):
+        st = time.time()
+        batch = _get_batch(dataset, converter,
+                           (i * num_workers + rank) * batch_size, batch_size)
+        loss, grads = step(*batch)
+        losses.append(loss)
+        compute += time.time() - st
+
+        st = time.time()
+        # Gradients of the last layers come first, in the order of
+        # backpropagation.
+        arrays = [grads.get(id(p), z) for p, z in zip(params, zeros)]
+        allreduce.allreduce(arrays[::-1])
+        allreduce_time += time.time() - st
+
+        st = time.time()
+        for p, a in zip(params, arrays):
+            p.grad = a if id(p) in grads else None
+        optimizer.update()
+        update += time.time() - st
+    elapsed = time.time() - start
+
+    state = None
+    if rank == 0:
+        state = {name: p.array for name, p in model.namedparams()}
+    stats = (elapsed, compute, allreduce_time, update, losses)
+    results.put((rank, None, stats, state))
+
+
+def _worker_main(rank, allreduce, results, *args):
+    try:
+        _run_worker(rank, allreduce, results, *args)
+    except Exception:
+        allreduce.abort()
+        results.put((rank, traceback.format_exc(), None, None))
+
+
+def train(optimizer, dataset, batch_size, num_steps, num_workers,
+          bucket_size=1 << 20, converter=chainer.dataset.concat_examples,
+          **kwargs):
+    """Trains `optimizer.target` by `num_workers` processes.
+
+    The target model must return a loss, and all its parameters must
+    be float32 on CPU. Each worker takes `batch_size` examples from
+    `dataset` in a step, so a step consumes `batch_size * num_workers`
+    examples. Trained parameters are copied back to `optimizer.target`,
+    but states of the optimizer in workers are discarded.
+    Keyword arguments are passed to `Graph.compile`.
+
+    Returns a `Result` with the time spent in the steps and per-phase
+    time summed over steps, averaged over workers.
+    """
+    model = optimizer.target
+    if any(p.array is None for p in model.params()):
+        with chainer.no_backprop_mode():
+            model(*_get_batch(dataset, converter, 0, batch_size))
+    for name, p in model.namedparams():
+        if not isinstance(p.array, np.ndarray) or p.dtype != np.float32:
+            raise ValueError('Parameters must be float32 numpy arrays: %s' %
+                             name)
+
+    context = multiprocessing.get_context('fork')
+    size = sum(p.size for p in model.params())
+    allreduce = SharedMemoryAllreduce(num_workers, size,
+                                      bucket_size=bucket_size,
+                                      context=context)
+    results = context.Queue()
+    workers = []
+    for rank in range(num_workers):
+        worker = context.Process(
+            target=_worker_main,
+            args=(rank, allreduce, results, optimizer, dataset, batch_size,
+                  num_steps, converter, kwargs))
+        worker.start()
+        workers.append(worker)
+
+    stats = [None] * num_workers
+    errors = []
+    state = None
+    for _ in range(num_workers):
+        rank, error, stat, st = results.get()
+        if error is not None:
+            errors.append('worker %d: %s' % (rank, error))
+        stats[rank] = stat
+        if st is not None:
+            state = st
+    for worker in workers:
+        worker.join()
+    if errors:
+        raise RuntimeError('Data-parallel training failed\n' +
+                           '\n'.join(errors))
+
+    for name, p in model.namedparams():
+        p.array[...] = state[name]
+
+    elapsed = max(s[0] for s in stats)
+    losses = np.mean([s[4] for s in stats], axis=0).tolist()
+    return Result(num_workers=num_workers,
+                  batch_size=batch_size,
+                  num_steps=num_steps,
+                  elapsed=elapsed,
+                  throughput=batch_size * num_workers * num_steps / elapsed,
+                  compute=np.mean([s[1] for s in stats]),
+                  allreduce=np.mean([s[2] for s in stats]),
+                  update=np.mean([s[3] for s in stats]),
+                  losses=losses)
+
+
+def measure_scaling(optimizer, dataset, batch_size, num_steps,
+                    worker_counts=(1, 2, 4), **kwargs):
+    """Trains copies of `optimizer` by each number of workers.
+
+    `optimizer.target` is not updated. Returns a list of `Result`.
+    """
+    import copy
+
+    results = []
+    for num_workers in worker_counts:
+        # The target is copied together.
+        opt = copy.deepcopy(optimizer)
+        results.append(train(opt, dataset, batch_size, num_steps,
+                             num_workers, **kwargs))
+    return results
+
+
+def report(results, out=sys.stdout):
+    """Writes throughput and scaling efficiency of `results`.
+
+    The efficiency is the throughput divided by the number of workers
+    and the throughput per worker of the first result.
+    """
+    base = results[0].throughput / results[0].num_workers
+    out.write('%8s %12s %8s %10s %10s %10s %10s\n' % (
+        'workers', 'examples/s', 'speedup', 'efficiency', 'compute',
+        'allreduce', 'update'))
+    for r in results:
+        speedup = r.throughput / base
+        out.write('%8d %12.1f %7.2fx %9.1f%% %8.1fms %8.1fms %8.1fms\n' % (
+            r.num_workers,
+            r.throughput,
+            speedup,
+            100.0 * speedup / r.num_workers,
+            1000.0 * r.compute / r.num_steps,
+            1000.0 * r.allreduce / r.num_steps,
+            1000.0 * r.update / r.num_steps))
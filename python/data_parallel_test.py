@@ -0,0 +1,105 @@
+import multiprocessing
+import os
+import sys
+
+import chainer
+import chainer.functions as F
+import chainer.links as L
+import numpy as np
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(project_root, 'ch2o'))
+sys.path.append(os.path.join(project_root, 'python'))
+sys.path.append(os.path.join(project_root, 'build/python'))
+
+import data_parallel
+
+
+def _allreduce_worker(rank, allreduce, sizes, results):
+    allreduce.attach(rank)
+    for step in range(2):
+        arrays = [np.full(size, rank * 10 + i + step, dtype=np.float32)
+                  for i, size in enumerate(sizes)]
+        allreduce.allreduce(arrays)
+        results.put((rank, step, arrays))
+
+
+def test_shared_memory_allreduce():
+    num_workers = 3
+    sizes = [5, 7, 3]
+    context = multiprocessing.get_context('fork')
+    # Buckets do not match boundaries of arrays.
+    allreduce = data_parallel.SharedMemoryAllreduce(
+        num_workers, sum(sizes), bucket_size=4, context=context)
+    results = context.Queue()
+    workers = [context.Process(target=_allreduce_worker,
+                               args=(rank, allreduce, sizes, results))
+               for rank in range(num_workers)]
+    for worker in workers:
+        worker.start()
+    outputs = [results.get() for _ in range(num_workers * 2)]
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    for rank, step, arrays in outputs:
+        for i, (size, a) in enumerate(zip(sizes, arrays)):
+            expected = np.full(size, 10 + i + step, dtype=np.float32)
+            np.testing.assert_allclose(expected, a)
+
+
+class MLPWithLoss(chainer.Chain):
+
+    def __init__(self, n_units, n_out):
+        super(MLPWithLoss, self).__init__()
+        with self.init_scope():
+            self.l1 = L.Linear(None, n_units)
+            self.l2 = L.Linear(None, n_out)
+
+    def forward(self, x, t):
+        return F.softmax_cross_entropy(self.l2(F.relu(self.l1(x))), t)
+
+
+def test_train():
+    np.random.seed(42)
+
+    num_workers = 2
+    batch_size = 3
+    num_steps = 2
+    in_size = 5
+    n_out = 4
+
+    num_examples = num_workers * batch_size * num_steps
+    xs = np.random.rand(num_examples, in_size).astype(np.float32)
+    ts = np.random.randint(n_out, size=num_examples)
+    dataset = chainer.datasets.TupleDataset(xs, ts)
+
+    model = MLPWithLoss(3, n_out)
+    model(xs[:1], ts[:1])
+    expected_model = model.copy(mode='copy')
+
+    # A step of workers is the same as a step with the whole batch.
+    optimizer = chainer.optimizers.SGD()
+    optimizer.setup(expected_model)
+    expected_losses = []
+    global_batch_size = num_workers * batch_size
+    for i in range(num_steps):
+        s = slice(i * global_batch_size, (i + 1) * global_batch_size)
+        loss = expected_model(xs[s], ts[s])
+        expected_model.cleargrads()
+        loss.backward()
+        optimizer.update()
+        expected_losses.append(float(loss.array))
+
+    optimizer = chainer.optimizers.SGD()
+    optimizer.setup(model)
+    result = data_parallel.train(optimizer, dataset, batch_size, num_steps,
+                                 num_workers)
+    assert result.num_workers == num_workers
+    assert result.throughput > 0
+    np.testing.assert_allclose(expected_losses, result.losses, rtol=1e-5)
+
+    expected_params = dict(expected_model.namedparams())
+    for name, param in model.namedparams():
+        np.testing.assert_allclose(expected_params[name].array, param.array,
+                                   rtol=1e-4, atol=1e-6)
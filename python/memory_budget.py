@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+"""Finds batch sizes and Chen's budgets which fit in a memory limit.
+
+This runs the compiler on the forward+backward graph of an ONNX model
+and estimates the peak memory usage by the memory simulator of the
+compiler, i.e., nothing is executed on devices.
+
+The batch size is changed by rewriting the first dimension of
+non-parameter inputs, so the model must not depend on a specific
+batch size (e.g., by a Reshape with a constant shape).
+"""
+
+import argparse
+import collections
+import os
+import sys
+import tempfile
+
+import onnx
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(project_root, 'build/python'))
+
+import chainer_compiler_core
+
+
+Estimate = collections.namedtuple(
+    'Estimate', ['batch_size', 'chen_budget', 'param', 'peak', 'flops',
+                 'recompute_flops', 'num_unknowns'])
+
+
+def _load_graph(onnx_path, batch_size):
+    if batch_size is None:
+        return chainer_compiler_core.load(onnx_path)
+
+    xmodel = onnx.load(onnx_path)
+    initializers = set(i.name for i in xmodel.graph.initializer)
+    for input in xmodel.graph.input:
+        if input.name in initializers:
+            continue
+        dims = input.type.tensor_type.shape.dim
+        if dims:
+            dims[0].dim_value = batch_size
+    # Let the compiler infer shapes for the new batch size.
+    del xmodel.graph.value_info[:]
+    for output in xmodel.graph.output:
+        output.type.tensor_type.ClearField('shape')
+
+    f = tempfile.NamedTemporaryFile(suffix='.onnx', delete=False)
+    f.write(xmodel.SerializeToString())
+    f.close()
+    try:
+        return chainer_compiler_core.load(f.name)
+    finally:
+        os.unlink(f.name)
+
+
+class MemoryBudgetSearcher(object):
+    """Estimates memory usage and FLOPs of training a model.
+
+    All estimates are kept in `self.estimates` so they can be reported
+    later.
+    """
+
+    def __init__(self, onnx_path, computation_order='chen',
+                 **compile_kwargs):
+        self.onnx_path = onnx_path
+        self.computation_order = computation_order
+        self.compile_kwargs = compile_kwargs
+        self.estimates = []
+        self._flops_without_recompute = {}
+
+    def _compile(self, batch_size, chen_budget):
+        graph = _load_graph(self.onnx_path, batch_size)
+        kwargs = dict(self.compile_kwargs)
+        if chen_budget is not None:
+            kwargs['computation_order'] = self.computation_order
+            kwargs['chen_budget'] = chen_budget
+        graph.compile(backprop=True, **kwargs)
+        return graph
+
+    def _flops(self, batch_size):
+        if batch_size not in self._flops_without_recompute:
+            graph = self._compile(batch_size, None)
+            flops = graph.flops()['total']
+            self._flops_without_recompute[batch_size] = flops
+        return self._flops_without_recompute[batch_size]
+
+    def estimate(self, batch_size=None, chen_budget=None):
+        """Estimates training with `batch_size` and `chen_budget` (MB).
+
+        `chen_budget=None` means no recomputation. The budget is used
+        by the policy of `computation_order`.
+        """
+        graph = self._compile(batch_size, chen_budget)
+        usage = graph.simulate_memory()
+        flops = graph.flops()
+        recompute_flops = 0
+        if chen_budget is not None:
+            recompute_flops = flops['total'] - self._flops(batch_size)
+        e = Estimate(batch_size=batch_size,
+                     chen_budget=chen_budget,
+                     param=usage.param,
+                     peak=usage.peak,
+                     flops=flops['total'],
+                     recompute_flops=recompute_flops,
+                     num_unknowns=usage.num_unknowns + flops['num_unknown_ops'])
+        self.estimates.append(e)
+        return e
+
+    def find_max_batch_size(self, memory_limit, chen_budget=None,
+                            max_batch_size=1 << 16):
+        """Returns the largest batch size whose peak fits `memory_limit`.
+
+        Returns 0 if even batch size 1 does not fit.
+        """
+        def fits(batch_size):
+            e = self.estimate(batch_size, chen_budget)
+            return e.peak <= memory_limit
+
+        if not fits(1):
+            return 0
+        lo = 1
+        hi = 2
+        while hi <= max_batch_size and fits(hi):
+            lo = hi
+            hi *= 2
+        if hi > max_batch_size:
+            return lo
+        # `lo` fits and `hi` does not.
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if fits(mid):
+                lo = mid
+            else:
+                hi = mid
+        return lo
+
+    def find_chen_budget(self, memory_limit, batch_size=None):
+        """Returns the Chen's budget (MB) with the least recomputation.
+
+        As a larger budget means fewer recomputations, this is the
+        largest budget which fits `memory_limit`. Returns None if no
+        recomputation is needed, and 0 if no budget fits.
+        """
+        e = self.estimate(batch_size, None)
+        if e.peak <= memory_limit:
+            return None
+        # Any budget larger than all activations behaves the same.
+        hi = e.peak // 1000000 + 1
+
+        def fits(budget):
+            return self.estimate(batch_size, budget).peak <= memory_limit
+
+        if not fits(1):
+            return 0
+        lo = 1
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if fits(mid):
+                lo = mid
+            else:
+                hi = mid
+        return lo
+
+    def report(self, out=sys.stdout):
+        out.write('%10s %10s %10s %10s %14s %14s\n' % (
+            'batchsize', 'budget', 'param', 'peak', 'flops', 'recompute'))
+        for e in self.estimates:
+            budget = '-' if e.chen_budget is None else '%dMB' % e.chen_budget
+            out.write('%10s %10s %8dMB %8dMB %14d %13.1f%%%s\n' % (
+                '-' if e.batch_size is None else e.batch_size,
+                budget,
+                e.param // 1000000,
+                e.peak // 1000000,
+                e.flops,
+                100.0 * e.recompute_flops / max(1, e.flops -
+                                                e.recompute_flops),
+                ' (incomplete)' if e.num_unknowns else ''))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('onnx', help='ONNX model')
+    parser.add_argument('--memory_limit', type=int, required=True,
+                        help='Memory limit in MB')
+    parser.add_argument('--search', choices=['batchsize', 'chen_budget'],
+                        default='batchsize', help='What to search')
+    parser.add_argument('--batchsize', '-B', type=int,
+                        help='Batch size for --search=chen_budget')
+    parser.add_argument('--chen_budget', type=int,
+                        help='Chen\'s budget (MB) for --search=batchsize')
+    parser.add_argument('--computation_order', choices=['chen', 'remat'],
+                        default='chen',
+                        help='The policy of recomputation')
+    parser.add_argument('--fuse_operations', action='store_true',
+                        help='Fuse consecutive operations')
+    args = parser.parse_args()
+
+    searcher = MemoryBudgetSearcher(args.onnx,
+                                    computation_order=args.computation_order,
+                                    fuse_operations=args.fuse_operations)
+    limit = args.memory_limit * 1000000
+    if args.search == 'batchsize':
+        result = searcher.find_max_batch_size(limit, args.chen_budget)
+        searcher.report()
+        print('Largest batch size: %d' % result)
+    else:
+        result = searcher.find_chen_budget(limit, args.batchsize)
+        searcher.report()
+        if result is None:
+            print('No recomputation is needed')
+        elif result == 0:
+            print('No budget fits in the memory limit')
+        else:
+            print('Chen\'s budget: %dMB' % result)
+
+
+if __name__ == '__main__':
+    main()
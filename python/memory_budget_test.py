@@ -0,0 +1,30 @@
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(project_root, 'python'))
+
+import memory_budget
+
+
+MODEL = 'out/ch2o_node_Linear_backprop/model.onnx'
+
+
+def test_estimate():
+    searcher = memory_budget.MemoryBudgetSearcher(MODEL)
+    small = searcher.estimate(batch_size=2)
+    large = searcher.estimate(batch_size=64)
+    assert small.param == large.param
+    assert small.peak < large.peak
+    assert small.flops < large.flops
+    assert small.recompute_flops == 0
+    assert len(searcher.estimates) == 2
+
+
+def test_find_max_batch_size():
+    searcher = memory_budget.MemoryBudgetSearcher(MODEL)
+    limit = searcher.estimate(batch_size=20).peak
+    batch_size = searcher.find_max_batch_size(limit)
+    assert batch_size >= 20
+    assert searcher.estimate(batch_size=batch_size).peak <= limit
+    assert searcher.estimate(batch_size=batch_size + 1).peak > limit
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+"""Post-training int8 quantization for CPU inference.
+
+This runs an ONNX model on calibration inputs, collects the range of
+each float tensor, and writes the ranges to a file. The file is used
+by `--quantization_ranges` of run_onnx or `quantization_ranges` of
+`Graph.compile`, which let Conv, Gemm, and MatMul run in int8.
+
+Calibration inputs are ONNX test data (`test_data_set_*/input_*.pb`).
+By default, test data next to the model are used for both calibration
+and validation, e.g., for out/onnx_real_resnet50/model.onnx.
+"""
+
+import argparse
+import glob
+import os
+import sys
+import tempfile
+
+import chainerx
+import numpy as np
+import onnx
+from onnx import numpy_helper
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(project_root, 'build/python'))
+
+import chainer_compiler_core
+
+
+def load_test_data(xmodel, test_dir):
+    """Returns pairs of inputs (a dict) and expected outputs (a list)."""
+    initializers = set(i.name for i in xmodel.graph.initializer)
+    input_names = [i.name for i in xmodel.graph.input
+                   if i.name not in initializers]
+    data = []
+    for data_set in sorted(glob.glob(os.path.join(test_dir,
+                                                  'test_data_set_*'))):
+        def load(prefix):
+            arrays = []
+            for pb in sorted(glob.glob(os.path.join(data_set,
+                                                    prefix + '_*.pb'))):
+                tensor = onnx.TensorProto()
+                with open(pb, 'rb') as f:
+                    tensor.ParseFromString(f.read())
+                arrays.append(numpy_helper.to_array(tensor))
+            return arrays
+
+        inputs = dict(zip(input_names, load('input')))
+        data.append((inputs, load('output')))
+    return data
+
+
+def _run(graph, xcvm, inputs):
+    values = dict(graph.params())
+    for name, array in inputs.items():
+        values[name] = chainer_compiler_core.value(chainerx.array(array))
+    outputs = xcvm.run(values)
+    return {name: chainerx.to_numpy(v.array())
+            for name, v in outputs.items() if v.is_array()}
+
+
+class Calibrator(object):
+    """Collects ranges of float tensors of an ONNX model."""
+
+    def __init__(self, onnx_path):
+        self.xmodel = onnx.load(onnx_path)
+        self.ranges = {}
+
+        # Expose all float tensors as outputs so they can be observed.
+        xmodel = onnx.shape_inference.infer_shapes(self.xmodel)
+        initializers = set(i.name for i in xmodel.graph.initializer)
+        outputs = set(o.name for o in xmodel.graph.output)
+        candidates = list(xmodel.graph.input) + list(xmodel.graph.value_info)
+        for value in candidates:
+            if value.name in initializers or value.name in outputs:
+                continue
+            if value.type.tensor_type.elem_type != onnx.TensorProto.FLOAT:
+                continue
+            xmodel.graph.output.extend([value])
+            outputs.add(value.name)
+        self.observed = outputs
+
+        f = tempfile.NamedTemporaryFile(suffix='.onnx', delete=False)
+        f.write(xmodel.SerializeToString())
+        f.close()
+        try:
+            self.graph = chainer_compiler_core.load(f.name)
+        finally:
+            os.unlink(f.name)
+        self.xcvm = self.graph.compile()
+
+    def feed(self, inputs):
+        """Runs the model with `inputs` (a dict of NumPy arrays)."""
+        for name, array in _run(self.graph, self.xcvm, inputs).items():
+            if name not in self.observed or array.dtype != np.float32:
+                continue
+            if not array.size:
+                continue
+            lo, hi = float(array.min()), float(array.max())
+            if name in self.ranges:
+                plo, phi = self.ranges[name]
+                lo, hi = min(lo, plo), max(hi, phi)
+            self.ranges[name] = (lo, hi)
+
+    def write(self, filename):
+        with open(filename, 'w') as f:
+            for name, (lo, hi) in sorted(self.ranges.items()):
+                f.write('%s %.9g %.9g\n' % (name, lo, hi))
+
+
+def validate(onnx_path, ranges_file, data, rtol=1e-4, atol=1e-6):
+    """Compares outputs of the quantized model with expected outputs.
+
+    Returns a list of dicts of statistics, one for each output of
+    each test case. `top1` is whether the argmax of each row agrees.
+    """
+    graph = chainer_compiler_core.load(onnx_path)
+    xcvm = graph.compile(quantization_ranges=ranges_file)
+    output_names = graph.output_names()
+    stats = []
+    for inputs, expected_outputs in data:
+        outputs = _run(graph, xcvm, inputs)
+        for name, expected in zip(output_names, expected_outputs):
+            actual = outputs[name]
+            error = np.abs(actual - expected)
+            s = {
+                'name': name,
+                'max_error': float(error.max()) if error.size else 0.0,
+                'mismatch': float(np.mean(error > atol + rtol *
+                                          np.abs(expected))),
+            }
+            if expected.ndim == 2:
+                s['top1'] = float(np.mean(np.argmax(actual, axis=1) ==
+                                          np.argmax(expected, axis=1)))
+            stats.append(s)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('onnx', help='ONNX model')
+    parser.add_argument('--output', '-o', required=True,
+                        help='Output file of value ranges')
+    parser.add_argument('--calibration_data', nargs='*',
+                        help='Directories of test data for calibration')
+    parser.add_argument('--validation_data', nargs='*',
+                        help='Directories of test data for validation')
+    parser.add_argument('--rtol', type=float, default=1e-4,
+                        help='rtol to count mismatched elements')
+    parser.add_argument('--atol', type=float, default=1e-6,
+                        help='atol to count mismatched elements')
+    parser.add_argument('--min_top1_agreement', type=float, default=1.0,
+                        help='Fail if top-1 agreement is lower than this')
+    args = parser.parse_args()
+
+    model_dir = os.path.dirname(args.onnx)
+    calibrator = Calibrator(args.onnx)
+    for test_dir in args.calibration_data or [model_dir]:
+        for inputs, _ in load_test_data(calibrator.xmodel, test_dir):
+            calibrator.feed(inputs)
+    calibrator.write(args.output)
+    print('Wrote ranges of %d values to %s' %
+          (len(calibrator.ranges), args.output))
+
+    data = []
+    for test_dir in args.validation_data or [model_dir]:
+        data.extend(load_test_data(calibrator.xmodel, test_dir))
+    ok = True
+    for s in validate(args.onnx, args.output, data,
+                      rtol=args.rtol, atol=args.atol):
+        line = '%-30s max_error=%g mismatch=%.2f%%' % (
+            s['name'], s['max_error'], s['mismatch'] * 100)
+        if 'top1' in s:
+            line += ' top1_agreement=%.2f%%' % (s['top1'] * 100)
+            ok &= s['top1'] >= args.min_top1_agreement
+        print(line)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
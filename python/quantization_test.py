@@ -0,0 +1,33 @@
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(project_root, 'python'))
+
+import quantization
+
+
+MODEL_DIR = 'out/ch2o_node_Linear'
+MODEL = os.path.join(MODEL_DIR, 'model.onnx')
+
+
+def test_calibrate_and_validate():
+    calibrator = quantization.Calibrator(MODEL)
+    data = quantization.load_test_data(calibrator.xmodel, MODEL_DIR)
+    assert data
+    for inputs, _ in data:
+        calibrator.feed(inputs)
+    assert calibrator.ranges
+    for lo, hi in calibrator.ranges.values():
+        assert lo <= hi
+
+    with tempfile.NamedTemporaryFile(suffix='.txt') as f:
+        calibrator.write(f.name)
+        stats = quantization.validate(MODEL, f.name, data)
+    assert stats
+    for s in stats:
+        assert np.isfinite(s['max_error'])
+        assert 0 <= s['mismatch'] <= 1
@@ -0,0 +1,189 @@
+#include <dlfcn.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+#include <cerrno>
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+#include <fstream>
+#include <functional>
+#include <map>
+#include <mutex>
+#include <sstream>
+
+#include <chainerx/array.h>
+#include <chainerx/routines/creation.h>
+#include <chainerx/shape.h>
+
+#include <common/log.h>
+#include <common/strutil.h>
+#include <runtime/chainerx_util.h>
+#include <runtime/gen_xcvm_ops.h>
+
+namespace chainer_compiler {
+namespace runtime {
+
+namespace {
+
+typedef void (*ElementWiseCpuFunc)(int64_t n, void** args);
+
+// Returns true if `path` is owned by the current user and not
+// writable by others.
+bool IsPrivate(const std::string& path) {
+    struct stat st;
+    if (lstat(path.c_str(), &st) != 0) return false;
+    return st.st_uid == getuid() && (st.st_mode & (S_IWGRP | S_IWOTH)) == 0;
+}
+
+void MakeDir(const std::string& dir) {
+    if (mkdir(dir.c_str(), 0700) == 0) return;
+    CHECK_EQ(EEXIST, errno) << "Failed to create " << dir << ": " << strerror(errno);
+}
+
+// Shared objects in the cache directory are loaded by dlopen, so it
+// must not be writable by other users. It is
+// $CHAINER_COMPILER_CACHE_DIR, $XDG_CACHE_HOME/chainer_compiler, or
+// ~/.cache/chainer_compiler. Without $HOME, a temporary directory is
+// used for each process.
+std::string GetCacheDir() {
+    static const std::string cache_dir = []() -> std::string {
+        std::string dir;
+        const char* env = std::getenv("CHAINER_COMPILER_CACHE_DIR");
+        const char* xdg_cache_home = std::getenv("XDG_CACHE_HOME");
+        const char* home = std::getenv("HOME");
+        if (env && *env) {
+            dir = env;
+        } else if (xdg_cache_home && *xdg_cache_home) {
+            MakeDir(xdg_cache_home);
+            dir = StrCat(xdg_cache_home, "/chainer_compiler");
+        } else if (home && *home) {
+            MakeDir(StrCat(home, "/.cache"));
+            dir = StrCat(home, "/.cache/chainer_compiler");
+        } else {
+            char tmpl[] = "/tmp/chainer_compiler_XXXXXX";
+            CHECK(mkdtemp(tmpl)) << "Failed to create a temporary directory: " << strerror(errno);
+            return tmpl;
+        }
+        MakeDir(dir);
+        CHECK(IsPrivate(dir)) << "The cache directory must be owned by the current user and not writable by others: " << dir;
+        return dir;
+    }();
+    return cache_dir;
+}
+
+bool ReadFile(const std::string& filename, std::string* contents) {
+    std::ifstream ifs(filename);
+    if (!ifs) return false;
+    std::ostringstream oss;
+    oss << ifs.rdbuf();
+    *contents = oss.str();
+    return true;
+}
+
+bool FileExists(const std::string& filename) {
+    struct stat st;
+    return stat(filename.c_str(), &st) == 0;
+}
+
+// Compiles `code` to a shared object unless it is already in the
+// cache directory, and returns the filename of the shared object.
+std::string CompileToSharedObject(const std::string& code) {
+    const std::string base = StrCat(GetCacheDir(), "/libchainer_compiler_cpu_", std::hash<std::string>()(code));
+    const std::string src_filename = base + ".cc";
+    const std::string dso_filename = base + ".so";
+
+    std::string cached_code;
+    if (FileExists(dso_filename) && ReadFile(src_filename, &cached_code) && cached_code == code) {
+        return dso_filename;
+    }
+
+    // Write files with unique names and rename them so concurrent
+    // processes never see incomplete files.
+    const std::string tmp_base = StrCat(base, ".", getpid());
+    const std::string tmp_src = tmp_base + ".cc";
+    const std::string tmp_dso = tmp_base + ".so";
+    {
+        std::ofstream ofs(tmp_src);
+        CHECK(ofs) << "Failed to open: " << tmp_src;
+        ofs << code;
+    }
+
+    const char* cxx = std::getenv("CXX");
+    const std::string cmd =
+            StrCat(cxx && *cxx ? cxx : "c++", " -std=c++11 -O3 -march=native -fopenmp -shared -fPIC -o ", tmp_dso, " ", tmp_src);
+    CHECK_EQ(0, std::system(cmd.c_str())) << "Failed to compile a fusion group: " << cmd << "\ncode:\n" << code;
+    CHECK_EQ(0, std::rename(tmp_dso.c_str(), dso_filename.c_str())) << dso_filename;
+    CHECK_EQ(0, std::rename(tmp_src.c_str(), src_filename.c_str())) << src_filename;
+    return dso_filename;
+}
+
+ElementWiseCpuFunc CompileAndLoad(const std::string& name, const std::string& code) {
+    static std::mutex mu;
+    static std::map<const std::string, ElementWiseCpuFunc> cache;
+    std::lock_guard<std::mutex> lock(mu);
+    auto found = cache.find(code);
+    if (found != cache.end()) return found->second;
+
+    const std::string dso_filename = CompileToSharedObject(code);
+    CHECK(IsPrivate(dso_filename)) << "Refusing to load a shared object writable by others: " << dso_filename;
+    void* handle = dlopen(dso_filename.c_str(), RTLD_NOW | RTLD_LOCAL);
+    CHECK(handle) << "Failed to load " << dso_filename << ": " << dlerror();
+    ElementWiseCpuFunc func = reinterpret_cast<ElementWiseCpuFunc>(dlsym(handle, name.c_str()));
+    CHECK(func) << "No " << name << " in " << dso_filename;
+
+    CHECK(cache.emplace(code, func).second);
+    return func;
+}
+
+}  // namespace
+
+std::vector<chainerx::Array> ElementWiseCpuOp::RunImpl(
+        chainer_compiler::runtime::XCVMState* st, const std::vector<chainerx::Array>& orig_inputs) {
+    CHECK(!inputs.empty());
+    const std::string& name = StrCat("fusion", fusion_id);
+    chainerx::Device& device = orig_inputs[0].device();
+    CHECK(!IsCudaDevice(&device)) << "Use NVRTC for CUDA: " << name;
+
+    // Validate inputs.
+    chainerx::Dtype dtype = orig_inputs[0].dtype();
+    CHECK_EQ(chainerx::Dtype::kFloat32, dtype) << "Only float32 is supported: " << name;
+    chainerx::Shape shape = orig_inputs[0].shape();
+    for (const chainerx::Array& input : orig_inputs) {
+        CHECK_EQ(dtype, input.dtype());
+        CHECK_EQ(&device, &input.device());
+        shape = chainerx::internal::BroadcastShapes(shape, input.shape());
+    }
+
+    std::vector<chainerx::Array> inputs;
+    for (chainerx::Array input : orig_inputs) {
+        if (shape != input.shape()) {
+            // TODO(hamaji): Generate code which works without broadcast.
+            input = input.BroadcastTo(shape);
+        }
+        if (!input.IsContiguous()) {
+            input = chainerx::Copy(input);
+        }
+        inputs.push_back(input);
+    }
+
+    std::vector<chainerx::Array> outputs;
+    for (int i = 0; i < num_outputs; ++i) {
+        outputs.push_back(chainerx::Empty(shape, dtype, device));
+    }
+
+    ElementWiseCpuFunc func = CompileAndLoad(name, code);
+
+    std::vector<void*> args;
+    for (chainerx::Array& input : inputs) {
+        args.push_back(input.raw_data());
+    }
+    for (chainerx::Array& output : outputs) {
+        args.push_back(output.raw_data());
+    }
+    func(shape.GetTotalSize(), args.data());
+    return outputs;
+}
+
+}  // namespace runtime
+}  // namespace chainer_compiler
@@ -0,0 +1,134 @@
+#include <cmath>
+#include <cstdint>
+
+#include <chainerx/array.h>
+#include <chainerx/routines/creation.h>
+#include <chainerx/routines/math.h>
+
+#include <common/log.h>
+#include <runtime/chainerx_util.h>
+#include <runtime/gen_xcvm_ops.h>
+
+namespace chainer_compiler {
+namespace runtime {
+
+namespace {
+
+// Parameters and optimizer states are updated in place so they keep
+// living in the same buffers across training steps. On CPU, float32
+// arrays are updated by a single loop without temporary arrays.
+
+bool CanUpdateNatively(const std::vector<const chainerx::Array*>& arrays) {
+    for (const chainerx::Array* a : arrays) {
+        if (!IsNativeDevice(&a->device()) || a->dtype() != chainerx::Dtype::kFloat32 || !a->IsContiguous()) {
+            return false;
+        }
+    }
+    return true;
+}
+
+float* GetFloatData(const chainerx::Array& a) {
+    return reinterpret_cast<float*>(static_cast<char*>(a.raw_data()) + a.offset());
+}
+
+void CheckSameShape(const chainerx::Array& param, const chainerx::Array& a) {
+    CHECK_EQ(param.shape(), a.shape()) << "Shape mismatch in an optimizer update";
+}
+
+}  // namespace
+
+chainerx::Array SGDUpdateOp::RunImpl(XCVMState* st, const chainerx::Array& param, const chainerx::Array& grad, const chainerx::Array& lr) {
+    CheckSameShape(param, grad);
+    if (CanUpdateNatively({&param, &grad})) {
+        const float lr_value = static_cast<float>(chainerx::AsScalar(lr));
+        float* p = GetFloatData(param);
+        const float* g = GetFloatData(grad);
+        const int64_t size = param.GetTotalSize();
+        for (int64_t i = 0; i < size; ++i) {
+            p[i] -= lr_value * g[i];
+        }
+        return param;
+    }
+
+    chainerx::Array p = param;
+    p -= grad * lr.AsType(param.dtype());
+    return param;
+}
+
+std::tuple<chainerx::Array, chainerx::Array> MomentumSGDUpdateOp::RunImpl(
+        XCVMState* st, const chainerx::Array& param, const chainerx::Array& grad, const chainerx::Array& v, const chainerx::Array& lr) {
+    CheckSameShape(param, grad);
+    CheckSameShape(param, v);
+    if (CanUpdateNatively({&param, &grad, &v})) {
+        const float lr_value = static_cast<float>(chainerx::AsScalar(lr));
+        float* p = GetFloatData(param);
+        const float* g = GetFloatData(grad);
+        float* vd = GetFloatData(v);
+        const int64_t size = param.GetTotalSize();
+        for (int64_t i = 0; i < size; ++i) {
+            vd[i] = momentum * vd[i] - lr_value * g[i];
+            p[i] += vd[i];
+        }
+        return std::tie(param, v);
+    }
+
+    chainerx::Array vv = v;
+    vv *= momentum;
+    vv -= grad * lr.AsType(param.dtype());
+    chainerx::Array p = param;
+    p += v;
+    return std::tie(param, v);
+}
+
+std::tuple<chainerx::Array, chainerx::Array, chainerx::Array, chainerx::Array> AdamUpdateOp::RunImpl(
+        XCVMState* st,
+        const chainerx::Array& param,
+        const chainerx::Array& grad,
+        const chainerx::Array& m,
+        const chainerx::Array& v,
+        const chainerx::Array& t,
+        const chainerx::Array& lr) {
+    CheckSameShape(param, grad);
+    CheckSameShape(param, m);
+    CheckSameShape(param, v);
+    CHECK_EQ(chainerx::Dtype::kInt64, t.dtype());
+
+    chainerx::Array tt = t;
+    tt += chainerx::OnesLike(t);
+
+    if (CanUpdateNatively({&param, &grad, &m, &v})) {
+        // The same update as chainer.optimizers.Adam with `lr` as `alpha`.
+        const int64_t step = static_cast<int64_t>(chainerx::AsScalar(t));
+        const float lr_value = static_cast<float>(chainerx::AsScalar(lr));
+        const float fix1 = 1.0 - std::pow(beta1, step);
+        const float fix2 = 1.0 - std::pow(beta2, step);
+        const float alpha_t = lr_value * std::sqrt(fix2) / fix1;
+        float* p = GetFloatData(param);
+        const float* g = GetFloatData(grad);
+        float* md = GetFloatData(m);
+        float* vd = GetFloatData(v);
+        const int64_t size = param.GetTotalSize();
+        for (int64_t i = 0; i < size; ++i) {
+            md[i] += (1 - beta1) * (g[i] - md[i]);
+            vd[i] += (1 - beta2) * (g[i] * g[i] - vd[i]);
+            p[i] -= alpha_t * md[i] / (std::sqrt(vd[i]) + epsilon);
+        }
+        return std::tie(param, m, v, t);
+    }
+
+    // Bias corrections are computed on the device to avoid a sync.
+    chainerx::Array tf = t.AsType(param.dtype());
+    chainerx::Array fix1 = -chainerx::Exp(tf * std::log(beta1)) + 1;
+    chainerx::Array fix2 = -chainerx::Exp(tf * std::log(beta2)) + 1;
+    chainerx::Array alpha_t = lr.AsType(param.dtype()) * chainerx::Sqrt(fix2) / fix1;
+    chainerx::Array mm = m;
+    mm += (grad - m) * (1 - beta1);
+    chainerx::Array vv = v;
+    vv += (grad * grad - v) * (1 - beta2);
+    chainerx::Array p = param;
+    p -= alpha_t * m / (chainerx::Sqrt(v) + epsilon);
+    return std::tie(param, m, v, t);
+}
+
+}  // namespace runtime
+}  // namespace chainer_compiler
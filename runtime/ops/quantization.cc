@@ -0,0 +1,164 @@
+#include <algorithm>
+#include <cstdint>
+
+#include <chainerx/array.h>
+#include <chainerx/routines/creation.h>
+#include <chainerx/routines/math.h>
+
+#include <common/log.h>
+#include <runtime/chainerx_util.h>
+#include <runtime/gen_xcvm_ops.h>
+
+namespace chainer_compiler {
+namespace runtime {
+
+namespace {
+
+// Multiplies `x` by `multiplier` and rounds the result to int8. Values
+// are clipped to [-127, 127], or [0, 127] if `relu` is true.
+chainerx::Array RoundToInt8(const chainerx::Array& x, float multiplier, bool relu) {
+    chainerx::Array y = x.AsType(chainerx::Dtype::kFloat32) * multiplier;
+    y = -chainerx::Maximum(-chainerx::Maximum(y, relu ? 0.0f : -127.0f), -127.0f);
+    // Values are non-negative after the shift, so the truncation of
+    // `AsType` rounds them.
+    y = (y + 128.5f).AsType(chainerx::Dtype::kInt32) - 128;
+    return y.AsType(chainerx::Dtype::kInt8);
+}
+
+chainerx::Array AsNativeContiguous(const chainerx::Array& a, chainerx::Dtype dtype) {
+    CHECK(IsNativeDevice(&a.device())) << "Integer ops are supported only on CPU: " << a.device().name();
+    CHECK_EQ(dtype, a.dtype());
+    if (a.IsContiguous()) return a;
+    return chainerx::Copy(a);
+}
+
+template <typename T>
+const T* GetData(const chainerx::Array& a) {
+    return reinterpret_cast<const T*>(static_cast<const char*>(a.raw_data()) + a.offset());
+}
+
+template <typename T>
+T* GetMutableData(const chainerx::Array& a) {
+    return reinterpret_cast<T*>(static_cast<char*>(a.raw_data()) + a.offset());
+}
+
+// c[m, n] = a[m, k] * b[k, n] with int32 accumulators.
+void GemmInt8(int64_t m, int64_t n, int64_t k, const int8_t* a, const int8_t* b, int32_t* c) {
+    for (int64_t i = 0; i < m; ++i) {
+        int32_t* ci = c + i * n;
+        std::fill(ci, ci + n, 0);
+        for (int64_t p = 0; p < k; ++p) {
+            const int32_t av = a[i * k + p];
+            if (av == 0) continue;
+            const int8_t* bp = b + p * n;
+            // The innermost loop is contiguous so compilers vectorize it.
+            for (int64_t j = 0; j < n; ++j) {
+                ci[j] += av * bp[j];
+            }
+        }
+    }
+}
+
+void AddBias(int64_t m, int64_t n, const int32_t* bias, bool per_row, int32_t* c) {
+    for (int64_t i = 0; i < m; ++i) {
+        for (int64_t j = 0; j < n; ++j) {
+            c[i * n + j] += bias[per_row ? i : j];
+        }
+    }
+}
+
+}  // namespace
+
+chainerx::Array QuantizeLinearOp::RunImpl(XCVMState* st, const chainerx::Array& x) {
+    return RoundToInt8(x, 1.0f / scale, false);
+}
+
+chainerx::Array DequantizeLinearOp::RunImpl(XCVMState* st, const chainerx::Array& x) {
+    return x.AsType(chainerx::Dtype::kFloat32) * scale;
+}
+
+chainerx::Array RequantizeOp::RunImpl(XCVMState* st, const chainerx::Array& x) {
+    return RoundToInt8(x, scale, relu);
+}
+
+chainerx::Array ConvIntegerOp::RunImpl(
+        XCVMState* st, const chainerx::Array& x_orig, const chainerx::Array& w_orig, const nonstd::optional<chainerx::Array>& b_orig) {
+    CHECK_EQ(4, x_orig.ndim()) << "Only 2D convolution is supported";
+    CHECK_EQ(4, w_orig.ndim());
+    const chainerx::Array x = AsNativeContiguous(x_orig, chainerx::Dtype::kInt8);
+    const chainerx::Array w = AsNativeContiguous(w_orig, chainerx::Dtype::kInt8);
+    const Int64StackVector stride = ComplementStride(strides, x);
+    const Int64StackVector pad = ComplementPad(pads, x);
+
+    const int64_t batch_size = x.shape()[0];
+    const int64_t ic = x.shape()[1];
+    const int64_t ih = x.shape()[2];
+    const int64_t iw = x.shape()[3];
+    const int64_t oc = w.shape()[0];
+    const int64_t kh = w.shape()[2];
+    const int64_t kw = w.shape()[3];
+    CHECK_EQ(ic, w.shape()[1]);
+    const int64_t oh = (ih + pad[0] * 2 - kh) / stride[0] + 1;
+    const int64_t ow = (iw + pad[1] * 2 - kw) / stride[1] + 1;
+    const int64_t col_rows = ic * kh * kw;
+    const int64_t col_cols = oh * ow;
+
+    chainerx::Array y = chainerx::Empty({batch_size, oc, oh, ow}, chainerx::Dtype::kInt32, x.device());
+    // Zeros in int8 are zeros in float as quantization is symmetric,
+    // so padded elements are zeros.
+    std::vector<int8_t> col(col_rows * col_cols);
+    const int8_t* xd = GetData<int8_t>(x);
+    const int8_t* wd = GetData<int8_t>(w);
+    int32_t* yd = GetMutableData<int32_t>(y);
+    for (int64_t n = 0; n < batch_size; ++n) {
+        const int8_t* xn = xd + n * ic * ih * iw;
+        for (int64_t c = 0; c < ic; ++c) {
+            for (int64_t ky = 0; ky < kh; ++ky) {
+                for (int64_t kx = 0; kx < kw; ++kx) {
+                    int8_t* row = &col[((c * kh + ky) * kw + kx) * col_cols];
+                    for (int64_t oy = 0; oy < oh; ++oy) {
+                        const int64_t iy = oy * stride[0] - pad[0] + ky;
+                        for (int64_t ox = 0; ox < ow; ++ox) {
+                            const int64_t ix = ox * stride[1] - pad[1] + kx;
+                            const bool inside = 0 <= iy && iy < ih && 0 <= ix && ix < iw;
+                            row[oy * ow + ox] = inside ? xn[(c * ih + iy) * iw + ix] : 0;
+                        }
+                    }
+                }
+            }
+        }
+        int32_t* yn = yd + n * oc * col_cols;
+        GemmInt8(oc, col_cols, col_rows, wd, col.data(), yn);
+        if (b_orig.has_value()) {
+            const chainerx::Array b = AsNativeContiguous(*b_orig, chainerx::Dtype::kInt32);
+            CHECK_EQ(oc, b.GetTotalSize());
+            AddBias(oc, col_cols, GetData<int32_t>(b), true /* per_row */, yn);
+        }
+    }
+    return y;
+}
+
+chainerx::Array MatMulIntegerOp::RunImpl(
+        XCVMState* st, const chainerx::Array& a_orig, const chainerx::Array& b_orig, const nonstd::optional<chainerx::Array>& c_orig) {
+    CHECK_EQ(2, a_orig.ndim());
+    CHECK_EQ(2, b_orig.ndim());
+    const chainerx::Array a = AsNativeContiguous(a_orig, chainerx::Dtype::kInt8);
+    const chainerx::Array b = AsNativeContiguous(b_orig, chainerx::Dtype::kInt8);
+    const int64_t m = a.shape()[0];
+    const int64_t k = a.shape()[1];
+    const int64_t n = b.shape()[1];
+    CHECK_EQ(k, b.shape()[0]);
+
+    chainerx::Array y = chainerx::Empty({m, n}, chainerx::Dtype::kInt32, a.device());
+    int32_t* yd = GetMutableData<int32_t>(y);
+    GemmInt8(m, n, k, GetData<int8_t>(a), GetData<int8_t>(b), yd);
+    if (c_orig.has_value()) {
+        const chainerx::Array c = AsNativeContiguous(*c_orig, chainerx::Dtype::kInt32);
+        CHECK_EQ(n, c.GetTotalSize());
+        AddBias(m, n, GetData<int32_t>(c), false /* per_row */, yd);
+    }
+    return y;
+}
+
+}  // namespace runtime
+}  // namespace chainer_compiler
@@ -1,6 +1,12 @@
 #include "runtime/xcvm.h"
 
+#include <algorithm>
+#include <condition_variable>
+#include <exception>
+#include <functional>
 #include <iomanip>
+#include <memory>
+#include <mutex>
 #include <numeric>
 #include <sstream>
 
@@ -9,9 +15,14 @@
 #endif  // CHAINER_COMPILER_ENABLE_NVTX
 
 #include <chainerx/array.h>
+#include <chainerx/backprop_mode.h>
+#include <chainerx/context.h>
+#include <chainerx/device.h>
+#include <nonstd/optional.hpp>
 
 #include <common/log.h>
 #include <common/strutil.h>
+#include <common/thread_pool.h>
 #include <runtime/chrome_tracing.h>
 #include <runtime/meminfo.h>
 #include <runtime/npy.h>
@@ -32,8 +43,228 @@ struct XCVMInputDesc {
     const chainerx::Shape shape;
 };
 
+// A range of instructions [begin, end). Instructions in a parallel
+// region have no jumps and can be run in any order which respects
+// `XCVMDataflow::successors`.
+struct XCVMRegion {
+    int begin;
+    int end;
+    bool parallel;
+};
+
+// Dependencies between instructions. Edges are added only between
+// instructions in the same parallel region.
+struct XCVMDataflow {
+    std::vector<XCVMRegion> regions;
+    std::vector<std::vector<int>> successors;
+    std::vector<int> num_predecessors;
+};
+
 namespace {
 
+bool IsJump(XCInstructionProto::Op op) {
+    return op == XCInstructionProto::Jmp || op == XCInstructionProto::JmpTrue || op == XCInstructionProto::JmpFalse;
+}
+
+// Collects variables read and written by `inst`. `side_effect` is a
+// pseudo variable written by instructions whose order is observable.
+void GetReadsAndWrites(const XCInstructionProto& inst, int side_effect, std::vector<int>* reads, std::vector<int>* writes) {
+    for (const XCValueProto& value : inst.inputs()) {
+        switch (value.type()) {
+            case XCValueProto::ARRAY:
+            case XCValueProto::OPTIONAL_ARRAY:
+                if (value.array() >= 0) reads->push_back(value.array());
+                break;
+            case XCValueProto::ARRAY_LIST:
+                for (int id : value.array_list()) reads->push_back(id);
+                break;
+            case XCValueProto::SEQUENCE:
+                // Some sequence ops update their input in-place.
+                reads->push_back(value.sequence());
+                writes->push_back(value.sequence());
+                break;
+            case XCValueProto::OPAQUE:
+                reads->push_back(value.opaque());
+                break;
+            default:
+                break;
+        }
+    }
+    for (int id : inst.outputs()) {
+        if (id >= 0) writes->push_back(id);
+    }
+
+    switch (inst.op()) {
+        case XCInstructionProto::Free:
+            // Free kills its input.
+            *writes = *reads;
+            break;
+        case XCInstructionProto::BatchNormalization:
+            // Running statistics are updated in-place.
+            writes->insert(writes->end(), reads->begin(), reads->end());
+            break;
+        case XCInstructionProto::SGDUpdate:
+        case XCInstructionProto::MomentumSGDUpdate:
+        case XCInstructionProto::AdamUpdate: {
+            // The parameter and optimizer states are updated
+            // in-place. The gradient (the second input) and the
+            // learning rate (the last array input) are not.
+            std::vector<int> arrays;
+            for (const XCValueProto& value : inst.inputs()) {
+                if (value.type() == XCValueProto::ARRAY) arrays.push_back(value.array());
+            }
+            CHECK_LE(3UL, arrays.size()) << inst.DebugString();
+            writes->push_back(arrays[0]);
+            writes->insert(writes->end(), arrays.begin() + 2, arrays.end() - 1);
+            break;
+        }
+        case XCInstructionProto::Out:
+        case XCInstructionProto::Print:
+        case XCInstructionProto::DoSomething:
+            writes->push_back(side_effect);
+            break;
+        default:
+            break;
+    }
+}
+
+// Splits the program into regions. All jumps and their targets are
+// in a single sequential region and the rest are parallel regions.
+std::vector<XCVMRegion> SplitIntoRegions(const XCProgramProto& program) {
+    const int num_insts = program.instructions_size();
+    int lo = num_insts, hi = -1;
+    for (int pc = 0; pc < num_insts; ++pc) {
+        const XCInstructionProto& inst = program.instructions(pc);
+        if (!IsJump(inst.op())) continue;
+        int target = -1;
+        for (const XCValueProto& value : inst.inputs()) {
+            if (value.type() == XCValueProto::INT) target = value.i();
+        }
+        CHECK_LE(0, target) << inst.DebugString();
+        lo = std::min({lo, pc, static_cast<int>(target)});
+        hi = std::max({hi, pc, static_cast<int>(target)});
+    }
+
+    std::vector<XCVMRegion> regions;
+    if (hi < 0) {
+        regions.push_back({0, num_insts, true});
+        return regions;
+    }
+    hi = std::min(hi + 1, num_insts);
+    if (lo > 0) regions.push_back({0, lo, true});
+    regions.push_back({lo, hi, false});
+    if (hi < num_insts) regions.push_back({hi, num_insts, true});
+    return regions;
+}
+
+XCVMDataflow* BuildDataflow(const XCProgramProto& program, int num_variables) {
+    const int num_insts = program.instructions_size();
+    XCVMDataflow* dataflow = new XCVMDataflow();
+    dataflow->regions = SplitIntoRegions(program);
+    dataflow->successors.resize(num_insts);
+    dataflow->num_predecessors.resize(num_insts);
+
+    const int side_effect = num_variables;
+    for (const XCVMRegion& region : dataflow->regions) {
+        if (!region.parallel) continue;
+        std::vector<int> last_writers(num_variables + 1, -1);
+        std::vector<std::vector<int>> readers(num_variables + 1);
+        for (int pc = region.begin; pc < region.end; ++pc) {
+            std::vector<int> reads, writes;
+            GetReadsAndWrites(program.instructions(pc), side_effect, &reads, &writes);
+            std::vector<int> deps;
+            for (int id : reads) {
+                CHECK_LT(id, num_variables) << program.instructions(pc).DebugString();
+                if (last_writers[id] >= 0) deps.push_back(last_writers[id]);
+            }
+            for (int id : writes) {
+                CHECK_LE(id, num_variables) << program.instructions(pc).DebugString();
+                if (last_writers[id] >= 0) deps.push_back(last_writers[id]);
+                deps.insert(deps.end(), readers[id].begin(), readers[id].end());
+            }
+            std::sort(deps.begin(), deps.end());
+            deps.erase(std::unique(deps.begin(), deps.end()), deps.end());
+            for (int dep : deps) {
+                if (dep == pc) continue;
+                dataflow->successors[dep].push_back(pc);
+                ++dataflow->num_predecessors[pc];
+            }
+
+            for (int id : reads) readers[id].push_back(pc);
+            for (int id : writes) {
+                last_writers[id] = pc;
+                readers[id].clear();
+            }
+        }
+    }
+    return dataflow;
+}
+
+// The state of a parallel region shared by its tasks. This is
+// reference counted as tasks may still be running for a moment after
+// the last instruction finishes.
+struct ParallelRegion {
+    const XCVMDataflow* dataflow;
+    ThreadPool* pool;
+    std::function<void(int)> run_op;
+    chainerx::Context* context;
+    chainerx::Device* device;
+    bool backprop_required;
+    int begin;
+    int num_insts;
+
+    std::mutex mu;
+    std::condition_variable cond;
+    std::vector<int> num_predecessors;
+    int num_done = 0;
+    std::exception_ptr error;
+};
+
+void RunParallelTask(const std::shared_ptr<ParallelRegion>& region, int pc) {
+    // Workers run with the same ChainerX settings as the caller.
+    chainerx::SetDefaultContext(region->context);
+    chainerx::SetDefaultDevice(region->device);
+    nonstd::optional<chainerx::NoBackpropModeScope> no_backprop;
+    if (!region->backprop_required) no_backprop.emplace();
+
+    // Successors which become ready are run by this task to avoid a
+    // round trip through the queue for chains of instructions.
+    while (pc >= 0) {
+        bool failed;
+        {
+            std::lock_guard<std::mutex> lock(region->mu);
+            failed = static_cast<bool>(region->error);
+        }
+        // Once an instruction fails, the rest are skipped.
+        if (!failed) {
+            try {
+                region->run_op(pc);
+            } catch (...) {
+                std::lock_guard<std::mutex> lock(region->mu);
+                if (!region->error) region->error = std::current_exception();
+            }
+        }
+
+        std::vector<int> ready;
+        {
+            std::lock_guard<std::mutex> lock(region->mu);
+            for (int succ : region->dataflow->successors[pc]) {
+                if (--region->num_predecessors[succ - region->begin] == 0) ready.push_back(succ);
+            }
+            if (++region->num_done == region->num_insts) region->cond.notify_all();
+        }
+
+        pc = -1;
+        if (!ready.empty()) {
+            pc = ready.back();
+            ready.pop_back();
+        }
+        for (int succ : ready) {
+            region->pool->Schedule([region, succ]() { RunParallelTask(region, succ); });
+        }
+    }
+}
+
 void CheckType(XCVMState* st, const XCVMOp* op) {
     const XCInstructionProto& inst = op->instruction();
     CHECK_EQ(inst.outputs().size(), inst.output_types().size()) << inst.DebugString();
@@ -118,6 +349,8 @@ XCVM::XCVM(const XCProgramProto& program) {
         chainerx::Shape shape(type.shape().begin(), type.shape().end());
         input_descs_.emplace_back(new XCVMInputDesc(name, dtype, shape));
     }
+
+    dataflow_.reset(BuildDataflow(program, num_variables_));
 }
 
 XCVM::~XCVM() {
@@ -148,35 +381,61 @@ InOuts XCVM::Run(const InOuts& program_inputs, const XCVMOptions& options) {
 void XCVM::Run(XCVMState* state) {
     state->SetProgram(&program_);
     const XCVMOptions& options = state->options();
-    int64_t peak_used_mbs = 0, peak_total_mbs = 0;
-
-    while (true) {
-        int pc = state->pc();
-        if (pc >= program_.size()) break;
+    // Tracing and dumps expect instructions run in the program order.
+    const bool can_run_in_parallel = options.num_threads > 1 && options.trace_level == 0 && !options.dump_memory_usage &&
+                                     options.dump_outputs_dir.empty() && !options.chrome_tracing;
+    if (!can_run_in_parallel || state->pc() != 0) {
+        RunSequentially(state, state->pc(), program_.size());
+        return;
+    }
 
-        XCVMOp* op = program_[pc].get();
+    for (const XCVMRegion& region : dataflow_->regions) {
+        if (region.parallel) {
+            RunInParallel(state, region.begin, region.end);
+        } else {
+            RunSequentially(state, region.begin, region.end);
+        }
+    }
+    state->set_pc(program_.size());
+}
 
-        {
-            ChromeTracingEmitter::ScopedEvent se(options.chrome_tracing, "XCVM", op->name(), pc);
+void XCVM::RunOp(XCVMState* state, int pc) {
+    const XCVMOptions& options = state->options();
+    XCVMOp* op = program_[pc].get();
+    {
+        ChromeTracingEmitter::ScopedEvent se(options.chrome_tracing, "XCVM", op->name(), pc);
 #ifdef CHAINER_COMPILER_ENABLE_NVTX
-            nvtxRangePush(op->name().c_str());
+        nvtxRangePush(op->name().c_str());
 #endif
-            try {
-                op->Run(state);
-            } catch (...) {
-                std::cerr << "Exception in " << op->debug_info() << std::endl;
-                throw;
-            }
+        try {
+            op->Run(state);
+        } catch (...) {
+            std::cerr << "Exception in " << op->debug_info() << std::endl;
+            throw;
+        }
 #ifdef CHAINER_COMPILER_ENABLE_NVTX
-            nvtxRangePop();
+        nvtxRangePop();
 #endif
-        }
+    }
 
-        state->set_pc(state->pc() + 1);
+    if (options.check_types) {
+        CheckType(state, op);
+    }
+}
 
-        if (options.check_types) {
-            CheckType(state, op);
-        }
+void XCVM::RunSequentially(XCVMState* state, int begin, int end) {
+    const XCVMOptions& options = state->options();
+    int64_t peak_used_mbs = 0, peak_total_mbs = 0;
+
+    state->set_pc(begin);
+    while (true) {
+        int pc = state->pc();
+        if (pc >= end) break;
+
+        RunOp(state, pc);
+        XCVMOp* op = program_[pc].get();
+
+        state->set_pc(state->pc() + 1);
 
         if (!options.dump_outputs_dir.empty()) {
             DumpOutput(state, op, options.dump_outputs_dir);
@@ -205,5 +464,40 @@ void XCVM::Run(XCVMState* state) {
     }
 }
 
+void XCVM::RunInParallel(XCVMState* state, int begin, int end) {
+    if (begin == end) return;
+    std::shared_ptr<ParallelRegion> region = std::make_shared<ParallelRegion>();
+    region->dataflow = dataflow_.get();
+    region->pool = GetThreadPool(state->options().num_threads);
+    region->run_op = [this, state](int pc) { RunOp(state, pc); };
+    region->context = &chainerx::GetDefaultContext();
+    region->device = &chainerx::GetDefaultDevice();
+    region->backprop_required = chainerx::IsBackpropRequired();
+    region->begin = begin;
+    region->num_insts = end - begin;
+    region->num_predecessors.assign(dataflow_->num_predecessors.begin() + begin, dataflow_->num_predecessors.begin() + end);
+
+    for (int pc = begin; pc < end; ++pc) {
+        if (dataflow_->num_predecessors[pc] == 0) {
+            region->pool->Schedule([region, pc]() { RunParallelTask(region, pc); });
+        }
+    }
+
+    {
+        std::unique_lock<std::mutex> lock(region->mu);
+        while (region->num_done != region->num_insts) region->cond.wait(lock);
+    }
+    if (region->error) std::rethrow_exception(region->error);
+}
+
+ThreadPool* XCVM::GetThreadPool(int num_threads) {
+    // Pools are kept until the XCVM is destructed as other threads
+    // may be running the same XCVM.
+    std::lock_guard<std::mutex> lock(thread_pools_mu_);
+    std::unique_ptr<ThreadPool>& pool = thread_pools_[num_threads];
+    if (!pool) pool.reset(new ThreadPool(num_threads));
+    return pool.get();
+}
+
 }  // namespace runtime
 }  // namespace chainer_compiler
@@ -1,7 +1,9 @@
 #pragma once
 
 #include <cstdint>
+#include <map>
 #include <memory>
+#include <mutex>
 #include <string>
 #include <utility>
 #include <vector>
@@ -11,6 +13,9 @@
 #include "runtime/xcvm.pb.h"
 
 namespace chainer_compiler {
+
+class ThreadPool;
+
 namespace runtime {
 
 class ChromeTracingEmitter;
@@ -45,9 +50,15 @@ public:
     ChromeTracingEmitter* chrome_tracing{nullptr};
 
     std::string dump_outputs_dir;
+
+    // The number of threads to run instructions. When this is larger
+    // than one, instructions which do not depend on each other are run
+    // in parallel. Regions with jumps are still run sequentially.
+    int num_threads{1};
 };
 
 class XCVMInputDesc;
+class XCVMDataflow;
 
 class XCVM {
 public:
@@ -65,9 +76,18 @@ private:
     XCVM(const XCVM&) = delete;
     XCVM& operator=(const XCVM&) = delete;
 
+    void RunOp(XCVMState* state, int pc);
+    void RunSequentially(XCVMState* state, int begin, int end);
+    void RunInParallel(XCVMState* state, int begin, int end);
+    ThreadPool* GetThreadPool(int num_threads);
+
     std::vector<std::unique_ptr<XCVMOp>> program_;
     std::vector<std::unique_ptr<XCVMInputDesc>> input_descs_;
     int num_variables_;
+
+    std::unique_ptr<XCVMDataflow> dataflow_;
+    std::mutex thread_pools_mu_;
+    std::map<int, std::unique_ptr<ThreadPool>> thread_pools_;
 };
 
 }  // namespace runtime
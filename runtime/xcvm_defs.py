@@ -288,6 +288,25 @@ XC_OPS = [
      ['y']),
 
     ('MatMul', [Array('a'), Array('b')], ['y']),
+
+    ('QuantizeLinear', [Array('x'), Float('scale')], ['y']),
+    ('DequantizeLinear', [Array('x'), Float('scale')], ['y']),
+    ('Requantize', [Array('x'), Float('scale'), Int('relu')], ['y']),
+    ('ConvInteger',
+     [Array('x'), Array('w'), OptionalArray('b'),
+      Ints('strides'), Ints('pads')], ['y']),
+    ('MatMulInteger', [Array('a'), Array('b'), OptionalArray('c')], ['y']),
+
+    ('SGDUpdate', [Array('param'), Array('grad'), Array('lr')],
+     ['param_out']),
+    ('MomentumSGDUpdate',
+     [Array('param'), Array('grad'), Array('v'), Array('lr'),
+      Float('momentum')],
+     ['param_out', 'v_out']),
+    ('AdamUpdate',
+     [Array('param'), Array('grad'), Array('m'), Array('v'), Array('t'),
+      Array('lr'), Float('beta1'), Float('beta2'), Float('epsilon')],
+     ['param_out', 'm_out', 'v_out', 't_out']),
     ('Gemm',
      [Array('a'), Array('b'), Array('c'),
       Float('alpha'), Float('beta'), Int('trans_a'), Int('trans_b')],
@@ -370,6 +389,10 @@ XC_OPS = [
      [ArrayList('inputs'), Int('num_outputs'),
       String('code'), Int('fusion_id')],
      [ArrayList('outputs')]),
+    ('ElementWiseCpu',
+     [ArrayList('inputs'), Int('num_outputs'),
+      String('code'), Int('fusion_id')],
+     [ArrayList('outputs')]),
 
     ('DoSomething',
      [ArrayList('inputs'), String('func_name')],
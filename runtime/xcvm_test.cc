@@ -41,6 +41,108 @@ TEST(XCVMTest, Run) {
     EXPECT_TRUE(chainerx::AllClose(e, outputs["out"]->GetArray(), 0, 0));
 }
 
+TEST(XCVMTest, RunInParallel) {
+    chainerx::Context ctx;
+    chainerx::ContextScope ctx_scope(ctx);
+
+    // out = (in1 + in2) + in1 * in2, where the Add and the Mul are
+    // independent and the Frees must wait for both of them.
+    XCProgramProto program;
+    xcvm::AddInOp(&program, xcvm::XCVMValue(0), "in1");
+    xcvm::AddInOp(&program, xcvm::XCVMValue(1), "in2");
+    xcvm::AddAddOp(&program, xcvm::XCVMValue(2), 0, 1);
+    xcvm::AddMulOp(&program, xcvm::XCVMValue(3), 0, 1);
+    xcvm::AddFreeOp(&program, 0);
+    xcvm::AddFreeOp(&program, 1);
+    xcvm::AddAddOp(&program, xcvm::XCVMValue(4), 2, 3);
+    xcvm::AddOutOp(&program, "out", 4);
+
+    XCVM xcvm(program);
+    XCVMOptions options;
+    options.num_threads = 4;
+    chainerx::Array in1 = chainerx::Eye(2, nonstd::nullopt, nonstd::nullopt, chainerx::Dtype::kFloat32);
+    chainerx::Array e = chainerx::testing::BuildArray({2, 2}).WithData<float>({3, 1, 1, 3});
+    for (int i = 0; i < 10; ++i) {
+        InOuts inputs;
+        inputs.emplace("in1", std::shared_ptr<XCVMVar>(new XCVMVar(in1)));
+        inputs.emplace("in2", std::shared_ptr<XCVMVar>(new XCVMVar(chainerx::OnesLike(in1))));
+        InOuts outputs = xcvm.Run(inputs, options);
+        ASSERT_EQ(1, outputs.count("out"));
+        EXPECT_TRUE(chainerx::AllClose(e, outputs["out"]->GetArray(), 0, 0));
+    }
+}
+
+TEST(XCVMTest, MomentumSGDUpdate) {
+    chainerx::Context ctx;
+    chainerx::ContextScope ctx_scope(ctx);
+
+    XCProgramProto program;
+    xcvm::AddInOp(&program, xcvm::XCVMValue(0), "param");
+    xcvm::AddInOp(&program, xcvm::XCVMValue(1), "grad");
+    xcvm::AddInOp(&program, xcvm::XCVMValue(2), "v");
+    xcvm::AddInOp(&program, xcvm::XCVMValue(3), "lr");
+    xcvm::AddMomentumSGDUpdateOp(&program, xcvm::XCVMValue(4), xcvm::XCVMValue(5), 0, 1, 2, 3, 0.5);
+    xcvm::AddOutOp(&program, "param_out", 4);
+
+    XCVM xcvm(program);
+    chainerx::Array param = chainerx::testing::BuildArray({2, 2}).WithData<float>({1, 2, 3, 4});
+    chainerx::Array v = chainerx::ZerosLike(param);
+    InOuts inputs;
+    inputs.emplace("param", std::shared_ptr<XCVMVar>(new XCVMVar(param)));
+    inputs.emplace("grad", std::shared_ptr<XCVMVar>(new XCVMVar(chainerx::OnesLike(param))));
+    inputs.emplace("v", std::shared_ptr<XCVMVar>(new XCVMVar(v)));
+    inputs.emplace("lr", std::shared_ptr<XCVMVar>(new XCVMVar(chainerx::testing::BuildArray({}).WithData<float>({0.25}))));
+    for (int i = 0; i < 2; ++i) {
+        InOuts outputs = xcvm.Run(inputs, XCVMOptions());
+        ASSERT_EQ(1, outputs.count("param_out"));
+        EXPECT_EQ(param.raw_data(), outputs["param_out"]->GetArray().raw_data());
+    }
+
+    // v = -0.25 and then v = -0.375. The parameter and the state are
+    // updated in place.
+    chainerx::Array ev = chainerx::testing::BuildArray({2, 2}).WithData<float>({-0.375, -0.375, -0.375, -0.375});
+    chainerx::Array ep = chainerx::testing::BuildArray({2, 2}).WithData<float>({0.375, 1.375, 2.375, 3.375});
+    EXPECT_TRUE(chainerx::AllClose(ev, v, 0, 0));
+    EXPECT_TRUE(chainerx::AllClose(ep, param, 0, 0));
+}
+
+TEST(XCVMTest, TrainingStepInParallel) {
+    chainerx::Context ctx;
+    chainerx::ContextScope ctx_scope(ctx);
+
+    // y = w * x and w -= lr * (x * w). The update must wait for both
+    // readers of `w`.
+    XCProgramProto program;
+    xcvm::AddInOp(&program, xcvm::XCVMValue(0), "w");
+    xcvm::AddInOp(&program, xcvm::XCVMValue(1), "x");
+    xcvm::AddInOp(&program, xcvm::XCVMValue(2), "lr");
+    xcvm::AddMulOp(&program, xcvm::XCVMValue(3), 1, 0);
+    xcvm::AddMulOp(&program, xcvm::XCVMValue(4), 0, 1);
+    xcvm::AddSGDUpdateOp(&program, xcvm::XCVMValue(5), 0, 3, 2);
+    xcvm::AddOutOp(&program, "y", 4);
+    xcvm::AddOutOp(&program, "w_out", 5);
+
+    XCVM xcvm(program);
+    XCVMOptions options;
+    options.num_threads = 4;
+    chainerx::Array x = chainerx::testing::BuildArray({2, 2}).WithData<float>({1, 2, 3, 4});
+    chainerx::Array ey = chainerx::testing::BuildArray({2, 2}).WithData<float>({1, 4, 9, 16});
+    chainerx::Array ew = chainerx::testing::BuildArray({2, 2}).WithData<float>({0.5, 0, -1.5, -4});
+    for (int i = 0; i < 10; ++i) {
+        chainerx::Array w = x.Copy();
+        InOuts inputs;
+        inputs.emplace("w", std::shared_ptr<XCVMVar>(new XCVMVar(w)));
+        inputs.emplace("x", std::shared_ptr<XCVMVar>(new XCVMVar(x)));
+        inputs.emplace("lr", std::shared_ptr<XCVMVar>(new XCVMVar(chainerx::testing::BuildArray({}).WithData<float>({0.5}))));
+        InOuts outputs = xcvm.Run(inputs, options);
+        ASSERT_EQ(1, outputs.count("y"));
+        ASSERT_EQ(1, outputs.count("w_out"));
+        EXPECT_TRUE(chainerx::AllClose(ey, outputs["y"]->GetArray(), 0, 0));
+        EXPECT_TRUE(chainerx::AllClose(ew, outputs["w_out"]->GetArray(), 0, 0));
+        EXPECT_EQ(w.raw_data(), outputs["w_out"]->GetArray().raw_data());
+    }
+}
+
 }  // namespace
 }  // namespace runtime
 }  // namespace chainer_compiler
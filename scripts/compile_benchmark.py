@@ -0,0 +1,72 @@
+#!/usr/bin/python3
+#
+# Measures compilation time of test models.
+#
+# Usage:
+#
+# $ ./scripts/runtests.py large_oc --skip_build  # Generate models
+# $ ./scripts/compile_benchmark.py
+# $ ./scripts/compile_benchmark.py 'ch2o_model_' -- --fuse_operations
+
+import argparse
+import glob
+import os
+import re
+import subprocess
+import sys
+import time
+
+
+parser = argparse.ArgumentParser(
+    description='Measure compilation time of test models')
+parser.add_argument('test_filter', default='^(large_oc|ch2o_model|onnx_real)',
+                    nargs='?',
+                    help='A regular expression to filter tests in out/')
+parser.add_argument('--build_dir', '-b', default='build',
+                    help='The build directory')
+parser.add_argument('--repeat', '-r', type=int, default=3,
+                    help='The number of compilations per model')
+parser.add_argument('flags', nargs='*',
+                    help='Extra flags for run_onnx')
+args = parser.parse_args()
+
+
+def compile_time(run_onnx, test_dir):
+    cmdline = [run_onnx, '--compile_only', '--quiet',
+               '--onnx', os.path.join(test_dir, 'model.onnx')]
+    if 'backprop' in os.path.basename(test_dir):
+        cmdline.append('--backprop')
+    cmdline += args.flags
+    best = None
+    for _ in range(args.repeat):
+        start = time.time()
+        subprocess.check_call(cmdline, stdout=subprocess.DEVNULL)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main():
+    run_onnx = os.path.join(args.build_dir, 'tools/run_onnx')
+    reg = re.compile(args.test_filter)
+    test_dirs = []
+    for model in sorted(glob.glob('out/*/model.onnx')):
+        test_dir = os.path.dirname(model)
+        if reg.search(os.path.basename(test_dir)):
+            test_dirs.append(test_dir)
+    if not test_dirs:
+        sys.stderr.write('No model matches %s\n' % args.test_filter)
+        sys.exit(1)
+
+    total = 0.0
+    for test_dir in test_dirs:
+        elapsed = compile_time(run_onnx, test_dir)
+        total += elapsed
+        print('%s %.3f' % (os.path.basename(test_dir), elapsed))
+        sys.stdout.flush()
+    print('Total %.3f' % total)
+
+
+if __name__ == '__main__':
+    main()
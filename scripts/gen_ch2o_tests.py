@@ -0,0 +1,97 @@
+#!/usr/bin/python3
+#
+# Generates ch2o test cases in out/ by a single Python process, which
+# imports Chainer only once and runs test scripts in forked workers.
+# The build runs this for ch2o tests in CMakeLists.txt.
+#
+# Example usage:
+#
+# $ ./scripts/gen_ch2o_tests.py
+# $ ./scripts/gen_ch2o_tests.py -j 4 'node_(Linear|Relu)'
+# $ ./scripts/gen_ch2o_tests.py --tests node/Linear model/MLP_with_loss
+
+import argparse
+import multiprocessing
+import os
+import re
+import runpy
+import sys
+import time
+import traceback
+
+import ch2o_tests
+
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(project_root, 'ch2o'))
+# Imported before workers are forked.
+import chainer  # noqa
+import ch2o  # noqa
+
+
+def get_tests(names=None):
+    if names:
+        return [tuple(name.split('/')) for name in names]
+
+    tests = []
+    # Model tests come first as they take longer.
+    for category, names in [('model', ch2o_tests.MODEL_TESTS),
+                            ('node', ch2o_tests.NODE_TESTS),
+                            ('syntax', ch2o_tests.SYNTAX_TESTS)]:
+        for name in names:
+            tests.append((category, name))
+    return tests
+
+
+def generate(test):
+    category, name = test
+    py = os.path.join(project_root, 'ch2o', 'tests', category, name + '.py')
+    out_dir = os.path.join(project_root, 'out',
+                           'ch2o_%s_%s' % (category, name))
+    # Each worker runs only one test script, so states of Chainer and
+    # ch2o are never shared between tests.
+    sys.argv = [py, out_dir, '--quiet']
+    start = time.time()
+    try:
+        runpy.run_path(py, run_name='__main__')
+    except BaseException:
+        return test, traceback.format_exc(), time.time() - start
+    return test, None, time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate ch2o tests')
+    parser.add_argument('test_filter', default='.', nargs='?',
+                        help='A regexp to filter tests by <category>_<name>')
+    parser.add_argument('--tests', nargs='+',
+                        help='Tests to generate as <category>/<name>, '
+                        'instead of the ones in scripts/ch2o_tests.py')
+    parser.add_argument('--jobs', '-j', type=int,
+                        default=multiprocessing.cpu_count(),
+                        help='Number of worker processes')
+    args = parser.parse_args()
+
+    tests = [t for t in get_tests(args.tests)
+             if re.search(args.test_filter, '%s_%s' % t)]
+
+    start = time.time()
+    failed = []
+    context = multiprocessing.get_context('fork')
+    with context.Pool(args.jobs, maxtasksperchild=1) as pool:
+        for test, error, elapsed in pool.imap_unordered(generate, tests):
+            test_name = 'ch2o_%s_%s' % test
+            if error is None:
+                print('%s %.2f sec' % (test_name, elapsed))
+            else:
+                failed.append(test_name)
+                sys.stderr.write('%s FAILED\n%s\n' % (test_name, error))
+
+    print('Generated %d tests in %.2f sec' % (len(tests) - len(failed),
+                                              time.time() - start))
+    if failed:
+        print('Failed tests: %s' % ' '.join(failed))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -732,6 +732,8 @@ def main():
             test_case.args.append('--fuse_operations')
             if is_gpu:
                 test_case.args.append('--use_nvrtc')
+            else:
+                test_case.args.append('--use_cpu_codegen')
         if args.ngraph:
             test_case.args.append('--fuse_operations')
             test_case.args.append('--use_ngraph')
@@ -0,0 +1,62 @@
+#!/usr/bin/python3
+#
+# Compares the simulated peak memory usage of backprop models with
+# different schedulers.
+#
+# Usage:
+#
+# $ ./scripts/runtests.py large_oc_backprop --skip_build  # Generate models
+# $ ./scripts/scheduler_report.py
+# $ ./scripts/scheduler_report.py --beam_width 4 'ch2o_model_Resnet'
+
+import argparse
+import glob
+import os
+import re
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(project_root, 'build/python'))
+
+import chainer_compiler_core
+
+
+parser = argparse.ArgumentParser(
+    description='Compare simulated peak memory usage of schedulers')
+parser.add_argument('test_filter',
+                    default='^large_oc_backprop_(resnet50|vgg16|vgg19)_',
+                    nargs='?',
+                    help='A regular expression to filter tests in out/')
+parser.add_argument('--beam_width', type=int, default=1,
+                    help='The beam width of the memory scheduler')
+args = parser.parse_args()
+
+
+def simulated_peak(onnx_path, scheduler):
+    graph = chainer_compiler_core.load(onnx_path)
+    graph.compile(backprop=True, scheduler=scheduler,
+                  scheduler_beam_width=args.beam_width)
+    return graph.simulate_memory().peak
+
+
+def main():
+    reg = re.compile(args.test_filter)
+    models = []
+    for model in sorted(glob.glob('out/*/model.onnx')):
+        if reg.search(os.path.basename(os.path.dirname(model))):
+            models.append(model)
+    if not models:
+        sys.stderr.write('No model matches %s\n' % args.test_filter)
+        sys.exit(1)
+
+    print('%-50s %10s %10s' % ('model', 'greedy', 'memory'))
+    for model in models:
+        greedy = simulated_peak(model, 'greedy')
+        memory = simulated_peak(model, 'memory')
+        print('%-50s %8dMB %8dMB' % (os.path.basename(os.path.dirname(model)),
+                                     greedy // 1000000, memory // 1000000))
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
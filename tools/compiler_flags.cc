@@ -11,20 +11,31 @@ void AddCompilerFlags(cmdline::parser* args) {
     args->add("skip_inference", '\0', "Skip dtype/shape inference");
     args->add("replace_constant", '\0', "Replace Constant ops");
     args->add("fuse_operations", '\0', "Fuse consecutive operations");
+    args->add("fold_affine_ops", '\0', "Fold BatchNormalization and affine ops into Conv/Gemm (inference only)");
+    args->add("mixed_precision", '\0', "Run Conv/Gemm/MatMul in float16 with loss scaling");
+    args->add<std::string>(
+            "optimizer", '\0', "Update parameters in the training graph with this optimizer (sgd, momentum_sgd, or adam)", false);
+    args->add<int>("num_micro_batches", '\0', "Split a training batch into micro-batches and accumulate gradients", false, 1);
+    args->add<std::string>(
+            "quantization_ranges", '\0', "Run Conv/Gemm/MatMul in int8 with value ranges in this file (inference only)", false);
     args->add("use_nvrtc", '\0', "Use NVRTC");
+    args->add("use_cpu_codegen", '\0', "Use C++ code compiled for CPU to run fused element-wise operations");
     args->add("use_tvm", '\0', "Use TVM");
     args->add("reuse_tvm_code", '\0', "Reuse TVM code (unsafe)");
     args->add("use_ngraph", '\0', "Use nGraph");
     args->add<std::string>("dump_autotvm_task_dir", '\0', "Output AutoTVM tasks in this directory", false);
     args->add<std::string>("autotvm_log", '\0', "A tuning log of AutoTVM which contains best scheduling parameters", false);
+    args->add<int>("compiler_threads", '\0', "The number of threads to run compiler passes and build fused kernels", false, 1);
     args->add("dump_after_inference", '\0', "Dump the ONNX graph after dtype/shape inference");
     args->add("dump_after_simplification", '\0', "Dump the ONNX graph after graph simplification");
     args->add("dump_after_gradient", '\0', "Dump the ONNX graph after adding nodes for gradients");
     args->add("dump_after_fusion", '\0', "Dump the ONNX graph after operator fusion");
     args->add("dump_after_scheduling", '\0', "Dump the ONNX graph after scheduling");
     args->add("dump_subgraphs", '\0', "Dump the subgraph tree of the ONNX graph");
+    args->add<std::string>("scheduler", '\0', "The scheduler of nodes (greedy, naive, or memory)", false);
+    args->add<int>("scheduler_beam_width", '\0', "The beam width of the memory scheduler", false, 1);
     args->add<std::string>("computation_order", '\0', "Run the specified policy of computation order (backprop only)", false);
-    args->add<int>("chen_budget", '\0', "Memory budget of Chen's policy (in MB)", 0);
+    args->add<int>("chen_budget", '\0', "Memory budget of chen and remat policies (in MB)", 0);
 }
 
 void ApplyCompilerFlags(const cmdline::parser& args) {
@@ -33,18 +44,27 @@ void ApplyCompilerFlags(const cmdline::parser& args) {
     g_skip_inference = args.exist("skip_inference");
     g_replace_constant = args.exist("replace_constant");
     g_fuse_operations = args.exist("fuse_operations");
+    g_fold_affine_ops = args.exist("fold_affine_ops");
+    g_mixed_precision = args.exist("mixed_precision");
+    g_optimizer = args.get<std::string>("optimizer");
+    g_num_micro_batches = args.get<int>("num_micro_batches");
+    g_quantization_ranges = args.get<std::string>("quantization_ranges");
     g_use_nvrtc = args.exist("use_nvrtc");
+    g_use_cpu_codegen = args.exist("use_cpu_codegen");
     g_use_tvm = args.exist("use_tvm");
     g_reuse_tvm_code = args.exist("reuse_tvm_code");
     g_use_ngraph = args.exist("use_ngraph");
     g_dump_autotvm_task_dir = args.get<std::string>("dump_autotvm_task_dir");
     g_autotvm_log = args.get<std::string>("autotvm_log");
+    g_compiler_threads = args.get<int>("compiler_threads");
     g_dump_after_inference = args.exist("dump_after_inference");
     g_dump_after_simplification = args.exist("dump_after_simplification");
     g_dump_after_gradient = args.exist("dump_after_gradient");
     g_dump_after_fusion = args.exist("dump_after_fusion");
     g_dump_after_scheduling = args.exist("dump_after_scheduling");
     g_dump_subgraphs = args.exist("dump_subgraphs");
+    g_scheduler = args.get<std::string>("scheduler");
+    g_scheduler_beam_width = args.get<int>("scheduler_beam_width");
     g_computation_order = args.get<std::string>("computation_order");
     g_chen_budget = args.get<int>("chen_budget");
 }
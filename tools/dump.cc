@@ -41,7 +41,7 @@ void DumpTensor(const std::string& filename) {
     onnx::TensorProto xtensor(LoadLargeProto<onnx::TensorProto>(filename));
     chainer_compiler::Tensor tensor(xtensor);
     onnx::TensorProto xtensor_normalized;
-    tensor.ToONNX(&xtensor_normalized);
+    tensor.ToONNX(&xtensor_normalized, false /* use_raw_data */);
     std::cout << xtensor_normalized.DebugString();
 }
 
@@ -5,16 +5,20 @@
 #include <chrono>
 #include <cstdlib>
 #include <fstream>
+#include <future>
 #include <map>
 #include <queue>
 #include <set>
 #include <string>
+#include <thread>
+#include <tuple>
 
 #include <compiler/onnx.h>
 
 #include <chainerx/array.h>
 #include <chainerx/backprop_mode.h>
 #include <chainerx/context.h>
+#include <chainerx/device.h>
 #include <chainerx/native/native_backend.h>
 #include <chainerx/numeric.h>
 #include <chainerx/routines/creation.h>
@@ -24,11 +28,13 @@
 #include <common/log.h>
 #include <common/protoutil.h>
 #include <common/strutil.h>
+#include <common/thread_pool.h>
 #include <compiler/custom_onnx_ops.h>
 #include <compiler/flags.h>
 #include <compiler/gradient.h>
 #include <compiler/graph.h>
 #include <compiler/model.h>
+#include <compiler/onnx_writer.h>
 #include <compiler/passes.h>
 #include <compiler/tensor.h>
 #include <compiler/util.h>
@@ -69,33 +75,22 @@ std::vector<std::string> ListDir(const std::string& dirname) {
     return filenames;
 }
 
-chainerx::Array MakeArrayFromONNX(const onnx::TensorProto& xtensor) {
-    Tensor tensor(xtensor);
-    int64_t size = tensor.ElementSize() * tensor.NumElements();
-    std::shared_ptr<void> data(new char[size], std::default_delete<char[]>());
-    std::memcpy(data.get(), tensor.GetRawData(), size);
-    chainerx::Shape shape(tensor.dims());
-    chainerx::Dtype dtype;
-    switch (tensor.dtype()) {
-#define ASSIGN_DTYPE(n)             \
-    case Dtype::n:                  \
-        dtype = chainerx::Dtype::n; \
-        break
-        ASSIGN_DTYPE(kBool);
-        ASSIGN_DTYPE(kInt8);
-        ASSIGN_DTYPE(kInt16);
-        ASSIGN_DTYPE(kInt32);
-        ASSIGN_DTYPE(kInt64);
-        ASSIGN_DTYPE(kUInt8);
-        ASSIGN_DTYPE(kFloat16);
-        ASSIGN_DTYPE(kFloat32);
-        ASSIGN_DTYPE(kFloat64);
-        default:
-            CHECK(false) << "Unknown data type: " << static_cast<int>(tensor.dtype());
+// Makes an array which shares the memory with `xtensor` if possible.
+chainerx::Array MakeArrayFromONNX(const std::shared_ptr<onnx::TensorProto>& xtensor) {
+    chainerx::Shape shape(xtensor->dims().begin(), xtensor->dims().end());
+    chainerx::Dtype dtype = ChainerXTypeFromONNX(xtensor->data_type());
+    const std::string& raw_data = xtensor->raw_data();
+    const int64_t item_size = chainerx::GetItemSize(dtype);
+    std::shared_ptr<void> data;
+    if (xtensor->data_location() != onnx::TensorProto::EXTERNAL && xtensor->has_raw_data() &&
+        static_cast<int64_t>(raw_data.size()) == shape.GetTotalSize() * item_size &&
+        reinterpret_cast<uintptr_t>(raw_data.data()) % item_size == 0) {
+        // The array keeps `xtensor` alive.
+        data = std::shared_ptr<void>(xtensor, const_cast<char*>(raw_data.data()));
+    } else {
+        data = Tensor(*xtensor).GetSharedData();
     }
-    chainerx::Array array(chainerx::FromData(
-            shape, dtype, data, nonstd::nullopt /* strides */, 0 /* offset */, chainerx::GetNativeBackend().GetDevice(0)));
-    return array;
+    return chainerx::FromData(shape, dtype, data, nonstd::nullopt /* strides */, 0 /* offset */, chainerx::GetNativeBackend().GetDevice(0));
 }
 
 struct TestCase {
@@ -104,26 +99,133 @@ struct TestCase {
     InOuts outputs;
 };
 
-void ReadTestDir(
-        const std::string& test_path,
-        const std::vector<std::string>& input_names,
-        const std::vector<std::string>& output_names,
-        std::vector<std::unique_ptr<TestCase>>* test_cases) {
-    for (const std::string& data_set_dir : ListDir(test_path)) {
-        if (!HasPrefix(Basename(data_set_dir), "test_data_set_")) continue;
-        std::unique_ptr<TestCase> test_case(new TestCase);
+chainerx::Shape ChainerXShapeFromONNX(const onnx::TensorShapeProto& xshape) {
+    chainerx::Shape shape;
+    for (const auto& dim : xshape.dim()) {
+        if (dim.has_dim_value()) {
+            shape.push_back(dim.dim_value());
+        } else {
+            LOG() << "Dimension " << dim.dim_param() << " was replaced by 1" << std::endl;
+            shape.push_back(1);
+        }
+    }
+    return shape;
+}
+
+void GenerateFixedInput(const onnx::ModelProto& xmodel, const std::set<std::string>& initializer_names, InOuts* inputs) {
+    for (const onnx::ValueInfoProto& input : xmodel.graph().input()) {
+        if (initializer_names.count(input.name())) continue;
+        CHECK(input.type().has_tensor_type()) << "Only tensor_type is supported: " << input.type().DebugString();
+        const onnx::TypeProto::Tensor& tensor_type = input.type().tensor_type();
+        chainerx::Dtype dtype = ChainerXTypeFromONNX(tensor_type.elem_type());
+        chainerx::Shape shape = ChainerXShapeFromONNX(tensor_type.shape());
+        chainerx::Array array = chainerx::Ones(shape, dtype, chainerx::GetNativeBackend().GetDevice(0));
+        CHECK(inputs->emplace(input.name(), std::shared_ptr<XCVMVar>(new XCVMVar(array))).second) << "Duplicated input: " << input.name();
+        LOG() << "Generated test input " << input.name() << " type=" << dtype << " shape=" << shape << std::endl;
+    }
+}
+
+chainerx::Array StageArray(chainerx::Array a) {
+    // TODO(hamaji): Figure out a better way to identify host inputs.
+    if (a.dtype() != chainerx::Dtype::kInt64) return a.ToDevice(chainerx::GetDefaultDevice());
+    return a;
+}
+
+XCVMVar* StageVar(XCVMVar* var) {
+    switch (var->kind()) {
+        case XCVMVar::Kind::kArray:
+            return new XCVMVar(StageArray(var->GetArray()));
+        case XCVMVar::Kind::kSequence: {
+            XCVMVar* out = new XCVMVar(XCVMVar::Kind::kSequence);
+            for (const XCVMVar& v : *var->GetSequence()) out->GetSequence()->emplace_back(StageArray(v.GetArray()));
+            return out;
+        }
+
+        case XCVMVar::Kind::kOpaque:
+        case XCVMVar::Kind::kNull:
+            CHECK(false) << var->DebugString();
+    }
+    CHECK(false);
+}
+
+// Reads test cases in `test_data_set_*` directories lazily. Tensor
+// files of a test case are loaded in parallel, and the next test case
+// is loaded in the background while the current one is being used.
+class TestCaseReader {
+public:
+    TestCaseReader(
+            const std::string& test_path,
+            const std::vector<std::string>& input_names,
+            const std::vector<std::string>& output_names,
+            int iterations)
+        : input_names_(input_names),
+          output_names_(output_names),
+          keep_loaded_(iterations > 1),
+          device_(&chainerx::GetDefaultDevice()),
+          pool_(std::max<int>(1, std::thread::hardware_concurrency()) - 1) {
+        for (const std::string& data_set_dir : ListDir(test_path)) {
+            if (HasPrefix(Basename(data_set_dir), "test_data_set_")) data_set_dirs_.push_back(data_set_dir);
+        }
+        CHECK(!data_set_dirs_.empty()) << "No test found in " << test_path;
+        num_runs_ = data_set_dirs_.size() * iterations;
+        loaded_.resize(data_set_dirs_.size());
+        Prefetch(0);
+    }
+
+    ~TestCaseReader() {
+        if (next_.valid()) next_.wait();
+    }
+
+    size_t size() const {
+        return data_set_dirs_.size();
+    }
+
+    // Returns the test case for the `run`-th run, which repeats all
+    // test cases.
+    std::shared_ptr<TestCase> Get(size_t run) {
+        const size_t index = run % data_set_dirs_.size();
+        std::shared_ptr<TestCase> test_case = loaded_[index];
+        if (!test_case) {
+            if (next_.valid() && next_index_ == index) {
+                test_case = next_.get();
+            } else {
+                test_case = Load(index);
+            }
+            if (keep_loaded_) loaded_[index] = test_case;
+        }
+        if (run + 1 < num_runs_) Prefetch((run + 1) % data_set_dirs_.size());
+        return test_case;
+    }
+
+private:
+    void Prefetch(size_t index) {
+        if (loaded_[index] || (next_.valid() && next_index_ == index)) return;
+        if (next_.valid()) next_.wait();
+        next_index_ = index;
+        next_ = std::async(std::launch::async, [this, index]() {
+            chainerx::DeviceScope device_scope(device_);
+            return Load(index);
+        });
+    }
+
+    std::shared_ptr<TestCase> Load(size_t index) {
+        const std::string& data_set_dir = data_set_dirs_[index];
+        std::shared_ptr<TestCase> test_case(new TestCase);
         test_case->name = data_set_dir;
         size_t input_index = 0;
         size_t output_index = 0;
 
-        std::vector<std::tuple<std::string, std::string, chainerx::Array>> all_tensors;
+        std::vector<std::string> tensor_pbs;
         for (const std::string& tensor_pb : ListDir(data_set_dir)) {
-            if (!HasSuffix(tensor_pb, ".pb")) continue;
-            onnx::TensorProto xtensor(LoadLargeProto<onnx::TensorProto>(tensor_pb));
-            chainerx::Array tensor(MakeArrayFromONNX(xtensor));
-            all_tensors.emplace_back(Basename(tensor_pb), xtensor.name(), tensor);
+            if (HasSuffix(tensor_pb, ".pb")) tensor_pbs.push_back(tensor_pb);
         }
-
+        std::vector<std::tuple<std::string, std::string, chainerx::Array>> all_tensors(tensor_pbs.size());
+        pool_.ParallelFor(tensor_pbs.size(), [&tensor_pbs, &all_tensors](int64_t i) {
+            onnx::TensorProto loaded(LoadLargeProto<onnx::TensorProto>(tensor_pbs[i]));
+            std::shared_ptr<onnx::TensorProto> xtensor = std::make_shared<onnx::TensorProto>();
+            xtensor->Swap(&loaded);
+            all_tensors[i] = std::make_tuple(Basename(tensor_pbs[i]), xtensor->name(), MakeArrayFromONNX(xtensor));
+        });
         std::vector<std::tuple<std::string, std::string, XCVMVar*>> all_vars;
         for (size_t i = 0; i < all_tensors.size(); ++i) {
             const std::string& filename = std::get<0>(all_tensors[i]);
@@ -157,14 +259,16 @@ void ReadTestDir(
             std::shared_ptr<XCVMVar> var(std::get<2>(p));
             if (HasPrefix(filename, "input_")) {
                 if (tensor_name.empty()) {
-                    CHECK_LT(input_index, input_names.size());
-                    tensor_name = input_names[input_index++];
+                    CHECK_LT(input_index, input_names_.size());
+                    tensor_name = input_names_[input_index++];
                 }
+                // Inputs are staged only once for all runs.
+                var.reset(StageVar(var.get()));
                 CHECK(test_case->inputs.emplace(tensor_name, var).second) << "Duplicate input tensor: " << tensor_name;
             } else if (HasPrefix(filename, "output_")) {
                 if (tensor_name.empty()) {
-                    CHECK_LT(output_index, output_names.size());
-                    tensor_name = output_names[output_index++];
+                    CHECK_LT(output_index, output_names_.size());
+                    tensor_name = output_names_[output_index++];
                 }
                 CHECK(test_case->outputs.emplace(tensor_name, var).second) << "Duplicate output tensor:" << tensor_name;
             } else if (HasPrefix(filename, "gradient_")) {
@@ -172,59 +276,20 @@ void ReadTestDir(
                 CHECK(test_case->outputs.emplace("grad_out@" + tensor_name, var).second) << "Duplicate gradient tensor:" << tensor_name;
             }
         }
-        test_cases->emplace_back(std::move(test_case));
+        return test_case;
     }
-    CHECK(!test_cases->empty()) << "No test found in " << test_path;
-}
 
-chainerx::Shape ChainerXShapeFromONNX(const onnx::TensorShapeProto& xshape) {
-    chainerx::Shape shape;
-    for (const auto& dim : xshape.dim()) {
-        if (dim.has_dim_value()) {
-            shape.push_back(dim.dim_value());
-        } else {
-            LOG() << "Dimension " << dim.dim_param() << " was replaced by 1" << std::endl;
-            shape.push_back(1);
-        }
-    }
-    return shape;
-}
-
-void GenerateFixedInput(const onnx::ModelProto& xmodel, const std::set<std::string>& initializer_names, InOuts* inputs) {
-    for (const onnx::ValueInfoProto& input : xmodel.graph().input()) {
-        if (initializer_names.count(input.name())) continue;
-        CHECK(input.type().has_tensor_type()) << "Only tensor_type is supported: " << input.type().DebugString();
-        const onnx::TypeProto::Tensor& tensor_type = input.type().tensor_type();
-        chainerx::Dtype dtype = ChainerXTypeFromONNX(tensor_type.elem_type());
-        chainerx::Shape shape = ChainerXShapeFromONNX(tensor_type.shape());
-        chainerx::Array array = chainerx::Ones(shape, dtype, chainerx::GetNativeBackend().GetDevice(0));
-        CHECK(inputs->emplace(input.name(), std::shared_ptr<XCVMVar>(new XCVMVar(array))).second) << "Duplicated input: " << input.name();
-        LOG() << "Generated test input " << input.name() << " type=" << dtype << " shape=" << shape << std::endl;
-    }
-}
-
-chainerx::Array StageArray(chainerx::Array a) {
-    // TODO(hamaji): Figure out a better way to identify host inputs.
-    if (a.dtype() != chainerx::Dtype::kInt64) return a.ToDevice(chainerx::GetDefaultDevice());
-    return a;
-}
-
-XCVMVar* StageVar(XCVMVar* var) {
-    switch (var->kind()) {
-        case XCVMVar::Kind::kArray:
-            return new XCVMVar(StageArray(var->GetArray()));
-        case XCVMVar::Kind::kSequence: {
-            XCVMVar* out = new XCVMVar(XCVMVar::Kind::kSequence);
-            for (const XCVMVar& v : *var->GetSequence()) out->GetSequence()->emplace_back(StageArray(v.GetArray()));
-            return out;
-        }
-
-        case XCVMVar::Kind::kOpaque:
-        case XCVMVar::Kind::kNull:
-            CHECK(false) << var->DebugString();
-    }
-    CHECK(false);
-}
+    const std::vector<std::string> input_names_;
+    const std::vector<std::string> output_names_;
+    const bool keep_loaded_;
+    chainerx::Device* device_;
+    ThreadPool pool_;
+    std::vector<std::string> data_set_dirs_;
+    size_t num_runs_;
+    std::vector<std::shared_ptr<TestCase>> loaded_;
+    size_t next_index_ = 0;
+    std::future<std::shared_ptr<TestCase>> next_;
+};
 
 class ModelRunner {
 public:
@@ -263,6 +328,7 @@ public:
         xcvm_opts_.dump_memory_usage = args_.exist("trace");
         xcvm_opts_.base_memory_usage = initial_free_bytes_;
         xcvm_opts_.dump_outputs_dir = args_.get<std::string>("dump_outputs_dir");
+        xcvm_opts_.num_threads = args_.get<int>("num_threads");
         if (!args_.get<std::string>("chrome_tracing").empty()) {
             xcvm_opts_.chrome_tracing = new ChromeTracingEmitter();
         }
@@ -284,11 +350,7 @@ public:
             if (name) {
                 out_onnx = StrCat(name, '_', out_onnx);
             }
-            onnx::ModelProto xmodel;
-            model->ToONNX(&xmodel);
-            std::ofstream ofs(out_onnx);
-            CHECK(ofs) << "Failed to open output ONNX: " << out_onnx;
-            CHECK(xmodel.SerializeToOstream(&ofs));
+            WriteModel(*model, out_onnx, args_.exist("out_onnx_external_data"));
         }
 
         LOG() << "Generate code..." << std::endl;
@@ -392,9 +454,11 @@ void RunMain(const std::vector<std::string>& argv) {
     args.add<std::string>("onnx", '\0', "ONNX model", false);
     args.add<std::string>("device", 'd', "ChainerX device to be used", false);
     args.add<std::string>("out_onnx", '\0', "Output ONNX model after optimization", false);
+    args.add("out_onnx_external_data", '\0', "Store large initializers of --out_onnx in a separate file");
     args.add<std::string>("out_xcvm", '\0', "Output XCVM program", false);
     args.add<std::string>("dump_outputs_dir", '\0', "Dump each output of XCVM ops to this directory", false);
     args.add<int>("iterations", 'I', "The number of iteartions", false, 1);
+    args.add<int>("num_threads", '\0', "The number of threads to run independent XCVM ops", false, 1);
     args.add<double>("rtol", '\0', "rtol of AllClose", false, 1e-4);
     args.add<double>("atol", '\0', "atol of AllClose", false, 1e-6);
     args.add("check_nans", '\0', "Check for NaNs after each operation");
@@ -446,6 +510,7 @@ void RunMain(const std::vector<std::string>& argv) {
     LOG() << "Loading model..." << std::endl;
     RegisterCustomOnnxOperatorSetSchema();
     onnx::ModelProto xmodel(LoadLargeProto<onnx::ModelProto>(onnx_path));
+    ResolveExternalDataLocations(onnx_path, &xmodel);
     Model model(xmodel);
     if (!g_skip_inference) model.mutable_graph()->InferShapes();
 
@@ -465,27 +530,26 @@ void RunMain(const std::vector<std::string>& argv) {
         output_names.push_back(output->name());
     }
 
-    std::vector<std::unique_ptr<TestCase>> test_cases;
-    if (test_path.empty()) {
-        std::unique_ptr<TestCase> test_case(new TestCase());
-        test_case->name = "generated data by chainerx::Ones";
-        GenerateFixedInput(xmodel, initializer_names, &test_case->inputs);
-        test_cases.emplace_back(std::move(test_case));
-    } else {
-        ReadTestDir(test_path, input_names, output_names, &test_cases);
-        LOG() << "Found " << test_cases.size() << " test cases" << std::endl;
-    }
-
     int iterations = args.get<int>("iterations");
     CHECK_LT(0, iterations);
-    if (iterations > 1) {
-        std::vector<std::unique_ptr<TestCase>> new_test_cases;
-        for (int i = 0; i < iterations; ++i) {
-            for (auto& test : test_cases) {
-                new_test_cases.emplace_back(new TestCase(*test));
-            }
+
+    // Test data sets are loaded in the background while the model is
+    // being compiled and run.
+    std::unique_ptr<TestCaseReader> test_case_reader;
+    std::shared_ptr<TestCase> generated_test_case;
+    size_t num_test_cases = 1;
+    if (test_path.empty()) {
+        generated_test_case.reset(new TestCase());
+        generated_test_case->name = "generated data by chainerx::Ones";
+        InOuts inputs;
+        GenerateFixedInput(xmodel, initializer_names, &inputs);
+        for (const auto& p : inputs) {
+            generated_test_case->inputs.emplace(p.first, std::shared_ptr<XCVMVar>(StageVar(p.second.get())));
         }
-        test_cases.swap(new_test_cases);
+    } else {
+        test_case_reader.reset(new TestCaseReader(test_path, input_names, output_names, iterations));
+        num_test_cases = test_case_reader->size();
+        LOG() << "Found " << num_test_cases << " test cases" << std::endl;
     }
 
     ModelRunner model_runner(args, initial_free_bytes, &model);
@@ -494,12 +558,12 @@ void RunMain(const std::vector<std::string>& argv) {
 
     double elapsed_total = 0;
     int test_cnt = 0;
-    for (const std::unique_ptr<TestCase>& test_case : test_cases) {
+    for (size_t run = 0; run < num_test_cases * iterations; ++run) {
+        std::shared_ptr<TestCase> test_case = test_case_reader ? test_case_reader->Get(run) : generated_test_case;
         LOG() << "Running for " << test_case->name << std::endl;
         InOuts inputs(model_runner.params());
         for (const auto& p : test_case->inputs) {
-            XCVMVar* v = StageVar(p.second.get());
-            CHECK(inputs.emplace(p.first, std::shared_ptr<XCVMVar>(v)).second) << "Duplicated input parameter: " << p.first;
+            CHECK(inputs.emplace(p.first, p.second).second) << "Duplicated input parameter: " << p.first;
         }
 
         std::chrono::system_clock::time_point start = std::chrono::system_clock::now();
@@ -527,6 +591,10 @@ void RunMain(const std::vector<std::string>& argv) {
             continue;
         }
 
+        chainerx::GetDefaultDevice().Synchronize();
+        std::chrono::system_clock::time_point end = std::chrono::system_clock::now();
+        double elapsed = std::chrono::duration_cast<std::chrono::microseconds>(end - start).count() * 0.001;
+
         LOG() << "Verifying the result..." << std::endl;
         size_t ok_cnt = 0;
         for (const auto& p : test_case->outputs) {
@@ -537,13 +605,14 @@ void RunMain(const std::vector<std::string>& argv) {
             CHECK(found != outputs.end()) << "Output does not contain " << key;
             XCVMVar* actual = found->second.get();
 
-            auto array_str = [&args](const nonstd::optional<chainerx::Array>& a) {
+            // Arrays are printed only in the verbose mode.
+            auto array_str = [](const nonstd::optional<chainerx::Array>& a) {
                 int size = a->GetTotalSize();
-                if (size < 100 || args.exist("verbose")) return a->ToString();
+                if (size < 100) return a->ToString();
                 return a->shape().ToString() + " [0,20]=" + a->Reshape({size}).At({chainerx::Slice{20}}).ToString();
             };
 
-            auto var_str = [&args, array_str](XCVMVar* v) {
+            auto var_str = [array_str](XCVMVar* v) {
                 switch (v->kind()) {
                     case XCVMVar::Kind::kArray:
                         return array_str(v->GetArray());
@@ -556,39 +625,56 @@ void RunMain(const std::vector<std::string>& argv) {
                 CHECK(false);
             };
 
-            auto fail = [&](const std::string& type) {
-                LOG() << RED << "FAIL(" << type << "): " << key << RESET << "\nExpected: " << var_str(expected)
-                      << "\nActual: " << var_str(actual) << std::endl;
+            auto fail = [&](const std::string& type, const std::string& detail) {
+                LOG() << RED << "FAIL(" << type << "): " << key << RESET << "\n" << detail << std::endl;
+                if (args.exist("verbose")) {
+                    LOG() << "Expected: " << var_str(expected) << "\nActual: " << var_str(actual) << std::endl;
+                }
             };
 
             auto check_array = [&](const chainerx::Array& expected, const chainerx::Array& actual) {
                 if (expected.dtype() != actual.dtype()) {
-                    fail("dtype");
+                    fail("dtype", StrCat("Expected: ", expected.dtype(), "\nActual: ", actual.dtype()));
                     return false;
                 }
                 if (expected.shape() != actual.shape()) {
-                    fail("shape");
+                    fail("shape", StrCat("Expected: ", expected.shape(), "\nActual: ", actual.shape()));
                     return false;
                 }
                 if (iterations > 1) return true;
 
-                int mismatch = MismatchInAllClose(expected, actual, args.get<double>("rtol"), args.get<double>("atol"));
-                if (mismatch) {
-                    if (expected.GetTotalSize() == 1 && static_cast<bool>(chainerx::AsScalar(chainerx::IsNan(expected))) &&
-                        static_cast<bool>(chainerx::AsScalar(chainerx::IsNan(actual)))) {
-                        return true;
-                    }
-                    fail("value");
-                    int total_size = expected.GetTotalSize();
-                    LOG() << "Mismatch: " << mismatch << " / " << total_size << " (" << static_cast<double>(mismatch) * 100.0 / total_size
-                          << "%)" << std::endl;
+                const int64_t total_size = expected.GetTotalSize();
+                // A scalar NaN is OK if the expected value is also NaN.
+                const AllCloseResult result = ComputeAllCloseStats(
+                        expected, actual, args.get<double>("rtol"), args.get<double>("atol"), total_size == 1 /* equal_nan */);
+                if (result.mismatch_count) {
+                    const int64_t index = result.first_mismatch_index;
+                    chainerx::Array expected_value = expected.Reshape({total_size}).At({index});
+                    chainerx::Array actual_value = actual.Reshape({total_size}).At({index});
+                    fail("value",
+                         StrCat("Mismatch: ",
+                                result.mismatch_count,
+                                " / ",
+                                total_size,
+                                " (",
+                                static_cast<double>(result.mismatch_count) * 100.0 / total_size,
+                                "%) max_abs_error=",
+                                result.max_abs_error,
+                                " max_rel_error=",
+                                result.max_rel_error,
+                                "\nFirst mismatch at ",
+                                index,
+                                ": expected=",
+                                chainerx::AsScalar(expected_value),
+                                " actual=",
+                                chainerx::AsScalar(actual_value)));
                     return false;
                 }
                 return true;
             };
 
             if (expected->kind() != actual->kind()) {
-                fail("kind");
+                fail("kind", StrCat("Expected: ", expected->DebugString(), "\nActual: ", actual->DebugString()));
                 continue;
             }
 
@@ -602,7 +688,7 @@ void RunMain(const std::vector<std::string>& argv) {
                     const auto& expected_seq = *expected->GetSequence();
                     const auto& actual_seq = *actual->GetSequence();
                     if (expected_seq.size() != actual_seq.size()) {
-                        fail("seq_size");
+                        fail("seq_size", StrCat("Expected: ", expected_seq.size(), "\nActual: ", actual_seq.size()));
                         ok = false;
                         break;
                     }
@@ -625,14 +711,13 @@ void RunMain(const std::vector<std::string>& argv) {
             ++ok_cnt;
         }
 
-        chainerx::GetDefaultDevice().Synchronize();
-
-        std::chrono::system_clock::time_point end = std::chrono::system_clock::now();
-        double elapsed = std::chrono::duration_cast<std::chrono::microseconds>(end - start).count() * 0.001;
+        double verification_elapsed =
+                std::chrono::duration_cast<std::chrono::microseconds>(std::chrono::system_clock::now() - end).count() * 0.001;
         LOG() << "Elapsed: " << elapsed << " msec" << std::endl;
+        if (iterations == 1) LOG() << "Verification: " << verification_elapsed << " msec" << std::endl;
 
         // The first iteration is for warm up.
-        if (test_case != test_cases.front()) elapsed_total += elapsed;
+        if (run > 0) elapsed_total += elapsed;
 
         if (iterations == 1) CHECK_EQ(ok_cnt, test_case->outputs.size());
     }
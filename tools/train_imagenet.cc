@@ -24,6 +24,7 @@
 #include <compiler/value.h>
 #include <compiler/xcvm/emitter.h>
 #include <feeder/imagenet_iterator.h>
+#include <feeder/mmap_iterator.h>
 #include <runtime/chainerx_util.h>
 #include <runtime/chrome_tracing.h>
 #include <runtime/meminfo.h>
@@ -31,6 +32,7 @@
 #include <runtime/xcvm_var.h>
 #include <tools/cmdline.h>
 #include <tools/compiler_flags.h>
+#include <tools/trainer.h>
 #include <tools/util.h>
 
 namespace chainer_compiler {
@@ -50,7 +52,9 @@ bool ExpectsOnehot(const Model& model) {
     return (input_names.count("Input_0") && input_names.count("Input_1") && input_names.count("Input_2"));
 }
 
-void RunMain(const std::vector<std::string>& argv) {
+}  // namespace
+
+ImagenetTrainer::ImagenetTrainer(const std::vector<std::string>& argv) {
     cmdline::parser args;
     args.add<int>("batchsize", 'B', "Batch size", false, 32);
     args.add<float>("learning_rate", '\0', "Learning rate", false, 0.01);
@@ -58,6 +62,11 @@ void RunMain(const std::vector<std::string>& argv) {
     args.add<std::string>("chrome_tracing", '\0', "Output chrome tracing profile", false);
     args.add<int>("chrome_tracing_frequency", '\0', "Output chrome tracing every this itearation", false, 100);
     args.add<int>("iterations", 'I', "Number of iterations to train", false, 100);
+    args.add<int>("epoch", 'E', "Number of sweeps over the dataset to train", false, 1);
+    args.add<int>("loaderjob", 'j', "Number of threads to decode images", false, 1);
+    args.add<int>("loss_interval", '\0', "Read losses back from the device every this iteration", false, 1);
+    args.add("no_random_crop", '\0', "Crop the center of images without flipping");
+    args.add("shards", '\0', "<train.txt> is a comma separated list of pre-decoded shards");
     args.add("check_nans", '\0', "Check for NaNs after each operation");
     args.add("check_infs", '\0', "Check for infinities after each operation");
     args.add("dump_onnx", '\0', "Dump ONNX model after optimization");
@@ -77,10 +86,13 @@ void RunMain(const std::vector<std::string>& argv) {
 
     g_quiet = args.exist("quiet");
     int batch_size = args.get<int>("batchsize");
+    chrome_tracing_ = args.get<std::string>("chrome_tracing");
+    chrome_tracing_frequency_ = args.get<int>("chrome_tracing_frequency");
+    max_iterations_ = args.get<int>("iterations");
 
     LOG() << "Initializing ChainerX..." << std::endl;
-    chainerx::Context ctx;
-    chainerx::SetGlobalDefaultContext(&ctx);
+    ctx_.reset(new chainerx::Context());
+    chainerx::SetGlobalDefaultContext(ctx_.get());
     chainerx::NoBackpropModeScope no_backprop;
     const std::string device_spec = args.get<std::string>("device");
     if (!device_spec.empty()) {
@@ -91,22 +103,31 @@ void RunMain(const std::vector<std::string>& argv) {
             g_meminfo_enabled = true;
         }
     }
-    int64_t initial_free_bytes = GetMemoryUsageInBytes();
+    chainerx::Device* device = &chainerx::GetDefaultDevice();
+    initial_free_bytes_ = GetMemoryUsageInBytes();
 
     LOG() << "Constructing model..." << std::endl;
     RegisterCustomOnnxOperatorSetSchema();
     onnx::ModelProto xmodel(LoadLargeProto<onnx::ModelProto>(args.rest()[0]));
+    ResolveExternalDataLocations(args.rest()[0], &xmodel);
     Model model(xmodel);
     if (!g_skip_inference) model.mutable_graph()->InferShapes();
     const bool expects_onehot = ExpectsOnehot(model);
     CHECK_EQ(1, model.graph().output_values().size());
     const std::string loss_value_name = model.graph().output_values()[0]->name();
+    g_learning_rate = args.get<float>("learning_rate");
     RunDefaultPasses(&model, true /* gen_backprop */);
 
-    std::vector<Value*> infeed_values;
+    std::vector<std::string> infeed_names;
+    int height = 0, width = 0;
     for (Value* value : model.graph().input_values()) {
         if (value->initializer() == nullptr) {
-            infeed_values.push_back(value);
+            infeed_names.push_back(value->name());
+            const std::vector<int64_t>& dims = value->type().dims();
+            if (dims.size() == 4) {
+                height = dims[2];
+                width = dims[3];
+            }
         }
     }
 
@@ -114,7 +135,7 @@ void RunMain(const std::vector<std::string>& argv) {
 
     InOuts params(LoadParams(model.graph()));
 
-    chainerx::Array batch_size_array = MakeScalarArray(static_cast<float>(batch_size)).ToDevice(chainerx::GetDefaultDevice());
+    chainerx::Array batch_size_array = MakeScalarArray(static_cast<float>(batch_size)).ToDevice(*device);
 
     int trace_level = args.exist("verbose") ? 2 : args.exist("trace") ? 1 : 0;
 
@@ -137,119 +158,142 @@ void RunMain(const std::vector<std::string>& argv) {
         }
     }
 
-    XCVM xcvm(xcvm_prog);
+    xcvm_.reset(new XCVM(xcvm_prog));
     XCVMOptions xcvm_opts;
     xcvm_opts.trace_level = trace_level;
     xcvm_opts.is_training = true;
     xcvm_opts.check_nans = args.exist("check_nans");
     xcvm_opts.check_infs = args.exist("check_infs");
     xcvm_opts.dump_memory_usage = args.exist("trace");
-    xcvm_opts.base_memory_usage = initial_free_bytes;
-
-    int64_t param_bytes = initial_free_bytes - GetMemoryUsageInBytes();
-
-    int height = 0, width = 0;
-    for (Value* value : infeed_values) {
-        const std::vector<int64_t>& dims = value->type().dims();
-        if (dims.size() == 4) {
-            height = dims[2];
-            width = dims[3];
-        }
+    xcvm_opts.base_memory_usage = initial_free_bytes_;
+
+    param_bytes_ = initial_free_bytes_ - GetMemoryUsageInBytes();
+
+    const std::vector<float>& mean = LoadMean(args.rest()[2]);
+    if (args.exist("shards")) {
+        train_iter_.reset(new MmapIterator(
+                SplitString(args.rest()[1], ","),
+                3,
+                batch_size,
+                mean,
+                height,
+                width,
+                args.get<int>("loaderjob"),
+                !args.exist("no_random_crop"),
+                args.get<int>("epoch")));
+    } else {
+        train_iter_.reset(new ImageNetIterator(
+                args.rest()[1],
+                3,
+                batch_size,
+                mean,
+                height,
+                width,
+                args.get<int>("loaderjob"),
+                !args.exist("no_random_crop"),
+                args.get<int>("epoch")));
     }
-    const std::vector<float>& mean = LoadMean(args.rest()[2], height, width);
-    ImageNetIterator train_iter(args.rest()[1], 3, batch_size, mean, height, width);
-    train_iter.Start();
-
-    std::chrono::system_clock::time_point start = std::chrono::system_clock::now();
-    LOG() << "Start training!" << std::endl;
-    int iter_count = 0;
-    int max_iterations = args.get<int>("iterations");
-    for (; !max_iterations || iter_count < max_iterations; ++iter_count) {
-        if (!args.get<std::string>("chrome_tracing").empty() && iter_count % args.get<int>("chrome_tracing_frequency") == 1) {
-            xcvm_opts.chrome_tracing = new ChromeTracingEmitter();
-        }
+    train_iter_->Start();
 
+    // Runs in the background thread of `Trainer`.
+    DataIterator* train_iter = train_iter_.get();
+    auto prepare = [train_iter, expects_onehot, infeed_names, batch_size_array, device]() {
         InOuts inputs;
-        {
-            ChromeTracingEmitter::ScopedEvent se(xcvm_opts.chrome_tracing, "Trainer", "Prepare");
-
-            std::vector<chainerx::Array> data = train_iter.GetNext();
-            if (data.empty()) break;
-
-            inputs = params;
-            if (expects_onehot) {
-                CHECK_EQ(2, data.size());
-                CHECK_EQ(3, infeed_values.size());
-                inputs.emplace("Input_0", std::shared_ptr<XCVMVar>(new XCVMVar(data[0].ToDevice(chainerx::GetDefaultDevice()))));
-                chainerx::Array labels = data[1].ToDevice(chainerx::GetDefaultDevice()).AsType(chainerx::Dtype::kInt64);
-                chainerx::Array onehot = chainerx::Eye(1000, nonstd::nullopt, nonstd::nullopt, chainerx::Dtype::kFloat32).Take(labels, 0);
-                inputs.emplace("Input_1", std::shared_ptr<XCVMVar>(new XCVMVar(onehot)));
-                inputs.emplace("Input_2", std::shared_ptr<XCVMVar>(new XCVMVar(batch_size_array)));
-            } else {
-                CHECK_EQ(2, data.size());
-                CHECK_EQ(2, infeed_values.size());
-                inputs.emplace(
-                        infeed_values[0]->name(), std::shared_ptr<XCVMVar>(new XCVMVar(data[0].ToDevice(chainerx::GetDefaultDevice()))));
-                chainerx::Array labels = data[1].ToDevice(chainerx::GetDefaultDevice()).AsType(chainerx::Dtype::kInt64);
-                inputs.emplace(infeed_values[1]->name(), std::shared_ptr<XCVMVar>(new XCVMVar(labels)));
-            }
+        std::vector<chainerx::Array> data = train_iter->GetNext();
+        if (data.empty()) return inputs;
+
+        CHECK_EQ(2, data.size());
+        chainerx::Array labels = data[1].ToDevice(*device).AsType(chainerx::Dtype::kInt64);
+        if (expects_onehot) {
+            CHECK_EQ(3, infeed_names.size());
+            inputs.emplace("Input_0", std::shared_ptr<XCVMVar>(new XCVMVar(data[0].ToDevice(*device))));
+            chainerx::Array onehot = chainerx::Eye(1000, nonstd::nullopt, nonstd::nullopt, chainerx::Dtype::kFloat32).Take(labels, 0);
+            inputs.emplace("Input_1", std::shared_ptr<XCVMVar>(new XCVMVar(onehot)));
+            inputs.emplace("Input_2", std::shared_ptr<XCVMVar>(new XCVMVar(batch_size_array)));
+        } else {
+            CHECK_EQ(2, infeed_names.size());
+            inputs.emplace(infeed_names[0], std::shared_ptr<XCVMVar>(new XCVMVar(data[0].ToDevice(*device))));
+            inputs.emplace(infeed_names[1], std::shared_ptr<XCVMVar>(new XCVMVar(labels)));
         }
+        return inputs;
+    };
 
-        InOuts outputs;
+    // Parameters are updated by the XCVM program with `--optimizer`,
+    // which outputs no gradients.
+    trainer_.reset(new Trainer(
+            xcvm_.get(), xcvm_opts, params, loss_value_name, prepare, args.get<float>("learning_rate"), args.get<int>("loss_interval")));
+}
 
-        {
-            ChromeTracingEmitter::ScopedEvent se(xcvm_opts.chrome_tracing, "Trainer", "Run");
-            outputs = xcvm.Run(inputs, xcvm_opts);
-        }
+ImagenetTrainer::~ImagenetTrainer() {
+    // Wait for the prefetch by `trainer_` before stopping the iterator.
+    trainer_.reset();
+    train_iter_->Terminate();
+    chainerx::SetGlobalDefaultContext(nullptr);
+}
 
-        {
-            ChromeTracingEmitter::ScopedEvent se(xcvm_opts.chrome_tracing, "Trainer", "Update");
-            for (auto&& p : outputs) {
-                if (!HasPrefix(p.first, "grad_out@")) continue;
-                const std::string& param_name = p.first.substr(9);
-                auto found = inputs.find(param_name);
-                CHECK(found != inputs.end());
-                XCVMVar* param = found->second.get();
-                XCVMVar* grad = p.second.get();
-                CHECK_EQ(param->kind(), XCVMVar::Kind::kArray) << "Only an array can be a parameter";
-                CHECK_EQ(grad->kind(), XCVMVar::Kind::kArray) << "Only an array can be a parameter";
-                param->GetArray() -= grad->GetArray() * args.get<float>("learning_rate");
-            }
-        }
+bool ImagenetTrainer::Step() {
+    if (max_iterations_ && iter_count_ >= max_iterations_) {
+        trainer_->Sync();
+        return false;
+    }
 
-        double loss;
-        {
-            ChromeTracingEmitter::ScopedEvent se(xcvm_opts.chrome_tracing, "Trainer", "Sync");
-            loss = static_cast<double>(chainerx::AsScalar(outputs[loss_value_name]->GetArray()));
-        }
+    XCVMOptions* xcvm_opts = trainer_->mutable_options();
+    if (!chrome_tracing_.empty() && iter_count_ % chrome_tracing_frequency_ == 1) {
+        xcvm_opts->chrome_tracing = new ChromeTracingEmitter();
+    }
+
+    const bool ok = trainer_->Step();
+    if (ok) ++iter_count_;
 
+    if (xcvm_opts->chrome_tracing) {
+        xcvm_opts->chrome_tracing->Emit(chrome_tracing_);
+        delete xcvm_opts->chrome_tracing;
+        xcvm_opts->chrome_tracing = nullptr;
+    }
+    return ok;
+}
+
+void ImagenetTrainer::Run() {
+    LOG() << "Start training!" << std::endl;
+    std::chrono::system_clock::time_point start = std::chrono::system_clock::now();
+    size_t num_logged = 0;
+    bool ok = true;
+    while (ok) {
+        ok = Step();
+
+        const std::vector<double>& losses = trainer_->losses();
+        if (num_logged == losses.size()) continue;
         std::chrono::system_clock::time_point end = std::chrono::system_clock::now();
+        // The time per iteration since the last losses were read.
         double elapsed = std::chrono::duration_cast<std::chrono::microseconds>(end - start).count() * 0.001;
+        elapsed /= losses.size() - num_logged;
         start = end;
-        std::cout << train_iter.GetStatus() << " loss=" << loss << " elapsed=" << elapsed << "ms";
-        if (initial_free_bytes >= 0) {
-            int64_t free_bytes = GetMemoryUsageInBytes();
-            size_t used_bytes = initial_free_bytes - free_bytes;
-            size_t param_mbs = param_bytes / 1000 / 1000;
-            size_t used_mbs = used_bytes / 1000 / 1000;
-            std::cout << " param=" << param_mbs << "MB used=" << used_mbs << "MB";
-        }
-        std::cout << std::endl;
-
-        if (xcvm_opts.chrome_tracing) {
-            xcvm_opts.chrome_tracing->Emit(args.get<std::string>("chrome_tracing"));
-            delete xcvm_opts.chrome_tracing;
-            xcvm_opts.chrome_tracing = nullptr;
+        for (; num_logged < losses.size(); ++num_logged) {
+            std::cout << train_iter_->GetStatus() << " loss=" << losses[num_logged] << " elapsed=" << elapsed << "ms";
+            if (initial_free_bytes_ >= 0) {
+                int64_t free_bytes = GetMemoryUsageInBytes();
+                size_t used_bytes = initial_free_bytes_ - free_bytes;
+                size_t param_mbs = param_bytes_ / 1000 / 1000;
+                size_t used_mbs = used_bytes / 1000 / 1000;
+                std::cout << " param=" << param_mbs << "MB used=" << used_mbs << "MB";
+            }
+            std::cout << std::endl;
         }
     }
+    LOG() << GetStats().ToString() << std::endl;
+}
 
-    train_iter.Terminate();
+const std::vector<double>& ImagenetTrainer::GetLosses() const {
+    return trainer_->losses();
 }
 
-}  // namespace
+const TrainerStats& ImagenetTrainer::GetStats() const {
+    return trainer_->stats();
+}
 
 void TrainImagenet(const std::vector<std::string>& argv) {
-    RunMain(argv);
+    ImagenetTrainer trainer(argv);
+    trainer.Run();
 }
 
 }  // namespace runtime
@@ -1,11 +1,58 @@
 #pragma once
 
+#include <cstdint>
+#include <memory>
 #include <string>
 #include <vector>
 
+class DataIterator;
+
+namespace chainerx {
+class Context;
+}  // namespace chainerx
+
 namespace chainer_compiler {
 namespace runtime {
 
+class Trainer;
+class XCVM;
+struct TrainerStats;
+
+// Trains an ONNX model with ImageNet data. The constructor takes the
+// same command line arguments as train_imagenet.
+class ImagenetTrainer {
+public:
+    explicit ImagenetTrainer(const std::vector<std::string>& argv);
+    ~ImagenetTrainer();
+
+    ImagenetTrainer(const ImagenetTrainer&) = delete;
+    ImagenetTrainer& operator=(const ImagenetTrainer&) = delete;
+
+    // Runs a training step. Returns false at the end of training.
+    bool Step();
+
+    // Runs steps until the end of training with logs.
+    void Run();
+
+    // Losses of steps which have been read back from the device.
+    const std::vector<double>& GetLosses() const;
+
+    const TrainerStats& GetStats() const;
+
+private:
+    std::unique_ptr<chainerx::Context> ctx_;
+    std::unique_ptr<XCVM> xcvm_;
+    std::unique_ptr<DataIterator> train_iter_;
+    std::unique_ptr<Trainer> trainer_;
+
+    std::string chrome_tracing_;
+    int chrome_tracing_frequency_ = 0;
+    int max_iterations_ = 0;
+    int iter_count_ = 0;
+    int64_t initial_free_bytes_ = 0;
+    int64_t param_bytes_ = 0;
+};
+
 void TrainImagenet(const std::vector<std::string>& argv);
 
 }  // namespace runtime
@@ -1,23 +1,63 @@
+#include <memory>
+
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 
 #include <tools/train_imagenet.h>
+#include <tools/trainer.h>
 
 namespace chainer_compiler {
 namespace runtime {
 
+namespace py = pybind11;
+
 namespace {
 
 void TrainImagenetFromPython(const std::vector<std::string>& argv) {
-    pybind11::gil_scoped_release gsr;
+    py::gil_scoped_release gsr;
     TrainImagenet(argv);
 }
 
+void InitTrainer(py::module& m) {
+    py::class_<ImagenetTrainer> c{m, "Trainer"};
+    c.def(py::init([](const std::vector<std::string>& argv) {
+              py::gil_scoped_release gsr;
+              return std::make_unique<ImagenetTrainer>(argv);
+          }),
+          "Set up training by arguments of train_imagenet");
+    c.def("step",
+          [](ImagenetTrainer& trainer) {
+              py::gil_scoped_release gsr;
+              return trainer.Step();
+          },
+          "Run a training step and return False at the end of training");
+    c.def("run",
+          [](ImagenetTrainer& trainer) {
+              py::gil_scoped_release gsr;
+              trainer.Run();
+          },
+          "Run training steps until the end with logs");
+    c.def("losses", &ImagenetTrainer::GetLosses, "Losses which have been read back from the device");
+    c.def("stats",
+          [](const ImagenetTrainer& trainer) {
+              const TrainerStats& stats = trainer.GetStats();
+              py::dict d;
+              d["num_steps"] = stats.num_steps;
+              d["prepare_ms"] = stats.prepare_ms;
+              d["run_ms"] = stats.run_ms;
+              d["update_ms"] = stats.update_ms;
+              d["sync_ms"] = stats.sync_ms;
+              return d;
+          },
+          "Time spent in each phase of steps in total");
+}
+
 }  // namespace
 
 PYBIND11_MODULE(train_imagenet_core, m) {  // NOLINT
     m.doc() = "train_imagenet";
     m.def("train_imagenet", &TrainImagenetFromPython, "Run train_imagenet");
+    InitTrainer(m);
 }
 
 }  // namespace runtime
@@ -0,0 +1,149 @@
+#include "tools/trainer.h"
+
+#include <algorithm>
+#include <chrono>
+#include <sstream>
+
+#include <chainerx/backprop_mode.h>
+#include <chainerx/context.h>
+#include <chainerx/device.h>
+
+#include <common/log.h>
+#include <common/strutil.h>
+#include <runtime/chrome_tracing.h>
+#include <runtime/xcvm_var.h>
+
+namespace chainer_compiler {
+namespace runtime {
+
+namespace {
+
+class ScopedTimer {
+public:
+    explicit ScopedTimer(double* total_ms) : total_ms_(total_ms), start_(std::chrono::system_clock::now()) {
+    }
+
+    ~ScopedTimer() {
+        std::chrono::system_clock::time_point end = std::chrono::system_clock::now();
+        *total_ms_ += std::chrono::duration_cast<std::chrono::microseconds>(end - start_).count() * 0.001;
+    }
+
+private:
+    double* total_ms_;
+    std::chrono::system_clock::time_point start_;
+};
+
+}  // namespace
+
+std::string TrainerStats::ToString() const {
+    std::ostringstream oss;
+    const int64_t n = std::max<int64_t>(num_steps, 1);
+    oss << "steps=" << num_steps;
+    oss << " prepare=" << prepare_ms / n << "ms";
+    oss << " run=" << run_ms / n << "ms";
+    oss << " update=" << update_ms / n << "ms";
+    oss << " sync=" << sync_ms / n << "ms";
+    oss << " (per step)";
+    return oss.str();
+}
+
+Trainer::Trainer(
+        XCVM* xcvm,
+        const XCVMOptions& options,
+        const InOuts& params,
+        const std::string& loss_name,
+        PrepareFn prepare,
+        float learning_rate,
+        int loss_interval)
+    : xcvm_(xcvm),
+      options_(options),
+      loss_name_(loss_name),
+      prepare_(prepare),
+      learning_rate_(learning_rate),
+      loss_interval_(loss_interval),
+      device_(&chainerx::GetDefaultDevice()),
+      inputs_(params) {
+    CHECK_LT(0, loss_interval_);
+    Prefetch();
+}
+
+Trainer::~Trainer() {
+    if (next_inputs_.valid()) next_inputs_.wait();
+}
+
+void Trainer::Prefetch() {
+    chainerx::Context* context = &device_->context();
+    next_inputs_ = std::async(std::launch::async, [this, context]() {
+        // The default device and the backprop mode are thread local.
+        chainerx::DeviceScope device_scope(device_);
+        chainerx::NoBackpropModeScope no_backprop(*context);
+        return prepare_();
+    });
+}
+
+bool Trainer::Step() {
+    if (is_finished_) return false;
+    // `Step` may be called from a thread other than the constructor.
+    chainerx::DeviceScope device_scope(device_);
+    chainerx::NoBackpropModeScope no_backprop(device_->context());
+
+    {
+        ChromeTracingEmitter::ScopedEvent se(options_.chrome_tracing, "Trainer", "Prepare");
+        ScopedTimer timer(&stats_.prepare_ms);
+        InOuts next_inputs = next_inputs_.get();
+        if (next_inputs.empty()) {
+            is_finished_ = true;
+            Sync();
+            return false;
+        }
+        for (auto& p : next_inputs) {
+            inputs_[p.first] = std::move(p.second);
+        }
+    }
+    // Prepare the next inputs while running this step.
+    Prefetch();
+
+    InOuts outputs;
+    {
+        ChromeTracingEmitter::ScopedEvent se(options_.chrome_tracing, "Trainer", "Run");
+        ScopedTimer timer(&stats_.run_ms);
+        outputs = xcvm_->Run(inputs_, options_);
+    }
+
+    {
+        ChromeTracingEmitter::ScopedEvent se(options_.chrome_tracing, "Trainer", "Update");
+        ScopedTimer timer(&stats_.update_ms);
+        for (auto&& p : outputs) {
+            if (!HasPrefix(p.first, "grad_out@")) continue;
+            const std::string& param_name = p.first.substr(9);
+            auto found = inputs_.find(param_name);
+            CHECK(found != inputs_.end());
+            XCVMVar* param = found->second.get();
+            XCVMVar* grad = p.second.get();
+            CHECK_EQ(param->kind(), XCVMVar::Kind::kArray) << "Only an array can be a parameter";
+            CHECK_EQ(grad->kind(), XCVMVar::Kind::kArray) << "Only an array can be a parameter";
+            param->GetArray() -= grad->GetArray() * learning_rate_;
+        }
+    }
+
+    auto found = outputs.find(loss_name_);
+    CHECK(found != outputs.end()) << "No loss output: " << loss_name_;
+    pending_losses_.push_back(found->second->GetArray());
+    ++stats_.num_steps;
+    if (static_cast<int>(pending_losses_.size()) >= loss_interval_) {
+        Sync();
+    }
+    return true;
+}
+
+void Trainer::Sync() {
+    ChromeTracingEmitter::ScopedEvent se(options_.chrome_tracing, "Trainer", "Sync");
+    ScopedTimer timer(&stats_.sync_ms);
+    for (const chainerx::Array& loss : pending_losses_) {
+        losses_.push_back(static_cast<double>(chainerx::AsScalar(loss)));
+    }
+    pending_losses_.clear();
+}
+
+}  // namespace runtime
+}  // namespace chainer_compiler
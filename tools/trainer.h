@@ -0,0 +1,97 @@
+#pragma once
+
+#include <functional>
+#include <future>
+#include <string>
+#include <vector>
+
+#include <chainerx/array.h>
+
+#include <runtime/xcvm.h>
+
+namespace chainer_compiler {
+namespace runtime {
+
+// Time spent in each phase of training steps.
+struct TrainerStats {
+    int64_t num_steps = 0;
+    // Waiting for inputs of steps prepared in the background.
+    double prepare_ms = 0;
+    double run_ms = 0;
+    // Updating parameters by gradients outputs.
+    double update_ms = 0;
+    // Reading losses back from the device.
+    double sync_ms = 0;
+
+    std::string ToString() const;
+};
+
+// Runs training steps of an XCVM program.
+//
+// Inputs of the next step are prepared by a background thread while
+// the current step is running. The loss is read back from the device
+// only every `loss_interval` steps, so steps are not synchronized
+// with the host otherwise. If the program outputs `grad_out@<param>`,
+// the parameter is updated by SGD after each step.
+class Trainer {
+public:
+    // Returns inputs of a step, which will be fed in addition to
+    // `params`. An empty map means the end of the data. This is
+    // called from a thread other than the caller of `Step`.
+    typedef std::function<InOuts()> PrepareFn;
+
+    Trainer(XCVM* xcvm,
+            const XCVMOptions& options,
+            const InOuts& params,
+            const std::string& loss_name,
+            PrepareFn prepare,
+            float learning_rate,
+            int loss_interval);
+    ~Trainer();
+
+    Trainer(const Trainer&) = delete;
+    Trainer& operator=(const Trainer&) = delete;
+
+    // Runs a training step. Returns false if there is no more data.
+    bool Step();
+
+    // Reads back losses of steps which have not been read yet.
+    void Sync();
+
+    // Losses read back so far, in the order of steps.
+    const std::vector<double>& losses() const {
+        return losses_;
+    }
+
+    const TrainerStats& stats() const {
+        return stats_;
+    }
+
+    XCVMOptions* mutable_options() {
+        return &options_;
+    }
+
+private:
+    void Prefetch();
+
+    XCVM* xcvm_;
+    XCVMOptions options_;
+    const std::string loss_name_;
+    PrepareFn prepare_;
+    const float learning_rate_;
+    const int loss_interval_;
+    chainerx::Device* device_;
+
+    // Parameters and inputs of the last step. Values of the same
+    // names are overwritten in each step.
+    InOuts inputs_;
+    std::future<InOuts> next_inputs_;
+    bool is_finished_ = false;
+
+    std::vector<chainerx::Array> pending_losses_;
+    std::vector<double> losses_;
+    TrainerStats stats_;
+};
+
+}  // namespace runtime
+}  // namespace chainer_compiler
@@ -1,6 +1,8 @@
 #include "tools/util.h"
 
 #include <algorithm>
+#include <cmath>
+#include <limits>
 
 #include <chainerx/array.h>
 #include <chainerx/dtype.h>
@@ -8,7 +10,9 @@
 #include <chainerx/indexable_array.h>
 #include <chainerx/indexer.h>
 #include <chainerx/native/data_type.h>
+#include <chainerx/native/native_backend.h>
 #include <chainerx/numeric.h>
+#include <chainerx/routines/creation.h>
 
 #include <compiler/graph.h>
 #include <compiler/model.h>
@@ -50,7 +54,9 @@ InOuts LoadParams(const Graph& graph) {
         if (const Tensor* initializer = input->initializer()) {
             chainerx::Dtype dtype = ChainerXTypeFromONNX(initializer->dtype().ToONNX());
             chainerx::Shape shape(initializer->dims());
-            const void* data = initializer->GetRawData();
+            // Arrays on the native device share the memory with
+            // initializers, i.e., no data is copied.
+            std::shared_ptr<void> data = initializer->GetSharedData();
             chainerx::Array tensor;
             // If the input is used only by Reshape as a shape, place
             // it on host memory.
@@ -59,9 +65,10 @@ InOuts LoadParams(const Graph& graph) {
             if (std::find_if(input->users().begin(), input->users().end(), [input](const Node* node) {
                     return node->op_type() != Node::kReshape || node->input(1) != input;
                 }) == input->users().end()) {
-                tensor = MakeHostArray(dtype, shape, data);
+                tensor = chainerx::FromData(
+                        shape, dtype, data, nonstd::nullopt /* strides */, 0 /* offset */, chainerx::GetNativeBackend().GetDevice(0));
             } else {
-                tensor = MakeArray(dtype, shape, data);
+                tensor = chainerx::FromContiguousHostData(shape, dtype, data);
             }
             CHECK(params.emplace(initializer->name(), std::shared_ptr<XCVMVar>(new XCVMVar(tensor))).second)
                     << "Duplicate input tensor: " << initializer->name();
@@ -70,7 +77,7 @@ InOuts LoadParams(const Graph& graph) {
     return params;
 }
 
-int MismatchInAllClose(const chainerx::Array& a, const chainerx::Array& b, double rtol, double atol, bool equal_nan) {
+AllCloseResult ComputeAllCloseStats(const chainerx::Array& a, const chainerx::Array& b, double rtol, double atol, bool equal_nan) {
     // Most part of this code is copied from chainerx
     if (a.shape() != b.shape()) {
         throw chainerx::DimensionError{"Cannot compare Arrays of different shapes: ", a.shape(), ", ", b.shape()};
@@ -84,25 +91,58 @@ int MismatchInAllClose(const chainerx::Array& a, const chainerx::Array& b, doubl
 
     return VisitDtype(a.dtype(), [&](auto pt) {
         using T = typename decltype(pt)::type;
-        chainerx::IndexableArray<const T> a_iarray{a_native};
-        chainerx::IndexableArray<const T> b_iarray{b_native};
-        chainerx::Indexer<> indexer{a_native.shape()};
+        AllCloseResult result;
+        // All statistics are computed in a single pass.
+        auto check = [&](T at, T bt, int64_t index) {
+            const double ai = static_cast<double>(at);
+            const double bi = static_cast<double>(bt);
+            const bool a_nan = std::isnan(ai);
+            const bool b_nan = std::isnan(bi);
+            bool ok;
+            if (a_nan || b_nan) {
+                ok = equal_nan && a_nan && b_nan;
+            } else {
+                const double abs_error = std::abs(ai - bi);
+                const double tol = atol + rtol * std::abs(bi);
+                ok = !(abs_error > tol);
+                if (abs_error > result.max_abs_error) result.max_abs_error = abs_error;
+                if (abs_error > 0) {
+                    const double rel_error = bi == 0 ? std::numeric_limits<double>::infinity() : abs_error / std::abs(bi);
+                    if (rel_error > result.max_rel_error) result.max_rel_error = rel_error;
+                }
+            }
+            if (!ok) {
+                if (result.mismatch_count == 0) result.first_mismatch_index = index;
+                result.mismatch_count++;
+            }
+        };
 
-        int64_t error_count = 0;
-        for (auto it = indexer.It(0); it; ++it) {
-            T ai = chainerx::native::StorageToDataType<const T>(a_iarray[it]);
-            T bi = chainerx::native::StorageToDataType<const T>(b_iarray[it]);
-            if (equal_nan && chainerx::IsNan(ai) && chainerx::IsNan(bi)) {
-                // nop
-            } else if (
-                    chainerx::IsNan(ai) || chainerx::IsNan(bi) ||
-                    std::abs(static_cast<double>(ai) - static_cast<double>(bi)) > atol + rtol * std::abs(static_cast<double>(bi))) {
-                error_count++;
+        const int64_t size = a_native.GetTotalSize();
+        if (a_native.IsContiguous() && b_native.IsContiguous()) {
+            // Indices are not computed for each element, so the loop
+            // can be vectorized.
+            const T* ap = reinterpret_cast<const T*>(static_cast<const char*>(a_native.raw_data()) + a_native.offset());
+            const T* bp = reinterpret_cast<const T*>(static_cast<const char*>(b_native.raw_data()) + b_native.offset());
+            for (int64_t i = 0; i < size; ++i) {
+                check(chainerx::native::StorageToDataType<const T>(ap[i]), chainerx::native::StorageToDataType<const T>(bp[i]), i);
+            }
+        } else {
+            chainerx::IndexableArray<const T> a_iarray{a_native};
+            chainerx::IndexableArray<const T> b_iarray{b_native};
+            chainerx::Indexer<> indexer{a_native.shape()};
+            for (auto it = indexer.It(0); it; ++it) {
+                check(chainerx::native::StorageToDataType<const T>(a_iarray[it]),
+                      chainerx::native::StorageToDataType<const T>(b_iarray[it]),
+                      it.raw_index());
             }
         }
-        return error_count;
+        return result;
     });
 }
 
+int MismatchInAllClose(const chainerx::Array& a, const chainerx::Array& b, double rtol, double atol, bool equal_nan) {
+    return ComputeAllCloseStats(a, b, rtol, atol, equal_nan).mismatch_count;
+}
+
 }  // namespace runtime
 }  // namespace chainer_compiler
@@ -1,5 +1,7 @@
 #pragma once
 
+#include <cstdint>
+
 #include <compiler/onnx.h>
 
 #include <chainerx/array.h>
@@ -17,6 +19,19 @@ chainerx::Dtype ChainerXTypeFromONNX(int xtype);
 
 InOuts LoadParams(const Graph& graph);
 
+struct AllCloseResult {
+    int64_t mismatch_count{0};
+    // Errors of elements which are not NaN.
+    double max_abs_error{0};
+    double max_rel_error{0};
+    // The index of the first mismatch in the flattened arrays, or -1.
+    int64_t first_mismatch_index{-1};
+};
+
+// Compares `a` and `b` like numpy.allclose and returns statistics of
+// errors. Arrays are compared on the host.
+AllCloseResult ComputeAllCloseStats(const chainerx::Array& a, const chainerx::Array& b, double rtol, double atol, bool equal_nan = false);
+
 // Returns Mis-match Count
 int MismatchInAllClose(const chainerx::Array& a, const chainerx::Array& b, double rtol, double atol, bool equal_nan = false);
 